@@ -0,0 +1,149 @@
+"""
+图表预聚合
+在 NumPy 中计算直方图分箱、箱线图分位数/须/异常值样本和饼图计数，
+报告只嵌入聚合结果，大小与数据行数无关
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+
+def _finite(values) -> np.ndarray:
+    """转为 float64 数组并去掉缺失值"""
+    values = np.asarray(values, dtype=np.float64)
+    return values[np.isfinite(values)]
+
+
+def nice_step(raw: float) -> float:
+    """
+    将步长向上取整为 1/2/2.5/5 × 10^k
+
+    Args:
+        raw: 原始步长（> 0）
+
+    Returns:
+        float: 整齐的步长
+    """
+    magnitude = 10 ** np.floor(np.log10(raw))
+    return float(next(m * magnitude for m in (1, 2, 2.5, 5, 10) if m * magnitude >= raw))
+
+
+def nice_bin_edges(vmin: float, vmax: float, nbins: int = 50) -> np.ndarray:
+    """
+    计算"整齐"的分箱边界（箱宽取 1/2/2.5/5 × 10^k，与 Plotly 自动分箱相近）
+
+    Args:
+        vmin: 最小值
+        vmax: 最大值
+        nbins: 期望的分箱数
+
+    Returns:
+        ndarray: 分箱边界
+    """
+    if vmax <= vmin:
+        return np.array([vmin - 0.5, vmin + 0.5])
+
+    step = nice_step((vmax - vmin) / max(nbins, 1))
+
+    start = np.floor(vmin / step) * step
+    stop = np.ceil(vmax / step) * step
+    if stop <= vmax:
+        stop += step
+    n_edges = int(round((stop - start) / step)) + 1
+    return start + step * np.arange(n_edges)
+
+
+def histogram(values, nbins: int = 50) -> Dict:
+    """
+    计算直方图
+
+    Args:
+        values: 数据
+        nbins: 期望的分箱数
+
+    Returns:
+        dict: {'edges': 分箱边界, 'counts': 各箱计数, 'n': 有效样本数}
+    """
+    values = _finite(values)
+    if len(values) == 0:
+        return {'edges': np.array([0.0, 1.0]), 'counts': np.zeros(1, dtype=np.int64), 'n': 0}
+
+    edges = nice_bin_edges(values.min(), values.max(), nbins)
+    # 等宽分箱直接算下标，比 np.histogram 的通用路径快
+    step = edges[1] - edges[0]
+    index = np.clip(((values - edges[0]) / step).astype(np.int64), 0, len(edges) - 2)
+    counts = np.bincount(index, minlength=len(edges) - 1)
+    return {'edges': edges, 'counts': counts, 'n': len(values)}
+
+
+def box_stats(values, max_outliers: int = 200, whisker: float = 1.5,
+              random_state: int = 42) -> Dict:
+    """
+    计算箱线图统计量
+
+    须的端点为 [Q1 - 1.5 IQR, Q3 + 1.5 IQR] 内的最远数据点（与 Plotly 一致），
+    超出部分为异常值；异常值过多时保留最小、最大值并随机抽样其余部分。
+
+    Args:
+        values: 数据
+        max_outliers: 最多保留的异常值个数
+        whisker: 须长度（IQR 倍数）
+        random_state: 抽样随机种子
+
+    Returns:
+        dict: q1 / median / q3 / lowerfence / upperfence / mean / sd / n / n_outliers / outliers
+    """
+    values = _finite(values)
+    if len(values) == 0:
+        return {'q1': np.nan, 'median': np.nan, 'q3': np.nan, 'lowerfence': np.nan,
+                'upperfence': np.nan, 'mean': np.nan, 'sd': np.nan, 'n': 0,
+                'n_outliers': 0, 'outliers': np.array([])}
+
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    low_limit = q1 - whisker * iqr
+    high_limit = q3 + whisker * iqr
+
+    inside = (values >= low_limit) & (values <= high_limit)
+    outliers = values[~inside]
+    n_outliers = len(outliers)
+    if n_outliers > max_outliers:
+        rng = np.random.default_rng(random_state)
+        extremes = [outliers.argmin(), outliers.argmax()]
+        rest = np.setdiff1d(np.arange(n_outliers), extremes)
+        keep = np.concatenate([extremes, rng.choice(rest, max_outliers - 2, replace=False)])
+        outliers = outliers[np.sort(keep)]
+
+    return {
+        'q1': float(q1),
+        'median': float(median),
+        'q3': float(q3),
+        'lowerfence': float(values[inside].min()),
+        'upperfence': float(values[inside].max()),
+        'mean': float(values.mean()),
+        'sd': float(values.std()),
+        'n': len(values),
+        'n_outliers': n_outliers,
+        'outliers': outliers
+    }
+
+
+def category_counts(values, categories: Optional[Sequence] = None) -> Dict:
+    """
+    统计各类别的计数（顺序固定，不按频数排序）
+
+    Args:
+        values: 数据
+        categories: 类别列表，None 表示使用出现过的全部类别（升序）
+
+    Returns:
+        dict: {'categories': 类别列表, 'counts': 计数数组}
+    """
+    unique, counts = np.unique(np.asarray(values), return_counts=True)
+    if categories is None:
+        return {'categories': unique.tolist(), 'counts': counts}
+
+    lookup = dict(zip(unique.tolist(), counts.tolist()))
+    categories: List = list(categories)
+    return {'categories': categories,
+            'counts': np.array([lookup.get(c, 0) for c in categories], dtype=np.int64)}
@@ -0,0 +1,217 @@
+"""
+特征关联检验
+一次向量化计算全部特征与 cardio 的关联：分类特征做卡方检验，连续特征做点二列相关和
+Mann-Whitney U 检验，分类特征两两之间计算 Cramér's V。
+分类特征 one-hot 后由一次矩阵乘法得到所有两两列联表（含与 cardio 的列联表），
+连续特征按列同时排序求秩，不逐列调用检验函数
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import special
+
+# 取值不超过该数目的整数列视为分类特征
+MAX_CATEGORIES = 20
+
+# 分块构建 one-hot 矩阵的行数（限制内存）
+ONE_HOT_CHUNK = 200000
+
+
+def split_features(columns: Dict[str, np.ndarray], target: str = 'cardio',
+                   max_categories: int = MAX_CATEGORIES,
+                   exclude: Sequence[str] = ('id',)) -> Tuple[List[str], List[str]]:
+    """
+    将特征分为分类特征和连续特征
+
+    Args:
+        columns: 列名 -> 数组
+        target: 目标列
+        max_categories: 分类特征的最大取值数
+        exclude: 不参与检验的列
+
+    Returns:
+        tuple: (分类特征, 连续特征)
+    """
+    categorical, continuous = [], []
+    for name, values in columns.items():
+        if name == target or name in exclude:
+            continue
+        values = np.asarray(values, dtype=np.float64)
+        finite = values[np.isfinite(values)]
+        if np.array_equal(finite, np.round(finite)) and len(np.unique(finite)) <= max_categories:
+            categorical.append(name)
+        else:
+            continuous.append(name)
+    return categorical, continuous
+
+
+def contingency_tables(columns: Dict[str, np.ndarray], names: List[str]) -> Tuple[np.ndarray, np.ndarray, List]:
+    """
+    一次计算所有分类列两两之间的列联表
+
+    各列编码为 one-hot 后拼成 n × L 矩阵 X（L 为全部取值数之和），X.T @ X 的 (i, j) 块即列 i 与列 j 的列联表。
+
+    Args:
+        columns: 列名 -> 数组
+        names: 分类列
+
+    Returns:
+        tuple: (L × L 计数矩阵, 各列取值在矩阵中的起始位置（长度为列数 + 1）, 各列的取值)
+    """
+    codes, levels = [], []
+    for name in names:
+        values = np.asarray(columns[name], dtype=np.float64)
+        finite = np.isfinite(values)
+        uniques, inverse = np.unique(values[finite], return_inverse=True)
+        code = np.full(len(values), -1, dtype=np.int64)
+        code[finite] = inverse
+        codes.append(code)
+        levels.append(uniques)
+    offsets = np.concatenate([[0], np.cumsum([len(u) for u in levels])]).astype(np.int64)
+    codes = np.column_stack(codes)
+    positions = codes + offsets[:-1]
+
+    total = offsets[-1]
+    counts = np.zeros((total, total))
+    for start in range(0, len(codes), ONE_HOT_CHUNK):
+        block = positions[start:start + ONE_HOT_CHUNK]
+        present = codes[start:start + ONE_HOT_CHUNK] >= 0
+        one_hot = np.zeros((len(block), total), dtype=np.float32)
+        rows = np.broadcast_to(np.arange(len(block))[:, None], block.shape)
+        one_hot[rows[present], block[present]] = 1
+        counts += (one_hot.T @ one_hot).astype(np.float64)
+    return counts, offsets, levels
+
+
+def chi_square_blocks(counts: np.ndarray, offsets: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    对 contingency_tables 的全部块同时做卡方独立性检验
+
+    每一对列只使用两列都不缺失的行，期望频数由该块自身的行列合计计算。
+
+    Args:
+        counts: L × L 计数矩阵
+        offsets: 各列取值的起始位置
+
+    Returns:
+        dict: 'chi2'、'dof'、'p_value'、'cramers_v'、'n'，均为 列数 × 列数 矩阵
+    """
+    starts = offsets[:-1]
+    feature_of = np.repeat(np.arange(len(starts)), np.diff(offsets))
+    # margins[a, j]: 取值 a 所在列与列 j 同时不缺失时取值 a 的行数
+    margins = np.add.reduceat(counts, starts, axis=1)
+    n = np.add.reduceat(margins, starts, axis=0)
+    row_totals = margins[:, feature_of]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = row_totals * row_totals.T / n[feature_of][:, feature_of]
+        cells = np.where(expected > 0, (counts - expected) ** 2 / expected, 0.0)
+    chi2 = np.add.reduceat(np.add.reduceat(cells, starts, axis=0), starts, axis=1)
+
+    # 自由度按块内非空的行、列数计算
+    levels = np.add.reduceat((margins > 0).astype(np.int64), starts, axis=0)
+    rows, cols = levels, levels.T
+    dof = (rows - 1) * (cols - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_value = np.where(dof > 0, special.chdtrc(np.maximum(dof, 1), chi2), np.nan)
+        cramers_v = np.sqrt(chi2 / (n * (np.minimum(rows, cols) - 1)))
+    cramers_v = np.where(np.minimum(rows, cols) > 1, cramers_v, np.nan)
+    return {'chi2': chi2, 'dof': dof, 'p_value': p_value, 'cramers_v': cramers_v, 'n': n}
+
+
+def continuous_tests(X: np.ndarray, y: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    对全部连续列同时做点二列相关和 Mann-Whitney U 检验（双侧，正态近似，含结与连续性校正）
+
+    Args:
+        X: n × q 矩阵（不含缺失值）
+        y: 二值目标（0/1）
+
+    Returns:
+        dict: 'r'、'r_p_value'、'u'、'u_p_value'、'auc'，均为长度 q 的数组
+    """
+    n, q = X.shape
+    y = y.astype(bool)
+    n1 = y.sum()
+    n0 = n - n1
+
+    # 点二列相关即 x 与二值 y 的 Pearson 相关
+    mean1 = X[y].mean(axis=0) if n1 else np.zeros(q)
+    mean0 = X[~y].mean(axis=0) if n0 else np.zeros(q)
+    std = X.std(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = (mean1 - mean0) / std * np.sqrt(n1 * n0) / n
+        t = r * np.sqrt((n - 2) / (1 - r ** 2))
+    r_p_value = 2 * special.stdtr(n - 2, -np.abs(t))
+
+    # 所有列一次排序；同值（结）取平均秩，按 (列, 结组) 编号后用 bincount 聚合
+    order = np.argsort(X, axis=0, kind='stable')
+    ordered = np.take_along_axis(X, order, axis=0)
+    new_group = np.ones((n, q), dtype=bool)
+    new_group[1:] = ordered[1:] != ordered[:-1]
+    groups = (np.cumsum(new_group, axis=0) - 1 + np.arange(q) * n).ravel()
+    positions = np.broadcast_to(np.arange(1, n + 1, dtype=np.float64)[:, None], (n, q)).ravel()
+    sizes = np.bincount(groups, minlength=n * q).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_rank = np.bincount(groups, weights=positions, minlength=n * q) / sizes
+    ranks = mean_rank[groups].reshape(n, q)
+    rank_sum = (ranks * y[order]).sum(axis=0)
+    ties = (sizes ** 3 - sizes).reshape(q, n).sum(axis=1)
+
+    u = rank_sum - n1 * (n1 + 1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.sqrt(n1 * n0 / 12 * ((n + 1) - ties / (n * (n - 1))))
+        z = np.maximum(np.abs(u - n1 * n0 / 2) - 0.5, 0) / sigma
+        auc = u / (n1 * n0)
+    u_p_value = np.minimum(2 * special.ndtr(-z), 1.0)
+    return {'r': r, 'r_p_value': r_p_value, 'u': u, 'u_p_value': u_p_value, 'auc': auc}
+
+
+def association_tests(columns: Dict[str, np.ndarray], target: str = 'cardio',
+                      max_categories: int = MAX_CATEGORIES,
+                      exclude: Sequence[str] = ('id',)) -> Dict[str, pd.DataFrame]:
+    """
+    计算全部特征与目标的关联检验
+
+    Args:
+        columns: 列名 -> 数组（连续特征含缺失值的行不参与连续特征检验）
+        target: 二值目标列
+        max_categories: 分类特征的最大取值数
+        exclude: 不参与检验的列
+
+    Returns:
+        dict: {
+            'target': 每个检验一行（特征、类型、检验、统计量、自由度、p 值、效应量、效应量类型），
+            'cramers_v': 分类特征两两之间的 Cramér's V 矩阵
+        }
+    """
+    if target not in columns:
+        raise ValueError(f"数据中缺少目标列: {target}")
+    categorical, continuous = split_features(columns, target, max_categories, exclude)
+    rows = []
+
+    cramers_v = pd.DataFrame()
+    if categorical:
+        names = categorical + [target]
+        counts, offsets, _ = contingency_tables(columns, names)
+        result = chi_square_blocks(counts, offsets)
+        t = len(names) - 1
+        for i, name in enumerate(categorical):
+            rows.append((name, '分类', '卡方检验', result['chi2'][i, t], result['dof'][i, t],
+                         result['p_value'][i, t], result['cramers_v'][i, t], "Cramér's V"))
+        cramers_v = pd.DataFrame(result['cramers_v'][:t, :t], index=categorical, columns=categorical)
+
+    if continuous:
+        X = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in continuous])
+        y = np.asarray(columns[target], dtype=np.float64)
+        complete = np.isfinite(X).all(axis=1) & np.isfinite(y)
+        result = continuous_tests(X[complete], y[complete] == y[complete].max())
+        for j, name in enumerate(continuous):
+            rows.append((name, '连续', '点二列相关', result['r'][j], np.nan,
+                         result['r_p_value'][j], result['r'][j], 'r'))
+            rows.append((name, '连续', 'Mann-Whitney U', result['u'][j], np.nan,
+                         result['u_p_value'][j], result['auc'][j], 'AUC'))
+
+    table = pd.DataFrame(rows, columns=['特征', '类型', '检验', '统计量', '自由度', 'p 值', '效应量', '效应量类型'])
+    return {'target': table, 'cramers_v': cramers_v}
@@ -0,0 +1,619 @@
+"""
+分析计算后端
+数据读取和基础统计（缺失值、描述统计、相关矩阵、交叉表、计数）的统一接口：
+- pandas（默认）：一次性读入内存，结果与原先的 pandas 实现完全一致
+- polars：惰性扫描，列投影和过滤条件下推到 Parquet/CSV 扫描，多线程执行
+- duckdb：嵌入式 SQL 引擎，同样下推投影和过滤，多线程执行
+"""
+
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.report_cache import describe_columns
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# 过滤条件：(列名, 运算符, 取值)，多个条件之间为"且"，格式与 pandas.read_parquet 的 filters 相同
+Filter = Tuple[str, str, Any]
+FILTER_OPS = ('==', '!=', '<', '<=', '>', '>=', 'in', 'not in')
+
+# describe() 的行，与 pandas.DataFrame.describe 相同
+DESCRIBE_ROWS = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+def _check_filters(filters: Optional[Sequence[Filter]]) -> List[Filter]:
+    """校验过滤条件"""
+    filters = [tuple(f) for f in (filters or [])]
+    for f in filters:
+        if len(f) != 3 or f[1] not in FILTER_OPS:
+            raise ValueError(f"无效的过滤条件: {f}，格式为 (列名, 运算符, 取值)，运算符可选: {list(FILTER_OPS)}")
+    return filters
+
+
+def _data_format(data_path: str) -> str:
+    """数据文件格式"""
+    for suffix in ('.parquet', '.csv', '.xlsx'):
+        if data_path.endswith(suffix):
+            return suffix[1:]
+    raise ValueError("不支持的文件格式，请使用 .xlsx、.csv 或 .parquet")
+
+
+def _pivot_counts(counts: pd.DataFrame, index: str, columns: str, normalize=False) -> pd.DataFrame:
+    """
+    将分组计数（index, columns, n）整理为与 pandas.crosstab 相同格式的交叉表
+
+    Args:
+        counts: 分组计数
+        index: 行变量
+        columns: 列变量
+        normalize: False、'index'、'columns' 或 True/'all'
+
+    Returns:
+        DataFrame: 交叉表
+    """
+    table = counts.pivot_table(index=index, columns=columns, values='n', aggfunc='sum', fill_value=0)
+    table = table.sort_index().sort_index(axis=1).astype(np.int64)
+    if normalize == 'index':
+        return table.div(table.sum(axis=1), axis=0)
+    if normalize == 'columns':
+        return table.div(table.sum(axis=0), axis=1)
+    if normalize is True or normalize == 'all':
+        return table / table.to_numpy().sum()
+    return table
+
+
+def _describe_frame(values: Dict[str, Dict[str, float]]) -> pd.DataFrame:
+    """由各列的统计量生成与 pandas.DataFrame.describe 相同格式的表"""
+    return pd.DataFrame({col: [float(v) if v is not None else np.nan for v in (stats[row] for row in DESCRIBE_ROWS)]
+                         for col, stats in values.items()}, index=DESCRIBE_ROWS)
+
+
+def _corr_frame(columns: List[str], pairs: Dict[Tuple[int, int], float]) -> pd.DataFrame:
+    """由上三角（含对角线）相关系数生成对称矩阵；常数列的对角线为 NaN（与 pandas 一致）"""
+    n = len(columns)
+    matrix = np.full((n, n), np.nan)
+    for (i, j), value in pairs.items():
+        value = np.nan if value is None else float(value)
+        if i == j:
+            value = 1.0 if np.isfinite(value) else np.nan
+        matrix[i, j] = matrix[j, i] = value
+    return pd.DataFrame(matrix, index=columns, columns=columns)
+
+
+def _content_hash(*parts) -> str:
+    """由聚合结果（行数、哈希和等）计算列内容哈希"""
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+class AnalyticsBackend(ABC):
+    """分析后端基类"""
+
+    name = ''
+
+    def __init__(self,
+                 data_path: str,
+                 columns: Optional[Sequence[str]] = None,
+                 filters: Optional[Sequence[Filter]] = None,
+                 threads: Optional[int] = None):
+        """
+        初始化后端（不读取数据）
+
+        Args:
+            data_path: 数据文件路径（.xlsx、.csv 或 .parquet）
+            columns: 只读取这些列，None 表示全部
+            filters: 过滤条件列表 [(列名, 运算符, 取值)]
+            threads: 线程数（仅 duckdb 支持），None 表示引擎默认（全部核）
+        """
+        self.data_path = data_path
+        self.format = _data_format(data_path)
+        self.columns = list(columns) if columns is not None else None
+        self.filters = _check_filters(filters)
+        self.threads = threads
+        self.loaded = False
+
+    @abstractmethod
+    def load(self) -> 'AnalyticsBackend':
+        """准备数据源（惰性后端只建立查询计划）"""
+
+    @abstractmethod
+    def column_names(self) -> List[str]:
+        """列名"""
+
+    @abstractmethod
+    def dtypes(self) -> Dict[str, Any]:
+        """列名 -> 数据类型"""
+
+    @abstractmethod
+    def numeric_columns(self) -> List[str]:
+        """数值列"""
+
+    @abstractmethod
+    def n_rows(self) -> int:
+        """行数"""
+
+    @abstractmethod
+    def missing(self) -> Dict[str, int]:
+        """列名 -> 缺失值个数"""
+
+    @abstractmethod
+    def fill_missing_with_mean(self) -> Dict[str, float]:
+        """
+        数值列的缺失值用该列均值填充
+
+        Returns:
+            dict: 被填充的列 -> 均值
+        """
+
+    @abstractmethod
+    def describe(self) -> pd.DataFrame:
+        """数值列描述统计（格式同 pandas.DataFrame.describe）"""
+
+    @abstractmethod
+    def corr(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Pearson 相关矩阵，None 表示全部数值列"""
+
+    @abstractmethod
+    def crosstab(self, index: str, columns: str, normalize=False) -> pd.DataFrame:
+        """交叉表（格式同 pandas.crosstab）"""
+
+    @abstractmethod
+    def value_counts(self, column: str) -> Dict:
+        """取值 -> 计数（按计数降序，不含缺失值）"""
+
+    @abstractmethod
+    def column_hashes(self) -> Dict[str, Dict]:
+        """列名 -> {'hash': 内容哈希（含行顺序）, 'numeric': 是否数值列}，格式同 describe_columns"""
+
+    @abstractmethod
+    def to_numpy(self, columns: Sequence[str]) -> Dict[str, np.ndarray]:
+        """取出指定列（只读取这些列）"""
+
+    @abstractmethod
+    def to_pandas(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """取出为 DataFrame"""
+
+    def shape(self) -> Tuple[int, int]:
+        """(行数, 列数)"""
+        return self.n_rows(), len(self.column_names())
+
+    def column_info(self) -> Dict[str, Dict]:
+        """列名 -> {'numeric': 是否数值列}"""
+        numeric = set(self.numeric_columns())
+        return {col: {'numeric': col in numeric} for col in self.column_names()}
+
+
+class PandasBackend(AnalyticsBackend):
+    """pandas 后端：数据一次性读入内存"""
+
+    name = 'pandas'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.df: Optional[pd.DataFrame] = None
+
+    def load(self) -> 'PandasBackend':
+        if self.loaded:
+            return self
+        # 过滤条件用到的列也要读取，过滤后再去掉
+        usecols = self.columns
+        if usecols is not None and self.format != 'parquet':
+            usecols = usecols + [f[0] for f in self.filters if f[0] not in usecols]
+
+        if self.format == 'xlsx':
+            df = pd.read_excel(self.data_path, usecols=usecols)
+        elif self.format == 'csv':
+            df = pd.read_csv(self.data_path, usecols=usecols)
+        else:
+            # Parquet 的过滤条件由 pyarrow 在读取时应用
+            df = pd.read_parquet(self.data_path, columns=self.columns, filters=self.filters or None)
+
+        if self.filters and self.format != 'parquet':
+            mask = np.ones(len(df), dtype=bool)
+            for col, op, value in self.filters:
+                series = df[col]
+                if op == 'in':
+                    mask &= series.isin(list(value)).to_numpy()
+                elif op == 'not in':
+                    mask &= ~series.isin(list(value)).to_numpy()
+                else:
+                    mask &= {'==': series.eq, '!=': series.ne, '<': series.lt, '<=': series.le,
+                             '>': series.gt, '>=': series.ge}[op](value).to_numpy()
+            df = df[mask].reset_index(drop=True)
+            if self.columns is not None:
+                df = df[self.columns]
+
+        self.df = df
+        self.loaded = True
+        return self
+
+    def column_names(self) -> List[str]:
+        return self.df.columns.tolist()
+
+    def dtypes(self) -> Dict[str, Any]:
+        return self.df.dtypes.to_dict()
+
+    def numeric_columns(self) -> List[str]:
+        return self.df.select_dtypes(include=[np.number]).columns.tolist()
+
+    def n_rows(self) -> int:
+        return len(self.df)
+
+    def missing(self) -> Dict[str, int]:
+        return self.df.isnull().sum().to_dict()
+
+    def fill_missing_with_mean(self) -> Dict[str, float]:
+        filled = {}
+        for col in self.numeric_columns():
+            if self.df[col].isnull().sum() > 0:
+                mean_value = self.df[col].mean()
+                self.df[col] = self.df[col].fillna(mean_value)
+                filled[col] = float(mean_value)
+        return filled
+
+    def describe(self) -> pd.DataFrame:
+        return self.df.describe()
+
+    def corr(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        columns = self.numeric_columns() if columns is None else list(columns)
+        return self.df[columns].corr()
+
+    def crosstab(self, index: str, columns: str, normalize=False) -> pd.DataFrame:
+        return pd.crosstab(self.df[index], self.df[columns], normalize=normalize)
+
+    def value_counts(self, column: str) -> Dict:
+        return self.df[column].value_counts().to_dict()
+
+    def column_hashes(self) -> Dict[str, Dict]:
+        return describe_columns(self.df)
+
+    def to_numpy(self, columns: Sequence[str]) -> Dict[str, np.ndarray]:
+        return {col: self.df[col].to_numpy() for col in columns}
+
+    def to_pandas(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        return self.df if columns is None else self.df[list(columns)]
+
+
+class PolarsBackend(AnalyticsBackend):
+    """
+    Polars 惰性后端
+
+    所有统计都在 LazyFrame 上构建并一次性执行，投影和过滤由查询优化器下推到扫描，
+    使用 Polars 的全局线程池（线程数由环境变量 POLARS_MAX_THREADS 控制，不支持 threads 参数）。
+    """
+
+    name = 'polars'
+
+    def __init__(self, *args, **kwargs):
+        if pl is None:
+            raise ImportError("使用 polars 后端需要安装 polars: pip install polars")
+        super().__init__(*args, **kwargs)
+        if self.threads is not None:
+            raise ValueError("polars 后端不支持 threads 参数，线程数由环境变量 POLARS_MAX_THREADS 控制（须在导入 polars 前设置）")
+        self.lf = None
+        self._schema = None
+
+    def load(self) -> 'PolarsBackend':
+        if self.loaded:
+            return self
+        if self.format == 'parquet':
+            lf = pl.scan_parquet(self.data_path)
+        elif self.format == 'csv':
+            lf = pl.scan_csv(self.data_path)
+        else:
+            lf = pl.from_pandas(pd.read_excel(self.data_path)).lazy()
+
+        if self.filters:
+            lf = lf.filter(pl.all_horizontal([self._predicate(f) for f in self.filters]))
+        if self.columns is not None:
+            lf = lf.select(self.columns)
+
+        # 浮点 NaN 统一视为缺失值（与 pandas 的 isnull / 跳过缺失值的语义一致）
+        schema = lf.collect_schema()
+        floats = [col for col, dtype in schema.items() if dtype.is_float()]
+        if floats:
+            lf = lf.with_columns([pl.col(col).fill_nan(None) for col in floats])
+
+        self.lf = lf
+        self._schema = schema
+        self.loaded = True
+        return self
+
+    @staticmethod
+    def _predicate(f: Filter):
+        col, op, value = f
+        column = pl.col(col)
+        if op == 'in':
+            return column.is_in(list(value))
+        if op == 'not in':
+            return ~column.is_in(list(value))
+        return {'==': column.__eq__, '!=': column.__ne__, '<': column.__lt__, '<=': column.__le__,
+                '>': column.__gt__, '>=': column.__ge__}[op](value)
+
+    def column_names(self) -> List[str]:
+        return list(self._schema.names())
+
+    def dtypes(self) -> Dict[str, Any]:
+        return {col: str(dtype) for col, dtype in self._schema.items()}
+
+    def numeric_columns(self) -> List[str]:
+        return [col for col, dtype in self._schema.items() if dtype.is_numeric()]
+
+    def n_rows(self) -> int:
+        return int(self.lf.select(pl.len()).collect().item())
+
+    def missing(self) -> Dict[str, int]:
+        row = self.lf.select([pl.col(col).null_count() for col in self.column_names()]).collect().row(0)
+        return {col: int(n) for col, n in zip(self.column_names(), row)}
+
+    def fill_missing_with_mean(self) -> Dict[str, float]:
+        missing = self.missing()
+        columns = [col for col in self.numeric_columns() if missing[col] > 0]
+        if not columns:
+            return {}
+        means = self.lf.select([pl.col(col).mean() for col in columns]).collect().row(0, named=True)
+        self.lf = self.lf.with_columns([pl.col(col).fill_null(means[col]) for col in columns])
+        # 整数列填充均值后变为浮点列
+        self._schema = self.lf.collect_schema()
+        return {col: float(means[col]) for col in columns}
+
+    def describe(self) -> pd.DataFrame:
+        columns = self.numeric_columns()
+        exprs = []
+        for i, col in enumerate(columns):
+            c = pl.col(col).cast(pl.Float64)
+            exprs += [c.count().alias(f'{i}_count'), c.mean().alias(f'{i}_mean'), c.std().alias(f'{i}_std'),
+                      c.min().alias(f'{i}_min'), c.max().alias(f'{i}_max')]
+            exprs += [c.quantile(q, interpolation='linear').alias(f'{i}_{q}') for q in QUANTILES]
+        row = self.lf.select(exprs).collect().row(0, named=True)
+        return _describe_frame({
+            col: {'count': row[f'{i}_count'], 'mean': row[f'{i}_mean'], 'std': row[f'{i}_std'],
+                  'min': row[f'{i}_min'], '25%': row[f'{i}_0.25'], '50%': row[f'{i}_0.5'],
+                  '75%': row[f'{i}_0.75'], 'max': row[f'{i}_max']}
+            for i, col in enumerate(columns)
+        })
+
+    def corr(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        columns = self.numeric_columns() if columns is None else list(columns)
+        pairs = [(i, j) for i in range(len(columns)) for j in range(i, len(columns))]
+        row = self.lf.select([
+            pl.corr(pl.col(columns[i]).cast(pl.Float64), pl.col(columns[j]).cast(pl.Float64)).alias(f'{i}_{j}')
+            for i, j in pairs
+        ]).collect().row(0)
+        return _corr_frame(columns, dict(zip(pairs, row)))
+
+    def crosstab(self, index: str, columns: str, normalize=False) -> pd.DataFrame:
+        counts = (self.lf.drop_nulls([index, columns])
+                  .group_by([index, columns]).agg(pl.len().alias('n'))
+                  .collect().to_pandas())
+        return _pivot_counts(counts, index, columns, normalize)
+
+    def value_counts(self, column: str) -> Dict:
+        counts = (self.lf.drop_nulls([column]).group_by(column).agg(pl.len().alias('n'))
+                  .sort('n', descending=True).collect())
+        return dict(zip(counts[column].to_list(), counts['n'].to_list()))
+
+    def column_hashes(self) -> Dict[str, Dict]:
+        # 每行的（行号, 取值）哈希求和（UInt64 溢出回绕），一次扫描得到全部列，不取出数据
+        columns = self.column_names()
+        row = (self.lf.with_row_index('__row')
+               .select([pl.len().alias('__n')]
+                       + [pl.struct(['__row', col]).hash(0).sum().alias(f'{i}') for i, col in enumerate(columns)])
+               .collect().row(0))
+        numeric = set(self.numeric_columns())
+        return {col: {'hash': _content_hash(self.name, pl.__version__, str(self._schema[col]), row[0], row[i + 1]),
+                      'numeric': col in numeric}
+                for i, col in enumerate(columns)}
+
+    def to_numpy(self, columns: Sequence[str]) -> Dict[str, np.ndarray]:
+        df = self.lf.select(list(columns)).collect()
+        return {col: df[col].to_numpy() for col in columns}
+
+    def to_pandas(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        lf = self.lf if columns is None else self.lf.select(list(columns))
+        return lf.collect().to_pandas()
+
+
+class DuckDBBackend(AnalyticsBackend):
+    """
+    DuckDB 嵌入式后端
+
+    数据源注册为视图，统计以 SQL 执行，投影和过滤下推到 read_parquet/read_csv 扫描。
+    """
+
+    name = 'duckdb'
+
+    NUMERIC_TYPES = ('TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT', 'UTINYINT', 'USMALLINT',
+                     'UINTEGER', 'UBIGINT', 'FLOAT', 'DOUBLE', 'DECIMAL')
+
+    def __init__(self, *args, **kwargs):
+        if duckdb is None:
+            raise ImportError("使用 duckdb 后端需要安装 duckdb: pip install duckdb")
+        super().__init__(*args, **kwargs)
+        self.con = None
+        self._types: Dict[str, str] = {}
+
+    @staticmethod
+    def _ident(name: str) -> str:
+        return '"' + name.replace('"', '""') + '"'
+
+    @staticmethod
+    def _literal(value) -> str:
+        if value is None:
+            return 'NULL'
+        if isinstance(value, (bool, np.bool_)):
+            return 'TRUE' if value else 'FALSE'
+        if isinstance(value, (int, float, np.integer, np.floating)):
+            return repr(float(value)) if isinstance(value, (float, np.floating)) else str(int(value))
+        return "'" + str(value).replace("'", "''") + "'"
+
+    def _where(self) -> str:
+        conditions = []
+        for col, op, value in self.filters:
+            if op in ('in', 'not in'):
+                values = ', '.join(self._literal(v) for v in value)
+                conditions.append(f"{self._ident(col)} {op.upper()} ({values})")
+            else:
+                sql_op = '=' if op == '==' else op
+                conditions.append(f"{self._ident(col)} {sql_op} {self._literal(value)}")
+        return f" WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    def _query(self, sql: str):
+        return self.con.execute(sql)
+
+    def load(self) -> 'DuckDBBackend':
+        if self.loaded:
+            return self
+        self.con = duckdb.connect()
+        self.con.execute("SET enable_progress_bar = false")
+        if self.threads:
+            self.con.execute(f"SET threads TO {int(self.threads)}")
+
+        if self.format == 'parquet':
+            source = f"read_parquet({self._literal(self.data_path)})"
+        elif self.format == 'csv':
+            source = f"read_csv_auto({self._literal(self.data_path)})"
+        else:
+            self.con.register('excel_source', pd.read_excel(self.data_path))
+            source = 'excel_source'
+
+        select = ', '.join(self._ident(c) for c in self.columns) if self.columns is not None else '*'
+        self.con.execute(f"CREATE VIEW raw AS SELECT {select} FROM {source}{self._where()}")
+
+        # 浮点 NaN 统一视为缺失值（与 pandas 的 isnull / 跳过缺失值的语义一致）
+        types = dict(self._query("SELECT column_name, column_type FROM (DESCRIBE raw)").fetchall())
+        replace = [f"CASE WHEN isnan({self._ident(c)}) THEN NULL ELSE {self._ident(c)} END AS {self._ident(c)}"
+                   for c, t in types.items() if t in ('FLOAT', 'DOUBLE')]
+        self._create_view('clean', 'raw', replace)
+        self._create_view('data', 'clean', [])
+        self.loaded = True
+        return self
+
+    def _create_view(self, name: str, source: str, replace: List[str]):
+        """创建（或替换）视图：source 的全部列，replace 中的列替换为对应表达式"""
+        replace_sql = f" REPLACE ({', '.join(replace)})" if replace else ''
+        self.con.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT *{replace_sql} FROM {source}")
+        if name == 'data':
+            self._types = dict(self._query("SELECT column_name, column_type FROM (DESCRIBE data)").fetchall())
+
+    def column_names(self) -> List[str]:
+        return list(self._types)
+
+    def dtypes(self) -> Dict[str, Any]:
+        return dict(self._types)
+
+    def numeric_columns(self) -> List[str]:
+        return [c for c, t in self._types.items() if t.split('(')[0] in self.NUMERIC_TYPES]
+
+    def n_rows(self) -> int:
+        return int(self._query("SELECT COUNT(*) FROM data").fetchone()[0])
+
+    def missing(self) -> Dict[str, int]:
+        columns = self.column_names()
+        row = self._query("SELECT " + ', '.join(f"COUNT(*) - COUNT({self._ident(c)})" for c in columns)
+                          + " FROM data").fetchone()
+        return {col: int(n) for col, n in zip(columns, row)}
+
+    def fill_missing_with_mean(self) -> Dict[str, float]:
+        missing = self.missing()
+        columns = [col for col in self.numeric_columns() if missing[col] > 0]
+        if not columns:
+            return {}
+        row = self._query("SELECT " + ', '.join(f"AVG({self._ident(c)})" for c in columns) + " FROM data").fetchone()
+        means = {col: float(mean) for col, mean in zip(columns, row)}
+        # 整数列填充均值后变为浮点列（与 pandas 一致）
+        replace = [f"COALESCE(CAST({self._ident(c)} AS DOUBLE), {self._literal(means[c])}) AS {self._ident(c)}"
+                   for c in columns]
+        self._create_view('data', 'clean', replace)
+        return means
+
+    def describe(self) -> pd.DataFrame:
+        columns = self.numeric_columns()
+        exprs = []
+        for col in columns:
+            c = f"CAST({self._ident(col)} AS DOUBLE)"
+            exprs += [f"COUNT({c})", f"AVG({c})", f"STDDEV_SAMP({c})", f"MIN({c})",
+                      f"quantile_cont({c}, [{', '.join(map(str, QUANTILES))}])", f"MAX({c})"]
+        row = self._query("SELECT " + ', '.join(exprs) + " FROM data").fetchone()
+        values = {}
+        for i, col in enumerate(columns):
+            count, mean, std, vmin, quantiles, vmax = row[i * 6:(i + 1) * 6]
+            quantiles = quantiles or [None] * len(QUANTILES)
+            values[col] = {'count': count, 'mean': mean, 'std': std, 'min': vmin,
+                           '25%': quantiles[0], '50%': quantiles[1], '75%': quantiles[2], 'max': vmax}
+        return _describe_frame(values)
+
+    def corr(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        columns = self.numeric_columns() if columns is None else list(columns)
+        pairs = [(i, j) for i in range(len(columns)) for j in range(i, len(columns))]
+        row = self._query("SELECT " + ', '.join(
+            f"CORR(CAST({self._ident(columns[i])} AS DOUBLE), CAST({self._ident(columns[j])} AS DOUBLE))"
+            for i, j in pairs) + " FROM data").fetchone()
+        return _corr_frame(columns, dict(zip(pairs, row)))
+
+    def crosstab(self, index: str, columns: str, normalize=False) -> pd.DataFrame:
+        a, b = self._ident(index), self._ident(columns)
+        counts = self._query(f"SELECT {a}, {b}, COUNT(*) AS n FROM data "
+                             f"WHERE {a} IS NOT NULL AND {b} IS NOT NULL GROUP BY {a}, {b}").df()
+        return _pivot_counts(counts, index, columns, normalize)
+
+    def value_counts(self, column: str) -> Dict:
+        c = self._ident(column)
+        rows = self._query(f"SELECT {c}, COUNT(*) AS n FROM data WHERE {c} IS NOT NULL "
+                           f"GROUP BY {c} ORDER BY n DESC").fetchall()
+        return {value: int(n) for value, n in rows}
+
+    def column_hashes(self) -> Dict[str, Dict]:
+        # 每行的（行号, 取值）哈希求和，一次扫描得到全部列，不取出数据；
+        # 行号按扫描顺序编号（保持插入顺序），顺序不稳定时只会导致缓存未命中
+        columns = self.column_names()
+        sums = ', '.join(f"SUM(hash(__row, {self._ident(c)}))" for c in columns)
+        row = self._query(f"SELECT COUNT(*), {sums} FROM (SELECT row_number() OVER () AS __row, * FROM data)").fetchone()
+        numeric = set(self.numeric_columns())
+        return {col: {'hash': _content_hash(self.name, duckdb.__version__, self._types[col], row[0], row[i + 1]),
+                      'numeric': col in numeric}
+                for i, col in enumerate(columns)}
+
+    def to_numpy(self, columns: Sequence[str]) -> Dict[str, np.ndarray]:
+        df = self.to_pandas(columns)
+        return {col: df[col].to_numpy() for col in columns}
+
+    def to_pandas(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        select = ', '.join(self._ident(c) for c in columns) if columns is not None else '*'
+        return self._query(f"SELECT {select} FROM data").df()
+
+
+BACKENDS = {
+    'pandas': PandasBackend,
+    'polars': PolarsBackend,
+    'duckdb': DuckDBBackend
+}
+
+
+def create_backend(name: str, data_path: str, **kwargs) -> AnalyticsBackend:
+    """
+    创建分析后端
+
+    Args:
+        name: 后端名（pandas、polars 或 duckdb）
+        data_path: 数据文件路径
+        **kwargs: columns / filters / threads
+
+    Returns:
+        AnalyticsBackend: 后端实例（尚未读取数据）
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"未知的分析后端: {name}，可选: {list(BACKENDS)}")
+    return BACKENDS[name](data_path, **kwargs)
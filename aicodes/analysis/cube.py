@@ -0,0 +1,308 @@
+"""
+预计算分组立方体
+对所有低基数维度（性别、胆固醇、血糖、吸烟、饮酒、运动、年龄段、cardio）的
+全部组合预先计算计数和数值指标的和，任意过滤 + 分组查询只需在小数组上求和
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cardio_labels import AGE_BANDS, CHOLESTEROL_LABELS, GENDER_LABELS, age_in_years
+
+# 维度名 -> {取值: 标签}；age_band 由 age 列分段得到
+CUBE_DIMENSIONS = {
+    'gender': GENDER_LABELS,
+    'cholesterol': CHOLESTEROL_LABELS,
+    'gluc': CHOLESTEROL_LABELS,  # 血糖与胆固醇的取值含义相同
+    'smoke': {0: '不吸烟', 1: '吸烟'},
+    'alco': {0: '不饮酒', 1: '饮酒'},
+    'active': {0: '不运动', 1: '运动'},
+    'age_band': {label: label for _, _, label in AGE_BANDS},
+    'cardio': {0: '健康', 1: '患病'}
+}
+
+# 数值指标（按组求均值）
+CUBE_MEASURES = ['age_years', 'height', 'weight', 'bmi', 'ap_hi', 'ap_lo']
+
+
+def measure_values(df: pd.DataFrame, measure: str) -> np.ndarray:
+    """取出数值指标（float64），缺失的列返回全 NaN"""
+    if measure == 'age_years':
+        return age_in_years(df['age'].to_numpy()) if 'age' in df.columns else np.full(len(df), np.nan)
+    if measure == 'bmi':
+        if 'weight' not in df.columns or 'height' not in df.columns:
+            return np.full(len(df), np.nan)
+        height_m = df['height'].to_numpy(dtype=np.float64) / 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return df['weight'].to_numpy(dtype=np.float64) / height_m ** 2
+    if measure not in df.columns:
+        return np.full(len(df), np.nan)
+    return df[measure].to_numpy(dtype=np.float64)
+
+
+class DataCube:
+    """分组立方体"""
+
+    def __init__(self,
+                 dimensions: Optional[Dict[str, Dict]] = None,
+                 measures: Optional[List[str]] = None):
+        """
+        初始化空立方体
+
+        Args:
+            dimensions: 维度定义（维度名 -> {取值: 标签}），默认 CUBE_DIMENSIONS
+            measures: 数值指标，默认 CUBE_MEASURES
+        """
+        self.dimensions = {name: dict(values) for name, values in (dimensions or CUBE_DIMENSIONS).items()}
+        self.measures = list(measures or CUBE_MEASURES)
+        self.values = {name: list(values) for name, values in self.dimensions.items()}
+        self.shape = tuple(len(v) for v in self.values.values())
+
+        m = len(self.measures)
+        self.counts = np.zeros(self.shape, dtype=np.int64)
+        # 各指标的非缺失计数和求和，最后一维为指标
+        self.measure_counts = np.zeros(self.shape + (m,), dtype=np.int64)
+        self.sums = np.zeros(self.shape + (m,), dtype=np.float64)
+        self.n_rows = 0
+        self.dropped = 0
+
+        self._codes = {name: {v: i for i, v in enumerate(values)} for name, values in self.values.items()}
+        # 维度名 -> {标签: 取值}（不同维度可能有相同的标签）
+        self._labels = {name: {label: value for value, label in values.items()}
+                        for name, values in self.dimensions.items()}
+
+    def _dimension_codes(self, df: pd.DataFrame, name: str) -> np.ndarray:
+        """计算维度编码，无法识别的取值为 -1"""
+        n = len(df)
+        if name == 'age_band':
+            if 'age' not in df.columns:
+                return np.full(n, -1)
+            years = age_in_years(df['age'].to_numpy())
+            codes = np.full(n, -1)
+            for i, (low, high, _) in enumerate(AGE_BANDS):
+                codes[(years >= low) & (years < high)] = i
+            return codes
+
+        if name not in df.columns:
+            return np.full(n, -1)
+        values = np.asarray(self.values[name], dtype=np.float64)
+        column = df[name].to_numpy(dtype=np.float64)
+        position = np.clip(np.searchsorted(values, column), 0, len(values) - 1)
+        return np.where(values[position] == column, position, -1)
+
+    def encode(self, df: pd.DataFrame):
+        """
+        计算各维度编码
+
+        Args:
+            df: 数据
+
+        Returns:
+            (codes, valid): 编码矩阵（维度数 × 行数）和全部维度都能识别的行
+        """
+        codes = np.vstack([self._dimension_codes(df, name) for name in self.values])
+        return codes, (codes >= 0).all(axis=0)
+
+    def add(self, df: pd.DataFrame) -> 'DataCube':
+        """
+        将一批数据累加到立方体中（可对数据块逐块调用）
+
+        Args:
+            df: 数据
+
+        Returns:
+            self
+        """
+        codes, valid = self.encode(df)
+        self.n_rows += len(df)
+        self.dropped += int((~valid).sum())
+
+        flat = np.ravel_multi_index(codes[:, valid], self.shape)
+        n_cells = self.counts.size
+        self.counts += np.bincount(flat, minlength=n_cells).reshape(self.shape)
+
+        for j, measure in enumerate(self.measures):
+            values = measure_values(df, measure)[valid]
+            finite = np.isfinite(values)
+            self.measure_counts[..., j] += np.bincount(flat[finite], minlength=n_cells).reshape(self.shape)
+            self.sums[..., j] += np.bincount(flat[finite], weights=values[finite],
+                                             minlength=n_cells).reshape(self.shape)
+        return self
+
+    @classmethod
+    def build(cls, chunks: Iterable[pd.DataFrame], **kwargs) -> 'DataCube':
+        """
+        由数据块构建立方体（内存只与分块大小有关）
+
+        Args:
+            chunks: 数据块迭代器（单个 DataFrame 也可以放在列表中）
+            **kwargs: 传给构造函数的参数
+
+        Returns:
+            DataCube: 立方体
+        """
+        cube = cls(**kwargs)
+        for chunk in chunks:
+            cube.add(chunk)
+        return cube
+
+    def save(self, path: str):
+        """保存为压缩的 .npz 文件"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = {
+            'dimensions': {name: [[v, label] for v, label in values.items()]
+                           for name, values in self.dimensions.items()},
+            'measures': self.measures,
+            'n_rows': self.n_rows,
+            'dropped': self.dropped
+        }
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, counts=self.counts, measure_counts=self.measure_counts,
+                                sums=self.sums, meta=np.array(json.dumps(meta, ensure_ascii=False)))
+
+    @classmethod
+    def load(cls, path: str) -> 'DataCube':
+        """从 .npz 文件加载"""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            cube = cls({name: {v: label for v, label in values} for name, values in meta['dimensions'].items()},
+                       meta['measures'])
+            cube.counts = data['counts']
+            cube.measure_counts = data['measure_counts']
+            cube.sums = data['sums']
+        cube.n_rows = meta['n_rows']
+        cube.dropped = meta['dropped']
+        return cube
+
+    def describe(self) -> Dict:
+        """立方体元数据（维度、取值标签和指标）"""
+        return {
+            'dimensions': {name: [{'value': v, 'label': label} for v, label in values.items()]
+                           for name, values in self.dimensions.items()},
+            'measures': self.measures,
+            'n_rows': self.n_rows,
+            'dropped': self.dropped,
+            'cells': int(self.counts.size)
+        }
+
+    def code(self, dim: str, value) -> int:
+        """取值或标签 -> 编码"""
+        codes = self._codes[dim]
+        if value in codes:
+            return codes[value]
+        if isinstance(value, str):
+            labels = self._labels[dim]
+            if value in labels and labels[value] in codes:
+                return codes[labels[value]]
+            try:
+                number = float(value)
+                if number in codes:
+                    return codes[number]
+            except ValueError:
+                pass
+        raise ValueError(f"维度 {dim} 没有取值 {value!r}，可选: {self.values[dim]}")
+
+    def query(self,
+              filters: Optional[Dict[str, Sequence]] = None,
+              group_by: Optional[Sequence[str]] = None,
+              measures: Optional[Sequence[str]] = None) -> Dict:
+        """
+        过滤 + 分组查询
+
+        Args:
+            filters: 维度名 -> 允许的取值（原始取值或标签，单个值也可以）
+            group_by: 分组维度
+            measures: 需要求均值的指标，None 表示全部
+
+        Returns:
+            dict: {'group_by', 'rows': [{维度: 标签, 'count', 'cardio_rate', 'mean_<指标>'}], 'elapsed_us'}
+                  只返回样本数大于 0 的组
+        """
+        start = time.perf_counter()
+        filters = filters or {}
+        group_by = list(group_by or [])
+        measures = self.measures if measures is None else list(measures)
+
+        dims = list(self.values)
+        for dim in list(filters) + group_by:
+            if dim not in self.values:
+                raise ValueError(f"未知维度: {dim}，可选: {dims}")
+        unknown = [m for m in measures if m not in self.measures]
+        if unknown:
+            raise ValueError(f"未知指标: {unknown}，可选: {self.measures}")
+        measure_idx = [self.measures.index(m) for m in measures]
+
+        counts = self.counts
+        measure_counts = self.measure_counts[..., measure_idx]
+        sums = self.sums[..., measure_idx]
+        kept = {dim: list(range(len(self.values[dim]))) for dim in dims}
+
+        # 过滤：沿对应轴只保留允许的取值
+        for dim, allowed in filters.items():
+            if not isinstance(allowed, (list, tuple, set)):
+                allowed = [allowed]
+            axis = dims.index(dim)
+            kept[dim] = sorted({self.code(dim, v) for v in allowed})
+            counts = counts.take(kept[dim], axis=axis)
+            measure_counts = measure_counts.take(kept[dim], axis=axis)
+            sums = sums.take(kept[dim], axis=axis)
+
+        # 患病数：cardio 轴按取值加权
+        cardio_axis = dims.index('cardio')
+        positive_weight = np.array([self.values['cardio'][c] == 1 for c in kept['cardio']], dtype=np.int64)
+        shape = [1] * counts.ndim
+        shape[cardio_axis] = len(positive_weight)
+        positives = counts * positive_weight.reshape(shape)
+
+        # 对非分组维度求和
+        reduce_axes = tuple(i for i, dim in enumerate(dims) if dim not in group_by)
+        counts = counts.sum(axis=reduce_axes)
+        positives = positives.sum(axis=reduce_axes)
+        measure_counts = measure_counts.sum(axis=reduce_axes)
+        sums = sums.sum(axis=reduce_axes)
+
+        # 分组维度按立方体中的顺序排列，转换为调用方指定的顺序
+        ordered = [dim for dim in dims if dim in group_by]
+        permutation = [ordered.index(dim) for dim in group_by]
+        counts = counts.transpose(permutation)
+        positives = positives.transpose(permutation)
+        measure_counts = measure_counts.transpose(permutation + [len(permutation)])
+        sums = sums.transpose(permutation + [len(permutation)])
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates = positives / counts
+            means = sums / measure_counts
+
+        if group_by:
+            groups = list(zip(*np.nonzero(counts)))
+        else:
+            groups = [()] if counts > 0 else []
+
+        rows = []
+        for index in groups:
+            row = {}
+            for dim, i in zip(group_by, index):
+                value = self.values[dim][kept[dim][i]]
+                row[dim] = self.dimensions[dim][value]
+            row['count'] = int(counts[index])
+            row['cardio_rate'] = float(rates[index])
+            for j, measure in enumerate(measures):
+                mean = means[index + (j,)]
+                row[f'mean_{measure}'] = float(mean) if np.isfinite(mean) else None
+            rows.append(row)
+
+        return {
+            'group_by': group_by,
+            'filters': {dim: list(v) if isinstance(v, (list, tuple, set)) else [v] for dim, v in filters.items()},
+            'rows': rows,
+            'elapsed_us': (time.perf_counter() - start) * 1e6
+        }
@@ -5,66 +5,454 @@
 
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
+import json
 import os
 import sys
+import time
 from datetime import datetime
+from typing import Dict, List, Optional
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.logger import setup_logger
+from analysis import aggregates, association, backends, rasterize
+from analysis.aggregates import histogram, box_stats, category_counts
+from analysis.association import association_tests
+from analysis.backends import AnalyticsBackend, Filter, create_backend
+from analysis.rasterize import DensityView, figure_density
+from analysis.lazy_report import LOADER_SCRIPT, ensure_plotly_js, write_precompressed, write_section_payloads
+from analysis.parallel_render import render_figures_parallel
+from analysis.streaming_stats import StreamingStats, compute_streaming_stats
+from analysis.stats_store import update_stats
+from analysis.report_cache import ReportCache, code_version, fragment_key
 
 # 设置日志
 logger = setup_logger('analysis', log_dir='./logs')
 
 
+def build_age_distribution(columns: Dict[str, np.ndarray]) -> go.Figure:
+    """年龄分布直方图（分箱预先计算，报告只嵌入各箱计数）"""
+    return figure_age_distribution(histogram(columns['age'], nbins=50))
+
+
+def figure_age_distribution(hist: Dict) -> go.Figure:
+    """由直方图聚合结果绘制年龄分布图"""
+    edges = hist['edges']
+    
+    fig = go.Figure(data=go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=hist['counts'],
+        width=edges[1] - edges[0],
+        customdata=np.column_stack([edges[:-1], edges[1:]]),
+        hovertemplate='年龄 %{customdata[0]:g} - %{customdata[1]:g}<br>人数: %{y}<extra></extra>',
+        marker_color='#667eea'
+    ))
+    
+    fig.update_layout(
+        title='年龄分布直方图',
+        xaxis_title='年龄',
+        yaxis_title='人数',
+        template='plotly_white',
+        hovermode='x unified',
+        showlegend=False,
+        bargap=0
+    )
+    
+    return fig
+
+
+def build_blood_pressure_boxplot(columns: Dict[str, np.ndarray]) -> go.Figure:
+    """血压箱线图（分位数、须和异常值样本预先计算，报告不嵌入原始数据）"""
+    return figure_blood_pressure({col: box_stats(columns[col]) for col in ('ap_hi', 'ap_lo')})
+
+
+def figure_blood_pressure(boxes_stats: Dict[str, Dict]) -> go.Figure:
+    """由箱线图统计量绘制血压箱线图"""
+    # 创建子图
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=('收缩压 (ap_hi)', '舒张压 (ap_lo)')
+    )
+    
+    boxes = [('ap_hi', '收缩压', '#667eea', 1), ('ap_lo', '舒张压', '#764ba2', 2)]
+    for column, name, color, col in boxes:
+        stats = boxes_stats[column]
+        fig.add_trace(
+            go.Box(
+                x=[name],
+                q1=[stats['q1']],
+                median=[stats['median']],
+                q3=[stats['q3']],
+                lowerfence=[stats['lowerfence']],
+                upperfence=[stats['upperfence']],
+                mean=[stats['mean']],
+                sd=[stats['sd']],
+                name=name,
+                marker_color=color,
+                boxmean='sd'
+            ),
+            row=1, col=col
+        )
+        fig.add_trace(
+            go.Scatter(
+                x=[name] * len(stats['outliers']),
+                y=stats['outliers'],
+                mode='markers',
+                name=f'{name}异常值',
+                marker=dict(color=color, size=4, opacity=0.6),
+                hovertemplate=f'异常值 %{{y}}（共 {stats["n_outliers"]:,} 个）<extra></extra>'
+            ),
+            row=1, col=col
+        )
+    
+    fig.update_layout(
+        title_text='血压分布箱线图',
+        template='plotly_white',
+        showlegend=False,
+        height=500
+    )
+    
+    fig.update_yaxes(title_text="血压值 (mmHg)", row=1, col=1)
+    fig.update_yaxes(title_text="血压值 (mmHg)", row=1, col=2)
+    
+    return fig
+
+
+def build_correlation_heatmap(columns: Dict[str, np.ndarray]) -> go.Figure:
+    """特征相关性热力图"""
+    # 计算相关性矩阵
+    return figure_correlation_heatmap(pd.DataFrame(columns).corr())
+
+
+def figure_correlation_heatmap(corr_matrix: pd.DataFrame) -> go.Figure:
+    """由相关系数矩阵绘制热力图"""
+    # 创建热力图
+    fig = go.Figure(data=go.Heatmap(
+        z=corr_matrix.values,
+        x=corr_matrix.columns,
+        y=corr_matrix.columns,
+        colorscale='RdBu_r',
+        zmid=0,
+        text=corr_matrix.values,
+        texttemplate='%{text:.2f}',
+        textfont={"size": 10},
+        colorbar=dict(title="相关系数")
+    ))
+    
+    fig.update_layout(
+        title='特征相关性热力图',
+        template='plotly_white',
+        width=800,
+        height=800,
+        xaxis={'side': 'bottom'}
+    )
+    
+    return fig
+
+
+# 分类特征及其取值标签
+CATEGORICAL_FEATURES = {
+    'gender': {1: '女性', 2: '男性'},
+    'smoke': {0: '不吸烟', 1: '吸烟'},
+    'alco': {0: '不饮酒', 1: '饮酒'},
+    'active': {0: '不运动', 1: '运动'}
+}
+
+
+def build_categorical_vs_cardio(columns: Dict[str, np.ndarray]) -> go.Figure:
+    """分类特征与 cardio 的对比条形图"""
+    # 计算每个类别中患病和不患病的比例
+    cross_tabs = {
+        feature: pd.crosstab(columns[feature], columns['cardio'], normalize='index') * 100
+        for feature in CATEGORICAL_FEATURES if feature in columns
+    }
+    return figure_categorical_vs_cardio(cross_tabs)
+
+
+def figure_categorical_vs_cardio(cross_tabs: Dict[str, pd.DataFrame]) -> go.Figure:
+    """由按行归一化（百分比）的交叉表绘制分类特征对比图"""
+    # 创建子图
+    fig = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=('性别 vs 心血管疾病', '吸烟 vs 心血管疾病',
+                      '饮酒 vs 心血管疾病', '运动 vs 心血管疾病'),
+        specs=[[{'type': 'bar'}, {'type': 'bar'}],
+               [{'type': 'bar'}, {'type': 'bar'}]]
+    )
+    
+    positions = [(1, 1), (1, 2), (2, 1), (2, 2)]
+    colors = ['#667eea', '#764ba2', '#f093fb', '#4facfe']
+    
+    for idx, (feature, mapping) in enumerate(CATEGORICAL_FEATURES.items()):
+        if feature not in cross_tabs:
+            continue
+            
+        cross_tab = cross_tabs[feature]
+        
+        row, col = positions[idx]
+        
+        # 添加柱状图
+        for cardio_val in [0, 1]:
+            if cardio_val in cross_tab.columns:
+                fig.add_trace(
+                    go.Bar(
+                        x=[mapping.get(x, str(x)) for x in cross_tab.index],
+                        y=cross_tab[cardio_val],
+                        name='患病' if cardio_val == 1 else '健康',
+                        marker_color=colors[idx] if cardio_val == 1 else '#e0e0e0',
+                        showlegend=(idx == 0)
+                    ),
+                    row=row, col=col
+                )
+    
+    fig.update_layout(
+        title_text='分类特征与心血管疾病关系',
+        template='plotly_white',
+        height=800,
+        barmode='group'
+    )
+    
+    fig.update_yaxes(title_text="百分比 (%)")
+    
+    return fig
+
+
+def build_cardio_distribution(columns: Dict[str, np.ndarray]) -> go.Figure:
+    """目标变量分布饼图"""
+    # 按固定类别顺序计数，保证标签与计数对应
+    return figure_cardio_distribution(category_counts(columns['cardio'], categories=[0, 1]))
+
+
+def figure_cardio_distribution(cardio_counts: Dict) -> go.Figure:
+    """由目标变量计数绘制饼图"""
+    fig = go.Figure(data=[go.Pie(
+        labels=['健康', '患病'],
+        values=cardio_counts['counts'],
+        hole=0.4,
+        marker_colors=['#4facfe', '#f093fb'],
+        textinfo='label+percent',
+        textfont_size=14
+    )])
+    
+    fig.update_layout(
+        title='心血管疾病分布',
+        template='plotly_white',
+        height=400
+    )
+    
+    return fig
+
+
+def build_bmi_vs_bp(columns: Dict[str, np.ndarray]) -> go.Figure:
+    """BMI 与收缩压密度图（服务端栅格化）"""
+    return figure_density(DensityView.plan('bmi_vs_bp', columns).update(columns))
+
+
+def build_weight_vs_bp(columns: Dict[str, np.ndarray]) -> go.Figure:
+    """体重与收缩压密度图（服务端栅格化）"""
+    return figure_density(DensityView.plan('weight_vs_bp', columns).update(columns))
+
+
+# 图表名 -> (构建函数, 所需列)；所需列为 None 表示全部数值列
+FIGURE_SPECS = {
+    'age_distribution': (build_age_distribution, ['age']),
+    'blood_pressure': (build_blood_pressure_boxplot, ['ap_hi', 'ap_lo']),
+    'correlation': (build_correlation_heatmap, None),
+    'categorical_vs_cardio': (build_categorical_vs_cardio, list(CATEGORICAL_FEATURES) + ['cardio']),
+    'cardio_distribution': (build_cardio_distribution, ['cardio']),
+    'bmi_vs_bp': (build_bmi_vs_bp, ['height', 'weight', 'ap_hi', 'cardio']),
+    'weight_vs_bp': (build_weight_vs_bp, ['weight', 'ap_hi', 'cardio'])
+}
+
+
+def figures_from_stats(stats: StreamingStats) -> Dict[str, go.Figure]:
+    """
+    由流式聚合结果绘制全部图表（不需要原始数据）
+    
+    Args:
+        stats: 流式统计聚合
+        
+    Returns:
+        dict: 图表名 -> Figure（与 FIGURE_SPECS 的键相同）
+    """
+    return {
+        'age_distribution': figure_age_distribution(stats.histogram('age', nbins=50)),
+        'blood_pressure': figure_blood_pressure({col: stats.box_stats(col) for col in ('ap_hi', 'ap_lo')}),
+        'correlation': figure_correlation_heatmap(stats.correlation()),
+        'categorical_vs_cardio': figure_categorical_vs_cardio({
+            feature: stats.crosstab(feature, normalize='index') * 100
+            for feature in CATEGORICAL_FEATURES if feature in stats.crosstab_columns
+        }),
+        'cardio_distribution': figure_cardio_distribution(stats.category_counts([0, 1])),
+        'bmi_vs_bp': figure_density(stats.density_views['bmi_vs_bp']),
+        'weight_vs_bp': figure_density(stats.density_views['weight_vs_bp'])
+    }
+
+
+def stats_from_streaming(stats: StreamingStats) -> Dict:
+    """由流式聚合结果生成与 generate_basic_stats 结构相同的统计信息"""
+    return {
+        'shape': (stats.n_rows, len(stats.columns)),
+        'columns': list(stats.columns),
+        'describe': stats.describe().to_dict(),
+        'missing': dict(stats.missing),
+        'cardio_distribution': dict(stats.target_counts)
+    }
+
+
+def render_summary(stats: Dict) -> str:
+    """概览统计块：样本数、特征数和目标变量分布（JSON）"""
+    return json.dumps({
+        'shape': list(stats['shape']),
+        'cardio_distribution': {str(k): int(v) for k, v in stats['cardio_distribution'].items()}
+    })
+
+
+def parse_summary(content: str) -> Dict:
+    """解析概览统计块"""
+    summary = json.loads(content)
+    return {
+        'shape': tuple(summary['shape']),
+        'cardio_distribution': {int(k): v for k, v in summary['cardio_distribution'].items()}
+    }
+
+
+def render_statistics_table(stats: Dict) -> str:
+    """基础统计表格 HTML"""
+    describe_df = pd.DataFrame(stats['describe'])
+    return describe_df.to_html(
+        classes='stats-table',
+        float_format=lambda x: f'{x:.2f}'
+    )
+
+
+# 统计块名 -> (渲染函数, 所需列)；所需列为 None 表示全部列
+STATS_SPECS = {
+    'summary': (render_summary, None),
+    'statistics': (render_statistics_table, None)
+}
+
+
+def render_association_table(results: Dict[str, pd.DataFrame], note: str = '') -> str:
+    """关联检验表格 HTML（点击表头排序）"""
+    table = results['target'].sort_values('p 值', kind='stable')
+    formatters = {
+        '统计量': lambda x: f'{x:.4g}',
+        '自由度': lambda x: f'{x:.0f}',
+        'p 值': lambda x: f'{x:.2e}',
+        '效应量': lambda x: f'{x:.4f}'
+    }
+    html = table.to_html(classes='stats-table sortable', index=False, formatters=formatters, na_rep='—')
+    if not results['cramers_v'].empty:
+        html += '<h3 style="margin-top: 30px;">分类特征两两之间的 Cramér\'s V</h3>'
+        html += results['cramers_v'].to_html(classes='stats-table sortable', float_format=lambda x: f'{x:.3f}',
+                                             na_rep='—')
+    if note:
+        html += f'<p style="margin-top: 10px; color: #999;">{note}</p>'
+    return html
+
+
+def build_association_table(columns: Dict[str, np.ndarray], note: str = '') -> str:
+    """特征与 cardio 的关联检验表（卡方、点二列相关、Mann-Whitney U 和 Cramér's V）"""
+    if 'cardio' not in columns:
+        return '<p>数据中缺少 cardio 列，无法进行关联检验。</p>'
+    return render_association_table(association_tests(columns, target='cardio'), note)
+
+
+# 表格名 -> (构建函数, 所需列)；由原始列构建的 HTML 片段，所需列为 None 表示全部数值列
+TABLE_SPECS = {
+    'associations': (build_association_table, None)
+}
+
+
+def build_correlation_from_backend(backend: AnalyticsBackend, columns: List[str]) -> go.Figure:
+    """由后端计算相关矩阵并绘制热力图"""
+    return figure_correlation_heatmap(backend.corr(columns))
+
+
+def build_categorical_from_backend(backend: AnalyticsBackend, columns: List[str]) -> go.Figure:
+    """由后端计算交叉表并绘制分类特征对比图"""
+    return figure_categorical_vs_cardio({
+        feature: backend.crosstab(feature, 'cardio', normalize='index') * 100
+        for feature in CATEGORICAL_FEATURES if feature in columns
+    })
+
+
+# 可由后端直接聚合的图表：图表名 -> 构建函数(后端, 所需列)
+BACKEND_FIGURES = {
+    'correlation': build_correlation_from_backend,
+    'categorical_vs_cardio': build_categorical_from_backend
+}
+
+
+# 报告章节 id -> 片段名；每个章节对应一个按需加载的 JSON 数据文件
+REPORT_SECTIONS = {
+    'cardio-dist': ['cardio_distribution'],
+    'statistics': ['statistics'],
+    'age-dist': ['age_distribution'],
+    'blood-pressure': ['blood_pressure'],
+    'density': ['bmi_vs_bp', 'weight_vs_bp'],
+    'correlation': ['correlation'],
+    'categorical': ['categorical_vs_cardio'],
+    'associations': ['associations']
+}
+
+
+def render_figure(fig: go.Figure) -> str:
+    """将图表序列化为 JSON 片段（数值数组以 base64 编码嵌入）"""
+    return fig.to_json()
+
+
 class CardiovascularDataAnalysis:
     """心血管疾病数据分析类"""
     
-    def __init__(self, data_path: str):
+    def __init__(self, data_path: str, backend: str = 'pandas',
+                 columns: Optional[List[str]] = None,
+                 filters: Optional[List[Filter]] = None,
+                 threads: Optional[int] = None):
         """
         初始化分析器
         
         Args:
             data_path: 数据文件路径
+            backend: 计算后端（pandas、polars 或 duckdb），非 pandas 后端惰性执行并下推投影和过滤
+            columns: 只分析这些列，None 表示全部
+            filters: 过滤条件 [(列名, 运算符, 取值)]
+            threads: 后端线程数（仅 duckdb 支持）
         """
         self.data_path = data_path
+        self.backend = create_backend(backend, data_path, columns=columns, filters=filters, threads=threads)
         self.df = None
         self.stats = {}
         self.figures = {}
+        self.figure_json = {}
         
-        logger.info(f"初始化数据分析器，数据路径: {data_path}")
+        logger.info(f"初始化数据分析器，数据路径: {data_path}，计算后端: {backend}")
     
     def load_data(self):
         """加载并预处理数据"""
         logger.info("开始加载数据...")
         
         try:
-            # 加载数据
-            if self.data_path.endswith('.xlsx'):
-                self.df = pd.read_excel(self.data_path)
-            elif self.data_path.endswith('.csv'):
-                self.df = pd.read_csv(self.data_path)
-            else:
-                raise ValueError("不支持的文件格式，请使用 .xlsx 或 .csv")
+            # 加载数据（惰性后端只建立查询计划）
+            self.backend.load()
+            if self.backend.name == 'pandas':
+                self.df = self.backend.df
             
-            logger.info(f"数据加载成功，形状: {self.df.shape}")
+            logger.info(f"数据加载成功，形状: {self.backend.shape()}")
             
             # 检查缺失值
-            missing_values = self.df.isnull().sum()
+            missing_values = pd.Series(self.backend.missing())
             if missing_values.sum() > 0:
                 logger.warning(f"发现缺失值:\n{missing_values[missing_values > 0]}")
                 
                 # 处理缺失值：数值列用均值填充
-                numeric_cols = self.df.select_dtypes(include=[np.number]).columns
-                for col in numeric_cols:
-                    if self.df[col].isnull().sum() > 0:
-                        mean_value = self.df[col].mean()
-                        self.df[col].fillna(mean_value, inplace=True)
-                        logger.info(f"列 {col} 的缺失值已用均值 {mean_value:.2f} 填充")
+                for col, mean_value in self.backend.fill_missing_with_mean().items():
+                    logger.info(f"列 {col} 的缺失值已用均值 {mean_value:.2f} 填充")
             else:
                 logger.info("数据无缺失值")
             
@@ -78,242 +466,287 @@ class CardiovascularDataAnalysis:
         """生成基础统计信息"""
         logger.info("生成基础统计信息...")
         
+        backend = self.backend
+        columns = backend.column_names()
         self.stats = {
-            'shape': self.df.shape,
-            'columns': self.df.columns.tolist(),
-            'dtypes': self.df.dtypes.to_dict(),
-            'describe': self.df.describe().to_dict(),
-            'missing': self.df.isnull().sum().to_dict(),
-            'cardio_distribution': self.df['cardio'].value_counts().to_dict() if 'cardio' in self.df.columns else {}
+            'shape': backend.shape(),
+            'columns': columns,
+            'dtypes': backend.dtypes(),
+            'describe': backend.describe().to_dict(),
+            'missing': backend.missing(),
+            'cardio_distribution': backend.value_counts('cardio') if 'cardio' in columns else {}
         }
         
         logger.info(f"数据集包含 {self.stats['shape'][0]} 行, {self.stats['shape'][1]} 列")
         
         return self.stats
     
+    def figure_columns(self, name: str, column_info: Optional[Dict[str, Dict]] = None) -> List[str]:
+        """
+        获取图表或表格所需的列
+        
+        Args:
+            name: 图表名或表格名
+            column_info: 列信息（列名 -> {'numeric': ...}），None 表示从后端获取
+            
+        Returns:
+            list: 列名（数据中不存在的列会被忽略）
+        """
+        _, columns = FIGURE_SPECS[name] if name in FIGURE_SPECS else TABLE_SPECS[name]
+        if column_info is None:
+            column_info = self.backend.column_info()
+        if columns is None:
+            # 相关性热力图和关联检验表使用全部数值列
+            return [c for c, info in column_info.items() if info['numeric']]
+        return [c for c in columns if c in column_info]
+    
+    def _build_figure(self, name: str) -> go.Figure:
+        """在当前进程中构建图表（惰性后端的相关矩阵和交叉表在引擎内聚合，不取出原始列）"""
+        if self.backend.name != 'pandas' and name in BACKEND_FIGURES:
+            fig = BACKEND_FIGURES[name](self.backend, self.figure_columns(name))
+        else:
+            builder, _ = FIGURE_SPECS[name]
+            fig = builder(self.backend.to_numpy(self.figure_columns(name)))
+        self.figures[name] = fig
+        return fig
+    
     def plot_age_distribution(self):
         """绘制年龄分布直方图"""
         logger.info("生成年龄分布直方图...")
-        
-        fig = px.histogram(
-            self.df,
-            x='age',
-            nbins=50,
-            title='年龄分布直方图',
-            labels={'age': '年龄', 'count': '人数'},
-            color_discrete_sequence=['#667eea']
-        )
-        
-        fig.update_layout(
-            template='plotly_white',
-            hovermode='x unified',
-            showlegend=False
-        )
-        
-        self.figures['age_distribution'] = fig
-        return fig
+        return self._build_figure('age_distribution')
     
     def plot_blood_pressure_boxplot(self):
         """绘制血压箱线图"""
         logger.info("生成血压箱线图...")
-        
-        # 创建子图
-        fig = make_subplots(
-            rows=1, cols=2,
-            subplot_titles=('收缩压 (ap_hi)', '舒张压 (ap_lo)')
-        )
-        
-        # 收缩压箱线图
-        fig.add_trace(
-            go.Box(
-                y=self.df['ap_hi'],
-                name='收缩压',
-                marker_color='#667eea',
-                boxmean='sd'
-            ),
-            row=1, col=1
-        )
-        
-        # 舒张压箱线图
-        fig.add_trace(
-            go.Box(
-                y=self.df['ap_lo'],
-                name='舒张压',
-                marker_color='#764ba2',
-                boxmean='sd'
-            ),
-            row=1, col=2
-        )
-        
-        fig.update_layout(
-            title_text='血压分布箱线图',
-            template='plotly_white',
-            showlegend=False,
-            height=500
-        )
-        
-        fig.update_yaxes(title_text="血压值 (mmHg)", row=1, col=1)
-        fig.update_yaxes(title_text="血压值 (mmHg)", row=1, col=2)
-        
-        self.figures['blood_pressure'] = fig
-        return fig
+        return self._build_figure('blood_pressure')
     
     def plot_correlation_heatmap(self):
         """绘制特征与 cardio 的相关性热力图"""
         logger.info("生成相关性热力图...")
-        
-        # 选择数值列
-        numeric_cols = self.df.select_dtypes(include=[np.number]).columns.tolist()
-        
-        # 计算相关性矩阵
-        corr_matrix = self.df[numeric_cols].corr()
-        
-        # 创建热力图
-        fig = go.Figure(data=go.Heatmap(
-            z=corr_matrix.values,
-            x=corr_matrix.columns,
-            y=corr_matrix.columns,
-            colorscale='RdBu_r',
-            zmid=0,
-            text=corr_matrix.values,
-            texttemplate='%{text:.2f}',
-            textfont={"size": 10},
-            colorbar=dict(title="相关系数")
-        ))
-        
-        fig.update_layout(
-            title='特征相关性热力图',
-            template='plotly_white',
-            width=800,
-            height=800,
-            xaxis={'side': 'bottom'}
-        )
-        
-        self.figures['correlation'] = fig
-        return fig
+        return self._build_figure('correlation')
     
     def plot_categorical_vs_cardio(self):
         """绘制分类特征与 cardio 的对比条形图"""
         logger.info("生成分类特征对比图...")
-        
-        # 定义要分析的分类特征
-        categorical_features = {
-            'gender': {1: '女性', 2: '男性'},
-            'smoke': {0: '不吸烟', 1: '吸烟'},
-            'alco': {0: '不饮酒', 1: '饮酒'},
-            'active': {0: '不运动', 1: '运动'}
-        }
-        
-        # 创建子图
-        fig = make_subplots(
-            rows=2, cols=2,
-            subplot_titles=('性别 vs 心血管疾病', '吸烟 vs 心血管疾病',
-                          '饮酒 vs 心血管疾病', '运动 vs 心血管疾病'),
-            specs=[[{'type': 'bar'}, {'type': 'bar'}],
-                   [{'type': 'bar'}, {'type': 'bar'}]]
-        )
-        
-        positions = [(1, 1), (1, 2), (2, 1), (2, 2)]
-        colors = ['#667eea', '#764ba2', '#f093fb', '#4facfe']
-        
-        for idx, (feature, mapping) in enumerate(categorical_features.items()):
-            if feature not in self.df.columns:
-                continue
-                
-            # 计算每个类别中患病和不患病的人数
-            cross_tab = pd.crosstab(self.df[feature], self.df['cardio'], normalize='index') * 100
-            
-            row, col = positions[idx]
-            
-            # 添加柱状图
-            for cardio_val in [0, 1]:
-                if cardio_val in cross_tab.columns:
-                    fig.add_trace(
-                        go.Bar(
-                            x=[mapping.get(x, str(x)) for x in cross_tab.index],
-                            y=cross_tab[cardio_val],
-                            name='患病' if cardio_val == 1 else '健康',
-                            marker_color=colors[idx] if cardio_val == 1 else '#e0e0e0',
-                            showlegend=(idx == 0)
-                        ),
-                        row=row, col=col
-                    )
-        
-        fig.update_layout(
-            title_text='分类特征与心血管疾病关系',
-            template='plotly_white',
-            height=800,
-            barmode='group'
-        )
-        
-        fig.update_yaxes(title_text="百分比 (%)")
-        
-        self.figures['categorical_vs_cardio'] = fig
-        return fig
+        return self._build_figure('categorical_vs_cardio')
     
     def plot_cardio_distribution(self):
         """绘制目标变量分布饼图"""
         logger.info("生成目标变量分布图...")
+        return self._build_figure('cardio_distribution')
+    
+    def generate_all_plots(self, max_workers: Optional[int] = None, names: Optional[List[str]] = None):
+        """
+        生成并渲染所有图表
         
-        cardio_counts = self.df['cardio'].value_counts()
-        
-        fig = go.Figure(data=[go.Pie(
-            labels=['健康', '患病'],
-            values=cardio_counts.values,
-            hole=0.4,
-            marker_colors=['#4facfe', '#f093fb'],
-            textinfo='label+percent',
-            textfont_size=14
-        )])
-        
-        fig.update_layout(
-            title='心血管疾病分布',
-            template='plotly_white',
-            height=400
-        )
+        pandas 后端的图表在进程池中并行构建和渲染，工作进程通过共享内存读取所需列；
+        其他后端本身多线程执行，图表在当前进程中依次构建。
         
-        self.figures['cardio_distribution'] = fig
-        return fig
-    
-    def generate_all_plots(self):
-        """生成所有图表"""
+        Args:
+            max_workers: 进程数，None 表示按 CPU 核数，1 表示在当前进程串行执行
+            names: 只生成指定的图表，None 表示全部
+            
+        Returns:
+            dict: 图表名 -> Figure
+        """
         logger.info("开始生成所有图表...")
         
-        self.plot_age_distribution()
-        self.plot_blood_pressure_boxplot()
-        self.plot_correlation_heatmap()
-        self.plot_categorical_vs_cardio()
-        self.plot_cardio_distribution()
-        
-        logger.info(f"共生成 {len(self.figures)} 个图表")
+        names = list(FIGURE_SPECS) if names is None else names
+        start = time.perf_counter()
+        timings = {}
+        
+        if max_workers == 1 or len(names) == 1 or self.backend.name != 'pandas':
+            for name in names:
+                t0 = time.perf_counter()
+                fig = self._build_figure(name)
+                t1 = time.perf_counter()
+                self.figure_json[name] = render_figure(fig)
+                timings[name] = (t1 - t0, time.perf_counter() - t1)
+        else:
+            figure_columns = {name: self.figure_columns(name) for name in names}
+            for result in render_figures_parallel(self.df, figure_columns, max_workers):
+                name = result['name']
+                self.figures[name] = pio.from_json(result['figure'])
+                self.figure_json[name] = result['figure']
+                timings[name] = (result['build_s'], result['render_s'])
+        
+        wall = time.perf_counter() - start
+        serial = sum(build + render for build, render in timings.values())
+        for name, (build, render) in timings.items():
+            logger.info(f"图表 {name}: 构建 {build:.3f}s, 渲染 {render:.3f}s")
+        # 加速比按"各图表耗时之和 / 总墙钟时间"估算
+        logger.info(f"共生成 {len(timings)} 个图表，总耗时 {wall:.3f}s，"
+                    f"各图表累计 {serial:.3f}s，加速比 {serial / wall if wall > 0 else 0:.2f}x")
         
         return self.figures
     
-    def generate_html_report(self, output_path: str = 'analysis/report.html'):
-        """生成完整的交互式 HTML 报告"""
+    def _ensure_loaded(self):
+        """按需加载数据并生成基础统计"""
+        if not self.backend.loaded:
+            self.load_data()
+        if 'describe' not in self.stats:
+            self.generate_basic_stats()
+    
+    def render_fragments(self, names: List[str], max_workers: Optional[int] = None) -> Dict[str, str]:
+        """
+        渲染报告片段（图表 HTML 和统计块）
+        
+        Args:
+            names: 片段名（FIGURE_SPECS、TABLE_SPECS 或 STATS_SPECS 中的键）
+            max_workers: 图表构建/渲染进程数
+            
+        Returns:
+            dict: 片段名 -> 内容
+        """
+        self._ensure_loaded()
+        
+        fragments = {}
+        figure_names = [name for name in names if name in FIGURE_SPECS]
+        if figure_names:
+            self.generate_all_plots(max_workers, figure_names)
+            fragments.update({name: self.figure_json[name] for name in figure_names})
+        for name in names:
+            if name in TABLE_SPECS:
+                t0 = time.perf_counter()
+                builder, _ = TABLE_SPECS[name]
+                fragments[name] = builder(self.backend.to_numpy(self.figure_columns(name)))
+                logger.info(f"表格 {name}: {time.perf_counter() - t0:.3f}s")
+            if name in STATS_SPECS:
+                renderer, _ = STATS_SPECS[name]
+                fragments[name] = renderer(self.stats)
+        return fragments
+    
+    def render_fragments_cached(self, cache_dir: str, max_workers: Optional[int] = None) -> Dict[str, str]:
+        """
+        增量渲染报告片段
+        
+        每个片段按"所需列的内容哈希 + 代码版本 + 计算后端"缓存在磁盘上，只重新生成发生变化的片段。
+        列哈希由后端计算（惰性后端在扫描中聚合，不取出数据）；
+        数据文件未变化（大小和修改时间相同）时直接使用上次记录的列哈希，不读取数据。
+        
+        Args:
+            cache_dir: 缓存目录
+            max_workers: 图表构建/渲染进程数
+            
+        Returns:
+            dict: 片段名 -> 内容
+        """
+        cache = ReportCache(cache_dir)
+        version = code_version(os.path.abspath(__file__), aggregates.__file__, association.__file__,
+                               backends.__file__, rasterize.__file__)
+        
+        # 指定了列或过滤条件时数据内容与文件不对应，不使用按文件记录的列信息
+        whole_file = self.backend.columns is None and not self.backend.filters
+        column_info = cache.load_columns(self.data_path) if whole_file and not self.backend.loaded else None
+        if column_info is None:
+            self._ensure_loaded()
+            column_info = self.backend.column_hashes()
+            if whole_file:
+                cache.save_columns(self.data_path, column_info)
+        
+        keys = {name: fragment_key(name, self.figure_columns(name, column_info), column_info, version,
+                                   self.backend.name)
+                for name in list(FIGURE_SPECS) + list(TABLE_SPECS)}
+        for name, (_, columns) in STATS_SPECS.items():
+            keys[name] = fragment_key(name, columns or list(column_info), column_info, version, self.backend.name)
+        
+        fragments = {name: cache.get(key) for name, key in keys.items()}
+        missing = [name for name, content in fragments.items() if content is None]
+        if missing:
+            fragments.update(self.render_fragments(missing, max_workers))
+            for name in missing:
+                cache.put(keys[name], fragments[name])
+        
+        logger.info(f"报告片段缓存命中 {cache.hits} 个，重新生成 {len(missing)} 个"
+                    + (f": {', '.join(missing)}" if missing else ""))
+        
+        if 'shape' not in self.stats:
+            self.stats.update(parse_summary(fragments['summary']))
+        
+        return fragments
+    
+    def generate_html_report(self, output_path: str = 'analysis/report.html',
+                             max_workers: Optional[int] = None,
+                             cache_dir: Optional[str] = None):
+        """
+        生成完整的交互式 HTML 报告
+        
+        Args:
+            output_path: 输出路径
+            max_workers: 图表构建/渲染进程数，1 表示串行
+            cache_dir: 片段缓存目录，None 表示不使用缓存、全部重新生成
+        """
         logger.info(f"开始生成 HTML 报告: {output_path}")
         
         # 确保输出目录存在
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # 生成所有图表
-        self.generate_all_plots()
-        
-        # 将图表转换为 HTML
-        plots_html = {}
-        for name, fig in self.figures.items():
-            plots_html[name] = fig.to_html(
-                include_plotlyjs=False,
-                div_id=f'plot_{name}',
-                config={'displayModeBar': True, 'responsive': True}
-            )
-        
-        # 生成统计表格 HTML
-        describe_df = pd.DataFrame(self.stats['describe'])
-        stats_table_html = describe_df.to_html(
-            classes='stats-table',
-            float_format=lambda x: f'{x:.2f}'
+        # 生成图表和统计片段
+        if cache_dir:
+            fragments = self.render_fragments_cached(cache_dir, max_workers)
+        else:
+            fragments = self.render_fragments(list(FIGURE_SPECS) + list(TABLE_SPECS) + list(STATS_SPECS), max_workers)
+        return self._write_report(output_path, fragments)
+    
+    def generate_streaming_report(self, output_path: str = 'analysis/report.html',
+                                  chunk_size: int = 200000,
+                                  max_workers: Optional[int] = None,
+                                  store_path: Optional[str] = None):
+        """
+        流式生成 HTML 报告（适用于超出内存的数据集）
+        
+        不加载完整数据：分块并行计算可合并的聚合，再由聚合结果生成统计表和全部图表，
+        内存占用只与分块大小有关。分位数为 t-digest 估计值。
+        
+        Args:
+            output_path: 输出路径
+            chunk_size: 每块行数
+            max_workers: 进程数，None 表示 CPU 核数
+            store_path: 充分统计量存储路径；指定时只合并上次运行之后追加的新行
+        """
+        logger.info(f"开始流式生成 HTML 报告: {output_path}（分块 {chunk_size} 行）")
+        
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        
+        start = time.perf_counter()
+        if store_path:
+            stats, new_rows = update_stats(self.data_path, store_path, chunk_size, max_workers)
+            logger.info(f"增量统计完成: 新增 {new_rows} 行，累计 {stats.n_rows} 行，"
+                        f"耗时 {time.perf_counter() - start:.3f}s")
+        else:
+            stats = compute_streaming_stats(self.data_path, chunk_size, max_workers)
+            logger.info(f"流式统计完成: {stats.n_rows} 行，耗时 {time.perf_counter() - start:.3f}s")
+        
+        self.stats = stats_from_streaming(stats)
+        self.figures = figures_from_stats(stats)
+        self.figure_json = {name: render_figure(fig) for name, fig in self.figures.items()}
+        
+        # 关联检验需要原始数据（秩），由完整行的均匀抽样计算
+        associations = build_association_table(
+            stats.sampled_columns(),
+            note=f"流式模式：检验基于 {len(stats.row_sample.rows):,} 行完整记录的均匀抽样。"
         )
+        fragments = dict(self.figure_json, statistics=render_statistics_table(self.stats),
+                         associations=associations)
+        return self._write_report(output_path, fragments)
+    
+    def _write_report(self, output_path: str, fragments: Dict[str, str]) -> str:
+        """
+        保存报告：静态外壳 + 每个章节一个 JSON 数据文件（均附带 gzip 预压缩版本）
+        
+        外壳只包含概览数字和章节占位，章节滚动到可见区域时才请求数据并渲染，
+        首屏不再等待全部图表和 Plotly 加载。
+        
+        Args:
+            output_path: 外壳 HTML 路径，数据文件写入同名的 <报告名>_data 目录
+            fragments: 片段名 -> 内容（图表为 Figure JSON，统计表为 HTML）
+            
+        Returns:
+            str: 外壳路径
+        """
+        data_dir = os.path.splitext(output_path)[0] + '_data'
+        payloads = write_section_payloads(data_dir, REPORT_SECTIONS, fragments, FIGURE_SPECS)
+        plotly_url = ensure_plotly_js(data_dir)
         
         # 生成 HTML 内容
         html_content = f"""
@@ -323,7 +756,6 @@ class CardiovascularDataAnalysis:
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>心血管疾病数据分析报告</title>
-    <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
     <style>
         * {{
             margin: 0;
@@ -471,6 +903,11 @@ class CardiovascularDataAnalysis:
             background: #f8f9fa;
         }}
         
+        .sortable th {{
+            cursor: pointer;
+            user-select: none;
+        }}
+        
         .plot-container {{
             margin: 30px 0;
             background: white;
@@ -479,6 +916,14 @@ class CardiovascularDataAnalysis:
             box-shadow: 0 2px 5px rgba(0,0,0,0.05);
         }}
         
+        .loading {{
+            min-height: 400px;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            color: #999;
+        }}
+        
         .footer {{
             text-align: center;
             padding: 20px;
@@ -499,7 +944,7 @@ class CardiovascularDataAnalysis:
         }}
     </style>
 </head>
-<body>
+<body data-plotly="{plotly_url}">
     <div class="header">
         <h1>🫀 心血管疾病数据分析报告</h1>
         <div class="meta">
@@ -517,8 +962,10 @@ class CardiovascularDataAnalysis:
                 <li><a href="#cardio-dist">疾病分布</a></li>
                 <li><a href="#age-dist">年龄分布</a></li>
                 <li><a href="#blood-pressure">血压分析</a></li>
+                <li><a href="#density">体型与血压</a></li>
                 <li><a href="#correlation">相关性分析</a></li>
                 <li><a href="#categorical">分类特征分析</a></li>
+                <li><a href="#associations">关联检验</a></li>
             </ul>
         </nav>
         
@@ -552,10 +999,10 @@ class CardiovascularDataAnalysis:
             </section>
             
             <!-- 疾病分布 -->
-            <section id="cardio-dist" class="section">
+            <section id="cardio-dist" class="section" data-payload="{payloads['cardio-dist']['url']}">
                 <h2>🎯 疾病分布</h2>
                 <div class="plot-container">
-                    {plots_html['cardio_distribution']}
+                    <div class="loading" data-figure="cardio_distribution">加载中…</div>
                 </div>
                 <p style="margin-top: 20px; line-height: 1.8;">
                     数据集中患病样本占比为 
@@ -566,16 +1013,16 @@ class CardiovascularDataAnalysis:
             </section>
             
             <!-- 基础统计 -->
-            <section id="statistics" class="section">
+            <section id="statistics" class="section" data-payload="{payloads['statistics']['url']}">
                 <h2>📈 基础统计信息</h2>
-                {stats_table_html}
+                <div class="loading" data-html="statistics">加载中…</div>
             </section>
             
             <!-- 年龄分布 -->
-            <section id="age-dist" class="section">
+            <section id="age-dist" class="section" data-payload="{payloads['age-dist']['url']}">
                 <h2>👥 年龄分布</h2>
                 <div class="plot-container">
-                    {plots_html['age_distribution']}
+                    <div class="loading" data-figure="age_distribution">加载中…</div>
                 </div>
                 <p style="margin-top: 20px; line-height: 1.8;">
                     年龄分布显示了样本的年龄结构。可以看出数据集中不同年龄段的人群分布情况。
@@ -583,10 +1030,10 @@ class CardiovascularDataAnalysis:
             </section>
             
             <!-- 血压分析 -->
-            <section id="blood-pressure" class="section">
+            <section id="blood-pressure" class="section" data-payload="{payloads['blood-pressure']['url']}">
                 <h2>💓 血压分析</h2>
                 <div class="plot-container">
-                    {plots_html['blood_pressure']}
+                    <div class="loading" data-figure="blood_pressure">加载中…</div>
                 </div>
                 <p style="margin-top: 20px; line-height: 1.8;">
                     箱线图展示了收缩压和舒张压的分布情况，包括中位数、四分位数和异常值。
@@ -594,11 +1041,26 @@ class CardiovascularDataAnalysis:
                 </p>
             </section>
             
+            <!-- 体型与血压 -->
+            <section id="density" class="section" data-payload="{payloads['density']['url']}">
+                <h2>🗺️ 体型与血压</h2>
+                <div class="plot-container">
+                    <div class="loading" data-figure="bmi_vs_bp">加载中…</div>
+                </div>
+                <div class="plot-container">
+                    <div class="loading" data-figure="weight_vs_bp">加载中…</div>
+                </div>
+                <p style="margin-top: 20px; line-height: 1.8;">
+                    全部样本按网格聚合后以热力图展示，颜色表示每个格子内的患病率（人数过少的格子不着色）。
+                    点击图例中的“抽样点”可显示随机抽取的单个样本。
+                </p>
+            </section>
+            
             <!-- 相关性分析 -->
-            <section id="correlation" class="section">
+            <section id="correlation" class="section" data-payload="{payloads['correlation']['url']}">
                 <h2>🔗 特征相关性分析</h2>
                 <div class="plot-container">
-                    {plots_html['correlation']}
+                    <div class="loading" data-figure="correlation">加载中…</div>
                 </div>
                 <p style="margin-top: 20px; line-height: 1.8;">
                     相关性热力图展示了各特征之间的线性相关关系。
@@ -607,16 +1069,26 @@ class CardiovascularDataAnalysis:
             </section>
             
             <!-- 分类特征分析 -->
-            <section id="categorical" class="section">
+            <section id="categorical" class="section" data-payload="{payloads['categorical']['url']}">
                 <h2>📊 分类特征与疾病关系</h2>
                 <div class="plot-container">
-                    {plots_html['categorical_vs_cardio']}
+                    <div class="loading" data-figure="categorical_vs_cardio">加载中…</div>
                 </div>
                 <p style="margin-top: 20px; line-height: 1.8;">
                     该图展示了性别、吸烟、饮酒、运动等分类特征与心血管疾病的关系。
                     可以看出不同生活习惯对患病风险的影响。
                 </p>
             </section>
+            
+            <!-- 关联检验 -->
+            <section id="associations" class="section" data-payload="{payloads['associations']['url']}">
+                <h2>🧪 特征关联检验</h2>
+                <div class="loading" data-html="associations">加载中…</div>
+                <p style="margin-top: 20px; line-height: 1.8;">
+                    分类特征与 cardio 做卡方检验（效应量为 Cramér's V），连续特征做点二列相关
+                    和 Mann-Whitney U 检验（效应量为 AUC，0.5 表示无区分能力）。点击表头可排序。
+                </p>
+            </section>
         </main>
     </div>
     
@@ -624,16 +1096,19 @@ class CardiovascularDataAnalysis:
         <p>© 2024 心血管疾病预测系统 | 数据分析报告</p>
         <p>Powered by Python + Pandas + Plotly</p>
     </div>
+    
+    <script>{LOADER_SCRIPT}</script>
 </body>
 </html>
 """
         
-        # 保存 HTML 文件
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        # 保存外壳（数据文件已写出，外壳最后替换，避免引用尚不存在的数据）
+        shell_gzip = write_precompressed(output_path, html_content.encode('utf-8'))
         
         logger.info(f"HTML 报告已生成: {output_path}")
-        logger.info(f"报告大小: {os.path.getsize(output_path) / 1024:.2f} KB")
+        logger.info(f"外壳大小: {os.path.getsize(output_path) / 1024:.2f} KB（gzip {shell_gzip / 1024:.2f} KB）")
+        for section_id, info in payloads.items():
+            logger.info(f"章节 {section_id}: {info['bytes'] / 1024:.2f} KB（gzip {info['gzip_bytes'] / 1024:.2f} KB）")
         
         return output_path
 
@@ -663,7 +1138,7 @@ def main():
     print("\n" + "=" * 50)
     print("✅ 数据分析完成！")
     print(f"📊 报告已生成: {os.path.abspath(report_path)}")
-    print("💡 请用浏览器打开 report.html 查看完整报告")
+    print("💡 启动 API 服务后访问 http://localhost:5000/analysis/report.html 查看完整报告（章节数据按需加载，需通过 HTTP 访问）")
     print("=" * 50 + "\n")
 
 
@@ -8,20 +8,28 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import os
-from typing import Optional
+from typing import List, Optional
+
+from analysis.backends import Filter, create_backend
 
 
 class DataAnalyzer:
     """数据分析器类"""
     
-    def __init__(self, data_path: str):
+    def __init__(self, data_path: str, backend: str = 'pandas',
+                 columns: Optional[List[str]] = None,
+                 filters: Optional[List[Filter]] = None):
         """
         初始化数据分析器
         
         Args:
             data_path: 数据集路径
+            backend: 计算后端（pandas、polars 或 duckdb）
+            columns: 只分析这些列，None 表示全部
+            filters: 过滤条件 [(列名, 运算符, 取值)]
         """
         self.data_path = data_path
+        self.backend = create_backend(backend, data_path, columns=columns, filters=filters)
         self.df: Optional[pd.DataFrame] = None
         
     def load_data(self) -> pd.DataFrame:
@@ -31,13 +39,7 @@ class DataAnalyzer:
         Returns:
             DataFrame: 加载的数据
         """
-        if self.data_path.endswith('.xlsx'):
-            self.df = pd.read_excel(self.data_path)
-        elif self.data_path.endswith('.csv'):
-            self.df = pd.read_csv(self.data_path)
-        else:
-            raise ValueError("不支持的文件格式")
-        
+        self.df = self.backend.load().to_pandas()
         return self.df
     
     def generate_basic_stats(self) -> dict:
@@ -47,15 +49,14 @@ class DataAnalyzer:
         Returns:
             dict: 统计信息字典
         """
-        if self.df is None:
-            self.load_data()
+        backend = self.backend.load()
         
         stats = {
-            'shape': self.df.shape,
-            'columns': self.df.columns.tolist(),
-            'dtypes': self.df.dtypes.to_dict(),
-            'missing': self.df.isnull().sum().to_dict(),
-            'describe': self.df.describe().to_dict()
+            'shape': backend.shape(),
+            'columns': backend.column_names(),
+            'dtypes': backend.dtypes(),
+            'missing': backend.missing(),
+            'describe': backend.describe().to_dict()
         }
         
         return stats
@@ -70,10 +71,8 @@ class DataAnalyzer:
         Returns:
             Figure: Plotly图表对象
         """
-        if self.df is None:
-            self.load_data()
-        
-        fig = px.histogram(self.df, x=column, title=f'{column} 分布图')
+        # 只读取这一列
+        fig = px.histogram(self.backend.load().to_pandas([column]), x=column, title=f'{column} 分布图')
         return fig
     
     def plot_correlation_matrix(self) -> go.Figure:
@@ -83,12 +82,10 @@ class DataAnalyzer:
         Returns:
             Figure: Plotly图表对象
         """
-        if self.df is None:
-            self.load_data()
+        backend = self.backend.load()
         
         # 只选择数值列
-        numeric_cols = self.df.select_dtypes(include=['int64', 'float64']).columns
-        corr_matrix = self.df[numeric_cols].corr()
+        corr_matrix = backend.corr(backend.numeric_columns())
         
         fig = px.imshow(
             corr_matrix,
@@ -109,14 +106,11 @@ class DataAnalyzer:
         Returns:
             Figure: Plotly图表对象
         """
-        if self.df is None:
-            self.load_data()
-        
-        value_counts = self.df[target_col].value_counts()
+        value_counts = self.backend.load().value_counts(target_col)
         
         fig = px.pie(
-            values=value_counts.values,
-            names=value_counts.index,
+            values=list(value_counts.values()),
+            names=list(value_counts.keys()),
             title=f'{target_col} 分布'
         )
         
@@ -129,8 +123,7 @@ class DataAnalyzer:
         Args:
             output_path: 输出HTML文件路径
         """
-        if self.df is None:
-            self.load_data()
+        self.backend.load()
         
         # 创建子图
         from plotly.subplots import make_subplots
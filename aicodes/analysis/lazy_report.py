@@ -0,0 +1,207 @@
+"""
+按需加载的报告输出
+报告拆分为静态外壳（report.html）和每个章节一个 JSON 数据文件（report_data/<章节>.json），
+章节滚动到可见区域时才请求数据并渲染；所有文件同时写出 gzip 预压缩版本（.gz），
+由 API 服务直接返回，不在请求时压缩
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List
+
+# gzip 预压缩级别（只在生成报告时压缩一次）
+GZIP_LEVEL = 9
+
+# 外壳中的加载脚本：章节进入可见区域（提前 300px）时请求数据，
+# 首个图表需要渲染时才加载 Plotly
+LOADER_SCRIPT = """
+(function () {
+    var config = {displayModeBar: true, responsive: true};
+    var plotlyReady = null;
+
+    function loadPlotly() {
+        if (!plotlyReady) {
+            plotlyReady = new Promise(function (resolve, reject) {
+                var script = document.createElement('script');
+                script.src = document.body.dataset.plotly;
+                script.onload = resolve;
+                script.onerror = reject;
+                document.head.appendChild(script);
+            });
+        }
+        return plotlyReady;
+    }
+
+    // 点击表头按该列排序（再次点击反向）；能解析为数值的单元格按数值比较
+    function makeSortable(table) {
+        var body = table.tBodies[0];
+        table.querySelectorAll('thead th').forEach(function (th, index) {
+            var ascending = true;
+            th.addEventListener('click', function () {
+                var rows = Array.prototype.slice.call(body.rows);
+                function key(row) {
+                    var text = row.cells[index].textContent.trim();
+                    var value = parseFloat(text);
+                    return isNaN(value) ? text : value;
+                }
+                rows.sort(function (a, b) {
+                    var x = key(a), y = key(b);
+                    var result = (typeof x === 'number' && typeof y === 'number')
+                        ? x - y : String(x).localeCompare(String(y));
+                    return ascending ? result : -result;
+                });
+                ascending = !ascending;
+                rows.forEach(function (row) {
+                    body.appendChild(row);
+                });
+            });
+        });
+    }
+
+    function loadSection(section) {
+        fetch(section.dataset.payload).then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.json();
+        }).then(function (payload) {
+            Object.keys(payload.html).forEach(function (name) {
+                var el = section.querySelector('[data-html="' + name + '"]');
+                el.classList.remove('loading');
+                el.innerHTML = payload.html[name];
+                el.querySelectorAll('table.sortable').forEach(makeSortable);
+            });
+            var names = Object.keys(payload.figures);
+            if (!names.length) {
+                return;
+            }
+            return loadPlotly().then(function () {
+                names.forEach(function (name) {
+                    var fig = payload.figures[name];
+                    var el = section.querySelector('[data-figure="' + name + '"]');
+                    el.classList.remove('loading');
+                    el.textContent = '';
+                    Plotly.newPlot(el, fig.data, fig.layout, config);
+                });
+            });
+        }).catch(function () {
+            section.querySelectorAll('.loading').forEach(function (el) {
+                el.textContent = '加载失败，请通过 API 服务访问 /analysis/report.html';
+            });
+        });
+    }
+
+    var sections = document.querySelectorAll('section[data-payload]');
+    if (!('IntersectionObserver' in window)) {
+        sections.forEach(loadSection);
+        return;
+    }
+    var observer = new IntersectionObserver(function (entries) {
+        entries.forEach(function (entry) {
+            if (entry.isIntersecting) {
+                observer.unobserve(entry.target);
+                loadSection(entry.target);
+            }
+        });
+    }, {rootMargin: '300px 0px'});
+    sections.forEach(function (section) {
+        observer.observe(section);
+    });
+})();
+"""
+
+
+def write_precompressed(path: str, content: bytes) -> int:
+    """
+    写出文件及其 gzip 预压缩版本（path + '.gz'）
+
+    Args:
+        path: 输出路径
+        content: 文件内容
+
+    Returns:
+        int: 压缩后的字节数
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # mtime=0 使相同内容的压缩结果完全相同
+    compressed = gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+    for target, data in ((path, content), (f"{path}.gz", compressed)):
+        tmp_path = f"{target}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+    return len(compressed)
+
+
+def section_payload(names: Iterable[str], fragments: Dict[str, str], figure_names: Iterable[str]) -> str:
+    """
+    拼装章节数据
+
+    Args:
+        names: 章节包含的片段名
+        fragments: 片段名 -> 内容（图表为 Figure JSON，其余为 HTML）
+        figure_names: 图表片段名
+
+    Returns:
+        str: JSON（{'figures': {名称: Figure}, 'html': {名称: HTML}}）
+    """
+    figure_names = set(figure_names)
+    names = list(names)
+    # 图表片段本身就是 JSON，直接拼接，避免重新解析
+    figures = ','.join(f'{json.dumps(name)}:{fragments[name]}' for name in names if name in figure_names)
+    html = {name: fragments[name] for name in names if name not in figure_names}
+    return f'{{"figures":{{{figures}}},"html":{json.dumps(html, ensure_ascii=False)}}}'
+
+
+def write_section_payloads(data_dir: str,
+                           sections: Dict[str, List[str]],
+                           fragments: Dict[str, str],
+                           figure_names: Iterable[str]) -> Dict[str, Dict]:
+    """
+    写出全部章节数据文件
+
+    Args:
+        data_dir: 数据目录
+        sections: 章节 id -> 片段名
+        fragments: 片段名 -> 内容
+        figure_names: 图表片段名
+
+    Returns:
+        dict: 章节 id -> {'url': 相对外壳的地址（带内容哈希，内容变化时浏览器缓存失效）, 'bytes', 'gzip_bytes'}
+    """
+    figure_names = list(figure_names)
+    prefix = os.path.basename(os.path.normpath(data_dir))
+    written = {}
+    for section_id, names in sections.items():
+        content = section_payload(names, fragments, figure_names).encode('utf-8')
+        gzip_bytes = write_precompressed(os.path.join(data_dir, f'{section_id}.json'), content)
+        version = hashlib.blake2b(content, digest_size=6).hexdigest()
+        written[section_id] = {
+            'url': f'{prefix}/{section_id}.json?v={version}',
+            'bytes': len(content),
+            'gzip_bytes': gzip_bytes
+        }
+    return written
+
+
+def ensure_plotly_js(data_dir: str) -> str:
+    """
+    将已安装的 plotly 包自带的 plotly.min.js（与生成图表 JSON 的版本一致）复制到数据目录
+
+    Args:
+        data_dir: 数据目录
+
+    Returns:
+        str: 相对外壳的地址
+    """
+    import plotly
+
+    filename = f'plotly-{plotly.__version__}.min.js'
+    path = os.path.join(data_dir, filename)
+    if not (os.path.exists(path) and os.path.exists(f'{path}.gz')):
+        source = os.path.join(os.path.dirname(plotly.__file__), 'package_data', 'plotly.min.js')
+        with open(source, 'rb') as f:
+            write_precompressed(path, f.read())
+    return f'{os.path.basename(os.path.normpath(data_dir))}/{filename}'
@@ -0,0 +1,145 @@
+"""
+并行图表构建与渲染
+各图表在进程池中构建并序列化为 JSON，
+工作进程通过共享内存只读取所需的列，不传递序列化的 DataFrame
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 列描述：列名 -> (共享内存名, dtype, 长度)
+ColumnDescriptors = Dict[str, Tuple[str, str, int]]
+
+
+class SharedColumns:
+    """
+    将 DataFrame 的数值列复制到共享内存
+
+    作为上下文管理器使用，退出时释放所有共享内存块。
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: List[str]):
+        """
+        初始化
+
+        Args:
+            df: 数据框
+            columns: 需要共享的列
+        """
+        self.descriptors: ColumnDescriptors = {}
+        self._blocks: List[shared_memory.SharedMemory] = []
+
+        try:
+            for col in columns:
+                values = df[col].to_numpy()
+                if values.dtype == object:
+                    raise TypeError(f"列 {col} 不是数值类型，无法放入共享内存")
+                block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+                self.descriptors[col] = (block.name, values.dtype.str, len(values))
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """关闭并释放共享内存"""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_columns(descriptors: ColumnDescriptors) -> Tuple[Dict[str, np.ndarray], List]:
+    """
+    在工作进程中挂载共享内存列（零拷贝视图）
+
+    Args:
+        descriptors: 列描述
+
+    Returns:
+        (列名 -> 数组, 共享内存句柄列表)，使用完毕后需关闭句柄
+    """
+    columns = {}
+    handles = []
+    for col, (name, dtype, length) in descriptors.items():
+        block = shared_memory.SharedMemory(name=name)
+        handles.append(block)
+        columns[col] = np.ndarray((length,), dtype=np.dtype(dtype), buffer=block.buf)
+    return columns, handles
+
+
+def build_and_render(name: str, descriptors: ColumnDescriptors) -> Dict:
+    """
+    工作进程入口：构建一个图表并序列化为 JSON
+
+    Args:
+        name: 图表名（FIGURE_SPECS 中的键）
+        descriptors: 该图表所需列的描述
+
+    Returns:
+        dict: name / figure（JSON）/ build_s / render_s
+    """
+    from analysis.data_analysis import FIGURE_SPECS, render_figure
+
+    columns, handles = attach_columns(descriptors)
+    try:
+        start = time.perf_counter()
+        builder, _ = FIGURE_SPECS[name]
+        fig = builder(columns)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        figure_json = render_figure(fig)
+        render_s = time.perf_counter() - start
+    finally:
+        # 释放视图后才能关闭共享内存
+        del columns
+        for block in handles:
+            block.close()
+
+    return {
+        'name': name,
+        'figure': figure_json,
+        'build_s': build_s,
+        'render_s': render_s
+    }
+
+
+def render_figures_parallel(df: pd.DataFrame,
+                            figure_columns: Dict[str, List[str]],
+                            max_workers: Optional[int] = None) -> List[Dict]:
+    """
+    在进程池中并行构建并渲染图表
+
+    Args:
+        df: 数据框
+        figure_columns: 图表名 -> 所需列
+        max_workers: 进程数，None 表示 min(图表数, CPU 核数)
+
+    Returns:
+        list: 各图表的 build_and_render 结果（顺序与 figure_columns 一致）
+    """
+    needed = sorted({col for cols in figure_columns.values() for col in cols})
+    max_workers = max_workers or min(len(figure_columns), os.cpu_count() or 1)
+
+    with SharedColumns(df, needed) as shared:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(build_and_render, name,
+                                {col: shared.descriptors[col] for col in cols})
+                for name, cols in figure_columns.items()
+            ]
+            return [future.result() for future in futures]
@@ -0,0 +1,283 @@
+"""
+服务端栅格化
+将大量散点按二维网格聚合（计数、患病率），以热力图呈现；
+另附蓄水池抽样的 scattergl 点用于悬停查看。
+输出大小和渲染时间只与网格大小/样本数有关，与数据行数无关
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+import plotly.graph_objects as go
+
+# 密度视图：视图名 -> (x 列, y 列, x 轴标题, y 轴标题)
+DENSITY_VIEWS = {
+    'bmi_vs_bp': ('bmi', 'ap_hi', 'BMI (kg/m²)', '收缩压 (mmHg)'),
+    'weight_vs_bp': ('weight', 'ap_hi', '体重 (kg)', '收缩压 (mmHg)')
+}
+
+
+def derived_column(columns, name: str) -> Optional[np.ndarray]:
+    """
+    取出列或派生列（bmi 由身高、体重计算），所需列不存在时返回 None
+
+    Args:
+        columns: 列名 -> 数组（dict 或 DataFrame）
+        name: 列名
+
+    Returns:
+        ndarray 或 None
+    """
+    if name == 'bmi':
+        if 'weight' not in columns or 'height' not in columns:
+            return None
+        height_m = np.asarray(columns['height'], dtype=np.float64) / 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.asarray(columns['weight'], dtype=np.float64) / height_m ** 2
+    if name not in columns:
+        return None
+    return np.asarray(columns[name], dtype=np.float64)
+
+
+def robust_range(values: np.ndarray, low: float = 0.5, high: float = 99.5) -> Tuple[float, float]:
+    """
+    稳健的取值范围（去掉两端的极端值，避免录入错误把网格拉得过宽）
+
+    Args:
+        values: 数据
+        low: 下分位数（百分比）
+        high: 上分位数（百分比）
+
+    Returns:
+        (下限, 上限)
+    """
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return 0.0, 1.0
+    vmin, vmax = np.percentile(values, [low, high])
+    if vmax <= vmin:
+        vmax = vmin + 1.0
+    return float(vmin), float(vmax)
+
+
+class DensityGrid:
+    """
+    可合并的二维网格聚合
+
+    每个格子记录点数和目标值（cardio）之和；范围外的点不计入网格，只计数。
+    """
+
+    def __init__(self, x_range: Tuple[float, float], y_range: Tuple[float, float],
+                 shape: Tuple[int, int] = (100, 80)):
+        """
+        初始化
+
+        Args:
+            x_range: x 轴范围
+            y_range: y 轴范围
+            shape: 网格大小 (nx, ny)
+        """
+        self.x_range = tuple(x_range)
+        self.y_range = tuple(y_range)
+        self.shape = tuple(shape)
+        nx, ny = self.shape
+        self.counts = np.zeros((ny, nx), dtype=np.int64)
+        self.target_sums = np.zeros((ny, nx), dtype=np.float64)
+        self.out_of_range = 0
+
+    def _index(self, values: np.ndarray, value_range: Tuple[float, float], n: int) -> np.ndarray:
+        low, high = value_range
+        # 上边界上的点归入最后一格
+        return np.minimum(((values - low) / (high - low) * n).astype(np.int64), n - 1)
+
+    def update(self, x: np.ndarray, y: np.ndarray, target: Optional[np.ndarray] = None) -> 'DensityGrid':
+        """
+        加入一批点
+
+        Args:
+            x: x 坐标
+            y: y 坐标
+            target: 目标值（0/1），None 表示只计数
+
+        Returns:
+            self
+        """
+        valid = np.isfinite(x) & np.isfinite(y)
+        if target is not None:
+            target = np.asarray(target, dtype=np.float64)
+            valid &= np.isfinite(target)
+        inside = ((x >= self.x_range[0]) & (x <= self.x_range[1])
+                  & (y >= self.y_range[0]) & (y <= self.y_range[1]))
+        self.out_of_range += int((valid & ~inside).sum())
+        valid &= inside
+        nx, ny = self.shape
+        flat = self._index(y[valid], self.y_range, ny) * nx + self._index(x[valid], self.x_range, nx)
+        self.counts += np.bincount(flat, minlength=nx * ny).reshape(ny, nx)
+        if target is not None:
+            self.target_sums += np.bincount(flat, weights=target[valid], minlength=nx * ny).reshape(ny, nx)
+        return self
+
+    def merge(self, other: 'DensityGrid') -> 'DensityGrid':
+        """合并另一个网格（范围和大小必须相同）"""
+        if (other.x_range, other.y_range, other.shape) != (self.x_range, self.y_range, self.shape):
+            raise ValueError("范围或大小不同的网格不能合并")
+        self.counts += other.counts
+        self.target_sums += other.target_sums
+        self.out_of_range += other.out_of_range
+        return self
+
+    def centers(self) -> Tuple[np.ndarray, np.ndarray]:
+        """各列、各行格子的中心坐标"""
+        nx, ny = self.shape
+        x_edges = np.linspace(self.x_range[0], self.x_range[1], nx + 1)
+        y_edges = np.linspace(self.y_range[0], self.y_range[1], ny + 1)
+        return (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2
+
+
+class Reservoir:
+    """
+    可合并的均匀抽样（bottom-k）
+
+    每个点分配一个随机优先级，只保留优先级最小的 k 个；
+    任意划分下合并结果都是全体数据的均匀随机样本。
+    """
+
+    def __init__(self, size: int = 3000, n_fields: int = 3, seed: int = 0):
+        """
+        初始化
+
+        Args:
+            size: 样本数
+            n_fields: 每个点的字段数（如 x, y, target）
+            seed: 随机种子（并行时各块应使用不同的种子）
+        """
+        self.size = size
+        self.priorities = np.empty(0)
+        self.rows = np.empty((0, n_fields), dtype=np.float32)
+        self._rng = np.random.default_rng(seed)
+
+    def _keep(self, priorities: np.ndarray, rows: np.ndarray):
+        if len(priorities) > self.size:
+            keep = np.argpartition(priorities, self.size)[:self.size]
+            priorities, rows = priorities[keep], rows[keep]
+        self.priorities, self.rows = priorities, rows
+
+    def update(self, rows: np.ndarray) -> 'Reservoir':
+        """加入一批点（每行一个点）"""
+        rows = np.asarray(rows, dtype=np.float32)
+        rows = rows[np.isfinite(rows).all(axis=1)]
+        self._keep(np.concatenate([self.priorities, self._rng.random(len(rows))]),
+                   np.concatenate([self.rows, rows]))
+        return self
+
+    def merge(self, other: 'Reservoir') -> 'Reservoir':
+        """合并另一个样本"""
+        self._keep(np.concatenate([self.priorities, other.priorities]),
+                   np.concatenate([self.rows, other.rows]))
+        return self
+
+
+class DensityView:
+    """一个密度视图的聚合：网格 + 悬停样本"""
+
+    def __init__(self, name: str, x_range: Tuple[float, float], y_range: Tuple[float, float],
+                 shape: Tuple[int, int] = (100, 80), sample_size: int = 3000, seed: int = 0):
+        self.name = name
+        self.x_col, self.y_col, self.x_title, self.y_title = DENSITY_VIEWS[name]
+        self.grid = DensityGrid(x_range, y_range, shape)
+        self.sample = Reservoir(sample_size, n_fields=3, seed=seed)
+
+    @classmethod
+    def plan(cls, name: str, columns, **kwargs) -> Optional['DensityView']:
+        """由样本数据确定网格范围，所需列不存在时返回 None"""
+        x_col, y_col, _, _ = DENSITY_VIEWS[name]
+        x, y = derived_column(columns, x_col), derived_column(columns, y_col)
+        if x is None or y is None:
+            return None
+        return cls(name, robust_range(x), robust_range(y), **kwargs)
+
+    def empty_like(self, seed: int = 0) -> 'DensityView':
+        """创建范围相同的空聚合"""
+        return DensityView(self.name, self.grid.x_range, self.grid.y_range, self.grid.shape,
+                           self.sample.size, seed)
+
+    def update(self, columns, target_col: Optional[str] = 'cardio') -> 'DensityView':
+        """加入一批数据"""
+        x, y = derived_column(columns, self.x_col), derived_column(columns, self.y_col)
+        target = derived_column(columns, target_col) if target_col else None
+        self.grid.update(x, y, target)
+        self.sample.update(np.column_stack([x, y, target if target is not None else np.zeros(len(x))]))
+        return self
+
+    def merge(self, other: 'DensityView') -> 'DensityView':
+        self.grid.merge(other.grid)
+        self.sample.merge(other.sample)
+        return self
+
+
+def figure_density(view: DensityView, color_by: str = 'rate', min_count: int = 5) -> go.Figure:
+    """
+    绘制密度热力图（附可切换显示的 scattergl 抽样点）
+
+    Args:
+        view: 密度视图聚合
+        color_by: 'rate' 按患病率着色，'count' 按点数（对数）着色
+        min_count: 按患病率着色时，点数少于该值的格子不显示
+
+    Returns:
+        Figure
+    """
+    grid = view.grid
+    x_centers, y_centers = grid.centers()
+    counts = grid.counts
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if color_by == 'rate':
+            z = np.where(counts >= min_count, grid.target_sums / counts * 100, np.nan)
+            colorbar_title = '患病率 (%)'
+            colorscale = 'RdYlBu_r'
+        else:
+            z = np.where(counts > 0, np.log10(counts), np.nan)
+            colorbar_title = 'log10(人数)'
+            colorscale = 'Viridis'
+
+    fig = go.Figure()
+    fig.add_trace(go.Heatmap(
+        x=x_centers.astype(np.float32),
+        y=y_centers.astype(np.float32),
+        z=z.astype(np.float32),
+        # 人数用能容纳最大值的最小整数类型，嵌入报告的数组更小
+        customdata=counts.astype(np.uint16 if counts.max() < 2 ** 16 else np.uint32),
+        colorscale=colorscale,
+        colorbar=dict(title=colorbar_title),
+        hovertemplate=(f'{view.x_title}: %{{x:.1f}}<br>{view.y_title}: %{{y:.0f}}<br>'
+                       f'人数: %{{customdata}}<br>{colorbar_title}: %{{z:.1f}}<extra></extra>'),
+        name='密度'
+    ))
+
+    # 抽样点默认隐藏，点击图例后显示，用于查看单个样本
+    sample = view.sample.rows
+    fig.add_trace(go.Scattergl(
+        x=sample[:, 0],
+        y=sample[:, 1],
+        mode='markers',
+        marker=dict(size=3, color=(sample[:, 2] > 0).astype(np.uint8),
+                    colorscale=[[0, '#4facfe'], [1, '#f093fb']], cmin=0, cmax=1, opacity=0.6),
+        name=f'抽样点（{len(sample):,} 个）',
+        visible='legendonly',
+        hovertemplate=f'{view.x_title}: %{{x:.1f}}<br>{view.y_title}: %{{y:.0f}}<extra></extra>'
+    ))
+
+    fig.update_layout(
+        title=(f'{view.x_title} 与 {view.y_title}（共 {int(counts.sum()):,} 人，'
+               f'范围外 {grid.out_of_range:,} 人未显示）'),
+        xaxis_title=view.x_title,
+        yaxis_title=view.y_title,
+        xaxis=dict(range=list(grid.x_range)),
+        yaxis=dict(range=list(grid.y_range)),
+        template='plotly_white',
+        height=550,
+        legend=dict(orientation='h', y=-0.15)
+    )
+
+    return fig
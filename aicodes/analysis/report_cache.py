@@ -0,0 +1,176 @@
+"""
+报告片段缓存
+每个图表/统计块按"所需列的内容哈希 + 代码版本 + 计算后端"缓存渲染结果，
+数据未变化时直接由缓存片段拼装报告
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def hash_column(series: pd.Series) -> str:
+    """
+    计算列内容哈希
+
+    Args:
+        series: 数据列
+
+    Returns:
+        str: 十六进制哈希
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(series.dtype).encode())
+    values = series.to_numpy()
+    if values.dtype != object and not isinstance(series.dtype, pd.StringDtype):
+        digest.update(np.ascontiguousarray(values).view(np.uint8))
+    else:
+        digest.update(pd.util.hash_pandas_object(series, index=False).to_numpy().view(np.uint8))
+    return digest.hexdigest()
+
+
+def describe_columns(df: pd.DataFrame) -> Dict[str, Dict]:
+    """
+    生成列信息（内容哈希和是否为数值列）
+
+    Args:
+        df: 数据框
+
+    Returns:
+        dict: 列名 -> {'hash', 'numeric'}
+    """
+    return {
+        col: {'hash': hash_column(df[col]), 'numeric': bool(pd.api.types.is_numeric_dtype(df[col]))}
+        for col in df.columns
+    }
+
+
+def code_version(*paths: str) -> str:
+    """
+    由源码文件内容和 Plotly 版本计算代码版本，任一变化都会使缓存失效
+
+    Args:
+        *paths: 参与计算的源码文件
+
+    Returns:
+        str: 版本哈希
+    """
+    import plotly
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(plotly.__version__.encode())
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def fragment_key(name: str, columns: List[str], column_info: Dict[str, Dict], version: str, backend: str) -> str:
+    """
+    计算片段缓存键
+
+    Args:
+        name: 片段名
+        columns: 片段依赖的列
+        column_info: 列信息（describe_columns 的返回值）
+        version: 代码版本
+        backend: 计算后端名（不同后端的统计结果可能有细微差异）
+
+    Returns:
+        str: 缓存键
+    """
+    payload = json.dumps({
+        'name': name,
+        'version': version,
+        'backend': backend,
+        'columns': [(col, column_info[col]['hash']) for col in columns]
+    })
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class ReportCache:
+    """报告片段磁盘缓存"""
+
+    def __init__(self, cache_dir: str):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+        """
+        self.cache_dir = cache_dir
+        self.fragment_dir = os.path.join(cache_dir, 'fragments')
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        os.makedirs(self.fragment_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _fingerprint(data_path: str) -> Dict:
+        """数据文件指纹（大小和修改时间）"""
+        stat = os.stat(data_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def _read_manifest(self) -> Dict:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, path: str, content: str):
+        """原子写入，避免中断时留下半个文件"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def load_columns(self, data_path: str) -> Optional[Dict[str, Dict]]:
+        """
+        数据文件未变化时返回上次记录的列信息，无需重新读取数据
+
+        Args:
+            data_path: 数据文件路径
+
+        Returns:
+            dict 或 None
+        """
+        entry = self._read_manifest().get(os.path.abspath(data_path))
+        if entry and entry.get('fingerprint') == self._fingerprint(data_path):
+            return entry['columns']
+        return None
+
+    def save_columns(self, data_path: str, column_info: Dict[str, Dict]):
+        """
+        记录数据文件的列信息
+
+        Args:
+            data_path: 数据文件路径
+            column_info: 列信息
+        """
+        manifest = self._read_manifest()
+        manifest[os.path.abspath(data_path)] = {
+            'fingerprint': self._fingerprint(data_path),
+            'columns': column_info
+        }
+        self._write(self.manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    def get(self, key: str) -> Optional[str]:
+        """读取片段，不存在时返回 None"""
+        path = os.path.join(self.fragment_dir, f'{key}.frag')
+        if os.path.exists(path):
+            self.hits += 1
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        self.misses += 1
+        return None
+
+    def put(self, key: str, content: str):
+        """写入片段"""
+        self._write(os.path.join(self.fragment_dir, f'{key}.frag'), content)
@@ -0,0 +1,394 @@
+"""
+分层抽样近似分析
+按 cardio × 年龄段分层，一次流式扫描得到嵌套的多级样本（小样本是大样本的子集，
+各层按总体比例分配样本量）。分组查询可由任一级样本回答并给出置信区间，
+精度不够时逐级细化到更大的样本，最终回退到全量立方体
+"""
+
+import json
+import os
+import sys
+import time
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.cube import DataCube, measure_values
+
+# 各级样本的总行数（从小到大）
+DEFAULT_SIZES = (5000, 50000, 200000)
+
+# 分层维度
+STRATA_DIMENSIONS = ('cardio', 'age_band')
+
+
+def _allocate(size: int, population: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+    """
+    按总体比例分配各层样本量（最大余数法取整）
+
+    每层至少 2 行（用于估计层内方差），且不超过该层总体和已保留的候选行数。
+
+    Args:
+        size: 样本总行数
+        population: 各层总体行数
+        capacity: 各层已保留的候选行数
+
+    Returns:
+        ndarray: 各层样本量
+    """
+    total = population.sum()
+    if total == 0:
+        return np.zeros_like(population)
+    quota = size * population / total
+    allocation = np.floor(quota).astype(np.int64)
+    remainder = int(min(size, total) - allocation.sum())
+    if remainder > 0:
+        allocation[np.argsort(-(quota - allocation), kind='stable')[:remainder]] += 1
+    allocation = np.maximum(allocation, np.minimum(population, 2))
+    return np.minimum(allocation, capacity)
+
+
+class StratifiedSamples:
+    """多级分层样本"""
+
+    def __init__(self, sizes: Sequence[int] = DEFAULT_SIZES, seed: int = 0):
+        """
+        初始化空样本
+
+        Args:
+            sizes: 各级样本的总行数
+            seed: 随机种子
+        """
+        self.template = DataCube()
+        self.dims = list(self.template.values)
+        self.measures = list(self.template.measures)
+        self.sizes = sorted(int(s) for s in sizes)
+        self._strata_axes = [self.dims.index(d) for d in STRATA_DIMENSIONS]
+        self._strata_shape = tuple(self.template.shape[a] for a in self._strata_axes)
+        n_strata = int(np.prod(self._strata_shape))
+
+        self.population = np.zeros(n_strata, dtype=np.int64)
+        self.n_rows = 0
+        self.dropped = 0
+
+        # 构建期间每层保留优先级最小的若干行（优先级为均匀随机数，即层内简单随机抽样）
+        self._rng = np.random.default_rng(seed)
+        self._candidates: List[Optional[tuple]] = [None] * n_strata
+
+        # 构建完成后的样本：按层排列，层内按优先级升序，每级样本取各层的前 allocation[级别, 层] 行
+        self.codes = np.empty((0, len(self.dims)), dtype=np.int8)
+        self.values = np.empty((0, len(self.measures)), dtype=np.float32)
+        self.strata = np.empty(0, dtype=np.int64)
+        self.offsets = np.zeros(n_strata + 1, dtype=np.int64)
+        self.allocation = np.zeros((len(self.sizes), n_strata), dtype=np.int64)
+        self._level_index: Dict[int, np.ndarray] = {}
+
+    def add(self, df: pd.DataFrame) -> 'StratifiedSamples':
+        """
+        加入一批数据（可对数据块逐块调用）
+
+        Args:
+            df: 数据
+
+        Returns:
+            self
+        """
+        codes, valid = self.template.encode(df)
+        self.n_rows += len(df)
+        self.dropped += int((~valid).sum())
+        codes = codes[:, valid].T.astype(np.int8)
+        values = np.column_stack([measure_values(df, m)[valid] for m in self.measures]).astype(np.float32)
+        strata = np.ravel_multi_index(codes[:, self._strata_axes].T, self._strata_shape)
+        self.population += np.bincount(strata, minlength=len(self.population))
+
+        priorities = self._rng.random(len(codes))
+        capacity = self.sizes[-1]
+        for h in np.unique(strata):
+            rows = strata == h
+            batch = (priorities[rows], codes[rows], values[rows])
+            if self._candidates[h] is not None:
+                batch = tuple(np.concatenate([old, new]) for old, new in zip(self._candidates[h], batch))
+            # 超过两倍容量时才截断，摊销 argpartition 的开销
+            if len(batch[0]) > 2 * capacity:
+                keep = np.argpartition(batch[0], capacity)[:capacity]
+                batch = tuple(a[keep] for a in batch)
+            self._candidates[h] = batch
+        return self
+
+    def finalize(self) -> 'StratifiedSamples':
+        """整理候选行并计算各级样本的分层分配"""
+        capacity = self.sizes[-1]
+        codes, values, strata = [], [], []
+        kept = np.zeros(len(self.population), dtype=np.int64)
+        for h, batch in enumerate(self._candidates):
+            if batch is None:
+                continue
+            order = np.argsort(batch[0], kind='stable')[:capacity]
+            codes.append(batch[1][order])
+            values.append(batch[2][order])
+            strata.append(np.full(len(order), h, dtype=np.int64))
+            kept[h] = len(order)
+        self._candidates = [None] * len(self.population)
+
+        if codes:
+            self.codes = np.concatenate(codes)
+            self.values = np.concatenate(values)
+            self.strata = np.concatenate(strata)
+        self.offsets = np.concatenate([[0], np.cumsum(kept)])
+        self.allocation = np.vstack([_allocate(size, self.population, kept) for size in self.sizes])
+        self._level_index = {}
+        return self
+
+    @classmethod
+    def build(cls, chunks: Iterable[pd.DataFrame], **kwargs) -> 'StratifiedSamples':
+        """
+        由数据块构建多级样本（内存只与分块大小和最大样本量有关）
+
+        Args:
+            chunks: 数据块迭代器
+            **kwargs: 传给构造函数的参数
+
+        Returns:
+            StratifiedSamples: 样本
+        """
+        samples = cls(**kwargs)
+        for chunk in chunks:
+            samples.add(chunk)
+        return samples.finalize()
+
+    def save(self, path: str):
+        """保存为压缩的 .npz 文件"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = {'sizes': self.sizes, 'dims': self.dims, 'measures': self.measures,
+                'n_rows': self.n_rows, 'dropped': self.dropped}
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, codes=self.codes, values=self.values, strata=self.strata,
+                                offsets=self.offsets, population=self.population, allocation=self.allocation,
+                                meta=np.array(json.dumps(meta, ensure_ascii=False)))
+
+    @classmethod
+    def load(cls, path: str) -> 'StratifiedSamples':
+        """从 .npz 文件加载"""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            samples = cls(meta['sizes'])
+            if meta['dims'] != samples.dims or meta['measures'] != samples.measures:
+                raise ValueError("样本文件的维度或指标与当前定义不一致，请重新运行 scripts/build_samples.py")
+            for name in ('codes', 'values', 'strata', 'offsets', 'population', 'allocation'):
+                setattr(samples, name, data[name])
+        samples.n_rows = meta['n_rows']
+        samples.dropped = meta['dropped']
+        return samples
+
+    def describe(self) -> Dict:
+        """各级样本的行数和分层信息"""
+        return {
+            'levels': [{'level': i, 'size': size, 'rows': int(self.allocation[i].sum())}
+                       for i, size in enumerate(self.sizes)],
+            'strata': list(STRATA_DIMENSIONS),
+            'population': int(self.population.sum()),
+            'n_rows': self.n_rows,
+            'dropped': self.dropped
+        }
+
+    def level_index(self, level: int) -> np.ndarray:
+        """某一级样本在样本数组中的行号"""
+        if level not in self._level_index:
+            starts = self.offsets[:-1]
+            counts = self.allocation[level]
+            self._level_index[level] = np.concatenate([np.arange(s, s + n) for s, n in zip(starts, counts)])
+        return self._level_index[level]
+
+    def query(self,
+              filters: Optional[Dict[str, Sequence]] = None,
+              group_by: Optional[Sequence[str]] = None,
+              measures: Optional[Sequence[str]] = None,
+              level: int = 0,
+              confidence: float = 0.95) -> Dict:
+        """
+        由样本估计过滤 + 分组查询的结果（参数和返回格式与 DataCube.query 相同，另附置信区间）
+
+        人数为分层加权估计，患病率和均值为分层比率估计，方差用线性化方法计算（含有限总体校正）。
+
+        Args:
+            filters: 维度名 -> 允许的取值（原始取值或标签）
+            group_by: 分组维度
+            measures: 需要求均值的指标，None 表示全部
+            level: 样本级别（0 为最小样本）
+            confidence: 置信水平
+
+        Returns:
+            dict: {'rows': [{维度: 标签, 'count', 'count_ci', 'cardio_rate', 'cardio_rate_ci',
+                   'mean_<指标>', 'mean_<指标>_ci', 'sample_rows'}], 'level', 'sample_size', 'exact', ...}
+        """
+        start = time.perf_counter()
+        filters = filters or {}
+        group_by = list(group_by or [])
+        measures = self.measures if measures is None else list(measures)
+
+        for dim in list(filters) + group_by:
+            if dim not in self.template.values:
+                raise ValueError(f"未知维度: {dim}，可选: {self.dims}")
+        unknown = [m for m in measures if m not in self.measures]
+        if unknown:
+            raise ValueError(f"未知指标: {unknown}，可选: {self.measures}")
+        if not 0 <= level < len(self.sizes):
+            raise ValueError(f"样本级别 {level} 不存在，可选: 0-{len(self.sizes) - 1}")
+
+        index = self.level_index(level)
+        codes = self.codes[index]
+        strata = self.strata[index]
+
+        mask = np.ones(len(index), dtype=bool)
+        for dim, allowed in filters.items():
+            if not isinstance(allowed, (list, tuple, set)):
+                allowed = [allowed]
+            allowed_codes = [self.template.code(dim, v) for v in allowed]
+            mask &= np.isin(codes[:, self.dims.index(dim)], allowed_codes)
+
+        group_shape = tuple(self.template.shape[self.dims.index(d)] for d in group_by)
+        n_groups = int(np.prod(group_shape)) if group_by else 1
+        if group_by:
+            groups = np.ravel_multi_index(codes[:, [self.dims.index(d) for d in group_by]].T, group_shape)
+        else:
+            groups = np.zeros(len(index), dtype=np.int64)
+
+        n_strata = len(self.population)
+        n_h = self.allocation[level].astype(np.float64)
+        N_h = self.population.astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weights = np.where(n_h > 0, N_h / n_h, 0.0)
+            # 层方差系数 N_h²(1 - f_h)/n_h；样本不足 2 行或全部入样的层不贡献方差
+            var_factor = np.where(n_h > 1, N_h ** 2 * (1 - n_h / N_h) / n_h, 0.0)
+        keys = strata * n_groups + groups
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+        def stratum_sums(selected, y=None):
+            """各 (层, 组) 的行数、y 之和与 y² 之和"""
+            k = keys[selected]
+            shape = (n_strata, n_groups)
+            s1 = np.bincount(k, minlength=n_strata * n_groups).reshape(shape).astype(np.float64)
+            if y is None:
+                return s1, None, None
+            y = y[selected]
+            sy = np.bincount(k, weights=y, minlength=n_strata * n_groups).reshape(shape)
+            syy = np.bincount(k, weights=y * y, minlength=n_strata * n_groups).reshape(shape)
+            return s1, sy, syy
+
+        def within_variance(total, total_sq):
+            """由层内和与平方和计算层内样本方差（分母 n_h - 1）"""
+            n = n_h[:, None]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(n > 1, (total_sq - total ** 2 / n) / (n - 1), 0.0)
+
+        def ratio_estimate(selected, y):
+            """分层比率估计 Σw·Σy / Σw·Σ1 及其标准误"""
+            s1, sy, syy = stratum_sums(selected, y)
+            x_hat = weights @ s1
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = (weights @ sy) / x_hat
+                # 线性化变量 z = (y - R)·1 / X̂ 的层内和与平方和
+                z_sum = (sy - ratio * s1) / x_hat
+                z_sq = (syy - 2 * ratio * sy + ratio ** 2 * s1) / x_hat ** 2
+            se = np.sqrt(np.maximum(var_factor @ np.nan_to_num(within_variance(z_sum, z_sq)), 0))
+            return ratio, se
+
+        # 人数：分层加权计数，指示变量的层内方差
+        s1, _, _ = stratum_sums(mask)
+        counts = weights @ s1
+        count_se = np.sqrt(np.maximum(var_factor @ within_variance(s1, s1), 0))
+
+        cardio_values = np.asarray(self.template.values['cardio'])[codes[:, self.dims.index('cardio')]]
+        rates, rate_se = ratio_estimate(mask, (cardio_values == 1).astype(np.float64))
+
+        values = self.values[index]
+        means = {}
+        for measure in measures:
+            y = values[:, self.measures.index(measure)]
+            finite = np.isfinite(y)
+            means[measure] = ratio_estimate(mask & finite, np.where(finite, y, 0.0))
+
+        rows = []
+        for g in np.flatnonzero(s1.sum(axis=0) > 0):
+            row = {}
+            for dim, code in zip(group_by, np.unravel_index(g, group_shape) if group_by else []):
+                row[dim] = self.template.dimensions[dim][self.template.values[dim][code]]
+            row['count'] = float(counts[g])
+            row['count_ci'] = [float(max(counts[g] - z * count_se[g], 0)), float(counts[g] + z * count_se[g])]
+            row['cardio_rate'] = float(rates[g])
+            row['cardio_rate_ci'] = [float(max(rates[g] - z * rate_se[g], 0)), float(min(rates[g] + z * rate_se[g], 1))]
+            for measure, (mean, se) in means.items():
+                if np.isfinite(mean[g]):
+                    row[f'mean_{measure}'] = float(mean[g])
+                    row[f'mean_{measure}_ci'] = [float(mean[g] - z * se[g]), float(mean[g] + z * se[g])]
+                else:
+                    row[f'mean_{measure}'] = None
+                    row[f'mean_{measure}_ci'] = None
+            row['sample_rows'] = int(s1[:, g].sum())
+            rows.append(row)
+
+        return {
+            'group_by': group_by,
+            'filters': {dim: list(v) if isinstance(v, (list, tuple, set)) else [v] for dim, v in filters.items()},
+            'rows': rows,
+            'level': level,
+            'sample_size': int(self.allocation[level].sum()),
+            'confidence': confidence,
+            'exact': False,
+            'elapsed_us': (time.perf_counter() - start) * 1e6
+        }
+
+
+def widest_rate_ci(result: Dict) -> float:
+    """查询结果中患病率置信区间的最大半宽（精确结果为 0）"""
+    widths = [(row['cardio_rate_ci'][1] - row['cardio_rate_ci'][0]) / 2
+              for row in result['rows'] if row.get('cardio_rate_ci')]
+    return max(widths, default=0.0)
+
+
+def figure_group_rates(result: Dict, title: Optional[str] = None) -> go.Figure:
+    """
+    将分组查询结果绘制为患病率柱状图（近似结果附置信区间误差线）
+
+    Args:
+        result: StratifiedSamples.query 或 DataCube.query 的结果
+        title: 标题，None 表示按分组维度生成
+
+    Returns:
+        Figure
+    """
+    rows = result['rows']
+    labels = [' / '.join(str(row[dim]) for dim in result['group_by']) or '全部' for row in rows]
+    rates = np.array([row['cardio_rate'] * 100 for row in rows])
+
+    error_y = None
+    if not result.get('exact', True):
+        lower = np.array([row['cardio_rate_ci'][0] * 100 for row in rows])
+        upper = np.array([row['cardio_rate_ci'][1] * 100 for row in rows])
+        error_y = dict(type='data', symmetric=False, array=upper - rates, arrayminus=rates - lower)
+        source = (f"{result['sample_size']:,} 行样本估计，"
+                  f"{result['confidence'] * 100:.0f}% 置信区间")
+    else:
+        source = '全量数据'
+
+    fig = go.Figure(go.Bar(
+        x=labels,
+        y=rates,
+        error_y=error_y,
+        customdata=[row['count'] for row in rows],
+        hovertemplate='%{x}<br>患病率: %{y:.1f}%<br>人数: %{customdata:,.0f}<extra></extra>',
+        marker_color='#667eea'
+    ))
+    fig.update_layout(
+        title=f"{title or '分组患病率'}（{source}）",
+        yaxis_title='患病率 (%)',
+        template='plotly_white',
+        height=450
+    )
+    return fig
@@ -0,0 +1,299 @@
+"""
+充分统计量持久化存储
+保存流式统计聚合和数据文件的高水位线（已处理的行数/字节位置），
+数据追加后只读取并合并新增的行，更新代价与新增行数成正比
+"""
+
+import hashlib
+import io
+import os
+import pickle
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from analysis.streaming_stats import StreamingStats, compute_streaming_stats
+
+STORE_VERSION = 5
+
+# 计算前缀哈希时每次读取的字节数
+HASH_BLOCK_BYTES = 1 << 20
+
+
+class _LimitedReader(io.RawIOBase):
+    """只读取到指定字节位置的文件包装，避免读到正在写入的半行"""
+
+    def __init__(self, f, limit: int):
+        self._f = f
+        self._remaining = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:self._remaining]
+        n = self._f.readinto(view)
+        self._remaining -= n
+        return n
+
+
+def _complete_end(data_path: str) -> int:
+    """文件中最后一个完整行的结束位置（字节）"""
+    size = os.path.getsize(data_path)
+    with open(data_path, 'rb') as f:
+        position = size
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            block = f.read(position - start)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            position = start
+    return 0
+
+
+def _prefix_checksums(data_path: str, ends: List[int]) -> List[str]:
+    """
+    一次顺序读取计算文件各前缀 [0, end) 的哈希
+
+    Args:
+        data_path: 文件路径
+        ends: 前缀长度（字节，升序）
+
+    Returns:
+        list: 各前缀的十六进制哈希
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    checksums = []
+    position = 0
+    with open(data_path, 'rb') as f:
+        for end in ends:
+            while position < end:
+                block = f.read(min(HASH_BLOCK_BYTES, end - position))
+                if not block:
+                    break
+                digest.update(block)
+                position += len(block)
+            checksums.append(digest.copy().hexdigest())
+    return checksums
+
+
+def _parquet_fingerprint(data_path: str, row_count: int) -> Optional[str]:
+    """
+    前 row_count 行所在行组的元数据（行数、字节数、各列统计量）的哈希
+
+    Returns:
+        str: 哈希；前 row_count 行不是完整的若干行组（行组被重新划分）时返回 None
+    """
+    import pyarrow.parquet as pq
+
+    metadata = pq.ParquetFile(data_path).metadata
+    digest = hashlib.blake2b(digest_size=16)
+    covered = 0
+    for i in range(metadata.num_row_groups):
+        if covered >= row_count:
+            break
+        row_group = metadata.row_group(i)
+        covered += row_group.num_rows
+        digest.update(repr((row_group.num_rows, row_group.total_byte_size)).encode())
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            statistics = column.statistics
+            if statistics is not None and statistics.has_min_max:
+                summary = (statistics.min, statistics.max, statistics.null_count)
+            elif statistics is not None:
+                summary = (statistics.null_count,)
+            else:
+                summary = ()
+            digest.update(repr((column.path_in_schema, column.total_compressed_size, summary)).encode())
+    if covered != row_count:
+        return None
+    return digest.hexdigest()
+
+
+def iter_csv_range(data_path: str, start: int, end: int, columns: Optional[List[str]],
+                   chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    分块读取 CSV 文件 [start, end) 字节范围内的行
+
+    Args:
+        data_path: CSV 文件路径
+        start: 起始字节（0 表示从表头开始）
+        end: 结束字节（须为完整行的末尾）
+        columns: 列名（start > 0 时使用，此时范围内没有表头）
+        chunk_size: 每块行数
+
+    Yields:
+        DataFrame: 数据块
+    """
+    if end <= start:
+        return
+    with open(data_path, 'rb') as f:
+        f.seek(start)
+        reader = io.BufferedReader(_LimitedReader(f, end - start))
+        if start == 0:
+            yield from pd.read_csv(reader, chunksize=chunk_size)
+        else:
+            yield from pd.read_csv(reader, chunksize=chunk_size, header=None, names=columns)
+
+
+def iter_parquet_rows(data_path: str, skip_rows: int, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    分块读取 Parquet 文件第 skip_rows 行之后的数据，整段跳过已处理的行组
+
+    Args:
+        data_path: Parquet 文件路径
+        skip_rows: 已处理的行数
+        chunk_size: 每块行数
+
+    Yields:
+        DataFrame: 数据块
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(data_path)
+    metadata = parquet_file.metadata
+    row_groups = []
+    to_skip = skip_rows
+    for i in range(metadata.num_row_groups):
+        n = metadata.row_group(i).num_rows
+        if to_skip >= n:
+            to_skip -= n
+        else:
+            row_groups.append(i)
+    if not row_groups:
+        return
+
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups):
+        chunk = batch.to_pandas()
+        if to_skip:
+            # 第一个行组中部分行已处理
+            chunk, to_skip = chunk.iloc[to_skip:], max(0, to_skip - len(chunk))
+        if len(chunk):
+            yield chunk
+
+
+class StatsStore:
+    """充分统计量存储（单个 pickle 文件）"""
+
+    def __init__(self, store_path: str):
+        """
+        初始化存储
+
+        Args:
+            store_path: 存储文件路径
+        """
+        self.store_path = store_path
+
+    def load(self) -> Optional[Dict]:
+        """读取存储状态，不存在或版本不符时返回 None"""
+        if not os.path.exists(self.store_path):
+            return None
+        with open(self.store_path, 'rb') as f:
+            state = pickle.load(f)
+        if state.get('version') != STORE_VERSION:
+            return None
+        return state
+
+    def save(self, state: Dict):
+        """原子写入存储状态"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.store_path)), exist_ok=True)
+        state = dict(state, version=STORE_VERSION, updated_at=datetime.now().isoformat())
+        tmp_path = f"{self.store_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.store_path)
+
+
+def _is_append(state: Optional[Dict], data_path: str, prefix_checksum: Optional[str] = None) -> bool:
+    """
+    判断数据文件是否只是在上次处理的基础上追加了新行
+
+    Args:
+        state: 存储状态
+        data_path: 数据文件路径
+        prefix_checksum: CSV 文件上次高水位线之前全部字节的当前哈希（文件短于高水位线时为 None）
+    """
+    if state is None or state.get('data_path') != os.path.abspath(data_path):
+        return False
+    if data_path.endswith('.csv'):
+        # 已处理的部分（高水位线之前的全部字节）未变，才视为追加
+        return prefix_checksum is not None and prefix_checksum == state['prefix_checksum']
+    # 行数不少于上次且前 row_count 行的行组元数据未变，才视为追加
+    fingerprint = _parquet_fingerprint(data_path, state['row_count'])
+    return fingerprint is not None and fingerprint == state['row_fingerprint']
+
+
+def update_stats(data_path: str,
+                 store_path: str,
+                 chunk_size: int = 200000,
+                 max_workers: Optional[int] = None,
+                 target_col: Optional[str] = 'cardio',
+                 crosstab_columns: Optional[Sequence[str]] = None) -> Tuple[StreamingStats, int]:
+    """
+    增量更新充分统计量
+
+    存储有效且数据文件只是追加时，只读取高水位线之后的新增行并合并到已有聚合中；
+    否则（首次运行、文件被改写）全量重新计算。CSV 校验高水位线之前全部字节的哈希
+    （顺序读取，不解析，远快于重新统计），Parquet 校验已处理的行所在行组的元数据和列统计量。
+
+    Args:
+        data_path: 数据文件路径（.csv 或 .parquet）
+        store_path: 存储文件路径
+        chunk_size: 每块行数
+        max_workers: 进程数
+        target_col: 目标列
+        crosstab_columns: 交叉表列
+
+    Returns:
+        (合并后的聚合, 本次处理的行数)
+    """
+    if not (data_path.endswith('.csv') or data_path.endswith('.parquet')):
+        raise ValueError("增量统计仅支持 .csv 和 .parquet 文件")
+
+    store = StatsStore(store_path)
+    state = store.load()
+
+    prefix_checksum = end = end_checksum = None
+    if data_path.endswith('.csv'):
+        end = _complete_end(data_path)
+        # 上次的高水位线和本次的结束位置的前缀哈希在一次读取中算出
+        if state is not None and state.get('byte_offset', end + 1) <= end:
+            prefix_checksum, end_checksum = _prefix_checksums(data_path, [state['byte_offset'], end])
+        else:
+            end_checksum = _prefix_checksums(data_path, [end])[0]
+    if not _is_append(state, data_path, prefix_checksum):
+        state = None
+
+    stats = state['stats'] if state else None
+    row_count = state['row_count'] if state else 0
+
+    if data_path.endswith('.csv'):
+        start = state['byte_offset'] if state else 0
+        columns = stats.columns if stats else None
+        chunks = iter_csv_range(data_path, start, end, columns, chunk_size)
+    else:
+        chunks = iter_parquet_rows(data_path, row_count, chunk_size)
+
+    before = stats.n_rows if stats else 0
+    stats = compute_streaming_stats(data_path, chunk_size, max_workers, target_col, crosstab_columns,
+                                    stats=stats, chunks=chunks)
+    new_rows = stats.n_rows - before
+
+    new_state = {
+        'data_path': os.path.abspath(data_path),
+        'stats': stats,
+        'row_count': row_count + new_rows
+    }
+    if end is not None:
+        new_state['byte_offset'] = end
+        new_state['prefix_checksum'] = end_checksum
+    else:
+        new_state['row_fingerprint'] = _parquet_fingerprint(data_path, new_state['row_count'])
+    store.save(new_state)
+
+    return stats, new_rows
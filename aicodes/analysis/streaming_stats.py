@@ -0,0 +1,578 @@
+"""
+流式统计引擎
+分块读取数据，在进程池中计算可合并的部分聚合（map），再逐个合并（reduce）：
+Welford 矩、固定分箱直方图、t-digest 分位数、相关性充分统计量、交叉表计数和二维密度网格。
+内存占用只与分块大小有关，可分析超出内存的数据集。
+"""
+
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.aggregates import nice_bin_edges, nice_step
+from analysis.rasterize import DENSITY_VIEWS, DensityView, Reservoir
+from utils.helpers import iter_data_chunks
+
+
+def _key(value):
+    """交叉表键统一为 Python 标量（整数取值不带小数）"""
+    value = value.item() if hasattr(value, 'item') else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class TDigest:
+    """
+    可合并的 t-digest 分位数草图
+
+    质心按 k1 尺度函数 k(q) = δ/(2π)·asin(2q-1) 分组压缩，
+    每个质心覆盖的 k 区间不超过 1，两端分位数精度最高。压缩过程完全向量化。
+    """
+
+    def __init__(self, compression: float = 200):
+        """
+        初始化
+
+        Args:
+            compression: 压缩参数 δ，质心数约为 δ
+        """
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        order = np.argsort(means, kind='mergesort')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        if total == 0:
+            self.means, self.weights = means, weights
+            return
+
+        # 以质心右端的累计分位数确定其所属的 k 区间，同一区间内的质心合并
+        q = np.cumsum(weights) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1, 1))
+        cluster = np.floor(k - 1e-9).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, cluster[1:] != cluster[:-1]])
+
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+    def update(self, values: np.ndarray):
+        """
+        加入一批数据
+
+        Args:
+            values: 数据（缺失值忽略）
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(len(values))]))
+
+    def merge(self, other: 'TDigest'):
+        """合并另一个草图"""
+        if len(other.weights) == 0:
+            return
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]),
+                       np.concatenate([self.weights, other.weights]))
+
+    def quantile(self, q) -> np.ndarray:
+        """
+        估计分位数
+
+        Args:
+            q: 分位数（0~1），标量或数组
+
+        Returns:
+            ndarray: 分位数估计
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        if len(self.weights) == 0:
+            return np.full(len(q), np.nan)
+        # 每个质心的质量集中在其累计权重的中点，两端用最小/最大值
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.r_[0.0, centers, self.count]
+        values = np.r_[self.min, self.means, self.max]
+        return np.interp(q * self.count, positions, values)
+
+
+class SparseHistogram:
+    """
+    固定宽度分箱的稀疏直方图
+
+    分箱网格以 0 为起点、宽度固定，任意两个直方图都可以直接按箱号合并；
+    只存储非空的箱，因此取值范围不需要预先知道。
+    """
+
+    def __init__(self, width: float):
+        """
+        初始化
+
+        Args:
+            width: 箱宽
+        """
+        self.width = width
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def _add(self, keys: np.ndarray, counts: np.ndarray):
+        keys = np.concatenate([self.keys, keys])
+        counts = np.concatenate([self.counts, counts])
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=counts, minlength=len(self.keys)).astype(np.int64)
+
+    def update(self, values: np.ndarray):
+        """加入一批数据（缺失值忽略）"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        keys, counts = np.unique(np.floor(values / self.width).astype(np.int64), return_counts=True)
+        self._add(keys, counts)
+
+    def merge(self, other: 'SparseHistogram'):
+        """合并另一个直方图（箱宽必须相同）"""
+        if other.width != self.width:
+            raise ValueError("箱宽不同的直方图不能合并")
+        self._add(other.keys, other.counts)
+
+    @property
+    def centers(self) -> np.ndarray:
+        return (self.keys + 0.5) * self.width
+
+    def coarsen(self, vmin: float, vmax: float, nbins: int = 50) -> Dict:
+        """
+        合并为约 nbins 个整齐的分箱（结构与 aggregates.histogram 相同）
+
+        细箱按中心点归入粗箱；粗箱宽为细箱宽整数倍时结果精确。
+
+        Args:
+            vmin: 数据最小值
+            vmax: 数据最大值
+            nbins: 期望的分箱数
+
+        Returns:
+            dict: {'edges', 'counts', 'n'}
+        """
+        edges = nice_bin_edges(vmin, vmax, nbins)
+        step = edges[1] - edges[0]
+        index = np.clip(((self.centers - edges[0]) / step).astype(np.int64), 0, len(edges) - 2)
+        counts = np.bincount(index, weights=self.counts, minlength=len(edges) - 1).astype(np.int64)
+        return {'edges': edges, 'counts': counts, 'n': int(self.counts.sum())}
+
+
+class StreamingStats:
+    """可合并的全量统计聚合"""
+
+    def __init__(self,
+                 columns: List[str],
+                 numeric_columns: List[str],
+                 bin_widths: Dict[str, float],
+                 crosstab_columns: List[str],
+                 target_col: Optional[str] = 'cardio',
+                 compression: float = 200,
+                 density_views: Optional[Dict[str, DensityView]] = None,
+                 row_sample_size: int = 20000,
+                 seed: int = 0):
+        """
+        初始化空聚合
+
+        Args:
+            columns: 全部列
+            numeric_columns: 数值列（计算矩、直方图、分位数和相关性）
+            bin_widths: 数值列的直方图箱宽
+            crosstab_columns: 与目标列做交叉表的分类列
+            target_col: 目标列
+            compression: t-digest 压缩参数
+            density_views: 二维密度视图（空聚合，网格范围已确定）
+            row_sample_size: 完整行均匀抽样的行数（用于需要原始数据的秩检验等）
+            seed: 抽样的随机种子
+        """
+        self.columns = list(columns)
+        self.numeric_columns = list(numeric_columns)
+        self.bin_widths = dict(bin_widths)
+        self.crosstab_columns = list(crosstab_columns)
+        self.target_col = target_col
+        self.compression = compression
+
+        k = len(self.numeric_columns)
+        self.n_rows = 0
+        self.missing = {col: 0 for col in self.columns}
+        # Welford 矩（逐列，忽略缺失值）
+        self.count = np.zeros(k)
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+        # 相关性充分统计量（完整行）：样本数、均值向量和协矩阵
+        self.cov_n = 0
+        self.cov_mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+        self.histograms = {col: SparseHistogram(self.bin_widths[col]) for col in self.numeric_columns}
+        self.digests = {col: TDigest(compression) for col in self.numeric_columns}
+        # 交叉表计数：列名 -> {(取值, 目标值): 计数}；目标列自身的分布在 target_counts
+        self.crosstabs: Dict[str, Dict] = {col: {} for col in self.crosstab_columns}
+        self.target_counts: Dict = {}
+        self.density_views: Dict[str, DensityView] = dict(density_views or {})
+        # 数值列都不缺失的行的均匀抽样
+        self.row_sample = Reservoir(row_sample_size, n_fields=k, seed=seed)
+        # 每个空聚合的抽样使用不同的随机种子
+        self._n_empties = 0
+
+    @classmethod
+    def plan(cls, sample: pd.DataFrame, target_col: Optional[str] = 'cardio',
+             crosstab_columns: Optional[Sequence[str]] = None,
+             max_categories: int = 20, fine_bins: int = 2000,
+             compression: float = 200) -> 'StreamingStats':
+        """
+        根据首个数据块确定统计计划（数值列、箱宽、交叉表列）
+
+        Args:
+            sample: 首个数据块
+            target_col: 目标列
+            crosstab_columns: 交叉表列，None 表示取值不超过 max_categories 个的数值列
+            max_categories: 自动选择交叉表列时的最大取值数
+            fine_bins: 细分箱数（按样本取值范围确定箱宽）
+            compression: t-digest 压缩参数
+
+        Returns:
+            StreamingStats: 空聚合
+        """
+        numeric_columns = [c for c in sample.columns if pd.api.types.is_numeric_dtype(sample[c])]
+
+        bin_widths = {}
+        for col in numeric_columns:
+            values = sample[col].to_numpy(dtype=np.float64)
+            values = values[np.isfinite(values)]
+            span = float(values.max() - values.min()) if len(values) else 0.0
+            width = nice_step(span / fine_bins) if span > 0 else 1.0
+            # 整数列箱宽不小于 1，保证每个整数取值落在单独的箱中
+            if pd.api.types.is_integer_dtype(sample[col]):
+                width = max(width, 1.0)
+            bin_widths[col] = width
+
+        if target_col not in sample.columns:
+            target_col = None
+        if crosstab_columns is None:
+            crosstab_columns = [c for c in numeric_columns
+                                if c != target_col and sample[c].nunique() <= max_categories]
+        crosstab_columns = [c for c in crosstab_columns if c in sample.columns] if target_col else []
+
+        density_views = {}
+        for name in DENSITY_VIEWS:
+            view = DensityView.plan(name, sample)
+            if view is not None:
+                density_views[name] = view
+
+        return cls(list(sample.columns), numeric_columns, bin_widths, crosstab_columns,
+                   target_col, compression, density_views)
+
+    def empty_like(self) -> 'StreamingStats':
+        """创建计划相同的空聚合"""
+        self._n_empties += 1
+        density_views = {name: view.empty_like(seed=self._n_empties)
+                         for name, view in self.density_views.items()}
+        return StreamingStats(self.columns, self.numeric_columns, self.bin_widths,
+                              self.crosstab_columns, self.target_col, self.compression,
+                              density_views, self.row_sample.size, seed=self._n_empties)
+
+    def _merge_moments(self, count, mean, m2, vmin, vmax):
+        """按 Chan 等人的并行公式合并矩"""
+        total = self.count + count
+        delta = mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = np.where(total > 0, count / total, 0.0)
+        self.mean = self.mean + delta * ratio
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * ratio
+        self.count = total
+        self.min = np.minimum(self.min, vmin)
+        self.max = np.maximum(self.max, vmax)
+
+    def _merge_comoment(self, n, mean, comoment):
+        total = self.cov_n + n
+        if total == 0:
+            return
+        delta = mean - self.cov_mean
+        self.comoment = self.comoment + comoment + np.outer(delta, delta) * self.cov_n * n / total
+        self.cov_mean = self.cov_mean + delta * n / total
+        self.cov_n = total
+
+    @staticmethod
+    def _merge_counts(target: Dict, source: Dict):
+        for key, value in source.items():
+            target[key] = target.get(key, 0) + value
+
+    def update(self, chunk: pd.DataFrame) -> 'StreamingStats':
+        """
+        加入一个数据块
+
+        Args:
+            chunk: 数据块
+
+        Returns:
+            self
+        """
+        self.n_rows += len(chunk)
+        for col in self.columns:
+            if col in chunk.columns:
+                self.missing[col] += int(chunk[col].isnull().sum())
+
+        X = chunk[self.numeric_columns].to_numpy(dtype=np.float64)
+        finite = np.isfinite(X)
+
+        # 块内矩（逐列忽略缺失值），再与已有结果合并
+        count = finite.sum(axis=0).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            filled = np.where(finite, X, 0.0)
+            mean = np.where(count > 0, filled.sum(axis=0) / count, 0.0)
+            m2 = (np.where(finite, X - mean, 0.0) ** 2).sum(axis=0)
+        vmin = np.where(finite, X, np.inf).min(axis=0) if len(X) else np.full(X.shape[1], np.inf)
+        vmax = np.where(finite, X, -np.inf).max(axis=0) if len(X) else np.full(X.shape[1], -np.inf)
+        self._merge_moments(count, mean, m2, vmin, vmax)
+
+        # 协矩阵只使用所有数值列都不缺失的行
+        complete = X[finite.all(axis=1)]
+        if len(complete):
+            block_mean = complete.mean(axis=0)
+            centered = complete - block_mean
+            self._merge_comoment(len(complete), block_mean, centered.T @ centered)
+
+        for j, col in enumerate(self.numeric_columns):
+            self.histograms[col].update(X[:, j])
+            self.digests[col].update(X[:, j])
+
+        if self.target_col:
+            counts = chunk[self.target_col].value_counts()
+            self._merge_counts(self.target_counts, {_key(k): int(v) for k, v in counts.items()})
+            for col in self.crosstab_columns:
+                counts = chunk[[col, self.target_col]].value_counts()
+                self._merge_counts(self.crosstabs[col],
+                                   {(_key(a), _key(b)): int(v) for (a, b), v in counts.items()})
+
+        for view in self.density_views.values():
+            view.update(chunk, self.target_col)
+        self.row_sample.update(X)
+
+        return self
+
+    def merge(self, other: 'StreamingStats') -> 'StreamingStats':
+        """
+        合并另一个聚合（计划必须相同）
+
+        Args:
+            other: 另一个聚合
+
+        Returns:
+            self
+        """
+        self.n_rows += other.n_rows
+        self._merge_counts(self.missing, other.missing)
+        self._merge_moments(other.count, other.mean, other.m2, other.min, other.max)
+        self._merge_comoment(other.cov_n, other.cov_mean, other.comoment)
+        for col in self.numeric_columns:
+            self.histograms[col].merge(other.histograms[col])
+            self.digests[col].merge(other.digests[col])
+        self._merge_counts(self.target_counts, other.target_counts)
+        for col in self.crosstab_columns:
+            self._merge_counts(self.crosstabs[col], other.crosstabs[col])
+        for name, view in self.density_views.items():
+            view.merge(other.density_views[name])
+        self.row_sample.merge(other.row_sample)
+        return self
+
+    # ---- 由聚合结果导出报告所需的统计量 ----
+
+    def _index(self, col: str) -> int:
+        return self.numeric_columns.index(col)
+
+    def describe(self) -> pd.DataFrame:
+        """与 DataFrame.describe() 结构相同的统计表（分位数为 t-digest 估计）"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std = np.sqrt(np.where(self.count > 1, self.m2 / (self.count - 1), np.nan))
+        quartiles = np.vstack([self.digests[col].quantile([0.25, 0.5, 0.75]) for col in self.numeric_columns])
+        return pd.DataFrame(
+            [self.count, self.mean, std, self.min, quartiles[:, 0], quartiles[:, 1], quartiles[:, 2], self.max],
+            index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'],
+            columns=self.numeric_columns
+        )
+
+    def correlation(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        由协矩阵计算 Pearson 相关系数矩阵
+
+        Args:
+            columns: 列（None 表示全部数值列）
+
+        Returns:
+            DataFrame: 相关系数矩阵
+        """
+        columns = columns or self.numeric_columns
+        idx = [self._index(c) for c in columns]
+        comoment = self.comoment[np.ix_(idx, idx)]
+        scale = np.sqrt(np.diag(comoment))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = comoment / np.outer(scale, scale)
+        return pd.DataFrame(corr, index=columns, columns=columns)
+
+    def crosstab(self, col: str, normalize: Optional[str] = None) -> pd.DataFrame:
+        """
+        交叉表（行为列取值，列为目标值）
+
+        Args:
+            col: 分类列
+            normalize: 'index' 表示按行归一化，None 表示计数
+
+        Returns:
+            DataFrame: 交叉表
+        """
+        counts = pd.Series(self.crosstabs[col], dtype=np.int64)
+        if counts.empty:
+            return pd.DataFrame()
+        table = counts.unstack(fill_value=0).sort_index().sort_index(axis=1)
+        if normalize == 'index':
+            table = table.div(table.sum(axis=1), axis=0)
+        return table
+
+    def histogram(self, col: str, nbins: int = 50) -> Dict:
+        """直方图（结构与 aggregates.histogram 相同）"""
+        j = self._index(col)
+        if self.count[j] == 0:
+            return {'edges': np.array([0.0, 1.0]), 'counts': np.zeros(1, dtype=np.int64), 'n': 0}
+        return self.histograms[col].coarsen(self.min[j], self.max[j], nbins)
+
+    def box_stats(self, col: str, max_outliers: int = 200, whisker: float = 1.5) -> Dict:
+        """
+        箱线图统计量（结构与 aggregates.box_stats 相同）
+
+        四分位数来自 t-digest；须端点和异常值由细分箱直方图得到，
+        精度为一个箱宽，异常值以非空箱的中心点表示（保留最小、最大值）。
+
+        Args:
+            col: 数值列
+            max_outliers: 最多保留的异常值个数
+            whisker: 须长度（IQR 倍数）
+
+        Returns:
+            dict: 箱线图统计量
+        """
+        j = self._index(col)
+        q1, median, q3 = self.digests[col].quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        low_limit = q1 - whisker * iqr
+        high_limit = q3 + whisker * iqr
+
+        hist = self.histograms[col]
+        centers = np.clip(hist.centers, self.min[j], self.max[j])
+        inside = (centers >= low_limit) & (centers <= high_limit)
+        outlier_values = centers[~inside]
+        if len(outlier_values) > max_outliers:
+            # 均匀取点，并保留两端
+            keep = np.unique(np.r_[np.linspace(0, len(outlier_values) - 1, max_outliers).astype(np.int64)])
+            outlier_values = outlier_values[keep]
+
+        return {
+            'q1': float(q1),
+            'median': float(median),
+            'q3': float(q3),
+            'lowerfence': float(centers[inside].min()) if inside.any() else float(q1),
+            'upperfence': float(centers[inside].max()) if inside.any() else float(q3),
+            'mean': float(self.mean[j]),
+            'sd': float(np.sqrt(self.m2[j] / self.count[j])) if self.count[j] else np.nan,
+            'n': int(self.count[j]),
+            'n_outliers': int(hist.counts[~inside].sum()),
+            'outliers': outlier_values
+        }
+
+    def category_counts(self, categories: Optional[Sequence] = None) -> Dict:
+        """目标列计数（结构与 aggregates.category_counts 相同）"""
+        if categories is None:
+            categories = sorted(self.target_counts)
+        categories = list(categories)
+        return {'categories': categories,
+                'counts': np.array([self.target_counts.get(c, 0) for c in categories], dtype=np.int64)}
+
+    def sampled_columns(self) -> Dict[str, np.ndarray]:
+        """完整行均匀抽样的各数值列（列名 -> 数组）"""
+        return {col: self.row_sample.rows[:, j].astype(np.float64) for j, col in enumerate(self.numeric_columns)}
+
+
+def _map_chunk(empty: StreamingStats, chunk: pd.DataFrame) -> StreamingStats:
+    """工作进程入口：计算一个数据块的部分聚合"""
+    return empty.update(chunk)
+
+
+def compute_streaming_stats(data_path: str,
+                            chunk_size: int = 200000,
+                            max_workers: Optional[int] = None,
+                            target_col: Optional[str] = 'cardio',
+                            crosstab_columns: Optional[Sequence[str]] = None,
+                            stats: Optional[StreamingStats] = None,
+                            chunks: Optional[Iterable[pd.DataFrame]] = None) -> StreamingStats:
+    """
+    并行 map-reduce 计算全量统计
+
+    主进程分块读取，工作进程计算每块的部分聚合，主进程逐个合并。
+    同时在途的数据块不超过 2 × 进程数，内存占用只与分块大小有关。
+
+    Args:
+        data_path: 数据文件路径（.csv 或 .parquet）
+        chunk_size: 每块行数
+        max_workers: 进程数，None 表示 CPU 核数，1 表示在当前进程中计算
+        target_col: 目标列
+        crosstab_columns: 交叉表列，None 表示自动选择低基数列
+        stats: 已有聚合，新数据块合并到其中；None 表示由首个数据块确定统计计划
+        chunks: 数据块迭代器，None 表示分块读取 data_path 的全部数据
+
+    Returns:
+        StreamingStats: 合并后的聚合
+    """
+    chunks = iter(chunks if chunks is not None else iter_data_chunks(data_path, chunk_size))
+    first = next(chunks, None)
+    if first is None:
+        if stats is None:
+            raise ValueError("数据为空")
+        return stats
+    if stats is None:
+        stats = StreamingStats.plan(first, target_col, crosstab_columns)
+    chunks = chain([first], chunks)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        for chunk in chunks:
+            stats.merge(stats.empty_like().update(chunk))
+        return stats
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for chunk in chunks:
+            pending.add(executor.submit(_map_chunk, stats.empty_like(), chunk))
+            if len(pending) >= 2 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stats.merge(future.result())
+        for future in pending:
+            stats.merge(future.result())
+
+    return stats
@@ -7,6 +7,7 @@ from flask import Flask, request, jsonify, send_from_directory, send_file
 from flask_cors import CORS
 import os
 import sys
+import time
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -16,6 +17,11 @@ from audio.deepseek_client import DeepSeekClient
 from audio.cosyvoice_client import CosyVoiceClient
 from utils.config import Config
 from utils.logger import setup_logger
+from utils.metrics import latency_metrics
+from utils.http_transport import get_transport
+from utils.job_queue import QueueFullError, get_job_queue
+from audio.answer_cache import normalize_question
+from api.sse import job_events, sse_event, sse_response, token_events
 
 logger = setup_logger('api')
 
@@ -48,6 +54,9 @@ def create_app():
         token=config.COSYVOICE_TOKEN
     )
     
+    # 语音问答的后台任务队列
+    voice_jobs = get_job_queue('voice')
+    
     @app.route('/')
     def index():
         """首页"""
@@ -57,9 +66,13 @@ def create_app():
             'endpoints': {
                 'predict': '/api/predict',
                 'chat': '/api/chat',
+                'chat_stream': '/api/chat/stream',
                 'voice': '/api/voice',
+                'job': '/api/jobs/<job_id>',
                 'model_info': '/api/model/info',
-                'health_advice': '/api/health/advice'
+                'health_advice': '/api/health/advice',
+                'health_advice_stream': '/api/health/advice/stream',
+                'metrics': '/api/metrics'
             }
         })
     
@@ -115,50 +128,100 @@ def create_app():
             logger.error(f"问答接口错误: {e}")
             return jsonify({'error': str(e)}), 500
     
+    @app.route('/api/chat/stream', methods=['GET', 'POST'])
+    def chat_stream():
+        """
+        流式文本问答接口（Server-Sent Events）
+        事件: token {"text"}、done {"text", "ttft_ms", "total_ms"}、error {"error"}
+        """
+        data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+        question = data.get('question', '')
+        
+        if not question:
+            return jsonify({'error': '请提供问题'}), 400
+        
+        logger.info(f"流式问答: {question[:50]}...")
+        return sse_response(token_events(deepseek_client.stream_question(question), 'chat'))
+    
+    def answer_voice(question):
+        """生成文本答案和语音（后台任务函数）"""
+        # 1. 使用 DeepSeek 生成文本答案
+        answer = deepseek_client.ask_question(question)
+        
+        # 2. 使用 CosyVoice 生成语音
+        audio_path = cosyvoice_client.text_to_speech(answer)
+        
+        if audio_path is None:
+            logger.warning("语音合成失败，仅返回文本")
+            return {
+                'success': True,
+                'question': question,
+                'answer': answer,
+                'audio_url': None
+            }
+        
+        # 生成音频访问URL
+        audio_filename = os.path.basename(audio_path)
+        logger.info(f"语音问答成功: {question[:50]}...")
+        return {
+            'success': True,
+            'question': question,
+            'answer': answer,
+            'audio_url': f'/api/audio/{audio_filename}'
+        }
+    
     @app.route('/api/voice', methods=['POST'])
     def voice():
         """
         语音问答接口
-        接收问题，返回文本答案和语音文件
+        接收问题，提交后台任务并立即返回任务 ID（202）；相同问题正在处理时合并到同一个任务。
+        通过 /api/jobs/<job_id> 轮询或 /api/jobs/<job_id>/events 订阅（SSE）获取文本答案和语音文件。
+        请求体中 "wait": true 时等待任务完成后直接返回结果；队列已满时返回 503。
         """
         try:
-            data = request.get_json()
+            data = request.get_json(silent=True) or {}
             question = data.get('question', '')
             
             if not question:
                 return jsonify({'error': '请提供问题'}), 400
             
-            # 1. 使用 DeepSeek 生成文本答案
-            answer = deepseek_client.ask_question(question)
-            
-            # 2. 使用 CosyVoice 生成语音
-            audio_path = cosyvoice_client.text_to_speech(answer)
+            try:
+                job, coalesced = voice_jobs.submit(f'voice:{normalize_question(question)}', answer_voice, question)
+            except QueueFullError as e:
+                logger.warning(str(e))
+                return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
             
-            if audio_path is None:
-                logger.warning("语音合成失败，仅返回文本")
-                return jsonify({
-                    'success': True,
-                    'question': question,
-                    'answer': answer,
-                    'audio_url': None
-                })
+            if not data.get('wait'):
+                return jsonify(voice_jobs.accepted(job, coalesced, '/api/jobs')), 202
             
-            # 生成音频访问URL
-            audio_filename = os.path.basename(audio_path)
-            audio_url = f'/api/audio/{audio_filename}'
-            
-            logger.info(f"语音问答成功: {question[:50]}...")
-            return jsonify({
-                'success': True,
-                'question': question,
-                'answer': answer,
-                'audio_url': audio_url
-            })
+            snapshot = voice_jobs.result(job.id)
+            if snapshot['status'] == 'done':
+                return jsonify(snapshot['result'])
+            return jsonify({'error': snapshot.get('error')}), 500
             
         except Exception as e:
             logger.error(f"语音问答接口错误: {e}")
             return jsonify({'error': str(e)}), 500
     
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        """
+        任务状态
+        返回 {"job_id", "status": "queued|running|done|failed", "position", "result", "error"}
+        """
+        snapshot = voice_jobs.get(job_id)
+        if snapshot is None:
+            return jsonify({'error': '任务不存在或已过期'}), 404
+        return jsonify(dict(snapshot, success=True))
+    
+    @app.route('/api/jobs/<job_id>/events', methods=['GET'])
+    def job_status_events(job_id):
+        """
+        订阅任务状态（Server-Sent Events）
+        事件: status（排队、开始执行）、done {"result"}、error {"error"}
+        """
+        return sse_response(job_events(voice_jobs, job_id))
+    
     @app.route('/api/health/advice', methods=['POST'])
     def health_advice():
         """
@@ -192,6 +255,42 @@ def create_app():
             logger.error(f"健康建议接口错误: {e}")
             return jsonify({'error': str(e)}), 500
     
+    @app.route('/api/health/advice/stream', methods=['POST'])
+    def health_advice_stream():
+        """
+        流式健康建议接口（Server-Sent Events）
+        先推送 prediction 事件（预测结果），再逐段推送建议文本（事件同 /api/chat/stream）
+        """
+        data = request.get_json(silent=True) or {}
+        user_data = data.get('user_data', {})
+        
+        if not user_data:
+            return jsonify({'error': '请提供用户数据'}), 400
+        
+        try:
+            prediction_result = predictor.predict(user_data)
+        except Exception as e:
+            logger.error(f"健康建议接口错误: {e}")
+            return jsonify({'error': str(e)}), 500
+        
+        def events():
+            start = time.perf_counter()
+            yield sse_event('prediction', prediction_result)
+            tokens = deepseek_client.stream_health_advice(user_data, prediction_result)
+            yield from token_events(tokens, 'health_advice', start=start)
+        
+        return sse_response(events())
+    
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics():
+        """延迟指标（首字延迟 <接口>.ttft、总耗时 <接口>.total、任务排队和执行耗时 jobs.voice.*）、外部调用的重试和熔断状态、任务队列"""
+        return jsonify({
+            'success': True,
+            'latency': latency_metrics.snapshot(),
+            'transport': get_transport().stats(),
+            'jobs': voice_jobs.stats()
+        })
+    
     @app.route('/api/model/info', methods=['GET'])
     def model_info():
         """获取模型信息"""
@@ -0,0 +1,238 @@
+"""
+ASGI 应用
+语音问答接口由 asyncio 实现（AsyncQAudioSystem）直接在事件循环中处理，等待 LLM / TTS 时不占用线程；
+其余路径（/predict、分析接口、静态文件等）交给原 Flask 应用，在独立的线程池中执行，
+不会被进行中的语音问答占满
+"""
+
+import asyncio
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.middleware.cors import CORSMiddleware
+    from starlette.responses import FileResponse, JSONResponse, StreamingResponse
+    from starlette.routing import Mount, Route
+except ImportError:
+    Starlette = None
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    WSGIMiddleware = None
+
+from utils.logger import setup_logger
+from utils.metrics import latency_metrics
+from utils.http_transport import get_async_transport, get_transport
+from utils.job_queue import DONE, FAILED, QueueFullError, get_job_queue
+from api.sse import async_job_events, async_pipeline_events, async_token_events
+
+# 设置日志
+logger = setup_logger('api', log_dir='./logs')
+
+# 流式响应头：禁用缓存和反向代理缓冲
+STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+# 在事件循环中等待后台任务时查询状态的间隔（秒）
+JOB_POLL_INTERVAL = 0.2
+
+
+async def read_params(request) -> dict:
+    """POST 请求体（JSON，解析失败时为空）或 GET 参数"""
+    if request.method != 'POST':
+        return dict(request.query_params)
+    try:
+        data = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def error_response(error: str, status_code: int) -> 'JSONResponse':
+    return JSONResponse({'success': False, 'error': error}, status_code=status_code)
+
+
+async def qa_audio(request):
+    """
+    语音问答接口（后台任务，请求和返回同 Flask 版本的 /qa_audio）
+
+    任务作为协程在事件循环中执行，不占用线程，同时执行的问答数为 JOB_ASYNC_WORKERS；
+    wait 为 true 时在事件循环中等待任务结束。
+    """
+    from audio.qa_audio_async import get_async_qa_system
+    from api.predict_api import qa_job_key, qa_job_result
+
+    try:
+        data = await read_params(request)
+        question = data.get('question')
+        if not isinstance(question, str):
+            logger.warning("请求数据缺少 question 字段")
+            return error_response('请提供问题（question 字段）', 400)
+        question = question.strip()
+        if not question:
+            return error_response('问题不能为空', 400)
+
+        pipelined = bool(data.get('pipeline'))
+        system = get_async_qa_system()
+
+        async def run():
+            return qa_job_result(await system.qa_pipeline(question, pipelined))
+
+        jobs = get_job_queue('qa_audio')
+        try:
+            job, coalesced = jobs.submit_coroutine(qa_job_key(question, pipelined), run)
+        except QueueFullError as e:
+            logger.warning(str(e))
+            return JSONResponse({'success': False, 'error': str(e)}, status_code=503, headers={'Retry-After': '5'})
+
+        logger.info(f"收到语音问答请求: {question[:50]}...（任务 {job.id}{'，已合并' if coalesced else ''}）")
+
+        if not data.get('wait'):
+            return JSONResponse(jobs.accepted(job, coalesced, '/qa_audio/jobs'), status_code=202)
+
+        while True:
+            snapshot = jobs.get(job.id)
+            if snapshot['status'] in (DONE, FAILED):
+                break
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+        if snapshot['status'] == DONE:
+            logger.info("语音问答成功")
+            return JSONResponse(snapshot['result'])
+        logger.error(f"语音问答失败: {snapshot.get('error')}")
+        return error_response(snapshot.get('error', '处理失败'), 500)
+
+    except Exception as e:
+        logger.error(f"语音问答接口错误: {e}", exc_info=True)
+        return error_response(f'服务器错误: {str(e)}', 500)
+
+
+async def qa_audio_job_events(request):
+    """订阅语音问答任务状态（SSE，事件同 Flask 版本的 /qa_audio/jobs/<job_id>/events）"""
+    events = async_job_events(get_job_queue('qa_audio'), request.path_params['job_id'], interval=JOB_POLL_INTERVAL)
+    return StreamingResponse(events, media_type='text/event-stream', headers=STREAM_HEADERS)
+
+
+async def qa_audio_stream(request):
+    """流式语音问答（SSE，事件同 Flask 版本的 /qa_audio/stream）"""
+    from audio.qa_audio_async import get_async_qa_system
+
+    data = await read_params(request)
+    question = (data.get('question') or '').strip()
+    if not question:
+        return error_response('请提供问题（question 字段）', 400)
+
+    logger.info(f"收到流式语音问答请求: {question[:50]}...")
+    system = get_async_qa_system()
+
+    async def synthesize(answer):
+        audio_url = system.speech_url(answer) if answer else None
+        if audio_url:
+            return {'audio_url': audio_url}
+        return {'audio_url': None, 'warning': '语音合成失败，仅返回文本'}
+
+    return StreamingResponse(async_token_events(system.stream_answer(question), 'qa_audio', synthesize),
+                             media_type='text/event-stream', headers=STREAM_HEADERS)
+
+
+async def qa_audio_pipeline(request):
+    """流水线语音问答（SSE，事件同 Flask 版本的 /qa_audio/pipeline）"""
+    from audio.qa_audio_async import get_async_qa_system
+
+    data = await read_params(request)
+    question = (data.get('question') or '').strip()
+    if not question:
+        return error_response('请提供问题（question 字段）', 400)
+
+    logger.info(f"收到流水线语音问答请求: {question[:50]}...")
+    events = get_async_qa_system().stream_pipeline(question)
+    return StreamingResponse(async_pipeline_events(events, 'qa_pipeline'),
+                             media_type='text/event-stream', headers=STREAM_HEADERS)
+
+
+async def qa_audio_speech(request):
+    """流式语音合成（参数和返回同 Flask 版本的 /qa_audio/speech）"""
+    from audio.qa_audio_async import get_async_qa_system
+    system = get_async_qa_system()
+
+    key = request.path_params.get('key')
+    if key is None:
+        data = await read_params(request)
+        text = (data.get('text') or '').strip()
+        if not text:
+            return error_response('请提供要合成的文本（text 字段）', 400)
+        key = system.shared.tts_key(text)
+    else:
+        text = system.speech_text(key)
+
+    if system.tts_cache.lookup(key):
+        return FileResponse(system.tts_cache.path(key), media_type='audio/wav')
+    if not text:
+        return error_response('音频不存在或已过期', 404)
+
+    stream = await system.open_speech_stream(text)
+    if stream is None:
+        return error_response('语音合成不可用，请检查 COSYVOICE_APPKEY 配置', 503)
+
+    return StreamingResponse(system.speech_frames(stream), media_type='audio/wav', headers=STREAM_HEADERS)
+
+
+async def qa_audio_stats(request):
+    """语音问答统计（同 Flask 版本的 /qa_audio/stats，另含异步传输层的调用统计）"""
+    from audio.qa_audio_async import get_async_qa_system
+
+    system = get_async_qa_system()
+    return JSONResponse({
+        'success': True,
+        'answer_cache': system.answer_cache.stats(),
+        'tts_cache': system.tts_cache.stats(),
+        'latency': latency_metrics.snapshot(),
+        'transport': get_transport().stats(),
+        'async_transport': get_async_transport().stats(),
+        'hedging': {'llm': system.llm_hedger.stats(), 'tts': system.tts_hedger.stats()},
+        'jobs': get_job_queue('qa_audio').stats()
+    })
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """服务退出时关闭异步连接池"""
+    yield
+    await get_async_transport().aclose()
+
+
+def create_asgi_app(wsgi_workers: int = 10):
+    """
+    创建 ASGI 应用
+
+    Args:
+        wsgi_workers: 执行 Flask 请求（预测、分析等）的线程数
+
+    Returns:
+        Starlette: ASGI 应用
+    """
+    if Starlette is None or WSGIMiddleware is None:
+        raise ImportError("异步服务需要安装 starlette 和 a2wsgi: pip install starlette a2wsgi httpx aiofiles uvicorn")
+
+    from api.predict_api import create_app
+    flask_app = create_app()
+
+    routes = [
+        Route('/qa_audio', qa_audio, methods=['POST']),
+        Route('/qa_audio/jobs/{job_id}/events', qa_audio_job_events),
+        Route('/qa_audio/stream', qa_audio_stream, methods=['GET', 'POST']),
+        Route('/qa_audio/pipeline', qa_audio_pipeline, methods=['GET', 'POST']),
+        Route('/qa_audio/speech', qa_audio_speech, methods=['GET', 'POST']),
+        Route('/qa_audio/speech/{key}.wav', qa_audio_speech),
+        Route('/qa_audio/stats', qa_audio_stats),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=wsgi_workers))
+    ]
+    # 与 Flask 应用的 CORS(app) 相同的宽松策略，覆盖原生路由（含 OPTIONS 预检）
+    middleware = [Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])]
+    return Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
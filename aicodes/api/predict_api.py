@@ -3,18 +3,26 @@ Flask 预测 API
 提供心血管疾病预测接口
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, abort, request, jsonify, send_from_directory, stream_with_context
+from werkzeug.utils import safe_join
 from flask_cors import CORS
 import joblib
 import numpy as np
 import pandas as pd
+import mimetypes
+import json
 import os
+import re
 import sys
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.logger import setup_logger
+from utils.metrics import latency_metrics
+from utils.http_transport import get_transport
+from api.sse import job_events, pipeline_events, sse_response, token_events
+from model.preprocessing import encode_category
 
 # 设置日志
 logger = setup_logger('api', log_dir='./logs')
@@ -27,11 +35,14 @@ CORS(app)  # 允许跨域请求
 model = None
 scaler = None
 feature_names = None
+category_mapping = {}
+cube = None
+samples = None
 
 
 def load_model():
     """加载模型和预处理器"""
-    global model, scaler, feature_names
+    global model, scaler, feature_names, category_mapping
     
     try:
         model_dir = './model'
@@ -51,6 +62,14 @@ def load_model():
         feature_names = joblib.load(features_path)
         logger.info(f"特征名加载成功，共 {len(feature_names)} 个特征")
         
+        # 加载类别映射（原生分类模型才有）
+        mapping_path = os.path.join(model_dir, 'category_mapping.pkl')
+        if os.path.exists(mapping_path):
+            category_mapping = joblib.load(mapping_path)
+            logger.info(f"类别映射加载成功: {list(category_mapping)}")
+        else:
+            category_mapping = {}
+        
         return True
         
     except Exception as e:
@@ -58,6 +77,116 @@ def load_model():
         return False
 
 
+def load_cube():
+    """加载分组立方体（由 scripts/build_cube.py 生成），不存在时返回 None"""
+    global cube
+    
+    if cube is None:
+        from utils.config import Config
+        cube_path = os.path.join(Config().ANALYSIS_STORE_DIR, 'cube.npz')
+        if os.path.exists(cube_path):
+            from analysis.cube import DataCube
+            cube = DataCube.load(cube_path)
+            logger.info(f"分组立方体加载成功: {cube_path}（{cube.n_rows} 行）")
+    return cube
+
+
+def load_samples():
+    """加载分层样本（由 scripts/build_samples.py 生成），不存在时返回 None"""
+    global samples
+    
+    if samples is None:
+        from utils.config import Config
+        samples_path = os.path.join(Config().ANALYSIS_STORE_DIR, 'samples.npz')
+        if os.path.exists(samples_path):
+            from analysis.sampling import StratifiedSamples
+            samples = StratifiedSamples.load(samples_path)
+            logger.info(f"分层样本加载成功: {samples_path}（{len(samples.sizes)} 级）")
+    return samples
+
+
+# /analysis/query 和 /analysis/chart 中不属于维度过滤的参数
+QUERY_PARAMS = ('group_by', 'measures', 'level', 'refine', 'max_ci', 'title')
+
+# /analysis/<path> 只提供报告外壳、章节数据和 Plotly 及其 gzip 预压缩版本，目录中的其他文件一律 404
+ANALYSIS_FILES = re.compile(r'(report\.html|report_data/[\w-]+\.json|report_data/plotly-[\w.-]+\.min\.js)(\.gz)?')
+
+
+def parse_query_args():
+    """
+    解析分组查询参数（GET 参数或 POST 请求体）
+    
+    Returns:
+        tuple: (filters, group_by, measures, options)，options 为 level / refine / max_ci / title
+    """
+    if request.method == 'POST':
+        data = request.get_json() or {}
+        filters = data.get('filters') or {}
+        group_by = data.get('group_by') or []
+        measures = data.get('measures')
+        options = {key: data.get(key) for key in QUERY_PARAMS[2:]}
+    else:
+        args = request.args
+        group_by = [g for g in args.get('group_by', '').split(',') if g]
+        measures = [m for m in args['measures'].split(',') if m] if 'measures' in args else None
+        filters = {dim: args[dim].split(',') for dim in args if dim not in QUERY_PARAMS}
+        options = {key: args.get(key) for key in QUERY_PARAMS[2:]}
+    options['refine'] = str(options['refine']).lower() in ('1', 'true', 'yes')
+    if options['max_ci'] is not None:
+        try:
+            options['max_ci'] = float(options['max_ci'])
+        except (TypeError, ValueError):
+            raise ValueError(f"max_ci 必须是数值: {options['max_ci']}")
+    return filters, group_by, measures, options
+
+
+def run_query(filters, group_by, measures, level=None, refine=False, max_ci=None, **kwargs):
+    """
+    由分层样本或立方体回答分组查询
+    
+    级别依次为 0, 1, ...（样本从小到大）和 'full'（立方体上的精确结果）。
+    未指定级别时有立方体则用 'full'，否则用最小样本；refine 表示升到下一级；
+    max_ci 表示患病率置信区间半宽超过该值时自动逐级细化。
+    
+    Returns:
+        dict: 查询结果，附 'level' 和 'next_level'（已是最高级别时为 None）
+    """
+    from analysis.sampling import widest_rate_ci
+    
+    levels = list(range(len(samples.sizes))) if load_samples() is not None else []
+    if load_cube() is not None:
+        levels.append('full')
+    if not levels:
+        raise LookupError('立方体和分层样本均未生成，请先运行 scripts/build_cube.py 或 scripts/build_samples.py')
+    
+    if level is None or level == '':
+        level = levels[0] if max_ci is not None or 'full' not in levels else 'full'
+    elif str(level) != 'full':
+        try:
+            level = int(level)
+        except ValueError:
+            raise ValueError(f"level 必须是样本级别序号或 full: {level}")
+    else:
+        level = 'full'
+    if level not in levels:
+        raise ValueError(f"级别 {level} 不可用，可选: {levels}")
+    
+    position = levels.index(level)
+    if refine:
+        position = min(position + 1, len(levels) - 1)
+    while True:
+        level = levels[position]
+        if level == 'full':
+            result = {**cube.query(filters, group_by, measures), 'level': 'full', 'exact': True}
+        else:
+            result = samples.query(filters, group_by, measures, level=level)
+        if max_ci is None or position == len(levels) - 1 or widest_rate_ci(result) <= max_ci:
+            break
+        position += 1
+    result['next_level'] = levels[position + 1] if position + 1 < len(levels) else None
+    return result
+
+
 @app.route('/')
 def home():
     """系统首页"""
@@ -75,7 +204,15 @@ def api_info():
             'predict': '/predict',
             'health': '/health',
             'features': '/features',
-            'qa_audio': '/qa_audio'
+            'qa_audio': '/qa_audio',
+            'qa_audio_job': '/qa_audio/jobs/<job_id>',
+            'qa_audio_stream': '/qa_audio/stream',
+            'qa_audio_pipeline': '/qa_audio/pipeline',
+            'qa_audio_speech': '/qa_audio/speech',
+            'qa_audio_stats': '/qa_audio/stats',
+            'analysis_cube': '/analysis/cube',
+            'analysis_query': '/analysis/query',
+            'analysis_chart': '/analysis/chart'
         }
     })
 
@@ -176,7 +313,11 @@ def predict():
                     'success': False,
                     'error': f'特征 {feature} 不能为空'
                 }), 400
-            features.append(float(value))
+            if feature in category_mapping:
+                # 原生分类特征按训练时的类别映射编码，未知取值视为缺失
+                features.append(encode_category(value, category_mapping[feature]))
+            else:
+                features.append(float(value))
         
         # 转换为 numpy 数组
         X = np.array([features])
@@ -222,26 +363,83 @@ def predict():
         }), 500
 
 
+def qa_job_key(question: str, pipelined: bool) -> str:
+    """语音问答任务的合并键：规范化问题（忽略标点、空白、全角/半角）和模式"""
+    from audio.answer_cache import normalize_question
+    return f"{'pipeline' if pipelined else 'full'}:{normalize_question(question)}"
+
+
+def qa_job_result(result: dict) -> dict:
+    """
+    将 qa_pipeline 的结果转换为接口返回值
+    
+    Args:
+        result: qa_pipeline 的返回值
+        
+    Returns:
+        dict: {'success', 'text', 'audio_url', 'segments'（流水线模式）, 'warning'（语音合成失败时）}；
+              问答失败时抛出 RuntimeError（任务状态为 failed）
+    """
+    if not result['success']:
+        raise RuntimeError(result.get('error') or '处理失败')
+    response = {
+        'success': True,
+        'text': result['text'],
+        'audio_url': result['audio_url']
+    }
+    if 'segments' in result:
+        response['segments'] = result['segments']
+    if result.get('error'):
+        response['warning'] = result['error']
+    return response
+
+
+def run_qa_job(question: str, pipelined: bool) -> dict:
+    """后台执行语音问答（任务函数）"""
+    from audio.qa_audio import qa_pipeline
+    return qa_job_result(qa_pipeline(question, pipelined=pipelined))
+
+
 @app.route('/qa_audio', methods=['POST'])
 def qa_audio():
     """
-    语音问答接口
+    语音问答接口（后台任务）
+    
+    问题提交到有界任务队列后立即返回任务 ID，由工作线程执行问答；相同问题（规范化后相同且模式相同）
+    正在排队或执行时合并到同一个任务。通过 status_url 轮询或 events_url 订阅（SSE）获取结果。
     
     请求体:
     {
-        "question": "如何预防心血管疾病？"
+        "question": "如何预防心血管疾病？",
+        "pipeline": false,  // 可选，true 时边生成边按句合成，结果另含各句音频 segments
+        "wait": false       // 可选，true 时等待任务完成后直接返回结果（同步调用）
     }
     
-    返回:
+    返回（202）:
+    {
+        "success": true,
+        "job_id": "9f1c...",
+        "status": "queued",
+        "position": 1,
+        "coalesced": false,
+        "status_url": "/qa_audio/jobs/9f1c...",
+        "events_url": "/qa_audio/jobs/9f1c.../events"
+    }
+    
+    任务结果（status 为 done 时的 result，或 wait 为 true 时的返回值）:
     {
         "success": true,
         "text": "回答内容",
         "audio_url": "/static/audio/xxx.wav"
     }
+    
+    队列已满时返回 503（Retry-After 头）。
     """
+    from utils.job_queue import QueueFullError, get_job_queue
+    
     try:
         # 获取请求数据
-        data = request.get_json()
+        data = request.get_json(silent=True)
         
         if not data or 'question' not in data:
             logger.warning("请求数据缺少 question 字段")
@@ -258,32 +456,28 @@ def qa_audio():
                 'error': '问题不能为空'
             }), 400
         
-        logger.info(f"收到语音问答请求: {question[:50]}...")
+        pipelined = bool(data.get('pipeline'))
+        jobs = get_job_queue('qa_audio')
+        try:
+            job, coalesced = jobs.submit(qa_job_key(question, pipelined), run_qa_job, question, pipelined)
+        except QueueFullError as e:
+            logger.warning(str(e))
+            return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': '5'}
         
-        # 导入语音问答模块
-        from audio.qa_audio import qa_pipeline
+        logger.info(f"收到语音问答请求: {question[:50]}...（任务 {job.id}{'，已合并' if coalesced else ''}）")
         
-        # 执行问答流程
-        result = qa_pipeline(question)
+        if not data.get('wait'):
+            return jsonify(jobs.accepted(job, coalesced, '/qa_audio/jobs')), 202
         
-        if result['success']:
-            response = {
-                'success': True,
-                'text': result['text'],
-                'audio_url': result['audio_url']
-            }
-            
-            if result.get('error'):
-                response['warning'] = result['error']
-            
+        snapshot = jobs.result(job.id)
+        if snapshot['status'] == 'done':
             logger.info("语音问答成功")
-            return jsonify(response)
-        else:
-            logger.error(f"语音问答失败: {result.get('error')}")
-            return jsonify({
-                'success': False,
-                'error': result.get('error', '处理失败')
-            }), 500
+            return jsonify(snapshot['result'])
+        logger.error(f"语音问答失败: {snapshot.get('error')}")
+        return jsonify({
+            'success': False,
+            'error': snapshot.get('error', '处理失败')
+        }), 500
             
     except Exception as e:
         logger.error(f"语音问答接口错误: {e}", exc_info=True)
@@ -293,6 +487,176 @@ def qa_audio():
         }), 500
 
 
+@app.route('/qa_audio/jobs/<job_id>')
+def qa_audio_job(job_id):
+    """
+    语音问答任务状态
+    
+    返回:
+        {"job_id", "status": "queued|running|done|failed", "position"（排队时）, "result"（完成时）, "error"（失败时）}
+    """
+    from utils.job_queue import get_job_queue
+    
+    snapshot = get_job_queue('qa_audio').get(job_id)
+    if snapshot is None:
+        return jsonify({
+            'success': False,
+            'error': '任务不存在或已过期'
+        }), 404
+    return jsonify(dict(snapshot, success=True))
+
+
+@app.route('/qa_audio/jobs/<job_id>/events')
+def qa_audio_job_events(job_id):
+    """
+    订阅语音问答任务状态（Server-Sent Events）
+    
+    事件:
+        status: 任务状态（排队、开始执行时）
+        done: 任务状态，含结果 result
+        error: 任务失败或不存在
+    """
+    from utils.job_queue import get_job_queue
+    return sse_response(job_events(get_job_queue('qa_audio'), job_id))
+
+
+@app.route('/qa_audio/stream', methods=['GET', 'POST'])
+def qa_audio_stream():
+    """
+    流式语音问答（Server-Sent Events），LLM 生成的文本逐段推送，回答完成后返回音频 URL
+    （未缓存时为流式音频 URL，请求后边合成边播放）
+    
+    请求体（POST）或 GET 参数:
+    {
+        "question": "如何预防心血管疾病？"
+    }
+    
+    事件:
+        token: {"text": "增量文本"}
+        done: {"text": "完整回答", "audio_url": "/qa_audio/speech/xxx.wav", "ttft_ms": 420.5, "total_ms": 3100.2}
+        error: {"error": "错误信息"}
+    """
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    question = (data.get('question') or '').strip()
+    if not question:
+        return jsonify({
+            'success': False,
+            'error': '请提供问题（question 字段）'
+        }), 400
+    
+    logger.info(f"收到流式语音问答请求: {question[:50]}...")
+    
+    from audio.qa_audio import get_qa_system
+    system = get_qa_system()
+    
+    def synthesize(answer):
+        audio_url = system.speech_url(answer) if answer else None
+        if audio_url:
+            return {'audio_url': audio_url}
+        return {'audio_url': None, 'warning': '语音合成失败，仅返回文本'}
+    
+    return sse_response(token_events(system.stream_answer(question), 'qa_audio', synthesize))
+
+
+@app.route('/qa_audio/pipeline', methods=['GET', 'POST'])
+def qa_audio_pipeline():
+    """
+    流水线语音问答（Server-Sent Events）：文本逐段推送，每完成一句即并发合成，
+    各句音频按顺序就绪即推送，无需等待整段回答生成完毕
+    
+    请求体（POST）或 GET 参数:
+    {
+        "question": "如何预防心血管疾病？"
+    }
+    
+    事件:
+        token: {"text": "增量文本"}
+        audio: {"index": 0, "text": "第一句。", "audio_url": "/static/audio/tts/xxx.wav", "cached": false}
+        done: {"text": "完整回答", "audio_url": "整段音频 URL", "segments": 3, "ttft_ms": 420.5, "ttfa_ms": 1650.3, "total_ms": 3900.2}
+        error: {"error": "错误信息"}
+    """
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    question = (data.get('question') or '').strip()
+    if not question:
+        return jsonify({
+            'success': False,
+            'error': '请提供问题（question 字段）'
+        }), 400
+    
+    logger.info(f"收到流水线语音问答请求: {question[:50]}...")
+    
+    from audio.qa_audio import get_qa_system
+    return sse_response(pipeline_events(get_qa_system().stream_pipeline(question), 'qa_pipeline'))
+
+
+@app.route('/qa_audio/speech', methods=['GET', 'POST'])
+@app.route('/qa_audio/speech/<key>.wav')
+def qa_audio_speech(key=None):
+    """
+    流式语音合成：音频帧边合成边以分块传输返回，收到首包即可开始播放，完整音频同时写入缓存
+    
+    /qa_audio/speech/<key>.wav 用于 /qa_audio/stream 返回的音频 URL；
+    /qa_audio/speech 直接传入文本（POST 请求体或 GET 参数 text）。
+    已缓存的文本直接返回缓存文件。
+    
+    返回:
+        audio/wav（流式输出时 WAV 头中的长度为占位值）
+    """
+    from audio.qa_audio import get_qa_system
+    system = get_qa_system()
+    
+    if key is None:
+        data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+        text = (data.get('text') or '').strip()
+        if not text:
+            return jsonify({
+                'success': False,
+                'error': '请提供要合成的文本（text 字段）'
+            }), 400
+        key = system.tts_key(text)
+    else:
+        text = system.speech_text(key)
+    
+    if system.tts_cache.lookup(key):
+        return send_from_directory(system.tts_cache.cache_dir, f'{key}.wav')
+    if not text:
+        return jsonify({
+            'success': False,
+            'error': '音频不存在或已过期'
+        }), 404
+    
+    stream = system.open_speech_stream(text)
+    if stream is None:
+        return jsonify({
+            'success': False,
+            'error': '语音合成不可用，请检查 COSYVOICE_APPKEY 配置'
+        }), 503
+    
+    return Response(
+        stream_with_context(system.speech_frames(stream)),
+        mimetype='audio/wav',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/qa_audio/stats')
+def qa_audio_stats():
+    """语音问答统计（缓存命中率、节省的 LLM 和合成时间、首字延迟等延迟指标、外部调用的重试和熔断状态、对冲率和节省的时间、任务队列）"""
+    from audio.qa_audio import get_qa_system
+    from utils.job_queue import get_job_queue
+    
+    system = get_qa_system()
+    return jsonify({
+        'success': True,
+        'answer_cache': system.answer_cache.stats(),
+        'tts_cache': system.tts_cache.stats(),
+        'latency': latency_metrics.snapshot(),
+        'transport': get_transport().stats(),
+        'hedging': {'llm': system.llm_hedger.stats(), 'tts': system.tts_hedger.stats()},
+        'jobs': get_job_queue('qa_audio').stats()
+    })
+
+
 @app.route('/static/audio/<path:filename>')
 def serve_audio(filename):
     """提供音频文件"""
@@ -300,11 +664,109 @@ def serve_audio(filename):
     return send_from_directory(audio_dir, filename)
 
 
+@app.route('/analysis/cube')
+def analysis_cube():
+    """分组立方体的维度、取值和指标"""
+    if load_cube() is None:
+        return jsonify({'success': False, 'error': '立方体未生成，请先运行 scripts/build_cube.py'}), 503
+    return jsonify({'success': True, **cube.describe()})
+
+
+@app.route('/analysis/query', methods=['GET', 'POST'])
+def analysis_query():
+    """
+    分组统计查询（精确结果来自立方体，近似结果来自分层样本并附置信区间）
+    
+    GET 参数:
+        group_by=gender,smoke&measures=ap_hi,bmi&cholesterol=2,3&level=0&refine=1&max_ci=0.02
+        （除 group_by / measures / level / refine / max_ci 外的参数名为维度，取值可以是原始值或标签，逗号分隔）
+    
+    POST 请求体:
+    {
+        "filters": {"cholesterol": [2, 3], "gender": "男性"},
+        "group_by": ["gender", "smoke"],
+        "measures": ["ap_hi", "bmi"],
+        "level": 0,
+        "refine": false,
+        "max_ci": 0.02
+    }
+    
+    返回:
+    {
+        "success": true,
+        "rows": [{"gender": "女性", "smoke": "吸烟", "count": 359, "cardio_rate": 0.69,
+                  "cardio_rate_ci": [0.64, 0.74], "mean_ap_hi": 125.8, "mean_ap_hi_ci": [124.1, 127.5]}],
+        "level": 0,
+        "next_level": 1,
+        "exact": false,
+        "elapsed_us": 150.2
+    }
+    """
+    try:
+        filters, group_by, measures, options = parse_query_args()
+        result = run_query(filters, group_by, measures, **options)
+        return jsonify({'success': True, **result})
+        
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+@app.route('/analysis/chart', methods=['GET', 'POST'])
+def analysis_chart():
+    """
+    分组患病率图表（参数同 /analysis/query，另可传 title），返回 Plotly Figure JSON
+    
+    近似结果带置信区间误差线，返回的 level / next_level 可用于"细化"按钮
+    """
+    from analysis.sampling import figure_group_rates
+    
+    try:
+        filters, group_by, measures, options = parse_query_args()
+        result = run_query(filters, group_by, measures, **options)
+        figure = figure_group_rates(result, options['title'])
+        return jsonify({
+            'success': True,
+            'figure': json.loads(figure.to_json()),
+            'level': result['level'],
+            'next_level': result['next_level'],
+            'exact': result['exact']
+        })
+        
+    except LookupError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
 @app.route('/analysis/<path:filename>')
 def serve_analysis(filename):
-    """提供分析报告文件"""
+    """
+    提供分析报告文件
+    
+    报告生成时已为外壳、章节数据和 Plotly 写出 gzip 预压缩版本（.gz），
+    客户端接受 gzip 且预压缩文件不旧于原文件时直接返回，不在请求时压缩。
+    只提供 ANALYSIS_FILES 中的报告文件，目录中的缓存等其他文件与不存在的文件一样返回 404。
+    """
+    if not ANALYSIS_FILES.fullmatch(filename):
+        abort(404)
+    
     analysis_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'analysis')
-    return send_from_directory(analysis_dir, filename)
+    
+    path = safe_join(analysis_dir, filename)
+    if path and 'gzip' in request.accept_encodings and os.path.isfile(path):
+        gz_path = f"{path}.gz"
+        if os.path.isfile(gz_path) and os.path.getmtime(gz_path) >= os.path.getmtime(path):
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response = send_from_directory(analysis_dir, f"{filename}.gz", mimetype=mimetype)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.headers['Vary'] = 'Accept-Encoding'
+            return response
+    
+    response = send_from_directory(analysis_dir, filename)
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 
 @app.route('/web/<path:filename>')
@@ -347,7 +809,8 @@ if __name__ == '__main__':
     print("=" * 60)
     print("API 接口:")
     print("  POST /predict    - 疾病预测接口")
-    print("  POST /qa_audio   - 语音问答接口")
+    print("  POST /qa_audio   - 语音问答接口（返回任务 ID）")
+    print("  GET  /qa_audio/jobs/<id> - 语音问答任务状态")
     print("  GET  /features   - 获取特征列表")
     print("=" * 60 + "\n")
     
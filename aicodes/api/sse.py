@@ -0,0 +1,258 @@
+"""
+Server-Sent Events 工具
+将 LLM 增量文本（及流水线合成的语音片段）、后台任务的状态变化转发为 SSE 事件流，并记录首字延迟（TTFT）；
+async_ 开头的版本用于 ASGI 服务的异步迭代器
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from flask import Response, stream_with_context
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.metrics import latency_metrics
+from utils.job_queue import DONE, FAILED, JobQueue
+
+# 任务状态无变化时发送注释行的间隔（秒），避免代理因连接空闲而断开
+KEEPALIVE_INTERVAL = 15.0
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """
+    格式化一个 SSE 事件
+
+    Args:
+        event: 事件名
+        data: 事件数据（JSON）
+
+    Returns:
+        str: 事件文本
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events: Iterable[str]) -> Response:
+    """将事件生成器包装为流式响应（禁用缓存和反向代理缓冲）"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def _job_event(snapshot: Optional[Dict]) -> Tuple[str, bool]:
+    """任务状态对应的 SSE 事件和是否为最后一个事件"""
+    if snapshot is None:
+        return sse_event('error', {'error': '任务不存在或已过期'}), True
+    if snapshot['status'] == DONE:
+        return sse_event('done', snapshot), True
+    if snapshot['status'] == FAILED:
+        return sse_event('error', snapshot), True
+    return sse_event('status', snapshot), False
+
+
+def job_events(jobs: JobQueue, job_id: str, keepalive: float = KEEPALIVE_INTERVAL) -> Iterator[str]:
+    """
+    将后台任务的状态变化转发为 SSE 事件
+
+    事件依次为: status（排队、开始执行时各一个，含排队位置 position）、done（含结果 result）；
+    任务失败或不存在时发送 error。状态长时间无变化时发送注释行保持连接。
+
+    Args:
+        jobs: 任务队列
+        job_id: 任务 ID
+        keepalive: 注释行的发送间隔（秒）
+
+    Returns:
+        Iterator[str]: SSE 事件文本
+    """
+    version = None
+    while True:
+        snapshot = jobs.wait(job_id, -1 if version is None else version, timeout=keepalive)
+        if snapshot is not None and snapshot['version'] == version:
+            yield ': keep-alive\n\n'
+            continue
+        event, last = _job_event(snapshot)
+        yield event
+        if last:
+            return
+        version = snapshot['version']
+
+
+def token_events(tokens: Iterator[str],
+                 metric: str,
+                 on_complete: Optional[Callable[[str], Dict]] = None,
+                 start: Optional[float] = None) -> Iterator[str]:
+    """
+    将增量文本转发为 SSE 事件
+
+    事件依次为: token（{'text': 增量文本}，每段一个）、done（{'text': 完整回答, 'ttft_ms', 'total_ms', ...}）；
+    出错时发送 error（{'error': 错误信息}）。首字延迟和总耗时记录到 latency_metrics 的
+    <metric>.ttft 和 <metric>.total。
+
+    Args:
+        tokens: 增量文本迭代器
+        metric: 指标名前缀
+        on_complete: 回答完成后调用，返回值合并到 done 事件（如语音 URL）
+        start: 计时起点（perf_counter），默认为首次迭代时
+
+    Returns:
+        Iterator[str]: SSE 事件文本
+    """
+    start = time.perf_counter() if start is None else start
+    ttft = None
+    parts = []
+    try:
+        for token in tokens:
+            if not token:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - start
+                latency_metrics.record(f'{metric}.ttft', ttft)
+            parts.append(token)
+            yield sse_event('token', {'text': token})
+        total = time.perf_counter() - start
+        latency_metrics.record(f'{metric}.total', total)
+
+        answer = ''.join(parts)
+        done = {
+            'text': answer,
+            'ttft_ms': round(ttft * 1000, 1) if ttft is not None else None,
+            'total_ms': round(total * 1000, 1)
+        }
+        if on_complete is not None:
+            done.update(on_complete(answer))
+        yield sse_event('done', done)
+    except Exception as e:
+        yield sse_event('error', {'error': str(e)})
+
+
+def pipeline_events(events: Iterator[Tuple[str, Dict]], metric: str) -> Iterator[str]:
+    """
+    将流水线问答的 (事件名, 数据) 转发为 SSE 事件
+
+    done 事件附加首字延迟 ttft_ms、首段音频延迟 ttfa_ms 和总耗时 total_ms，并分别记录到
+    latency_metrics 的 <metric>.ttft、<metric>.ttfa 和 <metric>.total；出错时发送 error 事件。
+
+    Args:
+        events: QAudioSystem.stream_pipeline 返回的事件迭代器
+        metric: 指标名前缀
+
+    Returns:
+        Iterator[str]: SSE 事件文本
+    """
+    start = time.perf_counter()
+    first = {}
+    try:
+        for event, data in events:
+            if event == 'token' and 'ttft' not in first:
+                first['ttft'] = time.perf_counter() - start
+            elif event == 'audio' and data.get('audio_url') and 'ttfa' not in first:
+                first['ttfa'] = time.perf_counter() - start
+            elif event == 'done':
+                first['total'] = time.perf_counter() - start
+                for name, seconds in first.items():
+                    latency_metrics.record(f'{metric}.{name}', seconds)
+                data = dict(data, **{f'{name}_ms': round(first[name] * 1000, 1) if name in first else None
+                                     for name in ('ttft', 'ttfa', 'total')})
+            yield sse_event(event, data)
+    except Exception as e:
+        yield sse_event('error', {'error': str(e)})
+
+
+async def async_token_events(tokens: AsyncIterator[str],
+                             metric: str,
+                             on_complete: Optional[Callable[[str], Awaitable[Dict]]] = None) -> AsyncIterator[str]:
+    """
+    将异步增量文本转发为 SSE 事件（事件和指标同 token_events，on_complete 为协程函数）
+
+    Returns:
+        AsyncIterator[str]: SSE 事件文本
+    """
+    start = time.perf_counter()
+    ttft = None
+    parts = []
+    try:
+        async for token in tokens:
+            if not token:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - start
+                latency_metrics.record(f'{metric}.ttft', ttft)
+            parts.append(token)
+            yield sse_event('token', {'text': token})
+        total = time.perf_counter() - start
+        latency_metrics.record(f'{metric}.total', total)
+
+        answer = ''.join(parts)
+        done = {
+            'text': answer,
+            'ttft_ms': round(ttft * 1000, 1) if ttft is not None else None,
+            'total_ms': round(total * 1000, 1)
+        }
+        if on_complete is not None:
+            done.update(await on_complete(answer))
+        yield sse_event('done', done)
+    except Exception as e:
+        yield sse_event('error', {'error': str(e)})
+
+
+async def async_pipeline_events(events: AsyncIterator[Tuple[str, Dict]], metric: str) -> AsyncIterator[str]:
+    """
+    将异步流水线问答的 (事件名, 数据) 转发为 SSE 事件（事件和指标同 pipeline_events）
+
+    Returns:
+        AsyncIterator[str]: SSE 事件文本
+    """
+    start = time.perf_counter()
+    first = {}
+    try:
+        async for event, data in events:
+            if event == 'token' and 'ttft' not in first:
+                first['ttft'] = time.perf_counter() - start
+            elif event == 'audio' and data.get('audio_url') and 'ttfa' not in first:
+                first['ttfa'] = time.perf_counter() - start
+            elif event == 'done':
+                first['total'] = time.perf_counter() - start
+                for name, seconds in first.items():
+                    latency_metrics.record(f'{metric}.{name}', seconds)
+                data = dict(data, **{f'{name}_ms': round(first[name] * 1000, 1) if name in first else None
+                                     for name in ('ttft', 'ttfa', 'total')})
+            yield sse_event(event, data)
+    except Exception as e:
+        yield sse_event('error', {'error': str(e)})
+
+
+async def async_job_events(jobs: JobQueue, job_id: str,
+                           interval: float = 0.2, keepalive: float = KEEPALIVE_INTERVAL) -> AsyncIterator[str]:
+    """
+    将后台任务的状态变化转发为 SSE 事件（事件同 job_events）
+
+    任务队列由线程驱动，这里按 interval 轮询状态，不占用线程。
+
+    Returns:
+        AsyncIterator[str]: SSE 事件文本
+    """
+    version = None
+    idle = 0.0
+    while True:
+        snapshot = jobs.get(job_id)
+        if snapshot is not None and snapshot['version'] == version:
+            await asyncio.sleep(interval)
+            idle += interval
+            if idle >= keepalive:
+                idle = 0.0
+                yield ': keep-alive\n\n'
+            continue
+        event, last = _job_event(snapshot)
+        yield event
+        if last:
+            return
+        version = snapshot['version']
+        idle = 0.0
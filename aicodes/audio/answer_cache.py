@@ -0,0 +1,240 @@
+"""
+问答缓存
+位于 LLM 之前：问题规范化后精确匹配（忽略标点、空白、全角/半角和大小写），
+未命中时（开启近似匹配时）用字符 n-gram 的 MinHash/LSH 查找近似重复的问题，Jaccard 相似度达到阈值、
+且两个问题的差异部分不含否定词、反义字和数字时才复用答案。
+条目有过期时间，超过容量时淘汰最久未使用的条目
+"""
+
+import difflib
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# MinHash 使用的梅森素数 2^31 - 1（a·x 不超过 2^62，uint64 运算不溢出）
+_PRIME = (1 << 31) - 1
+
+# 出现在两个问题差异部分时会改变问题含义的字：否定词、常见反义字和中文数字
+# （"高血压"/"低血压"、"可以"/"不可以"的字符相似度都很高，答案却不能互换）
+NEGATION_CHARS = frozenset('不没非无未勿别莫否')
+ANTONYM_CHARS = frozenset('高低增减升降多少大小快慢早晚前后上下')
+NUMERAL_CHARS = frozenset('零一二两三四五六七八九十百千万半')
+
+
+def normalize_question(text: str) -> str:
+    """
+    规范化问题：全角转半角（NFKC）、转小写，去掉标点、符号和空白
+
+    Args:
+        text: 问题原文
+
+    Returns:
+        str: 规范化文本
+    """
+    text = unicodedata.normalize('NFKC', text).lower()
+    return ''.join(ch for ch in text if unicodedata.category(ch)[0] not in 'PSZC')
+
+
+def shingles(text: str, n: int = 2) -> frozenset:
+    """字符 n-gram 集合（短于 n 的文本整体作为一个元素）"""
+    if len(text) <= n:
+        return frozenset([text])
+    return frozenset(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    """Jaccard 相似度"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def meaning_changed(a: str, b: str) -> bool:
+    """
+    判断两个（规范化后的）问题的差异部分是否含有否定词、反义字或数字
+
+    Args:
+        a: 问题一
+        b: 问题二
+
+    Returns:
+        bool: 含有时为 True（不能视为近似重复）
+    """
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        for ch in a[i1:i2] + b[j1:j2]:
+            if ch.isdigit() or ch in NEGATION_CHARS or ch in ANTONYM_CHARS or ch in NUMERAL_CHARS:
+                return True
+    return False
+
+
+class MinHasher:
+    """MinHash 签名（num_perm 个随机线性哈希 (a·x + b) mod p 的最小值）"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, items: frozenset) -> np.ndarray:
+        """计算集合的签名"""
+        values = np.fromiter((zlib.crc32(item.encode('utf-8')) % _PRIME for item in items),
+                             dtype=np.uint64, count=len(items))
+        return ((np.outer(values, self.a) + self.b) % _PRIME).min(axis=0)
+
+
+class AnswerCache:
+    """问答缓存（线程安全）"""
+
+    def __init__(self,
+                 max_entries: int = 1000,
+                 ttl: float = 86400,
+                 similarity: float = 1.1,
+                 ngram: int = 2,
+                 num_perm: int = 64,
+                 bands: int = 16):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最大条目数，超过时淘汰最久未使用的条目
+            ttl: 条目有效期（秒）
+            similarity: 近似匹配的 Jaccard 相似度阈值，大于 1 表示只做精确匹配（默认）；
+                        开启时建议不低于 0.95
+            ngram: 字符 n-gram 长度
+            num_perm: MinHash 签名长度
+            bands: LSH 分段数（每段 num_perm / bands 行；阈值约为 (1/bands)^(bands/num_perm)）
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) 必须是 bands ({bands}) 的整数倍")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.ngram = ngram
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+
+        self._lock = threading.Lock()
+        # 规范化问题 -> 条目；顺序即最近使用顺序
+        self._entries: 'OrderedDict[str, Dict]' = OrderedDict()
+        # 每个分段一个桶表：分段签名 -> 规范化问题集合
+        self._buckets = [dict() for _ in range(bands)]
+        self._counts = {'exact_hits': 0, 'near_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        self.seconds_saved = 0.0
+        self._lookup_seconds = 0.0
+
+    def _band_keys(self, signature: np.ndarray):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        for band, band_key in zip(self._buckets, self._band_keys(entry['signature'])):
+            bucket = band.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del band[band_key]
+
+    def _alive(self, key: str, now: float) -> bool:
+        """条目存在且未过期（过期条目顺带删除）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if entry['expires'] <= now:
+            self._remove(key)
+            self._counts['expirations'] += 1
+            return False
+        return True
+
+    def get(self, question: str) -> Optional[Tuple[str, str, float]]:
+        """
+        查询缓存
+
+        Args:
+            question: 问题原文
+
+        Returns:
+            tuple: (答案, 匹配方式 'exact' / 'near', 相似度)，未命中返回 None
+        """
+        start = time.perf_counter()
+        key = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            match, score = None, 0.0
+            if self._alive(key, now):
+                match, score = key, 1.0
+            elif self.similarity <= 1:
+                grams = shingles(key, self.ngram)
+                candidates = set()
+                for band, band_key in zip(self._buckets, self._band_keys(self.hasher.signature(grams))):
+                    candidates |= band.get(band_key, set())
+                # 候选用 n-gram 集合的精确 Jaccard 相似度复核，差异部分改变含义的不算重复
+                for candidate in candidates:
+                    if self._alive(candidate, now):
+                        value = jaccard(grams, self._entries[candidate]['shingles'])
+                        if value >= self.similarity and value > score and not meaning_changed(key, candidate):
+                            match, score = candidate, value
+
+            if match is None:
+                self._counts['misses'] += 1
+                result = None
+            else:
+                entry = self._entries[match]
+                self._entries.move_to_end(match)
+                entry['hits'] += 1
+                kind = 'exact' if match == key else 'near'
+                self._counts[f'{kind}_hits'] += 1
+                self.seconds_saved += entry['llm_s']
+                result = (entry['answer'], kind, score)
+            self._lookup_seconds += time.perf_counter() - start
+        return result
+
+    def put(self, question: str, answer: str, llm_s: float = 0.0):
+        """
+        写入缓存
+
+        Args:
+            question: 问题原文
+            answer: 答案
+            llm_s: 生成该答案所用的时间（秒），用于统计命中节省的时间
+        """
+        key = normalize_question(question)
+        grams = shingles(key, self.ngram)
+        signature = self.hasher.signature(grams)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                'answer': answer,
+                'shingles': grams,
+                'signature': signature,
+                'expires': time.time() + self.ttl,
+                'llm_s': llm_s,
+                'hits': 0
+            }
+            for band, band_key in zip(self._buckets, self._band_keys(signature)):
+                band.setdefault(band_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._counts['evictions'] += 1
+
+    def stats(self) -> Dict:
+        """命中率、节省的 LLM 时间和平均查询耗时"""
+        with self._lock:
+            lookups = self._counts['exact_hits'] + self._counts['near_hits'] + self._counts['misses']
+            hits = lookups - self._counts['misses']
+            return dict(
+                self._counts,
+                hit_rate=hits / lookups if lookups else 0.0,
+                entries=len(self._entries),
+                seconds_saved=round(self.seconds_saved, 3),
+                avg_lookup_ms=round(self._lookup_seconds / lookups * 1000, 3) if lookups else 0.0
+            )
@@ -1,26 +1,57 @@
 """
 DeepSeek API客户端
-用于调用DeepSeek API生成文本回答
+用于调用DeepSeek API生成文本回答（AsyncDeepSeekClient 为 asyncio 版本）
 """
 
+import os
+import sys
 import requests
-from typing import Optional, Dict, List
+from typing import AsyncIterator, Iterator, Optional, Dict, List
 import json
 
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.http_transport import AsyncHTTPTransport, CircuitOpenError, HTTPTransport, get_async_transport, get_transport
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+def _parse_sse_data(line: str) -> Optional[str]:
+    """
+    解析流式响应的一行 SSE（"data: {...}"，以 "data: [DONE]" 结束）
+
+    Returns:
+        str: 增量文本（可能为空串）；结束标记返回 None
+    """
+    if not line.startswith('data:'):
+        return ''
+    data = line[5:].strip()
+    if data == '[DONE]':
+        return None
+    choices = json.loads(data).get('choices') or [{}]
+    return (choices[0].get('delta') or {}).get('content') or ''
+
 
 class DeepSeekClient:
     """DeepSeek API客户端"""
     
-    def __init__(self, api_key: str, api_url: str = "https://api.deepseek.com/v1"):
+    def __init__(self, api_key: str, api_url: str = "https://api.deepseek.com/v1",
+                 transport: Optional[HTTPTransport] = None):
         """
         初始化DeepSeek客户端
         
         Args:
             api_key: API密钥
             api_url: API地址
+            transport: 传输层（连接池、重试、熔断），默认使用共享实例
         """
         self.api_key = api_key
         self.api_url = api_url
+        self.transport = transport or get_transport()
         self.headers = {
             'Authorization': f'Bearer {api_key}',
             'Content-Type': 'application/json'
@@ -58,7 +89,8 @@ class DeepSeekClient:
         }
         
         try:
-            response = requests.post(
+            response = self.transport.request(
+                'POST',
                 endpoint,
                 headers=self.headers,
                 json=payload,
@@ -66,27 +98,56 @@ class DeepSeekClient:
             )
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, CircuitOpenError) as e:
             print(f"DeepSeek API调用失败: {e}")
             return {"error": str(e)}
     
-    def ask_question(
+    def stream_chat_completion(
         self,
-        question: str,
-        system_prompt: Optional[str] = None,
-        context: Optional[str] = None
-    ) -> str:
+        messages: List[Dict[str, str]],
+        model: str = "deepseek-chat",
+        temperature: float = 0.7,
+        max_tokens: int = 2000
+    ) -> Iterator[str]:
         """
-        提问并获取回答
+        流式调用聊天完成接口（stream=True），逐段产出增量文本
         
         Args:
-            question: 用户问题
-            system_prompt: 系统提示词
-            context: 上下文信息
+            messages: 消息列表
+            model: 模型名称
+            temperature: 温度参数
+            max_tokens: 最大token数
             
         Returns:
-            str: AI回答
+            Iterator[str]: 增量文本；调用失败时抛出 requests 异常，熔断时抛出 CircuitOpenError
         """
+        endpoint = f"{self.api_url}/chat/completions"
+        
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+        
+        with self.transport.stream('POST', endpoint, headers=self.headers, json=payload, timeout=30) as response:
+            response.raise_for_status()
+            # 响应为 SSE，按 UTF-8 逐行解码
+            for line in response.iter_lines():
+                content = _parse_sse_data(line.decode('utf-8'))
+                if content is None:
+                    break
+                if content:
+                    yield content
+    
+    def _build_messages(
+        self,
+        question: str,
+        system_prompt: Optional[str] = None,
+        context: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """构建消息列表（系统提示、上下文和用户问题）"""
         messages = []
         
         # 添加系统提示
@@ -114,6 +175,27 @@ class DeepSeekClient:
             "content": question
         })
         
+        return messages
+    
+    def ask_question(
+        self,
+        question: str,
+        system_prompt: Optional[str] = None,
+        context: Optional[str] = None
+    ) -> str:
+        """
+        提问并获取回答
+        
+        Args:
+            question: 用户问题
+            system_prompt: 系统提示词
+            context: 上下文信息
+            
+        Returns:
+            str: AI回答
+        """
+        messages = self._build_messages(question, system_prompt, context)
+        
         # 调用API
         response = self.chat_completion(messages)
         
@@ -127,21 +209,23 @@ class DeepSeekClient:
         except (KeyError, IndexError) as e:
             return f"解析响应失败：{e}"
     
-    def generate_health_advice(
+    def stream_question(
         self,
-        user_data: Dict,
-        prediction_result: Dict
-    ) -> str:
+        question: str,
+        system_prompt: Optional[str] = None,
+        context: Optional[str] = None
+    ) -> Iterator[str]:
         """
-        根据用户数据和预测结果生成健康建议
+        提问并流式获取回答（参数同 ask_question）
         
-        Args:
-            user_data: 用户健康数据
-            prediction_result: 模型预测结果
-            
         Returns:
-            str: 健康建议
+            Iterator[str]: 增量文本
         """
+        return self.stream_chat_completion(self._build_messages(question, system_prompt, context))
+    
+    @staticmethod
+    def _health_advice_prompt(user_data: Dict, prediction_result: Dict) -> tuple:
+        """健康建议的 (问题, 上下文)"""
         risk_level = prediction_result.get('risk_level', '未知')
         probability = prediction_result.get('probability', {}).get('positive', 0)
         
@@ -156,4 +240,124 @@ class DeepSeekClient:
         
         question = "请根据以上数据，给出详细的健康建议和生活方式改善建议。"
         
+        return question, context
+    
+    def generate_health_advice(
+        self,
+        user_data: Dict,
+        prediction_result: Dict
+    ) -> str:
+        """
+        根据用户数据和预测结果生成健康建议
+        
+        Args:
+            user_data: 用户健康数据
+            prediction_result: 模型预测结果
+            
+        Returns:
+            str: 健康建议
+        """
+        question, context = self._health_advice_prompt(user_data, prediction_result)
         return self.ask_question(question, context=context)
+    
+    def stream_health_advice(
+        self,
+        user_data: Dict,
+        prediction_result: Dict
+    ) -> Iterator[str]:
+        """
+        根据用户数据和预测结果流式生成健康建议（参数同 generate_health_advice）
+        
+        Returns:
+            Iterator[str]: 增量文本
+        """
+        question, context = self._health_advice_prompt(user_data, prediction_result)
+        return self.stream_question(question, context=context)
+
+
+class AsyncDeepSeekClient:
+    """DeepSeek API客户端（asyncio 版本，等待响应期间不占用线程）"""
+    
+    def __init__(self, api_key: str, api_url: str = "https://api.deepseek.com/v1",
+                 transport: Optional[AsyncHTTPTransport] = None):
+        """
+        初始化DeepSeek客户端
+        
+        Args:
+            api_key: API密钥
+            api_url: API地址
+            transport: 异步传输层，默认使用共享实例
+        """
+        self.api_key = api_key
+        self.api_url = api_url
+        self.transport = transport or get_async_transport()
+        self.headers = {
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        }
+    
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "deepseek-chat",
+        temperature: float = 0.7,
+        max_tokens: int = 2000
+    ) -> Dict:
+        """
+        调用聊天完成接口（参数同 DeepSeekClient.chat_completion）
+        
+        Returns:
+            Dict: API响应，失败时为 {"error": 错误信息}
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": False
+        }
+        
+        try:
+            response = await self.transport.request(
+                'POST',
+                f"{self.api_url}/chat/completions",
+                headers=self.headers,
+                json=payload,
+                timeout=30
+            )
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            print(f"DeepSeek API调用失败: {e}")
+            return {"error": str(e)}
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "deepseek-chat",
+        temperature: float = 0.7,
+        max_tokens: int = 2000
+    ) -> AsyncIterator[str]:
+        """
+        流式调用聊天完成接口（参数同 DeepSeekClient.stream_chat_completion）
+        
+        Returns:
+            AsyncIterator[str]: 增量文本；调用失败时抛出 httpx 异常，熔断时抛出 CircuitOpenError
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+        
+        async with self.transport.stream('POST', f"{self.api_url}/chat/completions",
+                                         headers=self.headers, json=payload, timeout=30) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                content = _parse_sse_data(line)
+                if content is None:
+                    break
+                if content:
+                    yield content
@@ -5,18 +5,49 @@
 
 import os
 import sys
-from typing import Dict, Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.logger import setup_logger
-from utils.audio_utils import save_audio_file, ensure_audio_directory
+from utils.audio_utils import concat_wav, ensure_audio_directory, pcm_to_wav, wav_header
 from utils.config import Config
+from utils.metrics import latency_metrics
+from utils.http_transport import CircuitOpenError, get_transport
+from utils.hedging import Hedger
+from audio.answer_cache import AnswerCache
+from audio.speech_stream import SpeechStream
+from audio.tts_cache import SentenceSplitter, TTSCache, split_sentences
 
 # 设置日志
 logger = setup_logger('audio', log_dir='./logs')
 
+# 语音问答的系统提示
+SYSTEM_PROMPT = "你是一个专业的心血管健康顾问，能够回答关于心血管疾病预防、治疗和健康生活方式的问题。请用简洁、专业的语言回答。"
+
+# LLM 参数（同步和异步实现共用）
+LLM_MODEL = 'deepseek-chat'
+LLM_TEMPERATURE = 0.7
+LLM_MAX_TOKENS = 200
+
+# 合成音频格式（dashscope AudioFormat 成员名）；固定为 WAV 以便逐句拼接
+TTS_AUDIO_FORMAT = 'WAV_22050HZ_MONO_16BIT'
+
+# 流式合成使用裸 PCM（由本地加 WAV 头），采样参数与 TTS_AUDIO_FORMAT 相同，因此与其共用缓存键
+TTS_STREAM_FORMAT = 'PCM_22050HZ_MONO_16BIT'
+TTS_STREAM_PARAMS = (1, 2, 22050)  # 声道数、采样宽度（字节）、采样率
+
+# CosyVoice 服务主机（传输层按主机限制并发和熔断）
+TTS_HOST = 'dashscope.aliyuncs.com'
+
+# 已分配流式音频 URL、尚未请求的文本最多保留的条数
+MAX_PENDING_SPEECH = 256
+
 
 class QAudioSystem:
     """语音问答系统"""
@@ -26,11 +57,33 @@ class QAudioSystem:
         self.config = Config()
         self.llm = None
         self.tts_client = None
+        self.tts_format = None
+        self.tts_stream_format = None
+        self.transport = get_transport()
+        
+        # 对冲调用：LLM 按整次调用、TTS 按每字耗时计算阈值
+        hedge_options = dict(quantile=self.config.HEDGE_QUANTILE, budget=self.config.HEDGE_BUDGET,
+                             min_samples=self.config.HEDGE_MIN_SAMPLES, max_workers=self.config.HEDGE_WORKERS)
+        self.llm_hedger = Hedger('llm', **hedge_options)
+        self.tts_hedger = Hedger('tts', **hedge_options)
         
         logger.info("初始化语音问答系统")
         
         # 确保音频目录存在
         ensure_audio_directory()
+        
+        # 问答缓存（LLM 之前）和语音合成缓存（整段回答和单句）
+        self.answer_cache = AnswerCache(
+            max_entries=self.config.QA_CACHE_MAX_ENTRIES,
+            ttl=self.config.QA_CACHE_TTL,
+            similarity=self.config.QA_CACHE_SIMILARITY
+        )
+        self.tts_cache = TTSCache()
+        
+        # 流式合成：进行中的合成（缓存键 -> SpeechStream）和已分配 URL 的文本（缓存键 -> 文本）
+        self._speech_lock = threading.Lock()
+        self._speech_streams: Dict[str, SpeechStream] = {}
+        self._speech_texts: 'OrderedDict[str, str]' = OrderedDict()
     
     def _init_deepseek(self):
         """初始化 DeepSeek LLM"""
@@ -46,11 +99,11 @@ class QAudioSystem:
                 return False
             
             self.llm = ChatOpenAI(
-                model="deepseek-chat",
+                model=LLM_MODEL,
                 api_key=self.config.DEEPSEEK_API_KEY,
                 base_url=self.config.DEEPSEEK_API_URL,
-                temperature=0.7,
-                max_tokens=200
+                temperature=LLM_TEMPERATURE,
+                max_tokens=LLM_MAX_TOKENS
             )
             
             logger.info("DeepSeek LLM 初始化成功")
@@ -72,7 +125,7 @@ class QAudioSystem:
             # 使用阿里云 DashScope SDK
             # 参考: https://help.aliyun.com/zh/model-studio/cosyvoice-python-sdk
             import dashscope
-            from dashscope.audio.tts_v2 import SpeechSynthesizer
+            from dashscope.audio.tts_v2 import AudioFormat, SpeechSynthesizer
             
             # 检查 API Key
             if not self.config.COSYVOICE_APPKEY:
@@ -84,6 +137,8 @@ class QAudioSystem:
             
             # 保存 SpeechSynthesizer 类
             self.tts_client = SpeechSynthesizer
+            self.tts_format = getattr(AudioFormat, TTS_AUDIO_FORMAT)
+            self.tts_stream_format = getattr(AudioFormat, TTS_STREAM_FORMAT)
             
             logger.info("CosyVoice TTS 初始化成功")
             return True
@@ -95,6 +150,14 @@ class QAudioSystem:
             logger.error(f"CosyVoice 初始化失败: {e}")
             return False
     
+    @staticmethod
+    def _build_messages(question: str) -> List[Dict[str, str]]:
+        """构建 LLM 消息（系统提示 + 用户问题）"""
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": question}
+        ]
+    
     def generate_answer(self, question: str) -> Optional[str]:
         """
         使用 DeepSeek 生成文本回答
@@ -107,33 +170,142 @@ class QAudioSystem:
         """
         logger.info(f"生成回答，问题: {question[:50]}...")
         
+        # 相同或近似的问题直接返回缓存的答案
+        cached = self.answer_cache.get(question)
+        if cached is not None:
+            answer, match, similarity = cached
+            logger.info(f"问答缓存命中（{match}，相似度 {similarity:.2f}），长度: {len(answer)}")
+            return answer
+        
         # 初始化 LLM
         if not self._init_deepseek():
             return None
         
         try:
-            # 构建系统提示
-            system_prompt = "你是一个专业的心血管健康顾问，能够回答关于心血管疾病预防、治疗和健康生活方式的问题。请用简洁、专业的语言回答。"
-            
             # 调用 LLM
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": question}
-            ]
-            
-            response = self.llm.invoke(messages)
+            start = time.perf_counter()
+            response = self.llm_hedger.run(self.llm.invoke, self._build_messages(question))
             answer = response.content
+            elapsed = time.perf_counter() - start
             
-            logger.info(f"回答生成成功，长度: {len(answer)}")
+            self.answer_cache.put(question, answer, elapsed)
+            logger.info(f"回答生成成功，长度: {len(answer)}，耗时: {elapsed:.2f}s")
             return answer
             
         except Exception as e:
             logger.error(f"生成回答失败: {e}")
             return None
     
+    def stream_answer(self, question: str) -> Iterator[str]:
+        """
+        流式生成文本回答，LLM 每产出一段文本就立即返回
+        
+        命中问答缓存时一次返回完整答案；生成完成后写入问答缓存。
+        
+        Args:
+            question: 用户问题
+            
+        Returns:
+            Iterator[str]: 增量文本；LLM 不可用或调用失败时抛出异常
+        """
+        logger.info(f"流式生成回答，问题: {question[:50]}...")
+        
+        cached = self.answer_cache.get(question)
+        if cached is not None:
+            answer, match, similarity = cached
+            logger.info(f"问答缓存命中（{match}，相似度 {similarity:.2f}），长度: {len(answer)}")
+            yield answer
+            return
+        
+        if not self._init_deepseek():
+            raise RuntimeError('DeepSeek LLM 不可用，请检查 DEEPSEEK_API_KEY 配置')
+        
+        start = time.perf_counter()
+        ttft = None
+        parts = []
+        for chunk in self.llm.stream(self._build_messages(question)):
+            if not chunk.content:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            parts.append(chunk.content)
+            yield chunk.content
+        
+        answer = ''.join(parts)
+        elapsed = time.perf_counter() - start
+        if answer:
+            self.answer_cache.put(question, answer, elapsed)
+        logger.info(f"回答生成成功，长度: {len(answer)}，首字延迟: {(ttft or 0) * 1000:.0f}ms，耗时: {elapsed:.2f}s")
+    
+    def tts_key(self, text: str) -> str:
+        """文本在语音合成缓存中的键（当前音色、模型和格式）"""
+        return TTSCache.key(text, self.config.COSYVOICE_VOICE, self.config.COSYVOICE_MODEL, TTS_AUDIO_FORMAT)
+    
+    def _synthesize_once(self, text: str, max_retries: int) -> Optional[Tuple[bytes, float]]:
+        """
+        调用 CosyVoice 合成一段文本（不经过缓存）
+        
+        经共享传输层调用：按主机限制并发，失败后按带抖动的指数退避重试，服务持续故障时熔断快速失败；
+        超过自适应阈值仍未返回时发出对冲调用，取先完成的结果。
+        
+        Args:
+            text: 要合成的文本
+            max_retries: 最大尝试次数
+            
+        Returns:
+            tuple: (音频数据, 合成耗时秒数)，失败返回 None
+        """
+        # 获取超时时间（毫秒）
+        timeout_ms = self.config.COSYVOICE_TIMEOUT * 1000
+        
+        def attempt():
+            # 失败次数和重试由传输层记录
+            logger.info(f"语音合成请求，文本长度: {len(text)}")
+            
+            # 根据官方文档，使用 SpeechSynthesizer 进行同步调用
+            # 参考: https://help.aliyun.com/zh/model-studio/cosyvoice-python-sdk
+            # 示例代码：
+            # synthesizer = SpeechSynthesizer(model="cosyvoice-v2", voice="longxiaochun_v2")
+            # audio = synthesizer.call("今天天气怎么样？")
+            
+            # 每次调用前需要重新初始化 SpeechSynthesizer 实例（SDK 每次调用建立自己的 WebSocket 连接）
+            synthesizer = self.tts_client(
+                model=self.config.COSYVOICE_MODEL,
+                voice=self.config.COSYVOICE_VOICE,
+                format=self.tts_format
+            )
+            
+            # 同步调用，阻塞式返回完整音频数据
+            # timeout_millis: 超时时间（毫秒），从配置读取
+            start = time.perf_counter()
+            audio_data = synthesizer.call(text, timeout_millis=timeout_ms)
+            elapsed = time.perf_counter() - start
+            
+            if not audio_data:
+                raise RuntimeError("音频合成失败：无数据返回")
+            logger.info(f"Request ID: {synthesizer.get_last_request_id()}")
+            logger.info(f"首包延迟: {synthesizer.get_first_package_delay()}ms，合成耗时: {elapsed:.2f}s")
+            return audio_data, elapsed
+        
+        def call():
+            # SDK 不区分错误类型，所有失败都按临时故障重试
+            return self.transport.call(TTS_HOST, attempt, retries=max_retries, transient=lambda e: True)
+        
+        try:
+            # 慢调用（超过每字耗时 p90 × 字数）由对冲调用兜底，不必等到超时后重试
+            return self.tts_hedger.run(call, size=max(len(text), 1))
+        except CircuitOpenError as e:
+            logger.error(f"语音合成失败: {e}")
+        except Exception as e:
+            logger.error(f"语音合成失败：已达到最大尝试次数 {max_retries}（{e}）")
+        return None
+    
     def synthesize_audio(self, text: str, max_retries: int = None) -> Optional[str]:
         """
-        使用 CosyVoice 合成语音（带重试机制）
+        使用 CosyVoice 合成语音（带缓存和重试机制）
+        
+        整段回答命中缓存时直接返回已有文件；否则按句切分，已缓存的句子直接复用，
+        其余句子单独合成并缓存，最后在本地拼接为整段音频。
         
         Args:
             text: 要合成的文本
@@ -144,6 +316,12 @@ class QAudioSystem:
         """
         logger.info(f"合成语音，文本长度: {len(text)}")
         
+        answer_key = self.tts_key(text)
+        if self.tts_cache.lookup(answer_key):
+            audio_url = self.tts_cache.url(answer_key)
+            logger.info(f"音频缓存命中: {audio_url}")
+            return audio_url
+        
         # 初始化 TTS
         if not self._init_cosyvoice():
             return None
@@ -152,83 +330,281 @@ class QAudioSystem:
         if max_retries is None:
             max_retries = self.config.COSYVOICE_MAX_RETRIES
         
-        # 获取超时时间（毫秒）
-        timeout_ms = self.config.COSYVOICE_TIMEOUT * 1000
-        
         logger.info(f"超时设置: {self.config.COSYVOICE_TIMEOUT}秒, 最大重试: {max_retries}次")
         
-        # 重试机制
-        for attempt in range(max_retries):
+        sentences = split_sentences(text)
+        if len(sentences) <= 1:
+            result = self._synthesize_once(text, max_retries)
+            if result is None:
+                return None
+            audio_url = self.tts_cache.put(answer_key, *result)
+            logger.info(f"音频合成成功: {audio_url}")
+            return audio_url
+        
+        # 逐句复用或合成，整段音频的"合成时间"记为各句合成时间之和
+        segments = []
+        for sentence in sentences:
+            segment = self._synthesize_sentence(sentence, max_retries)
+            if segment is None:
+                return None
+            segments.append(segment)
+        
+        audio_url = self._put_answer_audio(answer_key, segments)
+        hits = sum(segment['cached'] for segment in segments)
+        logger.info(f"音频合成成功: {audio_url}（共 {len(sentences)} 句，缓存命中 {hits} 句）")
+        return audio_url
+    
+    def _synthesize_sentence(self, sentence: str, max_retries: int) -> Optional[Dict]:
+        """
+        合成一句（已缓存则直接复用）
+        
+        Args:
+            sentence: 句子
+            max_retries: 最大重试次数
+            
+        Returns:
+            dict: {'key': 缓存键, 'audio': 音频数据, 'synth_s': 合成耗时, 'cached': 是否命中缓存}，失败返回 None
+        """
+        key = self.tts_key(sentence)
+        if self.tts_cache.lookup(key, level='sentence'):
+            return {'key': key, 'audio': self.tts_cache.read(key),
+                    'synth_s': self.tts_cache.synth_seconds_of(key), 'cached': True}
+        result = self._synthesize_once(sentence, max_retries)
+        if result is None:
+            logger.error(f"句子合成失败: {sentence[:20]}...")
+            return None
+        self.tts_cache.put(key, *result)
+        return {'key': key, 'audio': result[0], 'synth_s': result[1], 'cached': False}
+    
+    def _put_answer_audio(self, answer_key: str, segments: List[Dict]) -> str:
+        """将各句音频拼接为整段回答写入缓存，返回音频 URL"""
+        synth_s = sum(segment['synth_s'] for segment in segments)
+        return self.tts_cache.put(answer_key, concat_wav([segment['audio'] for segment in segments]),
+                                  synth_s, spent_s=0.0)
+    
+    def stream_pipeline(self, question: str, max_retries: int = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        流水线问答：LLM 流式生成的同时按句合成语音
+        
+        每完成一句即提交到合成线程池（并发数 QA_PIPELINE_WORKERS），生成继续进行；
+        各句音频按顺序在就绪后立即返回，首段音频约在第一句生成完成后一个合成耗时内可用。
+        全部完成后各句音频拼接为整段回答并写入缓存（与 synthesize_audio 的结果相同）。
+        
+        Args:
+            question: 用户问题
+            max_retries: 每句的最大重试次数，默认使用配置值
+            
+        Returns:
+            Iterator[tuple]: (事件名, 数据)，依次为
+                token: {'text': 增量文本}
+                audio: {'index': 句序号, 'text': 句子, 'audio_url': 单句音频 URL（失败为 None）, 'cached': 是否命中缓存}
+                done: {'text': 完整回答, 'audio_url': 整段音频 URL, 'segments': 句数, 'warning': 可选}
+            LLM 不可用或调用失败时抛出异常
+        """
+        if max_retries is None:
+            max_retries = self.config.COSYVOICE_MAX_RETRIES
+        tts_ready = self._init_cosyvoice()
+        if not tts_ready:
+            logger.warning("语音合成不可用，流水线只返回文本")
+        
+        splitter = SentenceSplitter()
+        futures = []
+        segments = []
+        parts = []
+        
+        def ready_audio(block: bool):
+            # 按句序返回已完成的音频，前一句未完成时后面的句子等待
+            while len(segments) < len(futures) and (block or futures[len(segments)][1].done()):
+                index = len(segments)
+                sentence, future = futures[index]
+                segment = future.result()
+                segments.append(segment)
+                yield 'audio', {
+                    'index': index,
+                    'text': sentence,
+                    'audio_url': self.tts_cache.url(segment['key']) if segment else None,
+                    'cached': bool(segment and segment['cached'])
+                }
+        
+        with ThreadPoolExecutor(max_workers=self.config.QA_PIPELINE_WORKERS,
+                                thread_name_prefix='tts') as executor:
+            def submit(sentences):
+                if tts_ready:
+                    for sentence in sentences:
+                        futures.append((sentence, executor.submit(self._synthesize_sentence, sentence, max_retries)))
+            
+            for token in self.stream_answer(question):
+                parts.append(token)
+                yield 'token', {'text': token}
+                submit(splitter.feed(token))
+                yield from ready_audio(block=False)
+            submit(splitter.flush())
+            yield from ready_audio(block=True)
+        
+        answer = ''.join(parts)
+        done = {'text': answer, 'audio_url': None, 'segments': len(segments)}
+        if not tts_ready or not segments:
+            done['warning'] = '语音合成失败，仅返回文本'
+        elif not all(segments):
+            done['warning'] = f'{sum(s is None for s in segments)} 句语音合成失败'
+        else:
+            answer_key = self.tts_key(answer)
+            # 各句已计入缓存统计，整段音频只在不存在时拼接写入
+            if self.tts_cache.contains(answer_key):
+                done['audio_url'] = self.tts_cache.url(answer_key)
+            else:
+                done['audio_url'] = self._put_answer_audio(answer_key, segments)
+            hits = sum(segment['cached'] for segment in segments)
+            logger.info(f"流水线音频完成: {done['audio_url']}（共 {len(segments)} 句，缓存命中 {hits} 句）")
+        yield 'done', done
+    
+    def speech_url(self, text: str) -> Optional[str]:
+        """
+        获取文本的音频 URL，不等待合成
+        
+        已缓存时返回缓存文件 URL；否则登记文本并返回流式音频 URL（/qa_audio/speech/<缓存键>.wav），
+        客户端请求该 URL 时才开始合成，收到首包即可播放。
+        
+        Args:
+            text: 要合成的文本
+            
+        Returns:
+            str: 音频 URL，语音合成不可用时返回 None
+        """
+        key = self.tts_key(text)
+        if self.tts_cache.contains(key):
+            return self.tts_cache.url(key)
+        if not self._init_cosyvoice():
+            return None
+        with self._speech_lock:
+            self._speech_texts[key] = text
+            self._speech_texts.move_to_end(key)
+            while len(self._speech_texts) > MAX_PENDING_SPEECH:
+                self._speech_texts.popitem(last=False)
+        return f'/qa_audio/speech/{key}.wav'
+    
+    def speech_text(self, key: str) -> Optional[str]:
+        """speech_url 登记的文本"""
+        with self._speech_lock:
+            return self._speech_texts.get(key)
+    
+    def open_speech_stream(self, text: str) -> Optional[SpeechStream]:
+        """
+        开始流式合成（同一文本正在合成时返回进行中的合成）
+        
+        音频帧已开始输出后无法撤回，因此流式合成不重试，只检查和更新熔断状态。
+        
+        使用回调式合成器，call 立即返回，音频帧由回调线程写入 SpeechStream；
+        合成完成后回调线程将完整音频写入缓存，与客户端读取互不阻塞。
+        
+        Args:
+            text: 要合成的文本
+            
+        Returns:
+            SpeechStream: 流式合成，语音合成不可用或熔断时返回 None
+        """
+        key = self.tts_key(text)
+        with self._speech_lock:
+            stream = self._speech_streams.get(key)
+        if stream is not None:
+            logger.info(f"复用进行中的流式合成: {key}")
+            return stream
+        if not self._init_cosyvoice():
+            return None
+        
+        with self._speech_lock:
+            stream = self._speech_streams.get(key)
+            if stream is not None:
+                return stream
+            # 熔断时直接失败；合成结果在 _finish_speech_stream 中计入熔断器
             try:
-                logger.info(f"语音合成尝试 {attempt + 1}/{max_retries}")
-                
-                # 根据官方文档，使用 SpeechSynthesizer 进行同步调用
-                # 参考: https://help.aliyun.com/zh/model-studio/cosyvoice-python-sdk
-                # 示例代码：
-                # synthesizer = SpeechSynthesizer(model="cosyvoice-v2", voice="longxiaochun_v2")
-                # audio = synthesizer.call("今天天气怎么样？")
-                
-                # 每次调用前需要重新初始化 SpeechSynthesizer 实例
-                synthesizer = self.tts_client(
-                    model='cosyvoice-v1',      # 使用 v1 模型
-                    voice='longxiaochun'       # v1 对应的音色
-                )
-                
-                # 同步调用，阻塞式返回完整音频数据
-                # timeout_millis: 超时时间（毫秒），从配置读取
-                audio_data = synthesizer.call(text, timeout_millis=timeout_ms)
-                
-                # 保存音频文件
-                if audio_data:
-                    file_path, audio_url = save_audio_file(audio_data)
-                    logger.info(f"音频合成成功: {audio_url}")
-                    logger.info(f"Request ID: {synthesizer.get_last_request_id()}")
-                    logger.info(f"首包延迟: {synthesizer.get_first_package_delay()}ms")
-                    return audio_url
-                else:
-                    logger.error("音频合成失败：无数据返回")
-                    if attempt < max_retries - 1:
-                        logger.info(f"准备重试...")
-                        import time
-                        time.sleep(2)  # 等待 2 秒后重试
-                        continue
-                    return None
-                    
-            except TimeoutError as e:
-                logger.warning(f"第 {attempt + 1} 次尝试超时: {e}")
-                if attempt < max_retries - 1:
-                    logger.info(f"准备重试...")
-                    import time
-                    time.sleep(2)  # 等待 2 秒后重试
-                    continue
-                else:
-                    logger.error(f"语音合成失败：已达到最大重试次数 {max_retries}")
-                    return None
-                    
-            except Exception as e:
-                logger.error(f"音频合成失败: {e}")
-                logger.exception("详细错误信息:")
-                if attempt < max_retries - 1:
-                    logger.info(f"准备重试...")
-                    import time
-                    time.sleep(2)  # 等待 2 秒后重试
-                    continue
+                self.transport.breaker(TTS_HOST).before_call()
+            except CircuitOpenError as e:
+                logger.error(f"流式合成失败: {e}")
                 return None
+            stream = SpeechStream(key, on_finish=self._finish_speech_stream)
+            self._speech_streams[key] = stream
         
-        return None
+        logger.info(f"开始流式合成，文本长度: {len(text)}")
+        try:
+            stream.synthesizer = self.tts_client(
+                model=self.config.COSYVOICE_MODEL,
+                voice=self.config.COSYVOICE_VOICE,
+                format=self.tts_stream_format,
+                callback=stream
+            )
+            stream.synthesizer.call(text)
+        except Exception as e:
+            logger.error(f"流式合成启动失败: {e}")
+            stream.finish(error=str(e))
+        return stream
+    
+    def _finish_speech_stream(self, stream: SpeechStream):
+        """流式合成结束：成功时写入缓存，并从进行中的合成中移除"""
+        breaker = self.transport.breaker(TTS_HOST)
+        try:
+            if stream.succeeded:
+                breaker.record_success()
+                audio_url = self.tts_cache.put(stream.key, pcm_to_wav(stream.pcm(), *TTS_STREAM_PARAMS), stream.elapsed)
+                latency_metrics.record('tts_stream.first_package', stream.first_package_s)
+                latency_metrics.record('tts_stream.total', stream.elapsed)
+                logger.info(f"流式合成完成: {audio_url}，首包延迟: {stream.first_package_s * 1000:.0f}ms，"
+                            f"合成耗时: {stream.elapsed:.2f}s")
+            else:
+                breaker.record_failure()
+                logger.error(f"流式合成失败: {stream.error or '无数据返回'}")
+        finally:
+            with self._speech_lock:
+                if self._speech_streams.get(stream.key) is stream:
+                    del self._speech_streams[stream.key]
+    
+    def speech_frames(self, stream: SpeechStream) -> Iterator[bytes]:
+        """
+        流式合成的 WAV 字节流：先输出长度未知的 WAV 头，再按到达顺序输出 PCM 帧
+        
+        Args:
+            stream: open_speech_stream 返回的流式合成
+            
+        Returns:
+            Iterator[bytes]: 音频数据块；合成失败或超时时记录日志并提前结束（超时时放弃该合成）
+        """
+        yield wav_header(*TTS_STREAM_PARAMS)
+        try:
+            yield from stream.frames(timeout=self.config.COSYVOICE_TIMEOUT)
+        except TimeoutError as e:
+            logger.error(f"流式音频中断: {e}")
+            self._cancel_speech_stream(stream)
+        except RuntimeError as e:
+            logger.error(f"流式音频中断: {e}")
+    
+    @staticmethod
+    def _cancel_speech_stream(stream: SpeechStream):
+        """
+        放弃停滞的流式合成：关闭合成器的 WebSocket 连接，并按失败结束
+        
+        结束时 _finish_speech_stream 将其从进行中的合成中移除（后续请求重新合成）并计入熔断器
+        （半开状态的试探调用随之结束）。
+        """
+        if stream.synthesizer is not None and not stream.finished:
+            try:
+                stream.synthesizer.streaming_cancel()
+            except Exception as e:
+                logger.warning(f"取消语音合成失败: {e}")
+        stream.finish(error='timeout')
     
-    def qa_pipeline(self, question: str) -> Dict:
+    def qa_pipeline(self, question: str, pipelined: bool = False) -> Dict:
         """
         完整的问答流程
         
         Args:
             question: 用户问题
+            pipelined: 是否使用流水线模式（生成回答的同时按句合成语音，见 stream_pipeline）
             
         Returns:
-            dict: 包含文本回答和音频 URL
+            dict: 包含文本回答和音频 URL（流水线模式另含各句音频 URL 'segments'）
         """
         logger.info("=" * 50)
-        logger.info("开始语音问答流程")
+        logger.info(f"开始语音问答流程{'（流水线模式）' if pipelined else ''}")
         logger.info(f"问题: {question}")
         
         result = {
@@ -238,6 +614,9 @@ class QAudioSystem:
             'error': None
         }
         
+        if pipelined:
+            return self._qa_pipeline_pipelined(question, result)
+        
         try:
             # 1. 生成文本回答
             answer = self.generate_answer(question)
@@ -268,6 +647,35 @@ class QAudioSystem:
         
         logger.info("=" * 50)
         return result
+    
+    def _qa_pipeline_pipelined(self, question: str, result: Dict) -> Dict:
+        """流水线模式的 qa_pipeline：收集 stream_pipeline 的事件"""
+        try:
+            result['segments'] = []
+            for event, data in self.stream_pipeline(question):
+                if event == 'audio':
+                    result['segments'].append(data['audio_url'])
+                elif event == 'done':
+                    result['text'] = data['text']
+                    result['audio_url'] = data['audio_url']
+                    result['error'] = data.get('warning')
+            
+            if not result['text']:
+                result['error'] = '文本生成失败'
+                logger.error(result['error'])
+            else:
+                result['success'] = True
+                if result['error']:
+                    logger.warning(result['error'])
+                else:
+                    logger.info("语音问答流程完成")
+        
+        except Exception as e:
+            result['error'] = f'处理失败: {str(e)}'
+            logger.error(result['error'], exc_info=True)
+        
+        logger.info("=" * 50)
+        return result
 
 
 # 全局实例
@@ -310,18 +718,19 @@ def synthesize_audio(text: str) -> Optional[str]:
     return system.synthesize_audio(text)
 
 
-def qa_pipeline(question: str) -> Dict:
+def qa_pipeline(question: str, pipelined: bool = False) -> Dict:
     """
     完整问答流程（便捷函数）
     
     Args:
         question: 用户问题
+        pipelined: 是否使用流水线模式
         
     Returns:
         dict: 结果字典
     """
     system = get_qa_system()
-    return system.qa_pipeline(question)
+    return system.qa_pipeline(question, pipelined)
 
 
 # 测试代码
@@ -0,0 +1,520 @@
+"""
+语音问答模块（asyncio 版本）
+与 QAudioSystem 流程相同，LLM 和 TTS 调用在等待期间不占用线程，一个事件循环可同时处理大量进行中的问答。
+问答缓存、语音合成缓存、对冲阈值和熔断状态与同步版本共用
+"""
+
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.logger import setup_logger
+from utils.audio_utils import concat_wav, pcm_to_wav, wav_header
+from utils.metrics import latency_metrics
+from utils.http_transport import CircuitOpenError, get_async_transport
+from audio.deepseek_client import AsyncDeepSeekClient
+from audio.qa_audio import (LLM_MAX_TOKENS, LLM_MODEL, LLM_TEMPERATURE, TTS_HOST, TTS_STREAM_PARAMS,
+                            QAudioSystem, get_qa_system)
+from audio.speech_stream import AsyncSpeechStream
+from audio.tts_cache import SentenceSplitter, split_sentences
+
+# 设置日志
+logger = setup_logger('audio', log_dir='./logs')
+
+
+class AsyncQAudioSystem:
+    """语音问答系统（asyncio 版本，只能在一个事件循环中使用）"""
+
+    def __init__(self, shared: Optional[QAudioSystem] = None):
+        """
+        初始化系统
+
+        Args:
+            shared: 共用缓存、对冲器和 TTS 初始化的同步系统，默认使用全局实例
+        """
+        self.shared = shared or get_qa_system()
+        self.config = self.shared.config
+        self.answer_cache = self.shared.answer_cache
+        self.tts_cache = self.shared.tts_cache
+        self.llm_hedger = self.shared.llm_hedger
+        self.tts_hedger = self.shared.tts_hedger
+        self.transport = get_async_transport()
+        self.llm = None
+        # SDK 建立合成连接时阻塞，单独的线程池避免占满默认线程池（aiofiles 等使用）；
+        # 合成调用数已由传输层按主机限制，线程数与之相同
+        self._tts_executor = ThreadPoolExecutor(max_workers=self.transport.max_per_host,
+                                                thread_name_prefix='tts-start')
+
+        # 进行中的流式合成（缓存键 -> AsyncSpeechStream）和写缓存等后台任务
+        self._speech_streams: Dict[str, AsyncSpeechStream] = {}
+        self._background: Set[asyncio.Task] = set()
+
+        logger.info("初始化异步语音问答系统")
+
+    def _init_deepseek(self):
+        """初始化 DeepSeek 异步客户端"""
+        if self.llm is not None:
+            return True
+        if not self.config.DEEPSEEK_API_KEY:
+            logger.error("DEEPSEEK_API_KEY 未配置")
+            return False
+        self.llm = AsyncDeepSeekClient(self.config.DEEPSEEK_API_KEY, self.config.DEEPSEEK_API_URL,
+                                       transport=self.transport)
+        logger.info("DeepSeek 异步客户端初始化成功")
+        return True
+
+    def _init_cosyvoice(self):
+        """初始化 CosyVoice TTS（与同步系统共用）"""
+        return self.shared._init_cosyvoice()
+
+    def _spawn(self, coro):
+        """在后台执行协程（保留引用直到完成）"""
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def _complete(self, messages: List[Dict[str, str]]) -> str:
+        """调用一次 LLM，失败时抛出异常（以便对冲器等待另一个调用）"""
+        response = await self.llm.chat_completion(messages, model=LLM_MODEL, temperature=LLM_TEMPERATURE,
+                                                  max_tokens=LLM_MAX_TOKENS)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response['choices'][0]['message']['content']
+
+    async def generate_answer(self, question: str) -> Optional[str]:
+        """
+        使用 DeepSeek 生成文本回答
+
+        Args:
+            question: 用户问题
+
+        Returns:
+            str: AI 回答文本
+        """
+        logger.info(f"生成回答，问题: {question[:50]}...")
+
+        cached = self.answer_cache.get(question)
+        if cached is not None:
+            answer, match, similarity = cached
+            logger.info(f"问答缓存命中（{match}，相似度 {similarity:.2f}），长度: {len(answer)}")
+            return answer
+
+        if not self._init_deepseek():
+            return None
+
+        try:
+            start = time.perf_counter()
+            answer = await self.llm_hedger.arun(self._complete, QAudioSystem._build_messages(question))
+            elapsed = time.perf_counter() - start
+
+            self.answer_cache.put(question, answer, elapsed)
+            logger.info(f"回答生成成功，长度: {len(answer)}，耗时: {elapsed:.2f}s")
+            return answer
+
+        except Exception as e:
+            logger.error(f"生成回答失败: {e}")
+            return None
+
+    async def stream_answer(self, question: str) -> AsyncIterator[str]:
+        """
+        流式生成文本回答（同 QAudioSystem.stream_answer）
+
+        Args:
+            question: 用户问题
+
+        Returns:
+            AsyncIterator[str]: 增量文本；LLM 不可用或调用失败时抛出异常
+        """
+        logger.info(f"流式生成回答，问题: {question[:50]}...")
+
+        cached = self.answer_cache.get(question)
+        if cached is not None:
+            answer, match, similarity = cached
+            logger.info(f"问答缓存命中（{match}，相似度 {similarity:.2f}），长度: {len(answer)}")
+            yield answer
+            return
+
+        if not self._init_deepseek():
+            raise RuntimeError('DeepSeek LLM 不可用，请检查 DEEPSEEK_API_KEY 配置')
+
+        start = time.perf_counter()
+        ttft = None
+        parts = []
+        async for content in self.llm.stream_chat_completion(
+                QAudioSystem._build_messages(question), model=LLM_MODEL,
+                temperature=LLM_TEMPERATURE, max_tokens=LLM_MAX_TOKENS):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            parts.append(content)
+            yield content
+
+        answer = ''.join(parts)
+        elapsed = time.perf_counter() - start
+        if answer:
+            self.answer_cache.put(question, answer, elapsed)
+        logger.info(f"回答生成成功，长度: {len(answer)}，首字延迟: {(ttft or 0) * 1000:.0f}ms，耗时: {elapsed:.2f}s")
+
+    async def _start_synthesis(self, stream: AsyncSpeechStream, text: str):
+        """
+        启动回调式合成，音频帧由 SDK 的 WebSocket 线程经 stream 转发到事件循环
+
+        SDK 的 call 在建立连接和发送文本后返回（握手期间阻塞），因此放到线程池中执行。
+        """
+        stream.synthesizer = self.shared.tts_client(
+            model=self.config.COSYVOICE_MODEL,
+            voice=self.config.COSYVOICE_VOICE,
+            format=self.shared.tts_stream_format,
+            callback=stream
+        )
+        await asyncio.get_running_loop().run_in_executor(self._tts_executor, stream.synthesizer.call, text)
+
+    @staticmethod
+    def _cancel_synthesis(stream: AsyncSpeechStream):
+        """放弃未完成的合成（关闭 WebSocket 连接）"""
+        if stream.synthesizer is None or stream.finished:
+            return
+        try:
+            stream.synthesizer.streaming_cancel()
+        except Exception as e:
+            logger.warning(f"取消语音合成失败: {e}")
+
+    async def _synthesize_once(self, text: str, max_retries: int) -> Optional[Tuple[bytes, float]]:
+        """
+        调用 CosyVoice 合成一段文本（不经过缓存，重试、熔断和对冲规则同 QAudioSystem._synthesize_once）
+
+        Args:
+            text: 要合成的文本
+            max_retries: 最大尝试次数
+
+        Returns:
+            tuple: (音频数据, 合成耗时秒数)，失败返回 None
+        """
+        loop = asyncio.get_running_loop()
+
+        async def attempt():
+            logger.info(f"语音合成请求，文本长度: {len(text)}")
+            stream = AsyncSpeechStream(None, loop)
+            try:
+                await self._start_synthesis(stream, text)
+                async for _ in stream.frames(timeout=self.config.COSYVOICE_TIMEOUT):
+                    pass
+            except BaseException:
+                # 超时、失败或被取消（对冲调用已胜出、客户端断开）时不再等待剩余音频
+                self._cancel_synthesis(stream)
+                raise
+            if not stream.succeeded:
+                raise RuntimeError("音频合成失败：无数据返回")
+            logger.info(f"首包延迟: {stream.first_package_s * 1000:.0f}ms，合成耗时: {stream.elapsed:.2f}s")
+            return pcm_to_wav(stream.pcm(), *TTS_STREAM_PARAMS), stream.elapsed
+
+        async def call():
+            # SDK 不区分错误类型，所有失败都按临时故障重试
+            return await self.transport.call(TTS_HOST, attempt, retries=max_retries, transient=lambda e: True)
+
+        try:
+            return await self.tts_hedger.arun(call, size=max(len(text), 1))
+        except CircuitOpenError as e:
+            logger.error(f"语音合成失败: {e}")
+        except Exception as e:
+            logger.error(f"语音合成失败：已达到最大尝试次数 {max_retries}（{e}）")
+        return None
+
+    async def _synthesize_sentence(self, sentence: str, max_retries: int) -> Optional[Dict]:
+        """合成一句（已缓存则直接复用，返回值同 QAudioSystem._synthesize_sentence）"""
+        key = self.shared.tts_key(sentence)
+        if self.tts_cache.lookup(key, level='sentence'):
+            return {'key': key, 'audio': await self.tts_cache.aread(key),
+                    'synth_s': self.tts_cache.synth_seconds_of(key), 'cached': True}
+        result = await self._synthesize_once(sentence, max_retries)
+        if result is None:
+            logger.error(f"句子合成失败: {sentence[:20]}...")
+            return None
+        await self.tts_cache.aput(key, *result)
+        return {'key': key, 'audio': result[0], 'synth_s': result[1], 'cached': False}
+
+    async def _put_answer_audio(self, answer_key: str, segments: List[Dict]) -> str:
+        """将各句音频拼接为整段回答写入缓存，返回音频 URL"""
+        synth_s = sum(segment['synth_s'] for segment in segments)
+        return await self.tts_cache.aput(answer_key, concat_wav([segment['audio'] for segment in segments]),
+                                         synth_s, spent_s=0.0)
+
+    async def synthesize_audio(self, text: str, max_retries: int = None) -> Optional[str]:
+        """
+        使用 CosyVoice 合成语音（缓存规则同 QAudioSystem.synthesize_audio，未缓存的句子并发合成）
+
+        Args:
+            text: 要合成的文本
+            max_retries: 最大重试次数，默认使用配置值
+
+        Returns:
+            str: 音频 URL 路径
+        """
+        logger.info(f"合成语音，文本长度: {len(text)}")
+
+        answer_key = self.shared.tts_key(text)
+        if self.tts_cache.lookup(answer_key):
+            audio_url = self.tts_cache.url(answer_key)
+            logger.info(f"音频缓存命中: {audio_url}")
+            return audio_url
+
+        if not self._init_cosyvoice():
+            return None
+
+        if max_retries is None:
+            max_retries = self.config.COSYVOICE_MAX_RETRIES
+
+        sentences = split_sentences(text)
+        if len(sentences) <= 1:
+            result = await self._synthesize_once(text, max_retries)
+            if result is None:
+                return None
+            audio_url = await self.tts_cache.aput(answer_key, *result)
+            logger.info(f"音频合成成功: {audio_url}")
+            return audio_url
+
+        # 各句的合成并发进行（并发数由传输层按主机限制）
+        segments = await asyncio.gather(*(self._synthesize_sentence(sentence, max_retries)
+                                          for sentence in sentences))
+        if not all(segments):
+            return None
+
+        audio_url = await self._put_answer_audio(answer_key, segments)
+        hits = sum(segment['cached'] for segment in segments)
+        logger.info(f"音频合成成功: {audio_url}（共 {len(sentences)} 句，缓存命中 {hits} 句）")
+        return audio_url
+
+    async def stream_pipeline(self, question: str, max_retries: int = None) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        流水线问答：LLM 流式生成的同时按句合成语音（事件同 QAudioSystem.stream_pipeline）
+
+        每完成一句即创建合成任务（同时进行的合成不超过 QA_PIPELINE_WORKERS 句），各句音频按顺序返回。
+
+        Args:
+            question: 用户问题
+            max_retries: 每句的最大重试次数，默认使用配置值
+
+        Returns:
+            AsyncIterator[tuple]: (事件名, 数据)；LLM 不可用或调用失败时抛出异常
+        """
+        if max_retries is None:
+            max_retries = self.config.COSYVOICE_MAX_RETRIES
+        tts_ready = self._init_cosyvoice()
+        if not tts_ready:
+            logger.warning("语音合成不可用，流水线只返回文本")
+
+        splitter = SentenceSplitter()
+        workers = asyncio.Semaphore(self.config.QA_PIPELINE_WORKERS)
+        tasks = []
+        segments = []
+        parts = []
+
+        async def synthesize(sentence):
+            async with workers:
+                return await self._synthesize_sentence(sentence, max_retries)
+
+        def submit(sentences):
+            if tts_ready:
+                for sentence in sentences:
+                    tasks.append((sentence, asyncio.ensure_future(synthesize(sentence))))
+
+        def audio_event(index):
+            segment = segments[index]
+            return 'audio', {
+                'index': index,
+                'text': tasks[index][0],
+                'audio_url': self.tts_cache.url(segment['key']) if segment else None,
+                'cached': bool(segment and segment['cached'])
+            }
+
+        try:
+            async for token in self.stream_answer(question):
+                parts.append(token)
+                yield 'token', {'text': token}
+                submit(splitter.feed(token))
+                # 按句序返回已完成的音频，前一句未完成时后面的句子等待
+                while len(segments) < len(tasks) and tasks[len(segments)][1].done():
+                    segments.append(tasks[len(segments)][1].result())
+                    yield audio_event(len(segments) - 1)
+            submit(splitter.flush())
+            while len(segments) < len(tasks):
+                segments.append(await tasks[len(segments)][1])
+                yield audio_event(len(segments) - 1)
+        finally:
+            # 客户端断开或生成失败时不再合成剩余的句子
+            for _, task in tasks:
+                task.cancel()
+
+        answer = ''.join(parts)
+        done = {'text': answer, 'audio_url': None, 'segments': len(segments)}
+        if not tts_ready or not segments:
+            done['warning'] = '语音合成失败，仅返回文本'
+        elif not all(segments):
+            done['warning'] = f'{sum(s is None for s in segments)} 句语音合成失败'
+        else:
+            answer_key = self.shared.tts_key(answer)
+            if self.tts_cache.contains(answer_key):
+                done['audio_url'] = self.tts_cache.url(answer_key)
+            else:
+                done['audio_url'] = await self._put_answer_audio(answer_key, segments)
+            hits = sum(segment['cached'] for segment in segments)
+            logger.info(f"流水线音频完成: {done['audio_url']}（共 {len(segments)} 句，缓存命中 {hits} 句）")
+        yield 'done', done
+
+    def speech_url(self, text: str) -> Optional[str]:
+        """获取文本的音频 URL，不等待合成（同 QAudioSystem.speech_url）"""
+        return self.shared.speech_url(text)
+
+    def speech_text(self, key: str) -> Optional[str]:
+        """speech_url 登记的文本"""
+        return self.shared.speech_text(key)
+
+    async def open_speech_stream(self, text: str) -> Optional[AsyncSpeechStream]:
+        """
+        开始流式合成（同一文本正在合成时返回进行中的合成，规则同 QAudioSystem.open_speech_stream）
+
+        Args:
+            text: 要合成的文本
+
+        Returns:
+            AsyncSpeechStream: 流式合成，语音合成不可用或熔断时返回 None
+        """
+        key = self.shared.tts_key(text)
+        stream = self._speech_streams.get(key)
+        if stream is not None:
+            logger.info(f"复用进行中的流式合成: {key}")
+            return stream
+        if not self._init_cosyvoice():
+            return None
+
+        try:
+            self.transport.breaker(TTS_HOST).before_call()
+        except CircuitOpenError as e:
+            logger.error(f"流式合成失败: {e}")
+            return None
+        stream = AsyncSpeechStream(key, asyncio.get_running_loop(), on_finish=self._finish_speech_stream)
+        self._speech_streams[key] = stream
+
+        logger.info(f"开始流式合成，文本长度: {len(text)}")
+        try:
+            await self._start_synthesis(stream, text)
+        except Exception as e:
+            logger.error(f"流式合成启动失败: {e}")
+            stream.finish(error=str(e))
+        return stream
+
+    def _finish_speech_stream(self, stream: AsyncSpeechStream):
+        """流式合成结束：从进行中的合成中移除，成功时在后台写入缓存"""
+        if self._speech_streams.get(stream.key) is stream:
+            del self._speech_streams[stream.key]
+        breaker = self.transport.breaker(TTS_HOST)
+        if not stream.succeeded:
+            breaker.record_failure()
+            logger.error(f"流式合成失败: {stream.error or '无数据返回'}")
+            return
+        breaker.record_success()
+        latency_metrics.record('tts_stream.first_package', stream.first_package_s)
+        latency_metrics.record('tts_stream.total', stream.elapsed)
+        self._spawn(self._store_speech(stream))
+
+    async def _store_speech(self, stream: AsyncSpeechStream):
+        audio_url = await self.tts_cache.aput(stream.key, pcm_to_wav(stream.pcm(), *TTS_STREAM_PARAMS), stream.elapsed)
+        logger.info(f"流式合成完成: {audio_url}，首包延迟: {stream.first_package_s * 1000:.0f}ms，"
+                    f"合成耗时: {stream.elapsed:.2f}s")
+
+    async def speech_frames(self, stream: AsyncSpeechStream) -> AsyncIterator[bytes]:
+        """
+        流式合成的 WAV 字节流（同 QAudioSystem.speech_frames）
+
+        Args:
+            stream: open_speech_stream 返回的流式合成
+
+        Returns:
+            AsyncIterator[bytes]: 音频数据块；合成失败或超时时记录日志并提前结束（超时时放弃该合成）
+        """
+        yield wav_header(*TTS_STREAM_PARAMS)
+        try:
+            async for frame in stream.frames(timeout=self.config.COSYVOICE_TIMEOUT):
+                yield frame
+        except TimeoutError as e:
+            logger.error(f"流式音频中断: {e}")
+            # 合成停滞：关闭连接并按失败结束，从进行中的合成中移除并计入熔断器
+            self._cancel_synthesis(stream)
+            stream.finish(error='timeout')
+        except RuntimeError as e:
+            logger.error(f"流式音频中断: {e}")
+
+    async def qa_pipeline(self, question: str, pipelined: bool = False) -> Dict:
+        """
+        完整的问答流程（参数和返回值同 QAudioSystem.qa_pipeline）
+
+        Args:
+            question: 用户问题
+            pipelined: 是否使用流水线模式
+
+        Returns:
+            dict: 包含文本回答和音频 URL（流水线模式另含各句音频 URL 'segments'）
+        """
+        logger.info("=" * 50)
+        logger.info(f"开始异步语音问答流程{'（流水线模式）' if pipelined else ''}")
+        logger.info(f"问题: {question}")
+
+        result = {
+            'success': False,
+            'text': '',
+            'audio_url': None,
+            'error': None
+        }
+
+        try:
+            if pipelined:
+                result['segments'] = []
+                async for event, data in self.stream_pipeline(question):
+                    if event == 'audio':
+                        result['segments'].append(data['audio_url'])
+                    elif event == 'done':
+                        result['text'] = data['text']
+                        result['audio_url'] = data['audio_url']
+                        result['error'] = data.get('warning')
+            else:
+                result['text'] = await self.generate_answer(question) or ''
+                if result['text']:
+                    result['audio_url'] = await self.synthesize_audio(result['text'])
+                    if not result['audio_url']:
+                        result['error'] = '语音合成失败，仅返回文本'
+
+            if not result['text']:
+                result['error'] = '文本生成失败'
+                logger.error(result['error'])
+            else:
+                # 即使语音合成失败，也返回文本
+                result['success'] = True
+                if result['error']:
+                    logger.warning(result['error'])
+                else:
+                    logger.info("语音问答流程完成")
+
+        except Exception as e:
+            result['error'] = f'处理失败: {str(e)}'
+            logger.error(result['error'], exc_info=True)
+
+        logger.info("=" * 50)
+        return result
+
+
+# 全局实例
+_async_qa_system = None
+
+
+def get_async_qa_system() -> AsyncQAudioSystem:
+    """获取异步语音问答系统实例（单例模式，须在服务的事件循环中首次调用）"""
+    global _async_qa_system
+    if _async_qa_system is None:
+        _async_qa_system = AsyncQAudioSystem()
+    return _async_qa_system
@@ -0,0 +1,235 @@
+"""
+流式语音合成
+使用 dashscope 回调式合成器，合成出的音频帧立即转发给客户端（分块传输），
+同时在回调线程中累积 PCM，合成完成后写入语音合成缓存。
+同一文本正在合成时，后到的请求从头重放已收到的帧并继续跟随，不重复合成。
+AsyncSpeechStream 将回调转发到事件循环，供异步服务等待合成结果
+"""
+
+import asyncio
+import threading
+import time
+from typing import AsyncIterator, Callable, Iterator, List, Optional
+
+try:
+    from dashscope.audio.tts_v2 import ResultCallback
+except ImportError:
+    ResultCallback = object
+
+
+class SpeechStream(ResultCallback):
+    """一次流式合成（合成器回调 + 多读者的帧缓冲，线程安全）"""
+
+    def __init__(self, key: str, on_finish: Optional[Callable[['SpeechStream'], None]] = None):
+        """
+        初始化
+
+        Args:
+            key: 语音合成缓存键
+            on_finish: 合成结束（成功或失败）后在回调线程中调用，用于写缓存等
+        """
+        self.key = key
+        self.on_finish = on_finish
+        # 合成器须在合成期间保持引用
+        self.synthesizer = None
+        self.started = time.perf_counter()
+        self.first_package_s = None
+        self.elapsed = None
+        self.error = None
+        self._frames: List[bytes] = []
+        self._finished = False
+        self._condition = threading.Condition()
+
+    def on_open(self):
+        pass
+
+    def on_event(self, message):
+        pass
+
+    def on_close(self):
+        pass
+
+    def on_data(self, data: bytes):
+        with self._condition:
+            if self.first_package_s is None:
+                self.first_package_s = time.perf_counter() - self.started
+            self._frames.append(bytes(data))
+            self._condition.notify_all()
+
+    def on_complete(self):
+        self.finish()
+
+    def on_error(self, message):
+        self.finish(error=str(message))
+
+    def finish(self, error: Optional[str] = None):
+        """
+        结束合成（重复调用只有第一次生效）
+
+        Args:
+            error: 错误信息，None 表示成功
+        """
+        with self._condition:
+            if self._finished:
+                return
+            self._finished = True
+            self.error = error
+            self.elapsed = time.perf_counter() - self.started
+            self._condition.notify_all()
+        if self.on_finish is not None:
+            self.on_finish(self)
+
+    @property
+    def finished(self) -> bool:
+        """是否已结束"""
+        return self._finished
+
+    @property
+    def succeeded(self) -> bool:
+        """是否已成功完成"""
+        return self._finished and self.error is None and bool(self._frames)
+
+    def pcm(self) -> bytes:
+        """已收到的全部音频数据"""
+        with self._condition:
+            return b''.join(self._frames)
+
+    def frames(self, timeout: float) -> Iterator[bytes]:
+        """
+        从第一帧开始按序读取音频帧，直到合成结束
+
+        Args:
+            timeout: 等待下一帧的最长时间（秒）
+
+        Returns:
+            Iterator[bytes]: 音频帧；合成失败时抛出 RuntimeError，超时抛出 TimeoutError
+        """
+        index = 0
+        while True:
+            with self._condition:
+                if index == len(self._frames) and not self._finished:
+                    self._condition.wait_for(lambda: index < len(self._frames) or self._finished, timeout)
+                if index < len(self._frames):
+                    batch = self._frames[index:]
+                elif self._finished:
+                    if self.error is not None:
+                        raise RuntimeError(f"语音合成失败: {self.error}")
+                    return
+                else:
+                    raise TimeoutError(f"语音合成超时：{timeout} 秒内未收到音频")
+            index += len(batch)
+            yield b''.join(batch)
+
+
+class AsyncSpeechStream(ResultCallback):
+    """一次流式合成（回调线程 -> 事件循环 + 多读者的帧缓冲，只能在事件循环中读取）"""
+
+    def __init__(self, key: str, loop: asyncio.AbstractEventLoop,
+                 on_finish: Optional[Callable[['AsyncSpeechStream'], None]] = None):
+        """
+        初始化
+
+        Args:
+            key: 语音合成缓存键
+            loop: 读取音频帧的事件循环
+            on_finish: 合成结束（成功或失败）后在事件循环中调用
+        """
+        self.key = key
+        self.loop = loop
+        self.on_finish = on_finish
+        # 合成器须在合成期间保持引用
+        self.synthesizer = None
+        self.started = time.perf_counter()
+        self.first_package_s = None
+        self.elapsed = None
+        self.error = None
+        self._frames: List[bytes] = []
+        self._finished = False
+        # 每次收到帧或结束时置位并换新，读者等待取到的那一个
+        self._changed = asyncio.Event()
+
+    def on_open(self):
+        pass
+
+    def on_event(self, message):
+        pass
+
+    def on_close(self):
+        pass
+
+    def on_data(self, data: bytes):
+        self.loop.call_soon_threadsafe(self._put, bytes(data))
+
+    def on_complete(self):
+        self.loop.call_soon_threadsafe(self.finish)
+
+    def on_error(self, message):
+        self.loop.call_soon_threadsafe(self.finish, str(message))
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _put(self, data: bytes):
+        if self._finished:
+            return
+        if self.first_package_s is None:
+            self.first_package_s = time.perf_counter() - self.started
+        self._frames.append(data)
+        self._notify()
+
+    def finish(self, error: Optional[str] = None):
+        """
+        结束合成（须在事件循环中调用，重复调用只有第一次生效）
+
+        Args:
+            error: 错误信息，None 表示成功
+        """
+        if self._finished:
+            return
+        self._finished = True
+        self.error = error
+        self.elapsed = time.perf_counter() - self.started
+        self._notify()
+        if self.on_finish is not None:
+            self.on_finish(self)
+
+    @property
+    def finished(self) -> bool:
+        """是否已结束"""
+        return self._finished
+
+    @property
+    def succeeded(self) -> bool:
+        """是否已成功完成"""
+        return self._finished and self.error is None and bool(self._frames)
+
+    def pcm(self) -> bytes:
+        """已收到的全部音频数据"""
+        return b''.join(self._frames)
+
+    async def frames(self, timeout: float) -> AsyncIterator[bytes]:
+        """
+        从第一帧开始按序读取音频帧，直到合成结束（同 SpeechStream.frames）
+
+        Args:
+            timeout: 等待下一帧的最长时间（秒）
+
+        Returns:
+            AsyncIterator[bytes]: 音频帧；合成失败时抛出 RuntimeError，超时抛出 TimeoutError
+        """
+        index = 0
+        while True:
+            if index < len(self._frames):
+                batch = self._frames[index:]
+                index += len(batch)
+                yield b''.join(batch)
+            elif self._finished:
+                if self.error is not None:
+                    raise RuntimeError(f"语音合成失败: {self.error}")
+                return
+            else:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"语音合成超时：{timeout} 秒内未收到音频") from None
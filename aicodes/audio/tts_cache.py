@@ -0,0 +1,282 @@
+"""
+语音合成缓存
+按"规范化文本 + 音色 + 模型 + 格式"的哈希寻址存储合成结果，相同文本直接返回已有文件；
+回答按句切分，每句的音频单独缓存，整段音频由句子音频在本地拼接
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+import uuid
+from typing import Dict, List, Optional
+
+try:
+    import aiofiles
+    import aiofiles.os
+except ImportError:
+    aiofiles = None
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.audio_utils import ensure_audio_directory
+
+# 句末标点（连同其后的引号、括号）或换行处断句
+SENTENCE_END = re.compile(r'([。！？!?；;…]+[”’"\')）」』]*|\n+)')
+
+# 短于该字数的句子并入下一句（避免"好的。"之类的碎片单独合成）
+MIN_SENTENCE_CHARS = 6
+
+
+def normalize_tts_text(text: str) -> str:
+    """
+    规范化文本（只用于计算缓存键，合成时仍使用原文）
+
+    全角/半角字符统一（NFKC），连续空白合并为一个空格并去掉首尾空白。
+
+    Args:
+        text: 原文
+
+    Returns:
+        str: 规范化文本
+    """
+    text = unicodedata.normalize('NFKC', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def split_sentences(text: str, min_chars: int = MIN_SENTENCE_CHARS) -> List[str]:
+    """
+    将回答切分为句子（句末标点保留在句中）
+
+    Args:
+        text: 回答文本
+        min_chars: 短于该字数的句子并入下一句
+
+    Returns:
+        list: 句子（拼接后与原文只差句间空白）
+    """
+    parts = SENTENCE_END.split(text)
+    sentences = []
+    pending = ''
+    for i in range(0, len(parts), 2):
+        sentence = (pending + parts[i] + (parts[i + 1] if i + 1 < len(parts) else '')).strip()
+        if len(normalize_tts_text(sentence)) < min_chars and i + 2 < len(parts):
+            pending = sentence
+            continue
+        pending = ''
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+class SentenceSplitter:
+    """
+    增量断句：逐段输入流式生成的文本，句子一完整就输出
+
+    切分结果与对完整文本调用 split_sentences 相同（句子缓存键因此一致）。
+    句末标点出现在缓冲区末尾时暂不断句，等下一段文本确认其后没有更多标点或引号。
+    """
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ''
+        self._pending = ''
+
+    def feed(self, text: str) -> List[str]:
+        """
+        输入一段文本
+
+        Args:
+            text: 增量文本
+
+        Returns:
+            list: 新完成的句子
+        """
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            if match.end() == len(self._buffer):
+                break
+            sentence = (self._pending + self._buffer[start:match.end()]).strip()
+            start = match.end()
+            if len(normalize_tts_text(sentence)) < self.min_chars:
+                self._pending = sentence
+                continue
+            self._pending = ''
+            if sentence:
+                sentences.append(sentence)
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """
+        结束输入，返回剩余文本组成的最后一句
+
+        Returns:
+            list: 最后一句（剩余文本为空时为空列表）
+        """
+        sentence = (self._pending + self._buffer).strip()
+        self._buffer = self._pending = ''
+        return [sentence] if sentence else []
+
+
+class TTSCache:
+    """内容寻址的语音合成缓存（线程安全）"""
+
+    def __init__(self, cache_dir: Optional[str] = None, url_prefix: str = '/static/audio/tts'):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录，默认 static/audio/tts
+            url_prefix: 缓存文件的 URL 前缀
+        """
+        self.cache_dir = cache_dir or os.path.join(ensure_audio_directory(), 'tts')
+        self.url_prefix = url_prefix
+        self.index_path = os.path.join(self.cache_dir, 'index.jsonl')
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # 缓存键 -> {'synth_s': 合成耗时, 'bytes': 文件大小}
+        self._entries: Dict[str, Dict] = {}
+        # 整段回答和单句分别统计
+        self._counts = {'answer': {'hits': 0, 'misses': 0}, 'sentence': {'hits': 0, 'misses': 0}}
+        self.seconds_saved = 0.0
+        self.synth_seconds = 0.0
+        self._load_index()
+
+    def _load_index(self):
+        """读取索引（追加写入的 JSON 行，后写的覆盖先写的），忽略文件已不存在的条目"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程中断时最后一行可能不完整
+                    continue
+                if os.path.exists(self.path(record['key'])):
+                    self._entries[record['key']] = {'synth_s': record['synth_s'], 'bytes': record['bytes']}
+
+    @staticmethod
+    def key(text: str, voice: str, model: str, audio_format: str) -> str:
+        """缓存键：规范化文本、音色、模型和格式的哈希"""
+        content = json.dumps([model, voice, audio_format, normalize_tts_text(text)], ensure_ascii=False)
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+    def path(self, key: str) -> str:
+        """缓存文件路径"""
+        return os.path.join(self.cache_dir, f'{key}.wav')
+
+    def url(self, key: str) -> str:
+        """缓存文件 URL"""
+        return f'{self.url_prefix}/{key}.wav'
+
+    def lookup(self, key: str, level: str = 'answer') -> bool:
+        """
+        查询缓存并记录命中统计
+
+        Args:
+            key: 缓存键
+            level: 'answer'（整段回答）或 'sentence'（单句）
+
+        Returns:
+            bool: 是否命中
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            hit = entry is not None and os.path.exists(self.path(key))
+            if entry is not None and not hit:
+                del self._entries[key]
+            self._counts[level]['hits' if hit else 'misses'] += 1
+            if hit:
+                self.seconds_saved += entry['synth_s']
+        return hit
+
+    def contains(self, key: str) -> bool:
+        """是否已缓存（不计入命中统计）"""
+        with self._lock:
+            return key in self._entries and os.path.exists(self.path(key))
+
+    def synth_seconds_of(self, key: str) -> float:
+        """条目最初合成所用的时间（秒）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry['synth_s'] if entry else 0.0
+
+    def read(self, key: str) -> bytes:
+        """读取缓存的音频"""
+        with open(self.path(key), 'rb') as f:
+            return f.read()
+
+    async def aread(self, key: str) -> bytes:
+        """读取缓存的音频（异步，不阻塞事件循环）"""
+        if aiofiles is None:
+            return await asyncio.to_thread(self.read, key)
+        async with aiofiles.open(self.path(key), 'rb') as f:
+            return await f.read()
+
+    def put(self, key: str, audio: bytes, synth_s: float, spent_s: Optional[float] = None) -> str:
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            audio: 音频数据
+            synth_s: 合成该音频所需的时间（秒；拼接的整段回答为各句合成时间之和）
+            spent_s: 本次实际花费的合成时间，默认等于 synth_s
+
+        Returns:
+            str: 音频 URL
+        """
+        path = self.path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        return self._record(key, len(audio), synth_s, spent_s)
+
+    async def aput(self, key: str, audio: bytes, synth_s: float, spent_s: Optional[float] = None) -> str:
+        """写入缓存（异步，参数同 put）"""
+        if aiofiles is None:
+            return await asyncio.to_thread(self.put, key, audio, synth_s, spent_s)
+        path = self.path(key)
+        # 同一线程中可能有多个协程同时写同一个键，临时文件名不能用线程号
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        async with aiofiles.open(tmp_path, 'wb') as f:
+            await f.write(audio)
+        await aiofiles.os.replace(tmp_path, path)
+        return await asyncio.to_thread(self._record, key, len(audio), synth_s, spent_s)
+
+    def _record(self, key: str, size: int, synth_s: float, spent_s: Optional[float]) -> str:
+        """登记已写入的缓存文件（内存索引和索引文件），返回音频 URL"""
+        record = {'key': key, 'synth_s': round(synth_s, 3), 'bytes': size, 'created': int(time.time())}
+        with self._lock:
+            self._entries[key] = {'synth_s': record['synth_s'], 'bytes': record['bytes']}
+            self.synth_seconds += synth_s if spent_s is None else spent_s
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        return self.url(key)
+
+    def stats(self) -> Dict:
+        """命中率、节省的合成时间和缓存大小"""
+        with self._lock:
+            result = {}
+            for level, counts in self._counts.items():
+                total = counts['hits'] + counts['misses']
+                result[level] = dict(counts, hit_rate=counts['hits'] / total if total else 0.0)
+            result.update({
+                'seconds_saved': round(self.seconds_saved, 3),
+                'synth_seconds': round(self.synth_seconds, 3),
+                'entries': len(self._entries),
+                'bytes': sum(entry['bytes'] for entry in self._entries.values())
+            })
+        return result
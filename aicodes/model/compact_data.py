@@ -0,0 +1,352 @@
+"""
+紧凑训练数据
+加载时降精度（int8/float32），特征存为单个连续矩阵，
+训练/测试集为同一矩阵上的视图，标准化原地完成
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from typing import Dict, List, Optional, Tuple
+
+from model.preprocessing import build_standard_scaler, identity_scale_columns
+
+
+def downcast_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    数值列降精度：整数列取能容纳取值范围的最小整数类型，浮点列转为 float32
+
+    Args:
+        df: 数据框（原地修改）
+
+    Returns:
+        DataFrame: 降精度后的数据框
+    """
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            df[col] = series.astype(np.int8)
+        elif pd.api.types.is_integer_dtype(series):
+            df[col] = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_float_dtype(series):
+            df[col] = series.astype(np.float32)
+    return df
+
+
+def load_compact(data_path: str, chunk_size: int = 200000) -> pd.DataFrame:
+    """
+    以紧凑类型加载数据
+
+    CSV 分块读取并逐块降精度，避免先构造完整的 int64/float64 数据框。
+
+    Args:
+        data_path: 数据文件路径
+        chunk_size: CSV 每块行数
+
+    Returns:
+        DataFrame: 紧凑类型的数据框
+    """
+    if data_path.endswith('.csv'):
+        chunks = [downcast_frame(chunk) for chunk in pd.read_csv(data_path, chunksize=chunk_size)]
+        # 各块降精度结果可能不同（如 int8 与 int16），合并后再统一一次
+        df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    elif data_path.endswith('.parquet'):
+        df = pd.read_parquet(data_path)
+    elif data_path.endswith('.xlsx'):
+        df = pd.read_excel(data_path)
+    else:
+        raise ValueError("不支持的文件格式")
+
+    return downcast_frame(df)
+
+
+def nbytes(obj) -> int:
+    """统计 DataFrame / Series / ndarray 占用的字节数"""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    return 0
+
+
+class MemoryReport:
+    """记录各阶段数据占用的内存"""
+
+    def __init__(self, name: str, n_rows: int):
+        """
+        初始化报告
+
+        Args:
+            name: 数据路径名称（如 legacy / compact）
+            n_rows: 样本数
+        """
+        self.name = name
+        self.n_rows = n_rows
+        self.stages: List[Dict] = []
+
+    def record(self, stage: str, new_bytes: int, live_bytes: int):
+        """
+        记录一个阶段
+
+        Args:
+            stage: 阶段名
+            new_bytes: 该阶段新分配的数据字节数
+            live_bytes: 该阶段结束时仍存活的数据字节数
+        """
+        self.stages.append({
+            'stage': stage,
+            'new_bytes': new_bytes,
+            'live_bytes': live_bytes,
+            'new_bytes_per_row': new_bytes / max(self.n_rows, 1),
+            'live_bytes_per_row': live_bytes / max(self.n_rows, 1)
+        })
+
+    def to_dict(self) -> Dict:
+        """转换为字典"""
+        return {'name': self.name, 'n_rows': self.n_rows, 'stages': self.stages}
+
+
+def format_memory_reports(before: MemoryReport, after: MemoryReport) -> str:
+    """
+    格式化前后对比表
+
+    Args:
+        before: 原始数据路径的报告
+        after: 紧凑数据路径的报告
+
+    Returns:
+        str: 文本表格
+    """
+    lines = [
+        f"{'阶段':<12}{before.name + ' 新增 B/行':>20}{before.name + ' 存活 B/行':>20}"
+        f"{after.name + ' 新增 B/行':>20}{after.name + ' 存活 B/行':>20}"
+    ]
+    after_stages = {s['stage']: s for s in after.stages}
+    for stage in before.stages:
+        other = after_stages.get(stage['stage'], {})
+        lines.append(
+            f"{stage['stage']:<12}"
+            f"{stage['new_bytes_per_row']:>20.1f}{stage['live_bytes_per_row']:>20.1f}"
+            f"{other.get('new_bytes_per_row', 0):>20.1f}{other.get('live_bytes_per_row', 0):>20.1f}"
+        )
+    return "\n".join(lines)
+
+
+def profile_legacy_memory(df: pd.DataFrame, target_col: str = 'cardio',
+                          test_size: float = 0.2, random_state: int = 42) -> MemoryReport:
+    """
+    按 XGBoostTrainer 原有步骤执行一遍预处理，记录各阶段内存
+
+    会实际分配原路径的全部中间结果，仅用于生成对比报告。
+
+    Args:
+        df: 原始（未降精度的）数据框
+        target_col: 目标列名
+        test_size: 测试集比例
+        random_state: 随机种子
+
+    Returns:
+        MemoryReport: 原路径的内存报告
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    report = MemoryReport('legacy', len(df))
+    live = nbytes(df)
+    report.record('load', live, live)
+
+    exclude_cols = [target_col] + (['id'] if 'id' in df.columns else [])
+    X = df.drop(columns=exclude_cols)
+    y = df[target_col]
+    if X.isnull().sum().sum() > 0:
+        X = X.fillna(X.mean(numeric_only=True))
+    categorical_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
+    if categorical_cols:
+        X = pd.get_dummies(X, columns=categorical_cols, drop_first=True)
+    new = nbytes(X) + nbytes(y)
+    live += new
+    report.record('preprocess', new, live)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state, stratify=y
+    )
+    new = nbytes(X_train) + nbytes(X_test) + nbytes(y_train) + nbytes(y_test)
+    live += new
+    report.record('split', new, live)
+
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    new = nbytes(X_train_scaled) + nbytes(X_test_scaled)
+    live += new
+    report.record('scale', new, live)
+
+    return report
+
+
+class CompactDataset:
+    """
+    紧凑训练数据集
+
+    特征矩阵按"训练行在前、测试行在后"的顺序一次性写入单个 C 连续的
+    float32 矩阵，X_train / X_test 都是该矩阵的切片视图，标准化原地完成。
+    """
+
+    def __init__(self, target_col: str = 'cardio', categorical_mode: str = 'onehot'):
+        """
+        初始化数据集
+
+        Args:
+            target_col: 目标列名
+            categorical_mode: 'onehot' 展开为哑变量，'native' 保留为单列类别编码
+        """
+        self.target_col = target_col
+        self.categorical_mode = categorical_mode
+        self.category_mapping: Dict[str, List] = {}
+        self.X: Optional[np.ndarray] = None
+        self.y: Optional[np.ndarray] = None
+        self.n_train = 0
+        self.feature_names: List[str] = []
+        self.scaler = None
+        self.report: Optional[MemoryReport] = None
+
+    def build(self, df: pd.DataFrame, test_size: float = 0.2, random_state: int = 42) -> 'CompactDataset':
+        """
+        由（已降精度的）数据框构建特征矩阵
+
+        Args:
+            df: 数据框
+            test_size: 测试集比例
+            random_state: 随机种子
+
+        Returns:
+            self
+        """
+        if self.target_col not in df.columns:
+            raise ValueError(f"目标列 '{self.target_col}' 不存在")
+
+        n_rows = len(df)
+        self.report = MemoryReport('compact', n_rows)
+        live = nbytes(df)
+        self.report.record('load', live, live)
+
+        exclude_cols = [self.target_col] + (['id'] if 'id' in df.columns else [])
+        feature_cols = [c for c in df.columns if c not in exclude_cols]
+        categorical_cols = [c for c in feature_cols
+                            if not pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+        numeric_cols = [c for c in feature_cols if c not in categorical_cols]
+        categories = {c: sorted(df[c].dropna().unique().tolist()) for c in categorical_cols}
+
+        native = self.categorical_mode == 'native'
+        if native:
+            # 原生分类：列顺序不变，类别列为单列编码
+            self.feature_names = list(feature_cols)
+            self.category_mapping = categories
+        else:
+            # 与 get_dummies 一致：数值列在前，哑变量（drop_first）在后
+            self.feature_names = list(numeric_cols)
+            for col in categorical_cols:
+                self.feature_names.extend(f"{col}_{c}" for c in categories[col][1:])
+
+        # 划分只作用在行号上：训练行在前、测试行在后
+        y_all = df[self.target_col].to_numpy()
+        train_idx, test_idx = train_test_split(
+            np.arange(n_rows, dtype=np.int64),
+            test_size=test_size,
+            random_state=random_state,
+            stratify=y_all
+        )
+        order = np.concatenate([train_idx, test_idx])
+        self.n_train = len(train_idx)
+        del train_idx, test_idx
+
+        # 逐列写入单个连续矩阵，临时内存只有一列
+        X = np.empty((n_rows, len(self.feature_names)), dtype=np.float32, order='C')
+        if native:
+            for j, col in enumerate(self.feature_names):
+                if col in categories:
+                    codes = pd.Categorical(df[col], categories=categories[col]).codes[order]
+                    X[:, j] = np.where(codes < 0, np.nan, codes)
+                else:
+                    X[:, j] = self._numeric_column(df[col])[order]
+        else:
+            j = 0
+            for col in numeric_cols:
+                X[:, j] = self._numeric_column(df[col])[order]
+                j += 1
+            for col in categorical_cols:
+                codes = pd.Categorical(df[col], categories=categories[col]).codes[order]
+                for k in range(1, len(categories[col])):
+                    X[:, j] = codes == k
+                    j += 1
+
+        self.X = X
+        self.y = y_all[order].astype(np.int8)
+        del order
+        new = nbytes(self.X) + nbytes(self.y)
+        self.report.record('preprocess', new, live + new)
+        live += new
+
+        # 划分是视图，不新增内存
+        self.report.record('split', 0, live)
+
+        self._scale_inplace()
+        self.report.record('scale', 0, live)
+
+        return self
+
+    @staticmethod
+    def _numeric_column(series: pd.Series) -> np.ndarray:
+        """取出数值列（float32），缺失值用均值填充"""
+        values = series.to_numpy(dtype=np.float32)
+        if np.isnan(values).any():
+            values = np.where(np.isnan(values), np.nanmean(values), values)
+        return values
+
+    def _scale_inplace(self):
+        """用训练行统计量原地标准化整个矩阵"""
+        X_train = self.X[:self.n_train]
+        n_features = self.X.shape[1]
+        mean = np.empty(n_features, dtype=np.float64)
+        var = np.empty(n_features, dtype=np.float64)
+        # 逐列以 float64 累加，避免整矩阵的 float64 临时副本
+        for j in range(n_features):
+            col = X_train[:, j]
+            mean[j] = col.mean(dtype=np.float64)
+            var[j] = col.var(dtype=np.float64)
+
+        self.scaler = build_standard_scaler(mean, var, self.n_train, self.feature_names)
+        # 原生分类列保持类别编码不变
+        if self.category_mapping:
+            identity_scale_columns(self.scaler, list(self.category_mapping))
+        self.X -= self.scaler.mean_.astype(np.float32)
+        self.X /= self.scaler.scale_.astype(np.float32)
+
+    def raw_test_columns(self, columns: List[str]) -> pd.DataFrame:
+        """
+        还原测试集指定列的原始取值（反标准化，仅复制所需列）
+
+        Args:
+            columns: 列名（不存在的列忽略）
+
+        Returns:
+            DataFrame: 测试集原始取值
+        """
+        data = {}
+        for col in columns:
+            if col in self.feature_names:
+                j = self.feature_names.index(col)
+                values = self.X[self.n_train:, j].astype(np.float64)
+                data[col] = values * self.scaler.scale_[j] + self.scaler.mean_[j]
+        return pd.DataFrame(data)
+
+    def splits(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        获取训练/测试集视图
+
+        Returns:
+            X_train, X_test, y_train, y_test
+        """
+        return (self.X[:self.n_train], self.X[self.n_train:],
+                self.y[:self.n_train], self.y[self.n_train:])
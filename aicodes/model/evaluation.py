@@ -0,0 +1,213 @@
+"""
+模型评估引擎
+一次打分，向量化计算 bootstrap 置信区间和分组（性别、年龄段、胆固醇）指标
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from utils.cardio_labels import AGE_BANDS, CHOLESTEROL_LABELS, GENDER_LABELS, age_in_years
+
+METRIC_NAMES = ('accuracy', 'precision', 'recall', 'f1_score', 'roc_auc')
+
+
+def build_subgroups(frame: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    由测试集原始特征构建分组掩码
+
+    Args:
+        frame: 测试集特征（未标准化），需包含 gender / age / cholesterol 中的若干列
+
+    Returns:
+        dict: 分组名 -> 布尔掩码
+    """
+    subgroups = {}
+
+    if 'gender' in frame.columns:
+        gender = np.rint(frame['gender'].to_numpy(dtype=np.float64))
+        for value, label in GENDER_LABELS.items():
+            subgroups[f'性别={label}'] = gender == value
+
+    if 'age' in frame.columns:
+        years = age_in_years(frame['age'].to_numpy())
+        for low, high, label in AGE_BANDS:
+            subgroups[f'年龄={label}'] = (years >= low) & (years < high)
+
+    if 'cholesterol' in frame.columns:
+        cholesterol = np.rint(frame['cholesterol'].to_numpy(dtype=np.float64))
+        for value, label in CHOLESTEROL_LABELS.items():
+            subgroups[f'胆固醇={label}'] = cholesterol == value
+
+    return subgroups
+
+
+def _safe_divide(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """逐元素除法，分母为 0 时结果为 0（与 sklearn zero_division=0 一致）"""
+    return np.divide(a, b, out=np.zeros_like(a), where=b > 0)
+
+
+def weighted_metrics(weights: np.ndarray,
+                     y_sorted: np.ndarray,
+                     pred_sorted: np.ndarray,
+                     group_starts: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    对多组样本权重同时计算分类指标
+
+    每一行权重代表一次"加权样本集"：bootstrap 重采样时为各样本被抽中的次数，
+    分组时为 0/1 掩码，二者相乘即为重采样后的分组。样本需预先按分数升序排列。
+
+    Args:
+        weights: (m, n) 样本权重矩阵
+        y_sorted: (n,) 按分数升序排列的真实标签
+        pred_sorted: (n,) 对应的预测标签
+        group_starts: 分数相同的样本组在排序数组中的起始下标
+
+    Returns:
+        dict: 指标名 -> (m,) 数组
+    """
+    pos = y_sorted.astype(np.float64)
+    neg = 1.0 - pos
+    pred = pred_sorted.astype(np.float64)
+
+    # 混淆矩阵四项都是权重与指示向量的矩阵乘法
+    tp = weights @ (pos * pred)
+    fp = weights @ (neg * pred)
+    fn = weights @ (pos * (1.0 - pred))
+    total = weights.sum(axis=1)
+    n_pos = weights @ pos
+    n_neg = total - n_pos
+
+    # ROC AUC：按分数分组累加正负样本权重，
+    # AUC = Σ 正样本权重 × (分数更低的负样本权重 + 0.5 × 同分负样本权重) / (P × N)
+    pos_by_score = np.add.reduceat(weights * pos, group_starts, axis=1)
+    neg_by_score = np.add.reduceat(weights * neg, group_starts, axis=1)
+    neg_below = np.cumsum(neg_by_score, axis=1) - neg_by_score
+    auc_numerator = (pos_by_score * (neg_below + 0.5 * neg_by_score)).sum(axis=1)
+    pairs = n_pos * n_neg
+    auc = np.divide(auc_numerator, pairs, out=np.full_like(auc_numerator, np.nan), where=pairs > 0)
+
+    return {
+        'accuracy': _safe_divide(total - fp - fn, total),
+        'precision': _safe_divide(tp, tp + fp),
+        'recall': _safe_divide(tp, n_pos),
+        'f1_score': _safe_divide(2 * tp, 2 * tp + fp + fn),
+        'roc_auc': auc
+    }
+
+
+class BootstrapEvaluator:
+    """Bootstrap 置信区间与分组指标评估器"""
+
+    def __init__(self,
+                 n_bootstrap: int = 1000,
+                 confidence: float = 0.95,
+                 threshold: float = 0.5,
+                 random_state: int = 42,
+                 max_batch_cells: int = 4000000):
+        """
+        初始化评估器
+
+        Args:
+            n_bootstrap: bootstrap 重复次数
+            confidence: 置信水平
+            threshold: 判为患病的概率阈值
+            random_state: 随机种子
+            max_batch_cells: 每批权重矩阵的最大元素数，用于限制内存
+        """
+        self.n_bootstrap = n_bootstrap
+        self.confidence = confidence
+        self.threshold = threshold
+        self.random_state = random_state
+        self.max_batch_cells = max_batch_cells
+
+    def evaluate(self,
+                 y_true: np.ndarray,
+                 y_proba: np.ndarray,
+                 subgroups: Optional[Dict[str, np.ndarray]] = None) -> Dict:
+        """
+        计算总体和各分组的点估计及置信区间
+
+        Args:
+            y_true: 真实标签
+            y_proba: 预测为患病的概率（只需打分一次）
+            subgroups: 分组名 -> 布尔掩码
+
+        Returns:
+            dict: {分组名: {'n', 'point': {指标: 值}, 'ci': {指标: [下限, 上限]}}}，
+                  总体结果的分组名为 'overall'
+        """
+        y_true = np.asarray(y_true).astype(np.int8)
+        y_proba = np.asarray(y_proba, dtype=np.float64)
+        n = len(y_true)
+
+        names = ['overall'] + list(subgroups or {})
+        masks = np.vstack([np.ones(n, dtype=bool)] + [np.asarray(m, dtype=bool) for m in (subgroups or {}).values()])
+
+        # 所有计算都在分数升序空间进行，AUC 无需再排序
+        order = np.argsort(y_proba, kind='mergesort')
+        scores = y_proba[order]
+        y_sorted = y_true[order]
+        pred_sorted = (scores >= self.threshold).astype(np.int8)
+        masks = masks[:, order].astype(np.float64)
+        group_starts = np.flatnonzero(np.r_[True, scores[1:] != scores[:-1]])
+
+        point = weighted_metrics(masks, y_sorted, pred_sorted, group_starts)
+
+        replicates = {metric: np.empty((self.n_bootstrap, len(names))) for metric in METRIC_NAMES}
+        if self.n_bootstrap > 0:
+            rng = np.random.default_rng(self.random_state)
+            batch = max(1, self.max_batch_cells // (n * len(names)))
+            for start in range(0, self.n_bootstrap, batch):
+                b = min(batch, self.n_bootstrap - start)
+                # 重采样下标矩阵 (b, n) -> 各样本被抽中次数 (b, n)；
+                # 重采样作用于原始顺序，再映射到排序空间
+                index = rng.integers(0, n, size=(b, n))
+                counts = np.bincount((index + np.arange(b)[:, None] * n).ravel(),
+                                     minlength=b * n).reshape(b, n)[:, order]
+                weights = (counts[:, None, :] * masks[None, :, :]).reshape(b * len(names), n)
+                values = weighted_metrics(weights, y_sorted, pred_sorted, group_starts)
+                for metric in METRIC_NAMES:
+                    replicates[metric][start:start + b] = values[metric].reshape(b, len(names))
+
+        alpha = (1 - self.confidence) / 2 * 100
+        report = {}
+        for g, name in enumerate(names):
+            entry = {
+                'n': int(masks[g].sum()),
+                'point': {metric: float(point[metric][g]) for metric in METRIC_NAMES}
+            }
+            if self.n_bootstrap > 0:
+                entry['ci'] = {
+                    metric: [float(v) for v in np.nanpercentile(replicates[metric][:, g], [alpha, 100 - alpha])]
+                    for metric in METRIC_NAMES
+                }
+            report[name] = entry
+
+        return report
+
+
+def format_evaluation_report(report: Dict, confidence: float = 0.95) -> str:
+    """
+    格式化评估报告为文本表格
+
+    Args:
+        report: BootstrapEvaluator.evaluate 的返回值
+        confidence: 置信水平（仅用于表头）
+
+    Returns:
+        str: 文本表格
+    """
+    header = f"{'分组':<14}{'样本数':>8}" + ''.join(f"{m:>26}" for m in METRIC_NAMES)
+    lines = [f"点估计 [{confidence:.0%} 置信区间]", header]
+    for name, entry in report.items():
+        cells: List[str] = []
+        for metric in METRIC_NAMES:
+            value = entry['point'][metric]
+            if 'ci' in entry:
+                low, high = entry['ci'][metric]
+                cells.append(f"{value:.4f} [{low:.4f}, {high:.4f}]".rjust(26))
+            else:
+                cells.append(f"{value:.4f}".rjust(26))
+        lines.append(f"{name:<14}{entry['n']:>8}" + ''.join(cells))
+    return "\n".join(lines)
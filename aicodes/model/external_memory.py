@@ -0,0 +1,325 @@
+"""
+外存训练
+分块读取 CSV/Parquet，通过 xgboost DataIter 流式训练，
+峰值内存只与分块大小相关，与数据集总行数无关
+"""
+
+import os
+import shutil
+import tempfile
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.preprocessing import StandardScaler
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from model.preprocessing import build_standard_scaler
+from utils.helpers import iter_data_chunks
+
+
+def hash_split_mask(offset: int, n_rows: int, test_size: float, seed: int = 42) -> np.ndarray:
+    """
+    按全局行号哈希划分测试集
+
+    同一行无论落在哪个数据块、第几次遍历，划分结果都相同，
+    因此多次流式遍历之间不需要保存任何索引。
+
+    Args:
+        offset: 数据块首行的全局行号
+        n_rows: 数据块行数
+        test_size: 测试集比例
+        seed: 随机种子
+
+    Returns:
+        np.ndarray: 布尔数组，True 表示该行属于测试集
+    """
+    # splitmix64 混合函数，uint64 乘法溢出即取模，符合预期
+    with np.errstate(over='ignore'):
+        x = np.arange(offset, offset + n_rows, dtype=np.uint64) + np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53) < test_size
+
+
+class StreamingPreprocessor:
+    """
+    流式预处理器
+
+    第一遍遍历只统计训练行的计数、均值、M2（Welford 合并）和分类取值频数，
+    据此得到与 fillna(mean) + get_dummies + StandardScaler 等价的变换参数，
+    之后逐块应用。
+    """
+
+    def __init__(self, target_col: str = 'cardio', test_size: float = 0.2, random_state: int = 42):
+        """
+        初始化预处理器
+
+        Args:
+            target_col: 目标列名
+            test_size: 测试集比例
+            random_state: 随机种子
+        """
+        self.target_col = target_col
+        self.test_size = test_size
+        self.random_state = random_state
+
+        self.numeric_cols: List[str] = []
+        self.categorical_cols: List[str] = []
+        self.categories: Dict[str, List] = {}
+        self.feature_names: List[str] = []
+        self.fill_values: Optional[np.ndarray] = None
+        self.mean_: Optional[np.ndarray] = None
+        self.scale_: Optional[np.ndarray] = None
+        self.scaler: Optional[StandardScaler] = None
+        self.n_train = 0
+        self.n_test = 0
+
+    def _feature_frame(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """去掉目标列和 id 列"""
+        exclude_cols = [self.target_col]
+        if 'id' in chunk.columns:
+            exclude_cols.append('id')
+        return chunk.drop(columns=exclude_cols)
+
+    def fit(self, chunks: Iterator[pd.DataFrame]) -> 'StreamingPreprocessor':
+        """
+        第一遍流式统计
+
+        Args:
+            chunks: 数据块迭代器
+
+        Returns:
+            self
+        """
+        count = mean = m2 = None
+        category_counts: Dict[str, pd.Series] = {}
+        offset = 0
+
+        for chunk in chunks:
+            if self.target_col not in chunk.columns:
+                raise ValueError(f"目标列 '{self.target_col}' 不存在")
+
+            test_mask = hash_split_mask(offset, len(chunk), self.test_size, self.random_state)
+            offset += len(chunk)
+            self.n_test += int(test_mask.sum())
+
+            X = self._feature_frame(chunk)[~test_mask]
+            self.n_train += len(X)
+
+            if count is None:
+                self.categorical_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
+                self.numeric_cols = [c for c in X.columns if c not in self.categorical_cols]
+                k = len(self.numeric_cols)
+                count, mean, m2 = np.zeros(k), np.zeros(k), np.zeros(k)
+
+            # 数值列：逐块 Welford 合并（Chan 并行公式），忽略缺失值
+            values = X[self.numeric_cols].to_numpy(dtype=np.float64)
+            present = ~np.isnan(values)
+            chunk_count = present.sum(axis=0)
+            chunk_sum = np.where(present, values, 0.0).sum(axis=0)
+            chunk_mean = np.divide(chunk_sum, chunk_count, out=np.zeros_like(chunk_sum), where=chunk_count > 0)
+            chunk_m2 = np.where(present, (values - chunk_mean) ** 2, 0.0).sum(axis=0)
+
+            total = count + chunk_count
+            delta = chunk_mean - mean
+            safe_total = np.where(total > 0, total, 1)
+            mean = mean + delta * chunk_count / safe_total
+            m2 = m2 + chunk_m2 + delta ** 2 * count * chunk_count / safe_total
+            count = total
+
+            # 分类列：累计取值频数
+            for col in self.categorical_cols:
+                counts = X[col].value_counts()
+                if col in category_counts:
+                    counts = counts.add(category_counts[col], fill_value=0)
+                category_counts[col] = counts
+
+        if count is None or self.n_train == 0:
+            raise ValueError("数据为空，无法训练")
+
+        # fillna(mean) 后的方差：缺失行贡献 0 偏差，但计入样本数
+        n = float(self.n_train)
+        numeric_var = m2 / n
+        means = [mean]
+        variances = [numeric_var]
+        self.feature_names = list(self.numeric_cols)
+
+        # get_dummies(drop_first=True) 的哑变量列：均值为频率 p，方差为 p(1-p)
+        for col in self.categorical_cols:
+            cats = sorted(category_counts[col].index.tolist())
+            self.categories[col] = cats
+            freq = np.array([category_counts[col].get(c, 0) for c in cats[1:]], dtype=np.float64) / n
+            means.append(freq)
+            variances.append(freq * (1 - freq))
+            self.feature_names.extend(f"{col}_{c}" for c in cats[1:])
+
+        self.fill_values = mean
+        self.scaler = build_standard_scaler(np.concatenate(means), np.concatenate(variances),
+                                            self.n_train, self.feature_names)
+        self.mean_ = self.scaler.mean_
+        self.scale_ = self.scaler.scale_
+
+        return self
+
+    def transform(self, chunk: pd.DataFrame, offset: int, subset: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        对单个数据块应用预处理
+
+        Args:
+            chunk: 数据块
+            offset: 数据块首行的全局行号
+            subset: 'train' 或 'test'
+
+        Returns:
+            (float32 特征矩阵, 目标数组)
+        """
+        test_mask = hash_split_mask(offset, len(chunk), self.test_size, self.random_state)
+        rows = test_mask if subset == 'test' else ~test_mask
+        chunk = chunk[rows]
+
+        X = self._feature_frame(chunk)
+        numeric = X[self.numeric_cols].to_numpy(dtype=np.float64)
+        numeric = np.where(np.isnan(numeric), self.fill_values, numeric)
+
+        parts = [numeric]
+        for col in self.categorical_cols:
+            cats = self.categories[col]
+            codes = pd.Categorical(X[col], categories=cats).codes
+            # 未见过的取值与缺失值一样编码为全 0
+            parts.append((codes[:, None] == np.arange(1, len(cats))[None, :]).astype(np.float64))
+
+        features = np.hstack(parts) if len(parts) > 1 else numeric
+        features -= self.mean_
+        features /= self.scale_
+
+        return features.astype(np.float32), chunk[self.target_col].to_numpy()
+
+
+class ChunkDataIter(xgb.DataIter):
+    """逐块向 xgboost 提供预处理后数据的迭代器"""
+
+    def __init__(self,
+                 chunk_source: Callable[[], Iterator[pd.DataFrame]],
+                 preprocessor: StreamingPreprocessor,
+                 subset: str,
+                 cache_prefix: str):
+        """
+        初始化迭代器
+
+        Args:
+            chunk_source: 每次调用返回一个新的数据块迭代器
+            preprocessor: 已拟合的流式预处理器
+            subset: 'train' 或 'test'
+            cache_prefix: xgboost 外存缓存文件前缀
+        """
+        self._chunk_source = chunk_source
+        self._preprocessor = preprocessor
+        self._subset = subset
+        self._chunks = None
+        self._offset = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data: Callable) -> bool:
+        """向 xgboost 提交下一块数据，没有更多数据时返回 False"""
+        if self._chunks is None:
+            self._chunks = self._chunk_source()
+
+        for chunk in self._chunks:
+            offset = self._offset
+            self._offset += len(chunk)
+            X, y = self._preprocessor.transform(chunk, offset, self._subset)
+            if len(y) == 0:
+                continue
+            input_data(data=X, label=y)
+            return True
+
+        return False
+
+    def reset(self):
+        """回到第一块"""
+        self._chunks = None
+        self._offset = 0
+
+
+def train_external_memory(data_path: str,
+                          target_col: str = 'cardio',
+                          chunk_size: int = 100000,
+                          test_size: float = 0.2,
+                          random_state: int = 42,
+                          num_boost_round: int = 100,
+                          params: Optional[Dict] = None,
+                          profiler=None) -> Dict:
+    """
+    外存模式训练 XGBoost 模型
+
+    Args:
+        data_path: 数据文件路径（.csv 或 .parquet）
+        target_col: 目标列名
+        chunk_size: 每块行数
+        test_size: 测试集比例
+        random_state: 随机种子
+        num_boost_round: 迭代轮数
+        params: xgboost 原生训练参数
+        profiler: 阶段性能分析器（utils.profiler.StageProfiler，可选）
+
+    Returns:
+        dict: model（XGBClassifier）、scaler、feature_names、
+              preprocessor、y_test、y_pred_proba
+    """
+    def chunk_source():
+        return iter_data_chunks(data_path, chunk_size)
+
+    def stage(name):
+        return profiler.stage(name) if profiler is not None else nullcontext()
+
+    # 第一遍：流式统计标准化参数
+    with stage('scan'):
+        preprocessor = StreamingPreprocessor(target_col, test_size, random_state).fit(chunk_source())
+
+    train_params = {
+        'objective': 'binary:logistic',
+        'eval_metric': 'logloss',
+        'tree_method': 'hist',
+        'seed': random_state
+    }
+    train_params.update(params or {})
+
+    cache_dir = tempfile.mkdtemp(prefix='xgb_extmem_')
+    try:
+        # 第二遍起：xgboost 逐块拉取数据，分页写入磁盘缓存
+        with stage('fit'):
+            train_iter = ChunkDataIter(chunk_source, preprocessor, 'train',
+                                       os.path.join(cache_dir, 'train'))
+            dtrain = xgb.DMatrix(train_iter)
+            booster = xgb.train(train_params, dtrain, num_boost_round=num_boost_round)
+            del dtrain
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    # 测试集逐块预测，只保留目标值和概率两个一维数组
+    y_parts, proba_parts = [], []
+    offset = 0
+    with stage('evaluate'):
+        for chunk in chunk_source():
+            X, y = preprocessor.transform(chunk, offset, 'test')
+            offset += len(chunk)
+            if len(y):
+                y_parts.append(y)
+                proba_parts.append(booster.inplace_predict(X))
+
+    # 转为 XGBClassifier，保存后与常规训练产物的加载和预测方式一致
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(booster.save_raw('json')))
+
+    return {
+        'model': model,
+        'scaler': preprocessor.scaler,
+        'feature_names': preprocessor.feature_names,
+        'preprocessor': preprocessor,
+        'y_test': np.concatenate(y_parts) if y_parts else np.array([]),
+        'y_pred_proba': np.concatenate(proba_parts) if proba_parts else np.array([])
+    }
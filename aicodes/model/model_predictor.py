@@ -9,6 +9,8 @@ import pandas as pd
 from typing import Union, List, Dict
 import os
 
+from model.preprocessing import apply_category_mapping
+
 
 class ModelPredictor:
     """模型预测器类"""
@@ -24,6 +26,7 @@ class ModelPredictor:
         self.model = None
         self.scaler = None
         self.feature_names = None
+        self.category_mapping = {}
         
     def load_model(self):
         """加载模型、标准化器和特征名"""
@@ -38,6 +41,10 @@ class ModelPredictor:
         self.scaler = joblib.load(scaler_path)
         self.feature_names = joblib.load(features_path)
         
+        # 原生分类模型附带类别映射
+        mapping_path = os.path.join(self.model_dir, 'category_mapping.pkl')
+        self.category_mapping = joblib.load(mapping_path) if os.path.exists(mapping_path) else {}
+        
         print("模型加载成功")
     
     def predict(self, features: Union[Dict, pd.DataFrame, np.ndarray]) -> Dict:
@@ -63,6 +70,8 @@ class ModelPredictor:
         
         # 确保特征顺序正确
         df = df[self.feature_names]
+        if self.category_mapping:
+            df = apply_category_mapping(df, self.category_mapping)
         
         # 标准化
         features_scaled = self.scaler.transform(df)
@@ -97,6 +106,8 @@ class ModelPredictor:
         
         df = pd.DataFrame(features_list)
         df = df[self.feature_names]
+        if self.category_mapping:
+            df = apply_category_mapping(df, self.category_mapping)
         
         features_scaled = self.scaler.transform(df)
         
@@ -0,0 +1,103 @@
+"""
+预处理辅助函数
+标准化器构造、原生分类特征编码
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from typing import Dict, List
+
+
+def build_standard_scaler(mean: np.ndarray,
+                          var: np.ndarray,
+                          n_samples: int,
+                          feature_names: List[str]) -> StandardScaler:
+    """
+    由均值和方差构造 StandardScaler
+
+    结果与在同一数据上调用 StandardScaler.fit 等价，
+    保存后可被预测服务直接加载使用。
+
+    Args:
+        mean: 各特征均值
+        var: 各特征方差（总体方差）
+        n_samples: 样本数
+        feature_names: 特征名
+
+    Returns:
+        StandardScaler: 已"拟合"的标准化器
+    """
+    mean = np.asarray(mean, dtype=np.float64)
+    var = np.asarray(var, dtype=np.float64)
+    scale = np.sqrt(var)
+
+    scaler = StandardScaler()
+    scaler.mean_ = mean
+    scaler.var_ = var
+    # 与 sklearn 一致：方差为 0 的特征不缩放
+    scaler.scale_ = np.where(scale > np.finfo(np.float64).eps, scale, 1.0)
+    scaler.n_samples_seen_ = int(n_samples)
+    scaler.n_features_in_ = len(feature_names)
+    scaler.feature_names_in_ = np.array(feature_names, dtype=object)
+
+    return scaler
+
+
+def identity_scale_columns(scaler: StandardScaler, columns: List[str]) -> StandardScaler:
+    """
+    令指定列在标准化时保持原值（均值 0、缩放 1）
+
+    原生分类特征的取值是类别编码，不能参与标准化。
+
+    Args:
+        scaler: 已拟合的标准化器（原地修改）
+        columns: 保持原值的列名
+
+    Returns:
+        StandardScaler: 修改后的标准化器
+    """
+    names = list(scaler.feature_names_in_)
+    for col in columns:
+        j = names.index(col)
+        scaler.mean_[j] = 0.0
+        scaler.var_[j] = 1.0
+        scaler.scale_[j] = 1.0
+    return scaler
+
+
+def encode_category(value, categories: List) -> float:
+    """
+    将单个分类取值转换为类别编码
+
+    Args:
+        value: 原始取值
+        categories: 训练时的类别列表
+
+    Returns:
+        float: 类别编码，未知取值返回 NaN（xgboost 视为缺失值）
+    """
+    try:
+        return float(categories.index(value))
+    except ValueError:
+        return float('nan')
+
+
+def apply_category_mapping(df: pd.DataFrame, category_mapping: Dict[str, List]) -> pd.DataFrame:
+    """
+    将数据框中的分类列转换为类别编码
+
+    Args:
+        df: 数据框
+        category_mapping: 列名 -> 训练时的类别列表
+
+    Returns:
+        DataFrame: 转换后的数据框（副本）
+    """
+    df = df.copy()
+    for col, categories in category_mapping.items():
+        if col in df.columns:
+            codes = pd.Categorical(df[col], categories=categories).codes.astype(np.float64)
+            codes[codes < 0] = np.nan
+            df[col] = codes
+    return df
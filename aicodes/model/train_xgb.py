@@ -18,6 +18,7 @@ from sklearn.metrics import (
     roc_auc_score
 )
 import joblib
+import json
 import os
 import sys
 
@@ -25,6 +26,11 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.logger import setup_logger
+from model.external_memory import train_external_memory
+from model.compact_data import CompactDataset, load_compact, profile_legacy_memory, format_memory_reports
+from model.preprocessing import identity_scale_columns
+from utils.profiler import StageProfiler
+from model.evaluation import BootstrapEvaluator, build_subgroups, format_evaluation_report
 
 # 设置日志
 logger = setup_logger('train_xgb', log_dir='./logs')
@@ -33,23 +39,33 @@ logger = setup_logger('train_xgb', log_dir='./logs')
 class XGBoostTrainer:
     """XGBoost 模型训练器"""
     
-    def __init__(self, data_path: str, target_col: str = 'cardio'):
+    def __init__(self, data_path: str, target_col: str = 'cardio', categorical_mode: str = 'onehot'):
         """
         初始化训练器
         
         Args:
             data_path: 数据文件路径
             target_col: 目标列名
+            categorical_mode: 分类变量处理方式，'onehot' 为 get_dummies 展开，
+                              'native' 为保留类别编码并使用 xgboost 原生分类支持
         """
+        if categorical_mode not in ('onehot', 'native'):
+            raise ValueError(f"不支持的分类变量处理方式: {categorical_mode}")
+        
         self.data_path = data_path
         self.target_col = target_col
+        self.categorical_mode = categorical_mode
         self.model = None
         self.scaler = None
         self.feature_names = None
+        self.category_mapping = {}
+        self.profiler = None
+        self.evaluation_report = None
         
         logger.info(f"初始化 XGBoost 训练器")
         logger.info(f"数据路径: {data_path}")
         logger.info(f"目标列: {target_col}")
+        logger.info(f"分类变量处理: {categorical_mode}")
     
     def load_data(self):
         """加载数据"""
@@ -60,6 +76,8 @@ class XGBoostTrainer:
                 df = pd.read_excel(self.data_path)
             elif self.data_path.endswith('.csv'):
                 df = pd.read_csv(self.data_path)
+            elif self.data_path.endswith('.parquet'):
+                df = pd.read_parquet(self.data_path)
             else:
                 raise ValueError("不支持的文件格式")
             
@@ -100,15 +118,24 @@ class XGBoostTrainer:
         self.feature_names = X.columns.tolist()
         logger.info(f"特征列: {self.feature_names}")
         
-        # 处理缺失值
+        # 处理缺失值（分类列的缺失值保留，one-hot 为全 0，原生模式为缺失编码）
         if X.isnull().sum().sum() > 0:
             logger.warning("发现缺失值，使用均值填充")
-            X = X.fillna(X.mean())
+            X = X.fillna(X.mean(numeric_only=True))
         
-        # 检查是否有分类变量需要 one-hot 编码
+        # 检查是否有分类变量需要编码
         categorical_cols = X.select_dtypes(include=['object', 'category']).columns.tolist()
-        
-        if categorical_cols:
+        self.category_mapping = {}
+        
+        if categorical_cols and self.categorical_mode == 'native':
+            # 保留为类别编码，类别列表随模型保存，预测时按同一映射编码
+            logger.info(f"分类变量保留为类别编码: {categorical_cols}")
+            X = X.copy()
+            for col in categorical_cols:
+                categorical = X[col].astype('category')
+                self.category_mapping[col] = categorical.cat.categories.tolist()
+                X[col] = categorical.cat.codes.replace(-1, np.nan).astype(np.float64)
+        elif categorical_cols:
             logger.info(f"对分类变量进行 one-hot 编码: {categorical_cols}")
             X = pd.get_dummies(X, columns=categorical_cols, drop_first=True)
             self.feature_names = X.columns.tolist()
@@ -146,6 +173,34 @@ class XGBoostTrainer:
         
         return X_train, X_test, y_train, y_test
     
+    def prepare_compact_data(self, df, test_size=0.2, random_state=42):
+        """
+        紧凑数据路径：预处理、划分、标准化一次完成
+        
+        特征写入单个 float32 连续矩阵，训练/测试集为视图，标准化原地进行。
+        
+        Args:
+            df: 以紧凑类型加载的数据框
+            test_size: 测试集比例
+            random_state: 随机种子
+            
+        Returns:
+            CompactDataset: 紧凑数据集
+        """
+        logger.info("构建紧凑特征矩阵...")
+        
+        dataset = CompactDataset(self.target_col, self.categorical_mode).build(df, test_size, random_state)
+        self.feature_names = dataset.feature_names
+        self.scaler = dataset.scaler
+        self.category_mapping = dataset.category_mapping
+        
+        logger.info(f"特征列: {self.feature_names}")
+        logger.info(f"特征矩阵: {dataset.X.shape}, {dataset.X.dtype}, {dataset.X.nbytes / 1024 / 1024:.2f} MB")
+        logger.info(f"训练集大小: {dataset.n_train}")
+        logger.info(f"测试集大小: {len(dataset.y) - dataset.n_train}")
+        
+        return dataset
+    
     def standardize_features(self, X_train, X_test):
         """
         标准化特征
@@ -160,7 +215,13 @@ class XGBoostTrainer:
         logger.info("标准化特征...")
         
         self.scaler = StandardScaler()
-        X_train_scaled = self.scaler.fit_transform(X_train)
+        self.scaler.fit(X_train)
+        
+        # 原生分类列保持类别编码不变
+        if self.category_mapping:
+            identity_scale_columns(self.scaler, list(self.category_mapping))
+        
+        X_train_scaled = self.scaler.transform(X_train)
         X_test_scaled = self.scaler.transform(X_test)
         
         logger.info("特征标准化完成")
@@ -190,6 +251,14 @@ class XGBoostTrainer:
             'use_label_encoder': False
         }
         
+        # 原生分类支持：标记类别列，需要 hist 树方法
+        if self.category_mapping:
+            default_params['tree_method'] = 'hist'
+            default_params['enable_categorical'] = True
+            default_params['feature_types'] = [
+                'c' if name in self.category_mapping else 'q' for name in self.feature_names
+            ]
+        
         # 更新参数
         default_params.update(params)
         
@@ -201,22 +270,24 @@ class XGBoostTrainer:
         
         logger.info("模型训练完成")
     
-    def evaluate_model(self, X_test, y_test):
+    def evaluate_model(self, X_test, y_test, subgroup_frame=None, n_bootstrap=0):
         """
         评估模型
         
         Args:
             X_test: 测试集特征
             y_test: 测试集目标
+            subgroup_frame: 测试集原始特征（未标准化），用于按性别/年龄段/胆固醇分组
+            n_bootstrap: bootstrap 重复次数，0 表示只计算点估计
             
         Returns:
             metrics: 评估指标字典
         """
         logger.info("评估模型性能...")
         
-        # 预测
-        y_pred = self.model.predict(X_test)
+        # 只打分一次，类别由概率阈值得到（与 XGBClassifier.predict 一致）
         y_pred_proba = self.model.predict_proba(X_test)[:, 1]
+        y_pred = (y_pred_proba >= 0.5).astype(int)
         
         # 计算指标
         metrics = {
@@ -254,8 +325,37 @@ class XGBoostTrainer:
         for metric, value in metrics.items():
             logger.info(f"{metric}: {value:.4f}")
         
+        if n_bootstrap > 0 or subgroup_frame is not None:
+            self.bootstrap_evaluate(y_test, y_pred_proba, subgroup_frame, n_bootstrap)
+        
         return metrics
     
+    def bootstrap_evaluate(self, y_test, y_pred_proba, subgroup_frame=None, n_bootstrap=1000):
+        """
+        计算 bootstrap 置信区间和分组指标
+        
+        所有重复和分组在一个向量化引擎中完成，结果保存在 self.evaluation_report，
+        随模型一起写入 evaluation_report.json。
+        
+        Args:
+            y_test: 测试集目标
+            y_pred_proba: 测试集预测概率
+            subgroup_frame: 测试集原始特征（未标准化）
+            n_bootstrap: bootstrap 重复次数
+            
+        Returns:
+            dict: 评估报告
+        """
+        logger.info(f"计算 bootstrap 置信区间 (B={n_bootstrap}) 和分组指标...")
+        
+        subgroups = build_subgroups(subgroup_frame) if subgroup_frame is not None else None
+        evaluator = BootstrapEvaluator(n_bootstrap=n_bootstrap)
+        self.evaluation_report = evaluator.evaluate(np.asarray(y_test), y_pred_proba, subgroups)
+        
+        logger.info(f"评估报告:\n{format_evaluation_report(self.evaluation_report, evaluator.confidence)}")
+        
+        return self.evaluation_report
+    
     def save_model(self, model_dir='./model'):
         """
         保存模型和预处理器
@@ -283,6 +383,23 @@ class XGBoostTrainer:
         joblib.dump(self.feature_names, features_path)
         logger.info(f"特征名已保存: {features_path}")
         
+        # 保存评估报告（置信区间和分组指标，仅 bootstrap 评估时），避免残留其他模型的报告
+        report_path = os.path.join(model_dir, 'evaluation_report.json')
+        if self.evaluation_report:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(self.evaluation_report, f, ensure_ascii=False, indent=2)
+            logger.info(f"评估报告已保存: {report_path}")
+        elif os.path.exists(report_path):
+            os.remove(report_path)
+        
+        # 保存类别映射（仅原生分类模式），避免残留旧映射被预测服务误用
+        mapping_path = os.path.join(model_dir, 'category_mapping.pkl')
+        if self.category_mapping:
+            joblib.dump(self.category_mapping, mapping_path)
+            logger.info(f"类别映射已保存: {mapping_path}")
+        elif os.path.exists(mapping_path):
+            os.remove(mapping_path)
+        
         print(f"\n✅ 模型文件已保存到: {os.path.abspath(model_dir)}")
     
     def get_feature_importance(self):
@@ -300,60 +417,229 @@ class XGBoostTrainer:
         
         return importance_df
     
-    def run_full_pipeline(self, test_size=0.2, **model_params):
+    def run_full_pipeline(self, test_size=0.2, compact=False, memory_report=False,
+                          model_dir='./model', profile_stage=None, n_bootstrap=0, **model_params):
         """
         运行完整的训练流程
         
+        每个阶段的墙钟时间、CPU 时间和峰值内存都会记录下来，
+        训练结束后在模型目录写入 JSON 时间线和 Chrome trace 文件。
+        
         Args:
             test_size: 测试集比例
+            compact: 是否使用紧凑数据路径（int8/float32、视图划分、原地标准化）
+            memory_report: 紧凑模式下额外执行一遍原路径，输出各阶段每行字节数对比
+            model_dir: 模型保存目录
+            profile_stage: 需要运行 cProfile 的阶段名（如 'fit'）
+            n_bootstrap: bootstrap 重复次数，大于 0 时输出置信区间和分组指标
             **model_params: 模型参数
         """
         logger.info("=" * 50)
         logger.info("开始完整训练流程")
         logger.info("=" * 50)
         
-        # 1. 加载数据
-        df = self.load_data()
-        
-        # 2. 预处理
-        X, y = self.preprocess_data(df)
+        self.profiler = StageProfiler('training', profile_stage=profile_stage)
+        stage = self.profiler.stage
         
-        # 3. 划分数据集
-        X_train, X_test, y_train, y_test = self.split_data(X, y, test_size)
-        
-        # 4. 标准化
-        X_train_scaled, X_test_scaled = self.standardize_features(X_train, X_test)
+        if compact:
+            # 1. 以紧凑类型加载数据
+            with stage('load'):
+                df = load_compact(self.data_path)
+            logger.info(f"紧凑加载完成，形状: {df.shape}, 内存: {df.memory_usage(deep=True).sum() / 1024 / 1024:.2f} MB")
+            
+            # 2-4. 预处理、划分、标准化
+            with stage('preprocess'):
+                dataset = self.prepare_compact_data(df, test_size)
+                del df
+                X_train_scaled, X_test_scaled, y_train, y_test = dataset.splits()
+                subgroup_frame = dataset.raw_test_columns(['gender', 'age', 'cholesterol'])
+            
+            if memory_report:
+                with stage('memory_report'):
+                    legacy_report = profile_legacy_memory(self.load_data(), self.target_col, test_size)
+                table = format_memory_reports(legacy_report, dataset.report)
+                logger.info(f"内存对比（字节/行）:\n{table}")
+        else:
+            # 1. 加载数据
+            with stage('load'):
+                df = self.load_data()
+            
+            # 2. 预处理
+            with stage('preprocess'):
+                X, y = self.preprocess_data(df)
+            
+            # 3. 划分数据集
+            with stage('split'):
+                X_train, X_test, y_train, y_test = self.split_data(X, y, test_size)
+            
+            # 4. 标准化
+            with stage('scale'):
+                X_train_scaled, X_test_scaled = self.standardize_features(X_train, X_test)
+            subgroup_frame = X_test
         
         # 5. 训练模型
-        self.train_model(X_train_scaled, y_train, **model_params)
+        with stage('fit'):
+            self.train_model(X_train_scaled, y_train, **model_params)
         
         # 6. 评估模型
-        metrics = self.evaluate_model(X_test_scaled, y_test)
+        with stage('evaluate'):
+            metrics = self.evaluate_model(
+                X_test_scaled, y_test,
+                subgroup_frame=subgroup_frame if n_bootstrap > 0 else None,
+                n_bootstrap=n_bootstrap
+            )
         
         # 7. 特征重要性
-        self.get_feature_importance()
+        with stage('importance'):
+            self.get_feature_importance()
         
         # 8. 保存模型
-        self.save_model()
+        with stage('save'):
+            self.save_model(model_dir)
+        
+        self.save_profile(model_dir)
         
         logger.info("=" * 50)
         logger.info("训练流程完成")
         logger.info("=" * 50)
         
         return metrics
+    
+    def save_profile(self, model_dir='./model'):
+        """
+        输出阶段耗时汇总，并在模型目录保存时间线和 trace 文件
+        
+        Args:
+            model_dir: 模型保存目录
+        """
+        logger.info(f"各阶段耗时:\n{self.profiler.summary()}")
+        for kind, path in self.profiler.save(model_dir).items():
+            logger.info(f"性能分析文件已保存 ({kind}): {path}")
+    
+    def run_external_memory_pipeline(self, chunk_size=100000, test_size=0.2, random_state=42,
+                                     model_dir='./model', profile_stage=None, n_bootstrap=0, **model_params):
+        """
+        外存模式训练流程
+        
+        数据按块从 CSV/Parquet 流式读取：第一遍统计标准化参数，
+        之后通过 xgboost DataIter 逐块训练，峰值内存只与 chunk_size 相关。
+        保存的模型文件与 run_full_pipeline 完全兼容。
+        
+        Args:
+            chunk_size: 每块行数
+            test_size: 测试集比例
+            random_state: 随机种子
+            model_dir: 模型保存目录
+            profile_stage: 需要运行 cProfile 的阶段名（如 'fit'）
+            n_bootstrap: bootstrap 重复次数（外存模式不保留原始特征，只计算总体置信区间）
+            **model_params: 模型参数（同 train_model）
+        """
+        logger.info("=" * 50)
+        logger.info(f"开始外存训练流程，分块大小: {chunk_size}")
+        logger.info("=" * 50)
+        
+        if self.categorical_mode == 'native':
+            logger.warning("外存模式暂不支持原生分类，分类变量使用 one-hot 编码")
+        self.category_mapping = {}
+        
+        # 与 train_model 相同的默认参数，n_estimators 对应原生接口的迭代轮数
+        params = {
+            'max_depth': 6,
+            'learning_rate': 0.1,
+            'subsample': 0.8,
+            'colsample_bytree': 0.8
+        }
+        params.update(model_params)
+        num_boost_round = params.pop('n_estimators', 100)
+        params.pop('random_state', None)
+        params.pop('use_label_encoder', None)
+        logger.info(f"模型参数: {params}, 迭代轮数: {num_boost_round}")
+        
+        self.profiler = StageProfiler('training', profile_stage=profile_stage)
+        
+        result = train_external_memory(
+            self.data_path,
+            target_col=self.target_col,
+            chunk_size=chunk_size,
+            test_size=test_size,
+            random_state=random_state,
+            num_boost_round=num_boost_round,
+            params=params,
+            profiler=self.profiler
+        )
+        
+        self.model = result['model']
+        self.scaler = result['scaler']
+        self.feature_names = result['feature_names']
+        
+        preprocessor = result['preprocessor']
+        logger.info(f"训练集大小: {preprocessor.n_train}")
+        logger.info(f"测试集大小: {preprocessor.n_test}")
+        
+        # 评估：测试集概率已逐块算出
+        y_test = result['y_test']
+        y_pred_proba = result['y_pred_proba']
+        y_pred = (y_pred_proba >= 0.5).astype(int)
+        metrics = {
+            'accuracy': accuracy_score(y_test, y_pred),
+            'precision': precision_score(y_test, y_pred),
+            'recall': recall_score(y_test, y_pred),
+            'f1_score': f1_score(y_test, y_pred),
+            'roc_auc': roc_auc_score(y_test, y_pred_proba)
+        }
+        for metric, value in metrics.items():
+            logger.info(f"{metric}: {value:.4f}")
+        
+        if n_bootstrap > 0:
+            with self.profiler.stage('bootstrap'):
+                self.bootstrap_evaluate(y_test, y_pred_proba, n_bootstrap=n_bootstrap)
+        
+        with self.profiler.stage('importance'):
+            self.get_feature_importance()
+        with self.profiler.stage('save'):
+            self.save_model(model_dir)
+        
+        self.save_profile(model_dir)
+        
+        logger.info("=" * 50)
+        logger.info("外存训练流程完成")
+        logger.info("=" * 50)
+        
+        return metrics
+
+
+def parse_args():
+    """解析命令行参数"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='训练 XGBoost 心血管疾病预测模型')
+    parser.add_argument('--data', default="D:/project/workspace/ai_coding/data/心血管疾病.xlsx",
+                        help='数据文件路径')
+    parser.add_argument('--external-memory', action='store_true',
+                        help='外存模式：分块流式训练（仅支持 .csv / .parquet）')
+    parser.add_argument('--chunk-size', type=int, default=100000,
+                        help='外存模式每块行数')
+    parser.add_argument('--compact', action='store_true',
+                        help='紧凑数据路径：int8/float32、视图划分、原地标准化')
+    parser.add_argument('--memory-report', action='store_true',
+                        help='紧凑模式下输出与原路径的每行内存对比')
+    parser.add_argument('--categorical', choices=['onehot', 'native'], default='onehot',
+                        help='分类变量处理方式：onehot 展开或 xgboost 原生分类')
+    parser.add_argument('--profile-stage', default=None,
+                        help='对指定阶段运行 cProfile（如 fit、preprocess）')
+    parser.add_argument('--bootstrap', type=int, default=0,
+                        help='bootstrap 重复次数，输出置信区间和分组指标（如 1000）')
+    return parser.parse_args()
 
 
 def main():
     """主函数"""
-    # 数据路径
-    data_path = "D:/project/workspace/ai_coding/data/心血管疾病.xlsx"
+    args = parse_args()
     
     # 创建训练器
-    trainer = XGBoostTrainer(data_path, target_col='cardio')
+    trainer = XGBoostTrainer(args.data, target_col='cardio', categorical_mode=args.categorical)
     
-    # 运行完整训练流程
-    metrics = trainer.run_full_pipeline(
-        test_size=0.2,
+    model_params = dict(
         n_estimators=100,
         max_depth=6,
         learning_rate=0.1,
@@ -361,6 +647,25 @@ def main():
         colsample_bytree=0.8
     )
     
+    # 运行完整训练流程
+    if args.external_memory:
+        metrics = trainer.run_external_memory_pipeline(
+            chunk_size=args.chunk_size,
+            test_size=0.2,
+            profile_stage=args.profile_stage,
+            n_bootstrap=args.bootstrap,
+            **model_params
+        )
+    else:
+        metrics = trainer.run_full_pipeline(
+            test_size=0.2,
+            compact=args.compact,
+            memory_report=args.memory_report,
+            profile_stage=args.profile_stage,
+            n_bootstrap=args.bootstrap,
+            **model_params
+        )
+    
     print("\n" + "=" * 50)
     print("🎉 训练完成！")
     print("=" * 50)
@@ -0,0 +1,72 @@
+"""
+启动异步（ASGI）服务器
+语音问答接口在事件循环中处理，其余接口与 run_server.py 相同
+"""
+
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from api.asgi_app import create_asgi_app
+from utils.logger import setup_logger
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+# 设置日志
+logger = setup_logger('server', log_dir='./logs')
+
+
+def main():
+    """主函数"""
+    logger.info("=" * 50)
+    logger.info("启动心血管疾病预测服务器（ASGI）")
+    logger.info("=" * 50)
+
+    if uvicorn is None:
+        print("❌ 异步服务需要安装 uvicorn: pip install uvicorn")
+        sys.exit(1)
+
+    # 创建应用
+    try:
+        app = create_asgi_app()
+    except ImportError as e:
+        logger.error(str(e))
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    # 配置
+    host = '0.0.0.0'
+    port = 5000
+
+    logger.info(f"主机: {host}")
+    logger.info(f"端口: {port}")
+    logger.info("=" * 50)
+
+    # 打印访问地址
+    print("\n" + "=" * 60)
+    print("🚀 心血管疾病预测服务器（ASGI）启动成功！")
+    print("=" * 60)
+    print("\n访问地址:")
+    print(f"  📊 预测页面: http://localhost:{port}/web/predict.html")
+    print(f"  🎙️ 语音问答: http://localhost:{port}/web/qa_audio.html")
+    print(f"  🔌 API 接口: http://localhost:{port}/predict")
+    print(f"  📖 API 文档: http://localhost:{port}/")
+    print("\n按 Ctrl+C 停止服务器")
+    print("=" * 60 + "\n")
+
+    # 启动服务器（单进程单事件循环，语音问答请求在循环中并发处理）
+    try:
+        uvicorn.run(app, host=host, port=port, log_level='info')
+    except Exception as e:
+        logger.error(f"服务器启动失败: {e}")
+        print(f"\n❌ 服务器启动失败: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
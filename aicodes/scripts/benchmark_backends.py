@@ -0,0 +1,155 @@
+"""
+分析后端基准测试脚本
+由源数据有放回抽样生成指定行数的 Parquet 文件，比较 pandas / polars / duckdb 后端
+在加载、描述统计、相关矩阵、交叉表、计数和"过滤 + 投影"查询上的耗时与峰值内存
+"""
+
+import sys
+import os
+import argparse
+import multiprocessing
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.backends import BACKENDS, create_backend
+from analysis.data_analysis import CATEGORICAL_FEATURES
+from utils.config import Config
+from utils.profiler import StageProfiler
+
+STAGES = ['load', 'describe', 'corr', 'crosstab', 'value_counts', 'filtered']
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='分析后端基准测试')
+    parser.add_argument('--data', default=None, help='源数据文件路径（默认使用配置中的 DATA_PATH）')
+    parser.add_argument('--rows', default='70000,10000000', help='测试行数，逗号分隔')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='参与测试的后端，逗号分隔')
+    parser.add_argument('--output-dir', default=None, help='生成的测试数据目录（默认系统临时目录）')
+    parser.add_argument('--batch-rows', type=int, default=1000000, help='生成数据时每批行数')
+    return parser.parse_args()
+
+
+def make_dataset(source: pd.DataFrame, n_rows: int, path: str, batch_rows: int, seed: int = 0) -> str:
+    """
+    由源数据有放回抽样生成 n_rows 行的 Parquet 文件（已存在时直接使用）
+
+    Args:
+        source: 源数据
+        n_rows: 行数
+        path: 输出路径
+        batch_rows: 每批行数（内存只与批大小有关）
+        seed: 随机种子
+
+    Returns:
+        str: 文件路径
+    """
+    if os.path.exists(path):
+        return path
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rng = np.random.default_rng(seed)
+    writer = None
+    try:
+        for start in range(0, n_rows, batch_rows):
+            size = min(batch_rows, n_rows - start)
+            batch = source.iloc[rng.integers(0, len(source), size)].reset_index(drop=True)
+            if 'id' in batch.columns:
+                batch['id'] = np.arange(start, start + size)
+            table = pa.Table.from_pandas(batch, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(f"{path}.tmp", table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def run_backend(name: str, data_path: str) -> list:
+    """
+    在独立进程中运行一个后端的全部测试阶段（峰值内存互不影响）
+
+    Args:
+        name: 后端名
+        data_path: 数据文件路径
+
+    Returns:
+        list: 各阶段记录（StageProfiler.stages）
+    """
+    profiler = StageProfiler(name)
+
+    backend = create_backend(name, data_path)
+    with profiler.stage('load'):
+        backend.load()
+        backend.fill_missing_with_mean()
+        backend.n_rows()
+    with profiler.stage('describe'):
+        backend.describe()
+    with profiler.stage('corr'):
+        backend.corr()
+    with profiler.stage('crosstab'):
+        for feature in CATEGORICAL_FEATURES:
+            backend.crosstab(feature, 'cardio', normalize='index')
+    with profiler.stage('value_counts'):
+        backend.value_counts('cardio')
+
+    # 过滤 + 投影：只需要 4 列和胆固醇很高的行，惰性后端下推到 Parquet 扫描
+    with profiler.stage('filtered'):
+        filtered = create_backend(name, data_path, columns=['age', 'ap_hi', 'ap_lo', 'cardio'],
+                                  filters=[('cholesterol', '==', 3)])
+        filtered.load()
+        filtered.describe()
+        filtered.crosstab('ap_lo', 'cardio')
+
+    return profiler.stages
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    data_path = args.data or Config().DATA_PATH
+    source = create_backend('pandas', data_path).load().df
+    output_dir = args.output_dir or tempfile.gettempdir()
+    os.makedirs(output_dir, exist_ok=True)
+    backends = [b for b in args.backends.split(',') if b]
+    sizes = [int(n) for n in args.rows.split(',') if n]
+
+    results = []
+    # 使用 spawn 启动子进程，避免继承父进程已分配的内存
+    context = multiprocessing.get_context('spawn')
+    for n_rows in sizes:
+        path = os.path.join(output_dir, f'cardio_benchmark_{n_rows}.parquet')
+        print(f"准备 {n_rows:,} 行测试数据: {path}")
+        make_dataset(source, n_rows, path, args.batch_rows)
+        for name in backends:
+            with context.Pool(1) as pool:
+                stages = pool.apply(run_backend, (name, path))
+            results.append((n_rows, name, {s['name']: s for s in stages}))
+            print(f"  {name}: {sum(s['wall_s'] for s in stages):.2f}s")
+
+    print("\n" + "=" * 100)
+    print("分析后端基准测试（墙钟秒；CPU/墙钟 > 1 表示多线程执行）")
+    print("=" * 100)
+    header = f"{'行数':>12}{'后端':>8}" + ''.join(f"{stage:>13}" for stage in STAGES)
+    print(header + f"{'合计':>10}{'CPU/墙钟':>10}{'峰值RSS(MB)':>13}")
+    for n_rows, name, stages in results:
+        wall = sum(s['wall_s'] for s in stages.values())
+        cpu = sum(s['cpu_s'] for s in stages.values())
+        peaks = [s['peak_rss_mb'] for s in stages.values() if s['peak_rss_mb'] is not None]
+        peak = f"{max(peaks):.0f}" if peaks else '-'
+        print(f"{n_rows:>12,}{name:>8}" + ''.join(f"{stages[stage]['wall_s']:>13.3f}" for stage in STAGES)
+              + f"{wall:>10.2f}{cpu / wall if wall > 0 else 0:>10.2f}{peak:>13}")
+    print("=" * 100 + "\n")
+
+
+if __name__ == '__main__':
+    main()
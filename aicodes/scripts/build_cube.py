@@ -0,0 +1,56 @@
+"""
+构建分组立方体脚本
+预计算低基数维度全部组合的计数和指标和，供 /analysis/query 接口查询
+"""
+
+import sys
+import os
+import argparse
+import time
+
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.cube import DataCube
+from utils.config import Config
+from utils.helpers import iter_data_chunks
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='构建分组立方体')
+    parser.add_argument('--data', default=None, help='数据文件路径（默认使用配置中的 DATA_PATH）')
+    parser.add_argument('--output', default=None, help='输出路径（默认 <ANALYSIS_STORE_DIR>/cube.npz）')
+    parser.add_argument('--chunk-size', type=int, default=200000, help='每块行数')
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    config = Config()
+    data_path = args.data or config.DATA_PATH
+    output_path = args.output or os.path.join(config.ANALYSIS_STORE_DIR, 'cube.npz')
+
+    start = time.perf_counter()
+    if data_path.endswith('.xlsx'):
+        chunks = [pd.read_excel(data_path)]
+    else:
+        chunks = iter_data_chunks(data_path, args.chunk_size)
+    cube = DataCube.build(chunks)
+    cube.save(output_path)
+
+    print("\n" + "=" * 50)
+    print("✅ 分组立方体构建完成")
+    print(f"  - 数据行数: {cube.n_rows:,}（无法归入维度的行: {cube.dropped:,}）")
+    print(f"  - 单元格数: {cube.counts.size:,}")
+    print(f"  - 文件大小: {os.path.getsize(output_path) / 1024:.1f} KB")
+    print(f"  - 耗时: {time.perf_counter() - start:.2f}s")
+    print(f"  - 输出: {output_path}")
+    print("=" * 50 + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+分类变量处理方式对比脚本
+比较 one-hot 展开与 xgboost 原生分类的矩阵宽度、训练时间和推理延迟
+"""
+
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.train_xgb import XGBoostTrainer
+from model.preprocessing import apply_category_mapping
+from utils.config import Config
+
+
+def measure_mode(data_path: str, mode: str, n_requests: int = 500) -> dict:
+    """
+    按指定方式训练一次并测量各项指标
+
+    Args:
+        data_path: 数据文件路径
+        mode: 'onehot' 或 'native'
+        n_requests: 单条推理延迟的测量次数
+
+    Returns:
+        dict: 测量结果
+    """
+    trainer = XGBoostTrainer(data_path, categorical_mode=mode)
+    df = trainer.load_data()
+    X, y = trainer.preprocess_data(df)
+    X_train, X_test, y_train, y_test = trainer.split_data(X, y)
+    X_train_scaled, X_test_scaled = trainer.standardize_features(X_train, X_test)
+
+    start = time.perf_counter()
+    trainer.train_model(X_train_scaled, y_train)
+    train_seconds = time.perf_counter() - start
+
+    auc = trainer.evaluate_model(X_test_scaled, y_test)['roc_auc']
+
+    # 单条推理：从原始取值开始，包含编码、标准化和预测，与线上请求路径一致
+    # 两种方式执行相同的预处理（按训练集均值填充数值列缺失值），只有分类编码不同
+    raw = df.drop(columns=[c for c in (trainer.target_col, 'id') if c in df.columns])
+    fill_values = raw.mean(numeric_only=True)
+    raw_rows = raw.head(n_requests)
+    latencies = []
+    for i in range(len(raw_rows)):
+        row = raw_rows.iloc[[i]]
+        start = time.perf_counter()
+        row = row.fillna(fill_values)
+        if mode == 'native':
+            row = apply_category_mapping(row, trainer.category_mapping)
+        else:
+            row = pd.get_dummies(row).reindex(columns=trainer.feature_names, fill_value=0)
+        trainer.model.predict_proba(trainer.scaler.transform(row[trainer.feature_names].to_numpy()))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'mode': mode,
+        'width': X_train_scaled.shape[1],
+        'matrix_mb': X_train_scaled.nbytes / 1024 / 1024,
+        'train_seconds': train_seconds,
+        'latency_p50_ms': float(np.percentile(latencies, 50)),
+        'latency_p99_ms': float(np.percentile(latencies, 99)),
+        'roc_auc': auc
+    }
+
+
+def main():
+    """主函数"""
+    data_path = sys.argv[1] if len(sys.argv) > 1 else Config().DATA_PATH
+
+    results = [measure_mode(data_path, mode) for mode in ('onehot', 'native')]
+
+    print("\n" + "=" * 80)
+    print("分类变量处理方式对比")
+    print("=" * 80)
+    print(f"{'方式':<10}{'矩阵宽度':>10}{'训练矩阵MB':>12}{'训练秒':>10}"
+          f"{'推理p50(ms)':>14}{'推理p99(ms)':>14}{'ROC AUC':>10}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['width']:>10}{r['matrix_mb']:>12.2f}{r['train_seconds']:>10.2f}"
+              f"{r['latency_p50_ms']:>14.3f}{r['latency_p99_ms']:>14.3f}{r['roc_auc']:>10.4f}")
+    print("=" * 80 + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,17 +4,40 @@
 
 import sys
 import os
+import argparse
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from analysis.backends import BACKENDS
 from analysis.data_analysis import CardiovascularDataAnalysis
 from utils.config import Config
 from utils.logger import setup_logger
 
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='生成数据分析报告')
+    parser.add_argument('--data', default=None, help='数据文件路径（默认使用配置中的 DATA_PATH）')
+    parser.add_argument('--streaming', action='store_true',
+                        help='流式分块统计，不加载完整数据（仅支持 .csv / .parquet）')
+    parser.add_argument('--chunk-size', type=int, default=200000, help='流式模式每块行数')
+    parser.add_argument('--incremental', action='store_true',
+                        help='流式模式下持久化充分统计量，之后只合并追加的新行')
+    parser.add_argument('--workers', type=int, default=None, help='并行进程数（默认按 CPU 核数）')
+    parser.add_argument('--backend', choices=list(BACKENDS), default=None,
+                        help='计算后端：pandas（默认）、polars 或 duckdb（惰性执行，下推投影和过滤）；'
+                             '流式模式不使用计算后端')
+    args = parser.parse_args()
+    if args.backend and (args.streaming or args.incremental):
+        parser.error("--backend 不能与 --streaming / --incremental 同时使用（流式模式分块统计，不使用计算后端）")
+    return args
+
+
 def main():
     """主函数"""
+    args = parse_args()
+    
     # 设置日志
     logger = setup_logger('generate_report')
     
@@ -26,33 +49,35 @@ def main():
     logger.info("=" * 50)
     
     # 创建分析器
-    logger.info(f"数据路径: {config.DATA_PATH}")
-    analyzer = CardiovascularDataAnalysis(data_path=config.DATA_PATH)
+    data_path = args.data or config.DATA_PATH
+    logger.info(f"数据路径: {data_path}")
+    analyzer = CardiovascularDataAnalysis(data_path=data_path, backend=args.backend or 'pandas')
     
-    # 加载数据
-    logger.info("\n加载数据...")
-    df = analyzer.load_data()
-    logger.info(f"数据形状: {df.shape}")
+    # 生成 HTML 报告
+    analysis_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'analysis')
+    output_path = os.path.join(analysis_dir, 'report.html')
+    
+    # 片段按列内容哈希缓存，数据未变化时不重新读取数据和生成图表
+    cache_dir = os.path.join(analysis_dir, '.report_cache')
     
-    # 生成基础统计
-    logger.info("\n生成基础统计信息...")
-    stats = analyzer.generate_basic_stats()
+    logger.info(f"\n生成 HTML 报告: {output_path}")
+    if args.streaming or args.incremental:
+        store_path = None
+        if args.incremental:
+            store_name = os.path.splitext(os.path.basename(data_path))[0] + '.pkl'
+            store_path = os.path.join(config.ANALYSIS_STORE_DIR, 'stats_store', store_name)
+        report_path = analyzer.generate_streaming_report(output_path, args.chunk_size, args.workers,
+                                                         store_path=store_path)
+    else:
+        report_path = analyzer.generate_html_report(output_path, args.workers, cache_dir=cache_dir)
+    
+    stats = analyzer.stats
     print(f"\n数据集信息:")
     print(f"  - 总样本数: {stats['shape'][0]:,}")
     print(f"  - 特征数量: {stats['shape'][1]}")
     print(f"  - 患病人数: {stats['cardio_distribution'].get(1, 0):,}")
     print(f"  - 健康人数: {stats['cardio_distribution'].get(0, 0):,}")
     
-    # 生成 HTML 报告
-    output_path = os.path.join(
-        os.path.dirname(os.path.dirname(__file__)),
-        'analysis',
-        'report.html'
-    )
-    
-    logger.info(f"\n生成 HTML 报告: {output_path}")
-    report_path = analyzer.generate_html_report(output_path)
-    
     logger.info("\n" + "=" * 50)
     logger.info("报告生成完成!")
     logger.info(f"报告位置: {os.path.abspath(report_path)}")
@@ -61,7 +86,7 @@ def main():
     print("\n" + "=" * 50)
     print("✅ 数据分析报告生成完成！")
     print(f"📊 报告位置: {os.path.abspath(report_path)}")
-    print("💡 请用浏览器打开 report.html 查看完整报告")
+    print("💡 启动 API 服务后访问 http://localhost:5000/analysis/report.html 查看完整报告（章节数据按需加载，需通过 HTTP 访问）")
     print("=" * 50 + "\n")
 
 
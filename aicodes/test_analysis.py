@@ -82,7 +82,7 @@ def main():
     print("=" * 60)
     print(f"\n📊 报告已生成: {os.path.abspath(report_path)}")
     print(f"📝 日志文件: logs/analysis_*.log")
-    print(f"\n💡 请用浏览器打开 report.html 查看完整报告")
+    print(f"\n💡 启动 API 服务后访问 http://localhost:5000/analysis/report.html 查看完整报告（章节数据按需加载，需通过 HTTP 访问）")
     print("=" * 60)
 
 
@@ -0,0 +1,54 @@
+"""
+测试问答缓存的近似匹配
+含义相反的问题（否定词、反义字、数字不同）即使字符相似度很高也不能命中缓存
+"""
+
+import os
+import sys
+
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from audio.answer_cache import AnswerCache
+
+
+def test_answer_cache():
+    """测试近似匹配不会把含义不同的问题当作重复"""
+    print("=" * 60)
+    print("测试问答缓存近似匹配")
+    print("=" * 60)
+
+    cached = "高血压患者每天早上空腹可以喝咖啡吗？"
+
+    # 默认只做精确匹配
+    cache = AnswerCache()
+    cache.put(cached, "答案")
+    assert cache.get("高血压患者每天早上空腹可以喝咖啡吗") is not None
+    assert cache.get("高血压患者每天早上空腹能喝咖啡吗？") is None
+    print("✅ 默认关闭近似匹配")
+
+    # 开启近似匹配（阈值放宽到 0.8，检查差异部分的判断）
+    cache = AnswerCache(similarity=0.8)
+    cache.put(cached, "答案")
+    should_miss = [
+        "低血压患者每天早上空腹可以喝咖啡吗？",
+        "高血压患者每天早上空腹不可以喝咖啡吗？",
+        "高血压患者每天早上空腹没法喝咖啡吗？",
+        "高血压患者每天晚上空腹可以喝咖啡吗？",
+        "高血压患者每天早上空腹可以喝2杯咖啡吗？",
+        "高血压患者每天早上空腹可以喝三杯咖啡吗？"
+    ]
+    for question in should_miss:
+        result = cache.get(question)
+        assert result is None, f"不应命中: {question} -> {result}"
+        print(f"✅ 未命中: {question}")
+
+    result = cache.get("高血压患者每天早上空腹可以喝咖啡么？")
+    assert result is not None and result[1] == 'near', result
+    print(f"✅ 近似命中（相似度 {result[2]:.2f}）: 高血压患者每天早上空腹可以喝咖啡么？")
+
+    print("\n测试完成!")
+
+
+if __name__ == '__main__':
+    test_answer_cache()
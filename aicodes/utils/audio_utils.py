@@ -3,9 +3,12 @@
 处理音频文件保存、路径管理等
 """
 
+import io
 import os
+import struct
 import uuid
-from typing import Optional
+import wave
+from typing import List, Optional
 
 
 def ensure_audio_directory(base_dir: str = 'static/audio') -> str:
@@ -73,6 +76,93 @@ def save_audio_file(audio_data: bytes, filename: Optional[str] = None) -> tuple:
     return file_path, audio_url
 
 
+def _wav_parts(data: bytes) -> tuple:
+    """
+    解析 WAV 数据
+    
+    流式合成返回的 WAV 头中数据长度可能是占位值，因此只取 data 块起点，读到文件末尾。
+    
+    Returns:
+        tuple: ((声道数, 采样宽度, 采样率), PCM 数据)
+    """
+    params = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id, size = struct.unpack('<4sI', data[offset:offset + 8])
+        if chunk_id == b'fmt ':
+            channels, rate = struct.unpack('<HI', data[offset + 10:offset + 16])
+            bits = struct.unpack('<H', data[offset + 22:offset + 24])[0]
+            params = (channels, bits // 8, rate)
+        elif chunk_id == b'data':
+            if params is None:
+                break
+            return params, data[offset + 8:]
+        offset += 8 + size + (size & 1)
+    raise ValueError("无法解析 WAV 数据")
+
+
+def wav_header(channels: int, sampwidth: int, rate: int, data_size: Optional[int] = None) -> bytes:
+    """
+    生成 WAV 文件头
+    
+    Args:
+        channels: 声道数
+        sampwidth: 采样宽度（字节）
+        rate: 采样率
+        data_size: PCM 数据长度；None 表示长度未知（流式输出），使用最大占位值
+        
+    Returns:
+        bytes: 44 字节的文件头
+    """
+    if data_size is None:
+        data_size = 0xFFFFFFFF - 36
+    return struct.pack('<4sI4s4sIHHIIHH4sI',
+                       b'RIFF', 36 + data_size, b'WAVE',
+                       b'fmt ', 16, 1, channels, rate, rate * channels * sampwidth, channels * sampwidth,
+                       sampwidth * 8,
+                       b'data', data_size)
+
+
+def pcm_to_wav(pcm: bytes, channels: int, sampwidth: int, rate: int) -> bytes:
+    """为 PCM 数据加上 WAV 文件头"""
+    return wav_header(channels, sampwidth, rate, len(pcm)) + pcm
+
+
+def concat_wav(segments: List[bytes]) -> bytes:
+    """
+    拼接多段音频
+    
+    WAV 按 PCM 数据拼接并重写文件头（各段采样参数须相同）；
+    其他格式（如 MP3 帧流）直接按字节拼接。
+    
+    Args:
+        segments: 各段音频数据
+        
+    Returns:
+        bytes: 拼接后的音频
+    """
+    if len(segments) == 1:
+        return segments[0]
+    if not all(segment[:4] == b'RIFF' and segment[8:12] == b'WAVE' for segment in segments):
+        return b''.join(segments)
+    
+    params, frames = None, []
+    for segment in segments:
+        segment_params, pcm = _wav_parts(segment)
+        if params is not None and segment_params != params:
+            raise ValueError(f"音频采样参数不一致，无法拼接: {params} / {segment_params}")
+        params = segment_params
+        frames.append(pcm)
+    
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as writer:
+        writer.setnchannels(params[0])
+        writer.setsampwidth(params[1])
+        writer.setframerate(params[2])
+        writer.writeframes(b''.join(frames))
+    return output.getvalue()
+
+
 def get_audio_url(filename: str) -> str:
     """
     根据文件名生成 URL
@@ -0,0 +1,18 @@
+"""
+心血管数据集的取值标签
+性别、胆固醇标签和年龄分段，供模型评估和数据分析共用（不依赖模型训练相关的包）
+"""
+
+import numpy as np
+
+GENDER_LABELS = {1: '女性', 2: '男性'}
+CHOLESTEROL_LABELS = {1: '正常', 2: '偏高', 3: '很高'}
+AGE_BANDS = [(0, 40, '<40'), (40, 50, '40-49'), (50, 60, '50-59'), (60, 200, '60+')]
+
+
+def age_in_years(age: np.ndarray) -> np.ndarray:
+    """年龄统一换算为岁（数据集中的年龄以天为单位）"""
+    age = np.asarray(age, dtype=np.float64)
+    if len(age) and np.nanmedian(age) > 150:
+        return age / 365.25
+    return age
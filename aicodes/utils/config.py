@@ -38,12 +38,48 @@ class Config:
             'DATA_PATH', 
             'D:/project/workspace/ai_coding/data/心血管疾病.xlsx'
         )
+        # 由数据生成的中间文件（增量统计存储、分组立方体、分层样本等）的目录，不能放在对外提供的 analysis/ 目录下
+        self.ANALYSIS_STORE_DIR = os.getenv(
+            'ANALYSIS_STORE_DIR',
+            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'analysis')
+        )
         
         # CosyVoice配置
         self.COSYVOICE_APPKEY = os.getenv('COSYVOICE_APPKEY', '')
         self.COSYVOICE_TOKEN = os.getenv('COSYVOICE_TOKEN', '')
         self.COSYVOICE_TIMEOUT = int(os.getenv('COSYVOICE_TIMEOUT', '30'))  # 超时时间（秒）
         self.COSYVOICE_MAX_RETRIES = int(os.getenv('COSYVOICE_MAX_RETRIES', '3'))  # 最大重试次数
+        self.COSYVOICE_MODEL = os.getenv('COSYVOICE_MODEL', 'cosyvoice-v1')
+        self.COSYVOICE_VOICE = os.getenv('COSYVOICE_VOICE', 'longxiaochun')  # v1 对应的音色
+        
+        # 问答缓存配置
+        self.QA_CACHE_MAX_ENTRIES = int(os.getenv('QA_CACHE_MAX_ENTRIES', '1000'))
+        self.QA_CACHE_TTL = int(os.getenv('QA_CACHE_TTL', '86400'))  # 有效期（秒）
+        self.QA_CACHE_SIMILARITY = float(os.getenv('QA_CACHE_SIMILARITY', '1.1'))  # 近似匹配阈值，大于 1 关闭（默认）
+        self.QA_PIPELINE_WORKERS = int(os.getenv('QA_PIPELINE_WORKERS', '3'))  # 流水线模式并发合成的句子数
+        
+        # 外部调用传输层配置（DeepSeek / CosyVoice 共用）
+        self.HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))  # 每个主机的 keep-alive 连接数
+        self.HTTP_MAX_PER_HOST = int(os.getenv('HTTP_MAX_PER_HOST', '8'))  # 每个主机的最大并发调用数
+        self.HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))  # 最大尝试次数
+        self.HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))  # 退避基础时间（秒）
+        self.HTTP_BACKOFF_CAP = float(os.getenv('HTTP_BACKOFF_CAP', '8'))  # 退避时间上限（秒）
+        self.CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))  # 熔断的连续失败次数
+        self.CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))  # 熔断持续时间（秒）
+        self.HTTP_ASYNC_POOL_SIZE = int(os.getenv('HTTP_ASYNC_POOL_SIZE', '100'))  # 异步服务的连接池大小
+        self.HTTP_ASYNC_MAX_PER_HOST = int(os.getenv('HTTP_ASYNC_MAX_PER_HOST', '64'))  # 异步服务每个主机的最大并发调用数
+        
+        # 对冲请求配置（LLM / TTS 调用超过最近耗时的分位数仍未返回时发出重复调用）
+        self.HEDGE_QUANTILE = float(os.getenv('HEDGE_QUANTILE', '0.9'))  # 对冲阈值分位数
+        self.HEDGE_BUDGET = float(os.getenv('HEDGE_BUDGET', '0.1'))  # 对冲调用数占总调用数的上限，0 关闭
+        self.HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))  # 开始对冲前需要的样本数
+        self.HEDGE_WORKERS = int(os.getenv('HEDGE_WORKERS', '16'))  # 同步服务中每类调用（LLM / TTS）的执行线程数
+        
+        # 后台任务队列配置（POST /qa_audio、/api/voice）
+        self.JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))  # 每个队列的工作线程数
+        self.JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '100'))  # 排队任务数上限，超过时返回 503
+        self.JOB_TTL = float(os.getenv('JOB_TTL', '3600'))  # 已结束任务的保留时间（秒）
+        self.JOB_ASYNC_WORKERS = int(os.getenv('JOB_ASYNC_WORKERS', '200'))  # 异步服务中同时执行的任务数（不占用线程）
         
         # Flask配置
         self.FLASK_HOST = os.getenv('FLASK_HOST', '0.0.0.0')
@@ -0,0 +1,204 @@
+"""
+对冲请求
+调用超过自适应阈值（最近调用耗时的 p90）仍未返回时，再发出一个相同的调用，取先成功的结果，
+以少量额外调用换取更低的尾延迟。对冲调用数不超过总调用数的固定比例（预算）。
+run 用于线程中的同步调用，arun 用于事件循环中的协程调用，两者共用阈值样本和预算
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Awaitable, Callable, Dict, Optional
+
+from utils.logger import setup_logger
+from utils.metrics import LatencyMetrics, latency_metrics
+
+# 设置日志
+logger = setup_logger('transport', log_dir='./logs')
+
+
+class Hedger:
+    """对冲调用（线程安全）"""
+
+    def __init__(self,
+                 name: str,
+                 quantile: float = 0.9,
+                 budget: float = 0.1,
+                 min_samples: int = 20,
+                 max_workers: int = 16,
+                 metrics: LatencyMetrics = latency_metrics):
+        """
+        初始化
+
+        Args:
+            name: 名称，调用耗时记录在 metrics 的 hedge.<name>
+            quantile: 对冲阈值取最近成功调用耗时的分位数
+            budget: 对冲调用数占总调用数的上限
+            min_samples: 样本数达到该值之前不对冲
+            max_workers: 执行调用（含对冲调用）的线程数
+            metrics: 耗时记录
+        """
+        if not 0 < quantile < 1:
+            raise ValueError(f"quantile 必须在 (0, 1) 之间: {quantile}")
+        self.name = name
+        self.quantile = quantile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.metrics = metrics
+        self.metric = f'hedge.{name}'
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'hedge-{name}')
+        self._lock = threading.Lock()
+        self._counts = {'calls': 0, 'hedges': 0, 'hedge_wins': 0, 'budget_denied': 0}
+        self.seconds_saved = 0.0
+
+    def threshold(self, size: float = 1.0) -> Optional[float]:
+        """
+        对冲阈值（秒）
+
+        Args:
+            size: 调用的规模（如合成文本的字数），阈值按单位耗时的分位数乘以规模计算
+
+        Returns:
+            float: 阈值，样本不足时返回 None（不对冲）
+        """
+        if self.metrics.count(self.metric) < self.min_samples:
+            return None
+        return self.metrics.quantile(self.metric, self.quantile) * size
+
+    def _timed(self, fn: Callable, args: tuple, size: float, started: Optional[threading.Event] = None):
+        if started is not None:
+            started.set()
+        start = time.perf_counter()
+        result = fn(*args)
+        finished = time.perf_counter()
+        self.metrics.record(self.metric, (finished - start) / size)
+        return result, finished
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self._counts['hedges'] < self.budget * self._counts['calls']:
+                self._counts['hedges'] += 1
+                return True
+            self._counts['budget_denied'] += 1
+            return False
+
+    async def _atimed(self, fn: Callable[..., Awaitable], args: tuple, size: float):
+        start = time.perf_counter()
+        result = await fn(*args)
+        finished = time.perf_counter()
+        self.metrics.record(self.metric, (finished - start) / size)
+        return result, finished
+
+    def _account_saved(self, primary: Future, hedge_finished: float):
+        """对冲调用先完成时，原调用结束后累计节省的时间"""
+        finished = primary.result()[1] if primary.exception() is None else time.perf_counter()
+        with self._lock:
+            self.seconds_saved += max(finished - hedge_finished, 0.0)
+
+    def run(self, fn: Callable, *args, size: float = 1.0):
+        """
+        执行调用，超过阈值未返回且预算允许时发出对冲调用
+
+        两个调用都会执行完毕（无法中途取消），先成功的结果被返回；都失败时抛出最后一个异常。
+        阈值从调用在线程池中开始执行时计时，排队等待线程的时间不计入。
+
+        Args:
+            fn: 调用函数
+            *args: 传给 fn 的参数
+            size: 调用的规模（>0），用于按规模缩放阈值
+
+        Returns:
+            fn 的返回值
+        """
+        with self._lock:
+            self._counts['calls'] += 1
+        threshold = self.threshold(size)
+        started = threading.Event()
+        primary = self._executor.submit(self._timed, fn, args, size, started)
+        if threshold is None:
+            return primary.result()[0]
+        # 阈值从调用实际开始执行时计时：线程池排满时排队的时间不计入，否则过载时反而发出更多对冲调用
+        started.wait()
+        try:
+            return primary.result(timeout=threshold)[0]
+        except FutureTimeout:
+            pass
+        if not self._take_budget():
+            return primary.result()[0]
+
+        logger.info(f"{self.name} 调用超过 {threshold:.2f}s 未返回，发出对冲调用")
+        hedge = self._executor.submit(self._timed, fn, args, size)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: f is hedge):
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                result, finished = future.result()
+                if future is hedge:
+                    with self._lock:
+                        self._counts['hedge_wins'] += 1
+                    primary.add_done_callback(lambda f: self._account_saved(f, finished))
+                return result
+        raise error
+
+    async def arun(self, fn: Callable[..., Awaitable], *args, size: float = 1.0):
+        """
+        执行协程调用，超过阈值未返回且预算允许时发出对冲调用（规则同 run）
+
+        先成功的调用返回后取消另一个调用（释放连接槽位，不再消耗服务配额），调用方被取消时两个调用一并取消。
+        落后的调用没有完成时间，节省的时间（seconds_saved）只由 run 统计。
+
+        Args:
+            fn: 协程函数
+            *args: 传给 fn 的参数
+            size: 调用的规模（>0），用于按规模缩放阈值
+
+        Returns:
+            fn 的返回值
+        """
+        with self._lock:
+            self._counts['calls'] += 1
+        threshold = self.threshold(size)
+        primary = asyncio.ensure_future(self._atimed(fn, args, size))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=threshold)
+            if not done and self._take_budget():
+                logger.info(f"{self.name} 调用超过 {threshold:.2f}s 未返回，发出对冲调用")
+                tasks.add(asyncio.ensure_future(self._atimed(fn, args, size)))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: t is not primary):
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is not primary:
+                        with self._lock:
+                            self._counts['hedge_wins'] += 1
+                    return task.result()[0]
+            raise error
+        finally:
+            # 已有结果、都失败或调用方被取消：取消未完成的调用，
+            # 其异常不再有人等待，取走以免事件循环报告未处理的异常
+            for task in tasks:
+                task.cancel()
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def stats(self) -> Dict:
+        """调用数、对冲率、对冲胜出次数、节省的时间和当前阈值（单位规模）"""
+        threshold = self.threshold()
+        with self._lock:
+            calls = self._counts['calls']
+            return dict(
+                self._counts,
+                hedge_rate=self._counts['hedges'] / calls if calls else 0.0,
+                seconds_saved=round(self.seconds_saved, 3),
+                threshold_ms=round(threshold * 1000, 1) if threshold is not None else None,
+                budget=self.budget
+            )
@@ -6,7 +6,7 @@
 import os
 import json
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Optional
 
 
 def ensure_dir(directory: str):
@@ -129,6 +129,34 @@ def safe_divide(a: float, b: float, default: float = 0.0) -> float:
         return default
 
 
+def iter_data_chunks(data_path: str,
+                     chunk_size: int = 100000,
+                     columns: Optional[List[str]] = None) -> Iterator:
+    """
+    分块读取数据文件
+
+    Args:
+        data_path: 数据文件路径（.csv 或 .parquet）
+        chunk_size: 每块行数
+        columns: 只读取的列（None 表示全部）
+
+    Yields:
+        DataFrame: 数据块
+    """
+    import pandas as pd
+
+    if data_path.endswith('.csv'):
+        yield from pd.read_csv(data_path, chunksize=chunk_size, usecols=columns)
+    elif data_path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(data_path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        raise ValueError("分块读取仅支持 .csv 和 .parquet 文件")
+
+
 if __name__ == "__main__":
     # 测试辅助函数
     print(f"时间戳: {get_timestamp()}")
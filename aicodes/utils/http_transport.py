@@ -0,0 +1,514 @@
+"""
+共享的外部调用传输层
+所有对 LLM / TTS 服务的调用共用：keep-alive 连接池（requests.Session）、按主机限制并发、
+带抖动的指数退避重试，以及服务故障时快速失败的熔断器。
+AsyncHTTPTransport 是基于 httpx 的 asyncio 版本，与同步版本共用各主机的熔断器
+"""
+
+import asyncio
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from utils.config import Config
+from utils.logger import setup_logger
+
+# 设置日志
+logger = setup_logger('transport', log_dir='./logs')
+
+# 视为临时故障、可以重试的 HTTP 状态码
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开，调用被直接拒绝"""
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    是否为临时故障（连接失败、超时、限流和 5xx），只有临时故障会重试并计入熔断
+
+    Args:
+        error: 异常
+
+    Returns:
+        bool: 是否为临时故障
+    """
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUSES
+    if httpx is not None:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in RETRY_STATUSES
+        if isinstance(error, httpx.TransportError):
+            return True
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError,
+                              asyncio.TimeoutError))
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    第 attempt 次（从 0 开始）失败后的等待时间：[0, min(cap, base · 2^attempt)] 内均匀随机（全抖动），
+    避免大量客户端在同一时刻重试
+
+    Args:
+        attempt: 已失败的次数 - 1
+        base: 基础等待时间（秒）
+        cap: 等待时间上限（秒）
+
+    Returns:
+        float: 等待时间（秒）
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    熔断器（线程安全）
+
+    连续失败 failure_threshold 次后打开，打开期间调用直接失败；reset_timeout 秒后进入半开状态，
+    放行一次试探调用，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        初始化
+
+        Args:
+            name: 名称（主机名）
+            failure_threshold: 打开熔断的连续失败次数
+            reset_timeout: 打开后到允许试探调用的时间（秒）
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """调用前检查，熔断时抛出 CircuitOpenError"""
+        with self._lock:
+            if self.state == 'closed':
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == 'open' and remaining <= 0:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self._rejected += 1
+        raise CircuitOpenError(f"{self.name} 服务暂不可用（熔断中，{max(remaining, 0):.0f} 秒后重试）")
+
+    def record_success(self):
+        """记录一次成功调用（服务有响应即可，包括非临时性的错误）"""
+        with self._lock:
+            if self.state != 'closed':
+                logger.info(f"{self.name} 熔断关闭")
+            self.state = 'closed'
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """记录一次临时故障"""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or (self.state == 'closed' and self._failures >= self.failure_threshold):
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                logger.warning(f"{self.name} 连续失败 {self._failures} 次，熔断 {self.reset_timeout:g} 秒")
+
+    def snapshot(self) -> Dict:
+        """状态、连续失败次数和被拒绝的调用数"""
+        with self._lock:
+            return {'state': self.state, 'failures': self._failures, 'rejected': self._rejected}
+
+
+class HTTPTransport:
+    """共享传输层（线程安全）"""
+
+    def __init__(self,
+                 pool_size: int = 10,
+                 max_per_host: int = 8,
+                 retries: int = 3,
+                 backoff_base: float = 0.5,
+                 backoff_cap: float = 8.0,
+                 failure_threshold: int = 5,
+                 reset_timeout: float = 30.0):
+        """
+        初始化
+
+        Args:
+            pool_size: 每个主机的 keep-alive 连接池大小
+            max_per_host: 每个主机的最大并发调用数（超过时排队等待）
+            retries: 默认最大尝试次数
+            backoff_base: 退避基础时间（秒）
+            backoff_cap: 退避时间上限（秒）
+            failure_threshold: 打开熔断的连续失败次数
+            reset_timeout: 熔断打开后到允许试探调用的时间（秒）
+        """
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        # 重试由本层负责，连接池本身不重试
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._counts = {'calls': 0, 'retries': 0, 'failures': 0}
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        """主机的熔断器"""
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(host, self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._semaphores[host]
+
+    @contextmanager
+    def slot(self, host: str, transient: Callable[[Exception], bool] = is_transient):
+        """
+        占用主机的一个并发名额执行一次调用：先检查熔断，结束时按结果更新熔断器
+
+        Args:
+            host: 主机名
+            transient: 判断异常是否为临时故障
+        """
+        breaker = self.breaker(host)
+        breaker.before_call()
+        with self._semaphore(host):
+            try:
+                yield
+            except Exception as e:
+                if transient(e):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                raise
+            except BaseException:
+                # 调用方提前关闭（如客户端断开后生成器被关闭），服务本身正常
+                breaker.record_success()
+                raise
+            breaker.record_success()
+
+    def _should_retry(self, host: str, error: Exception, attempt: int, retries: int,
+                      transient: Callable[[Exception], bool]) -> bool:
+        """失败后是否重试（需要重试时按退避时间等待）"""
+        with self._lock:
+            self._counts['failures'] += 1
+        if isinstance(error, CircuitOpenError) or not transient(error) or attempt >= retries - 1:
+            return False
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+        logger.warning(f"{host} 第 {attempt + 1}/{retries} 次调用失败: {error}，{delay:.2f} 秒后重试")
+        with self._lock:
+            self._counts['retries'] += 1
+        time.sleep(delay)
+        return True
+
+    def call(self, host: str, fn: Callable, *args,
+             retries: Optional[int] = None,
+             transient: Callable[[Exception], bool] = is_transient,
+             **kwargs):
+        """
+        通过传输层执行一次调用（限制并发、熔断、带抖动的指数退避重试）
+
+        Args:
+            host: 主机名（并发限制和熔断按主机区分）
+            fn: 调用函数，失败时抛出异常
+            *args, **kwargs: 传给 fn 的参数
+            retries: 最大尝试次数，默认使用初始化时的值
+            transient: 判断异常是否为临时故障（只重试临时故障）
+
+        Returns:
+            fn 的返回值；最后一次失败的异常或 CircuitOpenError 直接抛出
+        """
+        retries = retries or self.retries
+        for attempt in range(retries):
+            with self._lock:
+                self._counts['calls'] += 1
+            try:
+                with self.slot(host, transient):
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if not self._should_retry(host, e, attempt, retries, transient):
+                    raise
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        response = self.session.request(method, url, **kwargs)
+        if response.status_code in RETRY_STATUSES:
+            response.close()
+            response.raise_for_status()
+        return response
+
+    def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """
+        发送 HTTP 请求（参数同 requests.request）
+
+        限流和 5xx 响应按临时故障重试，其余状态码原样返回。
+
+        Args:
+            method: 请求方法
+            url: 地址
+            retries: 最大尝试次数
+
+        Returns:
+            requests.Response: 响应
+        """
+        return self.call(urlsplit(url).hostname, self._send, method, url, retries=retries, **kwargs)
+
+    @contextmanager
+    def stream(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> Iterator[requests.Response]:
+        """
+        发送流式 HTTP 请求，在整个读取期间占用并发名额
+
+        收到响应头之前的临时故障会重试；开始读取后出错不再重试（已输出的内容无法撤回）。
+
+        Args:
+            method: 请求方法
+            url: 地址
+            retries: 最大尝试次数
+
+        Returns:
+            requests.Response: 响应（退出时关闭，连接归还连接池）
+        """
+        host = urlsplit(url).hostname
+        retries = retries or self.retries
+        for attempt in range(retries):
+            opened = False
+            with self._lock:
+                self._counts['calls'] += 1
+            try:
+                with self.slot(host):
+                    with self._send(method, url, stream=True, **kwargs) as response:
+                        opened = True
+                        yield response
+                return
+            except Exception as e:
+                if opened or not self._should_retry(host, e, attempt, retries, is_transient):
+                    raise
+
+    def stats(self) -> Dict:
+        """调用、重试、失败次数和各主机的熔断状态"""
+        with self._lock:
+            counts = dict(self._counts)
+            breakers = list(self._breakers.values())
+        counts['breakers'] = {breaker.name: breaker.snapshot() for breaker in breakers}
+        return counts
+
+
+class AsyncHTTPTransport:
+    """
+    共享传输层的 asyncio 版本（httpx.AsyncClient 连接池、asyncio 信号量限制并发）
+
+    等待响应和退避期间不占用线程；熔断器与同步传输层共用，同一服务的故障对两者同时生效。
+    只能在创建后首次使用它的事件循环中使用。
+    """
+
+    def __init__(self,
+                 pool_size: int = 100,
+                 max_per_host: int = 8,
+                 retries: int = 3,
+                 backoff_base: float = 0.5,
+                 backoff_cap: float = 8.0,
+                 breaker: Optional[Callable[[str], CircuitBreaker]] = None):
+        """
+        初始化
+
+        Args:
+            pool_size: 连接池大小（keep-alive 连接数）
+            max_per_host: 每个主机的最大并发调用数（超过时排队等待，不占用线程）
+            retries: 默认最大尝试次数
+            backoff_base: 退避基础时间（秒）
+            backoff_cap: 退避时间上限（秒）
+            breaker: 主机名 -> 熔断器，默认使用同步共享传输层的熔断器
+        """
+        if httpx is None:
+            raise ImportError("异步传输层需要安装 httpx: pip install httpx")
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or get_transport().breaker
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._counts = {'calls': 0, 'retries': 0, 'failures': 0}
+
+    def _semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return self._semaphores[host]
+
+    @asynccontextmanager
+    async def slot(self, host: str, transient: Callable[[Exception], bool] = is_transient):
+        """占用主机的一个并发名额执行一次调用（同 HTTPTransport.slot）"""
+        breaker = self.breaker(host)
+        breaker.before_call()
+        async with self._semaphore(host):
+            try:
+                yield
+            except Exception as e:
+                if transient(e):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                raise
+            except BaseException:
+                # 调用被取消（如客户端断开），服务本身正常
+                breaker.record_success()
+                raise
+            breaker.record_success()
+
+    async def _should_retry(self, host: str, error: Exception, attempt: int, retries: int,
+                            transient: Callable[[Exception], bool]) -> bool:
+        """失败后是否重试（需要重试时按退避时间等待）"""
+        self._counts['failures'] += 1
+        if isinstance(error, CircuitOpenError) or not transient(error) or attempt >= retries - 1:
+            return False
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+        logger.warning(f"{host} 第 {attempt + 1}/{retries} 次调用失败: {error}，{delay:.2f} 秒后重试")
+        self._counts['retries'] += 1
+        await asyncio.sleep(delay)
+        return True
+
+    async def call(self, host: str, fn: Callable[..., Awaitable], *args,
+                   retries: Optional[int] = None,
+                   transient: Callable[[Exception], bool] = is_transient,
+                   **kwargs):
+        """
+        通过传输层执行一次异步调用（参数同 HTTPTransport.call，fn 为协程函数）
+
+        Returns:
+            fn 的返回值；最后一次失败的异常或 CircuitOpenError 直接抛出
+        """
+        retries = retries or self.retries
+        for attempt in range(retries):
+            self._counts['calls'] += 1
+            try:
+                async with self.slot(host, transient):
+                    return await fn(*args, **kwargs)
+            except Exception as e:
+                if not await self._should_retry(host, e, attempt, retries, transient):
+                    raise
+
+    async def _send(self, method: str, url: str, **kwargs) -> 'httpx.Response':
+        response = await self.client.request(method, url, **kwargs)
+        if response.status_code in RETRY_STATUSES:
+            response.raise_for_status()
+        return response
+
+    async def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> 'httpx.Response':
+        """
+        发送 HTTP 请求（参数同 httpx.AsyncClient.request，重试规则同 HTTPTransport.request）
+
+        Returns:
+            httpx.Response: 响应
+        """
+        return await self.call(urlsplit(url).hostname, self._send, method, url, retries=retries, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, retries: Optional[int] = None,
+                     **kwargs) -> AsyncIterator['httpx.Response']:
+        """
+        发送流式 HTTP 请求，在整个读取期间占用并发名额（重试规则同 HTTPTransport.stream）
+
+        Returns:
+            httpx.Response: 响应（退出时关闭，连接归还连接池）
+        """
+        host = urlsplit(url).hostname
+        retries = retries or self.retries
+        for attempt in range(retries):
+            opened = False
+            self._counts['calls'] += 1
+            try:
+                async with self.slot(host):
+                    request = self.client.build_request(method, url, **kwargs)
+                    response = await self.client.send(request, stream=True)
+                    try:
+                        if response.status_code in RETRY_STATUSES:
+                            response.raise_for_status()
+                        opened = True
+                        yield response
+                    finally:
+                        await response.aclose()
+                return
+            except Exception as e:
+                if opened or not await self._should_retry(host, e, attempt, retries, is_transient):
+                    raise
+
+    def stats(self) -> Dict:
+        """调用、重试、失败次数（熔断状态见同步传输层）"""
+        return dict(self._counts)
+
+    async def aclose(self):
+        """关闭连接池"""
+        await self.client.aclose()
+
+
+# 全局实例
+_transport = None
+_async_transport = None
+_transport_lock = threading.Lock()
+_async_transport_lock = threading.Lock()
+
+
+def get_transport() -> HTTPTransport:
+    """获取共享传输层实例（单例模式，参数来自配置）"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            config = Config()
+            _transport = HTTPTransport(
+                pool_size=config.HTTP_POOL_SIZE,
+                max_per_host=config.HTTP_MAX_PER_HOST,
+                retries=config.HTTP_MAX_RETRIES,
+                backoff_base=config.HTTP_BACKOFF_BASE,
+                backoff_cap=config.HTTP_BACKOFF_CAP,
+                failure_threshold=config.CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=config.CIRCUIT_RESET_TIMEOUT
+            )
+        return _transport
+
+
+def get_async_transport() -> AsyncHTTPTransport:
+    """获取共享异步传输层实例（单例模式，参数来自配置）"""
+    global _async_transport
+    with _async_transport_lock:
+        if _async_transport is None:
+            config = Config()
+            _async_transport = AsyncHTTPTransport(
+                pool_size=config.HTTP_ASYNC_POOL_SIZE,
+                max_per_host=config.HTTP_ASYNC_MAX_PER_HOST,
+                retries=config.HTTP_MAX_RETRIES,
+                backoff_base=config.HTTP_BACKOFF_BASE,
+                backoff_cap=config.HTTP_BACKOFF_CAP
+            )
+    return _async_transport
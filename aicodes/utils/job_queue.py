@@ -0,0 +1,356 @@
+"""
+后台任务队列
+耗时的请求（语音问答等）提交到有界队列后立即返回任务 ID，由固定数量的工作线程执行，
+或（异步服务中）作为协程在事件循环中执行，同时执行的协程数由信号量限制；
+客户端轮询任务状态或订阅状态变化（SSE）。相同键的任务在排队或执行期间合并为同一个任务
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from utils.config import Config
+from utils.logger import setup_logger
+from utils.metrics import LatencyMetrics, latency_metrics
+
+# 设置日志
+logger = setup_logger('jobs', log_dir='./logs')
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFullError(RuntimeError):
+    """排队的任务数已达上限"""
+
+
+class Job:
+    """一个后台任务"""
+
+    def __init__(self, key: str, fn: Callable, args: tuple, kwargs: Dict):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        # 状态每变化一次加一，订阅者据此判断是否有更新
+        self.version = 0
+        self.result = None
+        self.error = None
+        self.subscribers = 1
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def terminal(self) -> bool:
+        """是否已结束（成功或失败）"""
+        return self.status in (DONE, FAILED)
+
+
+class JobQueue:
+    """有界的后台任务队列（线程安全）"""
+
+    def __init__(self,
+                 name: str,
+                 workers: int = 4,
+                 max_pending: int = 100,
+                 ttl: float = 3600,
+                 async_workers: int = 200,
+                 metrics: LatencyMetrics = latency_metrics):
+        """
+        初始化并启动工作线程
+
+        Args:
+            name: 名称，排队和执行耗时记录在 metrics 的 jobs.<name>.wait 和 jobs.<name>.run
+            workers: 工作线程数（同时执行的 submit 任务数）
+            max_pending: 排队（未开始执行）的任务数上限，超过时拒绝提交
+            ttl: 已结束的任务保留的时间（秒），过期后查询不到
+            async_workers: 同时执行的 submit_coroutine 任务数（事件循环中的信号量，不占用线程）
+            metrics: 耗时记录
+        """
+        if workers < 1:
+            raise ValueError(f"workers 必须大于 0: {workers}")
+        if async_workers < 1:
+            raise ValueError(f"async_workers 必须大于 0: {async_workers}")
+        self.name = name
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.async_workers = async_workers
+        self.metrics = metrics
+        self._condition = threading.Condition()
+        # 等待工作线程的任务；等待信号量的协程任务
+        self._pending: deque = deque()
+        self._async_pending: deque = deque()
+        # 任务 ID -> 任务（按创建顺序），键 -> 排队或执行中的任务
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self._counts = {'submitted': 0, 'coalesced': 0, 'rejected': 0, 'done': 0, 'failed': 0}
+        # 在首次 submit_coroutine 时于事件循环中创建
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f'{name}-job-{i}', daemon=True).start()
+
+    def _enqueue(self, key: str, fn: Callable, args: tuple, kwargs: Dict, queue: deque) -> Tuple[Job, bool]:
+        """登记任务（相同键的任务正在排队或执行时合并），新任务加入 queue"""
+        with self._condition:
+            self._purge()
+            job = self._active.get(key)
+            if job is not None:
+                job.subscribers += 1
+                self._counts['coalesced'] += 1
+                return job, True
+            if len(self._pending) + len(self._async_pending) >= self.max_pending:
+                self._counts['rejected'] += 1
+                raise QueueFullError(f"{self.name} 任务队列已满（{self.max_pending} 个排队任务），请稍后重试")
+            job = Job(key, fn, args, kwargs)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            queue.append(job)
+            self._counts['submitted'] += 1
+            pending = len(self._pending) + len(self._async_pending)
+            self._condition.notify_all()
+        logger.info(f"{self.name} 任务 {job.id} 已提交，排队 {pending} 个")
+        return job, False
+
+    def submit(self, key: str, fn: Callable, *args, **kwargs) -> Tuple[Job, bool]:
+        """
+        提交任务（由工作线程执行）；相同键的任务正在排队或执行时直接返回该任务
+
+        Args:
+            key: 合并键（相同键视为相同请求）
+            fn: 任务函数，返回值为任务结果，抛出异常时任务失败
+            *args, **kwargs: 传给 fn 的参数
+
+        Returns:
+            tuple: (任务, 是否合并到已有任务)；排队任务数已达上限时抛出 QueueFullError
+        """
+        return self._enqueue(key, fn, args, kwargs, self._pending)
+
+    def submit_coroutine(self, key: str, fn: Callable[..., Awaitable], *args, **kwargs) -> Tuple[Job, bool]:
+        """
+        提交协程任务，在当前事件循环中执行（须在事件循环中调用，规则同 submit）
+
+        同时执行的协程任务数为 async_workers，超出的在信号量上排队，不占用线程。
+
+        Args:
+            key: 合并键（与 submit 的任务共用）
+            fn: 协程函数，返回值为任务结果，抛出异常时任务失败
+            *args, **kwargs: 传给 fn 的参数
+
+        Returns:
+            tuple: (任务, 是否合并到已有任务)；排队任务数已达上限时抛出 QueueFullError
+        """
+        job, coalesced = self._enqueue(key, fn, args, kwargs, self._async_pending)
+        if not coalesced:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.async_workers)
+            task = asyncio.get_running_loop().create_task(self._run_coroutine(job))
+            # 事件循环只保留任务的弱引用
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return job, coalesced
+
+    def _purge(self):
+        """删除过期的已结束任务（调用方持有锁）"""
+        deadline = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.terminal and job.finished < deadline]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _start(self, job: Job):
+        """标记任务开始执行（调用方持有锁）"""
+        job.status = RUNNING
+        job.started = time.time()
+        job.version += 1
+        self._condition.notify_all()
+
+    def _finish(self, job: Job, result, error: Optional[str]):
+        """记录任务结果"""
+        with self._condition:
+            job.result = result
+            job.error = error
+            job.status = FAILED if error is not None else DONE
+            job.finished = time.time()
+            job.version += 1
+            # 释放参数引用，结束的任务只保留结果
+            job.fn = job.args = job.kwargs = None
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            self._counts['failed' if error is not None else 'done'] += 1
+            self._condition.notify_all()
+        self.metrics.record(f'jobs.{self.name}.run', job.finished - job.started)
+
+    def _work(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+                job = self._pending.popleft()
+                self._start(job)
+            self.metrics.record(f'jobs.{self.name}.wait', job.started - job.created)
+
+            try:
+                result, error = job.fn(*job.args, **job.kwargs), None
+            except Exception as e:
+                logger.error(f"{self.name} 任务 {job.id} 失败: {e}", exc_info=True)
+                result, error = None, str(e)
+            self._finish(job, result, error)
+
+    async def _run_coroutine(self, job: Job):
+        try:
+            async with self._semaphore:
+                with self._condition:
+                    self._async_pending.remove(job)
+                    self._start(job)
+                self.metrics.record(f'jobs.{self.name}.wait', job.started - job.created)
+
+                try:
+                    result, error = await job.fn(*job.args, **job.kwargs), None
+                except Exception as e:
+                    logger.error(f"{self.name} 任务 {job.id} 失败: {e}", exc_info=True)
+                    result, error = None, str(e)
+                self._finish(job, result, error)
+        except asyncio.CancelledError:
+            # 事件循环关闭：排队或执行中的任务按失败结束
+            with self._condition:
+                if job in self._async_pending:
+                    self._async_pending.remove(job)
+                    self._start(job)
+            if not job.terminal:
+                self._finish(job, None, '服务已停止')
+            raise
+
+    def _snapshot(self, job: Job) -> Dict:
+        """任务状态（调用方持有锁）"""
+        snapshot = {
+            'job_id': job.id,
+            'status': job.status,
+            'version': job.version,
+            'subscribers': job.subscribers,
+            'created': round(job.created, 3)
+        }
+        if job.status == QUEUED:
+            queue = self._pending if job in self._pending else self._async_pending
+            snapshot['position'] = queue.index(job) + 1
+        if job.started is not None:
+            snapshot['queued_ms'] = round((job.started - job.created) * 1000, 1)
+        if job.terminal:
+            snapshot['run_ms'] = round((job.finished - job.started) * 1000, 1)
+            if job.error is not None:
+                snapshot['error'] = job.error
+            else:
+                snapshot['result'] = job.result
+        return snapshot
+
+    def accepted(self, job: Job, coalesced: bool, prefix: str) -> Dict:
+        """
+        提交后返回给客户端的内容
+
+        Args:
+            job: submit 返回的任务
+            coalesced: 是否合并到已有任务
+            prefix: 任务状态接口的路径前缀（<prefix>/<任务 ID> 查询，<prefix>/<任务 ID>/events 订阅）
+
+        Returns:
+            dict: 任务状态及 success、coalesced、status_url、events_url
+        """
+        with self._condition:
+            snapshot = self._snapshot(job)
+        return dict(
+            snapshot,
+            success=True,
+            coalesced=coalesced,
+            status_url=f'{prefix}/{job.id}',
+            events_url=f'{prefix}/{job.id}/events'
+        )
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        查询任务状态
+
+        Args:
+            job_id: 任务 ID
+
+        Returns:
+            dict: {'job_id', 'status', 'version', ...}，排队时另含 position，成功时含 result，失败时含 error；
+                  任务不存在或已过期时返回 None
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job is not None else None
+
+    def wait(self, job_id: str, version: int = -1, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        等待任务状态变化
+
+        Args:
+            job_id: 任务 ID
+            version: 已知的版本号，状态版本与之不同时立即返回
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            dict: 任务状态（超时时为当前状态），任务不存在时返回 None
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._condition.wait_for(lambda: job.version != version, timeout)
+            return self._snapshot(job)
+
+    def result(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        等待任务结束
+
+        Args:
+            job_id: 任务 ID
+            timeout: 最长等待时间（秒），None 表示一直等待
+
+        Returns:
+            dict: 任务状态（超时时为当前状态），任务不存在时返回 None
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._condition.wait_for(lambda: job.terminal, timeout)
+            return self._snapshot(job)
+
+    def stats(self) -> Dict:
+        """提交、合并、拒绝、完成和失败的任务数，当前排队和执行中的任务数"""
+        with self._condition:
+            pending = len(self._pending) + len(self._async_pending)
+            return dict(
+                self._counts,
+                pending=pending,
+                running=len(self._active) - pending,
+                max_pending=self.max_pending
+            )
+
+
+# 全局实例（名称 -> 队列）
+_queues: Dict[str, JobQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_job_queue(name: str) -> JobQueue:
+    """获取指定名称的任务队列（单例模式，参数来自配置）"""
+    with _queues_lock:
+        if name not in _queues:
+            config = Config()
+            _queues[name] = JobQueue(
+                name,
+                workers=config.JOB_WORKERS,
+                max_pending=config.JOB_MAX_PENDING,
+                ttl=config.JOB_TTL,
+                async_workers=config.JOB_ASYNC_WORKERS
+            )
+        return _queues[name]
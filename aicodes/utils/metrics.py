@@ -0,0 +1,72 @@
+"""
+延迟指标
+按名称记录最近若干次耗时，给出次数、均值和分位数（线程安全），
+用于首字延迟（TTFT）等在线指标
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class LatencyMetrics:
+    """滑动窗口延迟统计"""
+
+    def __init__(self, window: int = 1000):
+        """
+        初始化
+
+        Args:
+            window: 每个指标保留的最近样本数
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+
+    def record(self, name: str, seconds: float):
+        """记录一次耗时（秒）"""
+        with self._lock:
+            if name not in self._samples:
+                self._samples[name] = deque(maxlen=self.window)
+                self._counts[name] = 0
+            self._samples[name].append(seconds)
+            self._counts[name] += 1
+
+    def count(self, name: str) -> int:
+        """最近窗口内的样本数"""
+        with self._lock:
+            return len(self._samples.get(name, ()))
+
+    def quantile(self, name: str, q: float) -> Optional[float]:
+        """最近样本的分位数（秒），没有样本时返回 None"""
+        with self._lock:
+            samples = list(self._samples.get(name, ()))
+        return float(np.quantile(samples, q)) if samples else None
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        全部指标的汇总
+
+        Returns:
+            dict: 指标名 -> {'count', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms'}（分位数按最近窗口计算）
+        """
+        with self._lock:
+            items = {name: (self._counts[name], np.array(samples)) for name, samples in self._samples.items()}
+        result = {}
+        for name, (count, samples) in items.items():
+            p50, p90, p99 = np.quantile(samples, [0.5, 0.9, 0.99]) * 1000
+            result[name] = {
+                'count': count,
+                'mean_ms': round(float(samples.mean()) * 1000, 1),
+                'p50_ms': round(float(p50), 1),
+                'p90_ms': round(float(p90), 1),
+                'p99_ms': round(float(p99), 1)
+            }
+        return result
+
+
+# 进程内共享的指标
+latency_metrics = LatencyMetrics()
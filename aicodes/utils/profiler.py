@@ -0,0 +1,202 @@
+"""
+阶段性能分析工具
+记录各阶段的墙钟时间、CPU 时间和峰值内存，
+导出 JSON 时间线和 Chrome trace-event 文件，可选对指定阶段运行 cProfile
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def _current_rss() -> Optional[int]:
+    """当前进程常驻内存（字节），无法获取时返回 None"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        # Linux 下从 /proc 读取，单位为页
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _PeakRssSampler:
+    """后台线程定时采样常驻内存，得到阶段内的峰值"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = _current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = _current_rss()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def __enter__(self):
+        if self.peak is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        rss = _current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+
+class StageProfiler:
+    """阶段性能分析器"""
+
+    def __init__(self, name: str = 'training', profile_stage: Optional[str] = None,
+                 sample_interval: float = 0.01):
+        """
+        初始化分析器
+
+        Args:
+            name: 分析对象名称，用作输出文件名前缀
+            profile_stage: 需要运行 cProfile 的阶段名（None 表示不运行）
+            sample_interval: 内存采样间隔（秒）
+        """
+        self.name = name
+        self.profile_stage = profile_stage
+        self.sample_interval = sample_interval
+        self.started_at = datetime.now()
+        self._origin = time.perf_counter()
+        self.stages: List[Dict] = []
+        self.profiles: Dict[str, pstats.Stats] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        记录一个阶段
+
+        Args:
+            name: 阶段名
+        """
+        profiler = cProfile.Profile() if name == self.profile_stage else None
+        rss_start = _current_rss()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        with _PeakRssSampler(self.sample_interval) as sampler:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                yield
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        self.stages.append({
+            'name': name,
+            'start_s': wall_start - self._origin,
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'rss_start_mb': rss_start / 1024 / 1024 if rss_start is not None else None,
+            'peak_rss_mb': sampler.peak / 1024 / 1024 if sampler.peak is not None else None
+        })
+        if profiler is not None:
+            self.profiles[name] = pstats.Stats(profiler)
+
+    def summary(self) -> str:
+        """
+        生成文本汇总表
+
+        Returns:
+            str: 各阶段耗时、占比和峰值内存
+        """
+        total = sum(s['wall_s'] for s in self.stages) or 1.0
+        lines = [f"{'阶段':<14}{'墙钟(s)':>10}{'CPU(s)':>10}{'占比':>8}{'峰值RSS(MB)':>14}"]
+        for s in self.stages:
+            peak = f"{s['peak_rss_mb']:.1f}" if s['peak_rss_mb'] is not None else '-'
+            lines.append(f"{s['name']:<14}{s['wall_s']:>10.3f}{s['cpu_s']:>10.3f}"
+                         f"{s['wall_s'] / total:>8.1%}{peak:>14}")
+        return "\n".join(lines)
+
+    def to_timeline(self) -> Dict:
+        """转换为 JSON 时间线"""
+        return {
+            'name': self.name,
+            'started_at': self.started_at.isoformat(),
+            'total_wall_s': sum(s['wall_s'] for s in self.stages),
+            'stages': self.stages
+        }
+
+    def to_chrome_trace(self) -> Dict:
+        """
+        转换为 Chrome trace-event 格式（chrome://tracing 或 Perfetto 可打开）
+
+        Returns:
+            dict: trace-event 文档
+        """
+        pid = os.getpid()
+        events = []
+        for s in self.stages:
+            ts = s['start_s'] * 1e6
+            events.append({
+                'name': s['name'], 'cat': self.name, 'ph': 'X',
+                'ts': ts, 'dur': s['wall_s'] * 1e6, 'pid': pid, 'tid': 1,
+                'args': {'cpu_s': s['cpu_s'], 'peak_rss_mb': s['peak_rss_mb']}
+            })
+            if s['peak_rss_mb'] is not None:
+                events.append({
+                    'name': 'peak_rss_mb', 'ph': 'C', 'ts': ts, 'pid': pid,
+                    'args': {'peak_rss_mb': s['peak_rss_mb']}
+                })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, output_dir: str) -> Dict[str, str]:
+        """
+        保存时间线、trace 文件和 cProfile 结果
+
+        Args:
+            output_dir: 输出目录
+
+        Returns:
+            dict: 输出类型 -> 文件路径
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        paths = {
+            'timeline': os.path.join(output_dir, f'{self.name}_timeline.json'),
+            'trace': os.path.join(output_dir, f'{self.name}_trace.json')
+        }
+
+        with open(paths['timeline'], 'w', encoding='utf-8') as f:
+            json.dump(self.to_timeline(), f, ensure_ascii=False, indent=2)
+        with open(paths['trace'], 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f)
+
+        for stage_name, stats in self.profiles.items():
+            prof_path = os.path.join(output_dir, f'{self.name}_{stage_name}.prof')
+            stats.dump_stats(prof_path)
+            paths[f'profile_{stage_name}'] = prof_path
+
+            # 同时输出按累计时间排序的前 30 项，便于直接查看
+            stream = io.StringIO()
+            pstats.Stats(prof_path, stream=stream).sort_stats('cumulative').print_stats(30)
+            text_path = os.path.join(output_dir, f'{self.name}_{stage_name}_profile.txt')
+            with open(text_path, 'w', encoding='utf-8') as f:
+                f.write(stream.getvalue())
+            paths[f'profile_{stage_name}_text'] = text_path
+
+        return paths
@@ -221,7 +221,19 @@ async function handleVoice(e) {
             body: JSON.stringify({ question })
         });
         
-        const result = await response.json();
+        const job = await response.json();
+        
+        if (!response.ok) {
+            document.getElementById(loadingId).remove();
+            addMessage('assistant', '抱歉，回答失败: ' + job.error, 'voice-messages');
+            return;
+        }
+        
+        // 订阅任务状态，完成后显示结果
+        const result = await waitForJob(job.events_url, status => {
+            const text = status.status === 'queued' ? `排队中（第 ${status.position} 位）...` : '正在生成回答和语音...';
+            document.getElementById(loadingId).lastElementChild.textContent = text;
+        });
         
         // 移除加载消息
         document.getElementById(loadingId).remove();
@@ -244,6 +256,27 @@ async function handleVoice(e) {
     }
 }
 
+// 订阅后台任务状态（SSE），返回任务结果；任务失败时返回 {success: false, error}
+function waitForJob(eventsUrl, onStatus) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`${API_BASE_URL}${eventsUrl}`);
+        source.addEventListener('status', e => onStatus(JSON.parse(e.data)));
+        source.addEventListener('done', e => {
+            source.close();
+            resolve(JSON.parse(e.data).result);
+        });
+        source.addEventListener('error', e => {
+            source.close();
+            // 服务端的 error 事件带数据，连接中断时没有
+            if (e.data) {
+                resolve({ success: false, error: JSON.parse(e.data).error });
+            } else {
+                reject(new Error('连接中断'));
+            }
+        });
+    });
+}
+
 // 添加消息
 function addMessage(role, content, containerId) {
     const container = document.getElementById(containerId);